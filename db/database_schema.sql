@@ -1,6 +1,15 @@
 -- Local SQLite Database Schema for RTX 3060 Edge Processing
--- Version: 2.0.0
--- Last Updated: 2025-11-15
+-- Version: 2.1.0
+-- Last Updated: 2026-10-18
+-- Modified 2026-10-18: Added session_profiles (per-stage timing percentiles per session, detection v3.14.0)
+-- Modified 2026-10-18: Added camera_events (camera_frozen from the frame quality gate);
+--                       sessions gains frames_skipped_dark/blurred/repeat (detection v3.12.0)
+-- Modified 2026-10-18: sessions gains effective_fps/fps_profile (event-adaptive sampling, detection v3.11.0)
+-- Modified 2026-10-18: sessions gains cascade_escalation_rate (detector cascade, detection v3.10.0)
+-- Modified 2026-10-18: sessions gains checkpoint_frame/checkpoint_state/checkpoint_at (resumable sessions);
+--                       processing_jobs gains plan_mode/plan_fps (deadline plans)
+-- Modified 2026-10-18: videos gains file_path/integrity_status/ffmpeg_exit_code (segment manifest)
+-- Modified 2026-10-18: Added processing_jobs claim table (see scripts/orchestration/processing_jobs.py)
 -- Purpose: Local transactional buffer for real-time processing, syncs to Supabase hourly
 -- Note: Schema mirrors Supabase ASE_ tables but adapted for SQLite
 
@@ -61,7 +70,7 @@ CREATE TABLE IF NOT EXISTS camera_rois (
 -- VIDEO & SESSION MANAGEMENT
 -- =============================================================================
 
--- VIDEOS: Video file metadata
+-- VIDEOS: Video file metadata (segment manifest, registered by capture when ffmpeg closes a segment)
 CREATE TABLE IF NOT EXISTS videos (
     video_id INTEGER PRIMARY KEY AUTOINCREMENT,
     camera_id TEXT NOT NULL,
@@ -74,7 +83,13 @@ CREATE TABLE IF NOT EXISTS videos (
     fps REAL,
     resolution TEXT,
     is_processed INTEGER DEFAULT 0,
-    storage_location TEXT DEFAULT 'local',
+    storage_location TEXT DEFAULT 'local',  -- 'local', 'deleted'
+    file_path TEXT,                         -- Absolute path (set by capture)
+    integrity_status TEXT DEFAULT 'ok',     -- 'ok', 'partial', 'empty', 'corrupt' (quarantined), 'missing'
+    ffmpeg_exit_code INTEGER,
+    analytics_path TEXT,                    -- Sub-stream copy (dual-stream capture), analytics/<same filename>
+    integrity_reason TEXT,                  -- Why a segment is not 'ok' (segment_integrity.py)
+    companion_size_bytes INTEGER,           -- Analytics segment + keyframe index sidecars (disk accounting)
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (camera_id) REFERENCES cameras(camera_id),
     UNIQUE(camera_id, video_filename)
@@ -93,15 +108,56 @@ CREATE TABLE IF NOT EXISTS sessions (
     total_frames INTEGER,
     fps REAL,
     resolution TEXT,
-    processing_status TEXT DEFAULT 'pending',
+    processing_status TEXT DEFAULT 'pending',  -- 'running', 'complete', 'failed' (detection v3.6.0+)
     processing_time_seconds REAL,
     error_message TEXT,
+    checkpoint_frame INTEGER,                  -- Last frame whose results are stored (resume point)
+    checkpoint_state TEXT,                     -- JSON: debounce state, frame counter, finished video parts
+    checkpoint_at TIMESTAMP,                   -- Refreshed every 15s while running
+    cascade_escalation_rate REAL,              -- Frames sent to the full detector under --cascade (NULL = no cascade)
+    effective_fps REAL,                        -- Processed frames per second of media
+    fps_profile TEXT,                          -- JSON {fps: share of media time} under --adaptive-fps
+    frames_skipped_dark INTEGER,               -- Frame quality gate skips (NULL = gate off)
+    frames_skipped_blurred INTEGER,
+    frames_skipped_repeat INTEGER,
+    config_hash TEXT,                          -- Content hash of the ROI config (roi_compiler.py cache key)
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (camera_id) REFERENCES cameras(camera_id),
     FOREIGN KEY (video_id) REFERENCES videos(video_id),
     FOREIGN KEY (location_id) REFERENCES locations(location_id)
 );
 
+-- PROCESSING_JOBS: One row per video to process (atomic claim/heartbeat/complete)
+-- Workers claim with BEGIN IMMEDIATE; UNIQUE key makes discovery idempotent
+CREATE TABLE IF NOT EXISTS processing_jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    camera_id TEXT NOT NULL,
+    video_file TEXT NOT NULL,
+    video_path TEXT NOT NULL,
+    video_date TEXT,
+    priority INTEGER DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',  -- 'pending', 'running', 'done', 'skipped', 'failed', 'deferred'
+    attempts INTEGER DEFAULT 0,
+    worker_id TEXT,                          -- host:pid:worker-N
+    claimed_at TIMESTAMP,
+    heartbeat_at TIMESTAMP,
+    completed_at TIMESTAMP,
+    exit_code INTEGER,
+    processing_seconds REAL,
+    error_message TEXT,
+    plan_mode TEXT,                          -- Deadline plan: 'full', 'reduced_fps', 'headless', 'deferred'
+    plan_fps REAL,                           -- Detection --fps for this job (NULL = default)
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(camera_id, video_file)
+);
+
+-- JOB_DISCOVERY_DIRS: Folder mtimes from last discovery (unchanged folders are skipped)
+CREATE TABLE IF NOT EXISTS job_discovery_dirs (
+    dir_path TEXT PRIMARY KEY,
+    dir_mtime REAL NOT NULL,
+    scanned_at TIMESTAMP
+);
+
 -- =============================================================================
 -- STATE TRACKING TABLES (Transactional Buffer - 24h retention)
 -- =============================================================================
@@ -148,6 +204,42 @@ CREATE TABLE IF NOT EXISTS table_states (
     FOREIGN KEY (location_id) REFERENCES locations(location_id)
 );
 
+-- CAMERA_EVENTS: Camera health events seen during detection (frame quality gate)
+CREATE TABLE IF NOT EXISTS camera_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    camera_id TEXT,
+    event_type TEXT NOT NULL,                  -- 'camera_frozen'
+    frame_number INTEGER NOT NULL,             -- First frame of the event
+    end_frame INTEGER,                         -- NULL while ongoing
+    media_seconds REAL,                        -- Position of frame_number in the segment
+    duration_seconds REAL,
+    timestamp REAL NOT NULL,                   -- When it was recorded
+    details TEXT,                              -- JSON (luma, sharpness, until_end)
+    FOREIGN KEY (session_id) REFERENCES sessions(session_id)
+);
+
+-- SESSION_PROFILES: Stage timings of a detection run, one row per stage (stage_profiler.py)
+CREATE TABLE IF NOT EXISTS session_profiles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    camera_id TEXT,
+    code_version TEXT,                         -- Detection script version + git commit ('3.14.0+3de1f44')
+    backend TEXT,                              -- Inference backend ('pytorch', 'onnx', 'cascade (...)')
+    stage TEXT NOT NULL,                       -- decode, skip, detect, classify, assign, state, draw,
+                                               -- encode, screenshot, db, finalize, frame
+    samples INTEGER NOT NULL,                  -- Frames on which the stage ran
+    total_ms REAL,
+    mean_ms REAL,
+    p50_ms REAL,
+    p95_ms REAL,
+    p99_ms REAL,
+    max_ms REAL,
+    histogram TEXT,                            -- JSON {bucket: count}, 10% log buckets (mergeable)
+    created_at TEXT,
+    FOREIGN KEY (session_id) REFERENCES sessions(session_id)
+);
+
 -- =============================================================================
 -- SYNC TRACKING
 -- =============================================================================
@@ -190,6 +282,13 @@ CREATE INDEX IF NOT EXISTS idx_rois_active ON camera_rois(camera_id, is_active)
 -- Video indexes
 CREATE INDEX IF NOT EXISTS idx_videos_camera_date ON videos(camera_id, video_date);
 CREATE INDEX IF NOT EXISTS idx_videos_unprocessed ON videos(camera_id, is_processed) WHERE is_processed = 0;
+CREATE INDEX IF NOT EXISTS idx_videos_date_storage ON videos(video_date, storage_location);
+CREATE INDEX IF NOT EXISTS idx_videos_end_time ON videos(end_time);
+
+-- Processing job indexes
+CREATE INDEX IF NOT EXISTS idx_jobs_claimable ON processing_jobs(status, priority, job_id)
+    WHERE status IN ('pending', 'running');
+CREATE INDEX IF NOT EXISTS idx_jobs_camera_date ON processing_jobs(camera_id, video_date);
 
 -- Session indexes
 CREATE INDEX IF NOT EXISTS idx_sessions_camera ON sessions(camera_id, created_at);
@@ -207,6 +306,11 @@ CREATE INDEX IF NOT EXISTS idx_table_camera_time ON table_states(camera_id, time
 CREATE INDEX IF NOT EXISTS idx_table_location_table_time ON table_states(location_id, table_id, timestamp_recorded);
 CREATE INDEX IF NOT EXISTS idx_table_unsynced ON table_states(synced_to_cloud) WHERE synced_to_cloud = 0;
 
+-- Camera event indexes
+CREATE INDEX IF NOT EXISTS idx_camera_events_camera ON camera_events(camera_id, event_type);
+CREATE INDEX IF NOT EXISTS idx_session_profiles_session ON session_profiles(session_id);
+CREATE INDEX IF NOT EXISTS idx_session_profiles_camera ON session_profiles(camera_id, stage);
+
 -- Sync queue indexes
 CREATE INDEX IF NOT EXISTS idx_sync_queue_pending ON sync_queue(table_name, created_at);
 
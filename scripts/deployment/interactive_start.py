@@ -3,6 +3,7 @@
 ASE Restaurant Surveillance System - Configuration Library v3.0
 Created: 2025-11-16
 Modified: 2025-11-16 - Library for configuration functionality (imported by initialize_restaurant.py)
+Modified: 2026-10-18 - Camera test probes all cameras in parallel via video_capture/rtsp_probe.py
 
 ⚠️  NOTICE: This file is a LIBRARY, not an entry point!
     DO NOT execute this file directly.
@@ -65,6 +66,8 @@ LOGS_DIR = PROJECT_ROOT / "logs"
 # Add scripts to path
 sys.path.insert(0, str(SCRIPTS_DIR))
 
+from video_capture.rtsp_probe import probe_cameras, probe_camera_sync, PROBE_TIMEOUT_SECONDS
+
 
 class InteractiveStartup:
     """
@@ -1009,17 +1012,20 @@ class InteractiveStartup:
         print(f"{Colors.BOLD}🔌 STEP 2: CAMERA CONNECTION TEST{Colors.RESET}")
         print("=" * 72 + "\n")
 
-        print(f"Testing RTSP connections for {len(self.cameras)} cameras...")
-        print("This may take 10-20 seconds per camera.\n")
+        print(f"Probing RTSP for {len(self.cameras)} cameras in parallel...")
+        print(f"Timeout: {PROBE_TIMEOUT_SECONDS:.0f}s for all cameras together.\n")
         print("─" * 72 + "\n")
 
-        # Test all cameras
-        for i, camera in enumerate(self.cameras, 1):
-            print(f"[{i}/{len(self.cameras)}] Testing {Colors.CYAN}{camera['id']}{Colors.RESET} ({camera.get('ip', 'N/A')}:{camera.get('port', 554)})")
-
-            success = self.test_camera_connection(camera, verbose=True)
-            self.camera_test_results[camera['id']] = success
+        # Probe all cameras concurrently (TCP + RTSP OPTIONS/DESCRIBE)
+        start_time = time.time()
+        results = probe_cameras({camera['id']: self._probe_config(camera) for camera in self.cameras})
+        elapsed = time.time() - start_time
 
+        for i, camera in enumerate(self.cameras, 1):
+            print(f"[{i}/{len(self.cameras)}] {Colors.CYAN}{camera['id']}{Colors.RESET} ({camera.get('ip', 'N/A')}:{camera.get('port', 554)})")
+            result = results[camera['id']]
+            self._print_probe_result(result)
+            self.camera_test_results[camera['id']] = result['stream_available']
             print()
 
         # Summary
@@ -1031,7 +1037,8 @@ class InteractiveStartup:
         print(f"  Total Cameras:    {total}")
         print(f"  Passed:           {Colors.GREEN}{passed} ✅{Colors.RESET}")
         print(f"  Failed:           {Colors.RED}{total - passed} ❌{Colors.RESET}")
-        print(f"  Success Rate:     {passed/total*100:.1f}%\n")
+        print(f"  Success Rate:     {passed/total*100:.1f}%")
+        print(f"  Probe Time:       {elapsed:.1f}s\n")
 
         # Handle failures
         failed_cameras = [cam for cam in self.cameras if not self.camera_test_results.get(cam['id'], False)]
@@ -1041,59 +1048,38 @@ class InteractiveStartup:
 
         return True
 
-    def test_camera_connection(self, camera: Dict, verbose: bool = False) -> bool:
-        """Test a single camera connection using OpenCV"""
-        try:
-            import cv2
-
-            # Build RTSP URL
-            ip = camera.get('ip', '')
-            port = camera.get('port', 554)
-            username = camera.get('username', 'admin')
-            password = camera.get('password', '123456')
-            stream_path = camera.get('stream_path', '/media/video1')
-
-            rtsp_url = f"rtsp://{username}:{password}@{ip}:{port}{stream_path}"
-
-            if verbose:
-                print(f"  ⏳ Connecting to rtsp://{username}:***@{ip}:{port}{stream_path}")
-
-            # Try to open stream
-            start_time = time.time()
-            cap = cv2.VideoCapture(rtsp_url)
-
-            if not cap.isOpened():
-                if verbose:
-                    print(f"  {Colors.RED}❌ Connection failed (could not open stream){Colors.RESET}")
-                cap.release()
-                return False
-
-            # Try to read a frame
-            ret, frame = cap.read()
-            elapsed = time.time() - start_time
-
-            if ret and frame is not None:
-                height, width = frame.shape[:2]
-                fps = cap.get(cv2.CAP_PROP_FPS)
-
-                if verbose:
-                    print(f"  {Colors.GREEN}✅ Connection successful ({elapsed:.1f}s){Colors.RESET}")
-                    print(f"  {Colors.GREEN}✅ Video stream detected ({width}x{height}){Colors.RESET}")
-                    print(f"  {Colors.GREEN}✅ FPS: {fps:.1f}{Colors.RESET}")
-                    print(f"  {Colors.GREEN}✅ Status: READY{Colors.RESET}")
+    @staticmethod
+    def _probe_config(camera: Dict) -> Dict:
+        """Camera wizard entry -> rtsp_probe config (same defaults as before)"""
+        return {
+            'ip': camera.get('ip', ''),
+            'port': camera.get('port', 554),
+            'username': camera.get('username', 'admin'),
+            'password': camera.get('password', '123456'),
+            'stream_path': camera.get('stream_path', '/media/video1'),
+        }
 
-                cap.release()
-                return True
-            else:
-                if verbose:
-                    print(f"  {Colors.RED}❌ Connection failed (no frames received){Colors.RESET}")
-                cap.release()
-                return False
+    def _print_probe_result(self, result: Dict):
+        if result['stream_available']:
+            print(f"  {Colors.GREEN}✅ TCP connect: {result['tcp_rtt_ms']:.1f}ms{Colors.RESET}")
+            print(f"  {Colors.GREEN}✅ Video stream available (OPTIONS+DESCRIBE {result['describe_ms']:.1f}ms){Colors.RESET}")
+            print(f"  {Colors.GREEN}✅ Status: READY{Colors.RESET}")
+        elif result['reachable']:
+            print(f"  {Colors.GREEN}✅ TCP connect: {result['tcp_rtt_ms']:.1f}ms{Colors.RESET}")
+            print(f"  {Colors.RED}❌ RTSP failed: {result['error']}{Colors.RESET}")
+        else:
+            print(f"  {Colors.RED}❌ Connection failed: {result['error']}{Colors.RESET}")
 
-        except Exception as e:
-            if verbose:
-                print(f"  {Colors.RED}❌ Connection failed: {e}{Colors.RESET}")
-            return False
+    def test_camera_connection(self, camera: Dict, verbose: bool = False) -> bool:
+        """Test a single camera connection (TCP + RTSP OPTIONS/DESCRIBE)"""
+        if verbose:
+            print(f"  ⏳ Probing rtsp://{camera.get('username', 'admin')}:***@{camera.get('ip', '')}:"
+                  f"{camera.get('port', 554)}{camera.get('stream_path', '/media/video1')}")
+
+        result = probe_camera_sync(camera.get('id', 'camera'), self._probe_config(camera))
+        if verbose:
+            self._print_probe_result(result)
+        return result['stream_available']
 
     def handle_camera_failures(self, failed_cameras: List[Dict]) -> bool:
         """Handle failed camera connections interactively"""
@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 """
 # Modified: 2025-11-16 - Created camera management tool with add/remove/edit capabilities
+# Modified: 2026-10-18 - Camera test uses rtsp_probe (concurrent TCP + RTSP OPTIONS/DESCRIBE), --test flag
+# Modified: 2026-10-18 - Sub-stream path / analytics capture in add, edit and list
 
 Camera Management Tool
-Version: 1.0.0
+Version: 1.2.0
 Created: 2025-11-16
 
 Purpose:
@@ -19,6 +21,8 @@ Usage:
     python3 manage_cameras.py --add              # Add new camera
     python3 manage_cameras.py --remove camera_35 # Remove camera
     python3 manage_cameras.py --edit camera_35   # Edit camera
+    python3 manage_cameras.py --test             # Probe all cameras concurrently
+    python3 manage_cameras.py --test camera_35   # Probe one camera
 """
 
 import os
@@ -34,6 +38,8 @@ SCRIPT_DIR = Path(__file__).parent
 PROJECT_ROOT = SCRIPT_DIR.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
 
+from video_capture.rtsp_probe import probe_cameras, format_result, PROBE_TIMEOUT_SECONDS
+
 DB_PATH = PROJECT_ROOT / "db" / "detection_data.db"
 CONFIG_DIR = SCRIPT_DIR.parent / "config"
 CAMERAS_CONFIG_FILE = CONFIG_DIR / "cameras_config.json"
@@ -144,6 +150,9 @@ class CameraManager:
             print(f"   Username: {config.get('username', 'N/A')}")
             print(f"   Port: {config.get('port', 554)}")
             print(f"   Stream: {config.get('stream_path', 'N/A')}")
+            if config.get('substream_path'):
+                print(f"   Sub-stream: {config['substream_path']} "
+                      f"({'analytics capture' if config.get('analytics_substream') else 'live only'})")
             print(f"   Division: {config.get('division_name', 'N/A')}")
             print(f"   Notes: {config.get('notes', 'N/A')}")
 
@@ -176,6 +185,7 @@ class CameraManager:
         port = int(port_input) if port_input else 554
 
         stream_path = input("Stream Path (default: /media/video1): ").strip() or "/media/video1"
+        substream_path = input("Sub-stream Path for analytics (e.g., /media/video2, blank = none): ").strip()
 
         division_name = input("Division/Area Name (optional): ").strip() or ""
         notes = input("Notes/Description (optional): ").strip() or f"Camera {camera_id}"
@@ -204,6 +214,10 @@ class CameraManager:
             'enabled': True,
             'notes': notes
         }
+        if substream_path:
+            # Dual-stream capture: detection runs on the sub-stream recording
+            self.cameras[camera_id]['substream_path'] = substream_path
+            self.cameras[camera_id]['analytics_substream'] = True
 
         # Save to file
         self.save_cameras_config()
@@ -241,6 +255,9 @@ class CameraManager:
         port = input(f"Port [{config.get('port', 554)}]: ").strip()
         port = int(port) if port else config.get('port', 554)
         stream_path = input(f"Stream Path [{config.get('stream_path', '/media/video1')}]: ").strip() or config.get('stream_path', '/media/video1')
+        substream_path = input(f"Sub-stream Path [{config.get('substream_path', 'none')}] ('-' = none): ").strip() or config.get('substream_path', '')
+        if substream_path == '-':
+            substream_path = ''
         division_name = input(f"Division [{config.get('division_name', '')}]: ").strip() or config.get('division_name', '')
         notes = input(f"Notes [{config.get('notes', '')}]: ").strip() or config.get('notes', '')
 
@@ -264,6 +281,9 @@ class CameraManager:
             'enabled': enabled,
             'notes': notes
         }
+        if substream_path:
+            self.cameras[camera_id]['substream_path'] = substream_path
+            self.cameras[camera_id]['analytics_substream'] = config.get('analytics_substream', True)
 
         # Save to file
         self.save_cameras_config()
@@ -308,8 +328,8 @@ class CameraManager:
 
         print(f"\n✅ Camera {camera_id} removed successfully!")
 
-    def test_camera(self):
-        """Test camera RTSP connection"""
+    def test_camera(self, camera_ids: Optional[List[str]] = None):
+        """Test camera RTSP connections (all selected cameras probed concurrently)"""
         print("\n" + "=" * 70)
         print("🔌 Test Camera Connection")
         print("=" * 70)
@@ -318,37 +338,41 @@ class CameraManager:
             print("No cameras configured yet.")
             return
 
-        camera_id = input("Camera ID to test (e.g., camera_35): ").strip()
+        if camera_ids is None:
+            answer = input("Camera ID(s) to test (e.g., camera_35; blank = all): ").strip()
+            camera_ids = answer.replace(',', ' ').split() if answer else list(self.cameras)
 
-        if camera_id not in self.cameras:
+        missing = [cid for cid in camera_ids if cid not in self.cameras]
+        for camera_id in missing:
             print(f"❌ Camera {camera_id} not found")
+        targets = {cid: self.cameras[cid] for cid in camera_ids if cid in self.cameras}
+        if not targets:
             return
 
-        config = self.cameras[camera_id]
-
-        try:
-            import cv2
-        except ImportError:
-            print("❌ OpenCV not installed. Install with: pip install opencv-python")
-            return
-
-        # Build RTSP URL
-        rtsp_url = f"rtsp://{config['username']}:{config['password']}@{config['ip']}:{config['port']}{config['stream_path']}"
+        print(f"\nProbing {len(targets)} camera(s) (TCP + RTSP OPTIONS/DESCRIBE, {PROBE_TIMEOUT_SECONDS:.0f}s timeout)...")
+        results = probe_cameras(targets)
+        for result in results.values():
+            print(f"   {format_result(result)}")
 
-        print(f"\nTesting {camera_id}...")
-        print(f"URL: rtsp://{config['username']}:***@{config['ip']}:{config['port']}{config['stream_path']}")
-
-        cap = cv2.VideoCapture(rtsp_url)
-        success, frame = cap.read()
-        cap.release()
-
-        if success:
-            print("✅ Connection successful!")
-            print(f"   Resolution: {frame.shape[1]}x{frame.shape[0]}")
-        else:
-            print("❌ Connection failed!")
+        ok = sum(1 for r in results.values() if r['stream_available'])
+        print(f"\n{'✅' if ok == len(results) else '⚠️ '} {ok}/{len(results)} camera(s) streaming")
+        if ok < len(results):
             print("   Check: IP address, credentials, network, RTSP endpoint")
 
+        # Single camera: decode one frame for resolution when OpenCV is available
+        if len(results) == 1 and ok == 1:
+            camera_id, config = next(iter(targets.items()))
+            try:
+                import cv2
+            except ImportError:
+                return
+            rtsp_url = f"rtsp://{config['username']}:{config['password']}@{config['ip']}:{config['port']}{config['stream_path']}"
+            cap = cv2.VideoCapture(rtsp_url)
+            success, frame = cap.read()
+            cap.release()
+            if success:
+                print(f"   Resolution: {frame.shape[1]}x{frame.shape[0]}")
+
     def _validate_ip(self, ip: str) -> bool:
         """Validate IP address format"""
         pattern = r'^(\d{1,3}\.){3}\d{1,3}$'
@@ -399,6 +423,8 @@ def main():
     parser.add_argument('--add', action='store_true', help='Add new camera')
     parser.add_argument('--remove', metavar='CAMERA_ID', help='Remove camera')
     parser.add_argument('--edit', metavar='CAMERA_ID', help='Edit camera')
+    parser.add_argument('--test', metavar='CAMERA_ID', nargs='*',
+                        help='Probe cameras concurrently (default: all)')
 
     args = parser.parse_args()
 
@@ -407,6 +433,8 @@ def main():
 
     if args.list:
         manager.list_cameras()
+    elif args.test is not None:
+        manager.test_camera(args.test or list(manager.cameras))
     elif args.add:
         manager.add_camera()
     elif args.remove:
@@ -260,7 +260,8 @@ class DatabaseMigrator:
         required_tables = [
             'locations', 'cameras', 'sessions',
             'division_states', 'table_states',
-            'sync_queue', 'sync_status'
+            'sync_queue', 'sync_status',
+            'processing_jobs'
         ]
 
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
 """
+# Modified: 2026-10-18 - Quarantined segments (videos/YYYYMMDD/camera_id/quarantine/, see segment_integrity.py)
+# expire after 7 days, or earlier with their camera folder
+#
+# Modified: 2026-10-18 - Disk accounting from the segment manifest (videos table)
+# Feature: Raw video sizes and the recording rate come from segments registered by capture
+# Reason: os.walk + getsize over every segment file was O(files); the manifest is one indexed query
+# Fallback: Folders without manifest rows (pre-manifest footage) are still sized with os.walk
+#
 # Modified: 2025-11-20 - Changed raw video cleanup logic to delete >= 2 days unconditionally
 # Feature: Raw videos now deleted when >= 2 days old, regardless of processing status
 # Reason: Ensures memory/hardware health by preventing accumulation of old files
 
 Disk Space Monitoring and Management
-Version: 2.1.0
-Last Updated: 2025-11-20
+Version: 2.2.0
+Last Updated: 2026-10-18
 
 Purpose: Monitor disk space and intelligently manage video storage with predictive analytics
 
@@ -47,6 +55,7 @@ import argparse
 import sys
 import time
 import subprocess
+import sqlite3
 
 # Constants
 SCRIPT_DIR = Path(__file__).parent.resolve()
@@ -54,6 +63,10 @@ PROJECT_DIR = SCRIPT_DIR.parent.parent
 VIDEOS_DIR = PROJECT_DIR / "videos"
 RESULTS_DIR = PROJECT_DIR / "results"
 DB_DIR = PROJECT_DIR / "db"
+DB_PATH = DB_DIR / "detection_data.db"
+
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+from video_capture.segment_manifest import SegmentManifest
 
 MIN_SPACE_GB = 150  # Minimum required space (based on actual 78GB/day + processing + buffer)
 ESTIMATED_VIDEO_SIZE_PER_DAY_GB = 80  # Actual measured: 10 cameras × 10 hours @ 0.222 MB/s
@@ -65,6 +78,7 @@ OBSERVATION_SECONDS = 30   # Observe disk usage for 30 seconds
 
 # Data retention policies (in days)
 SCREENSHOTS_RETENTION_DAYS = 30  # Keep screenshots for 30 days
+QUARANTINE_RETENTION_DAYS = 7  # Keep quarantined segments for a week (post-mortem only)
 PROCESSED_VIDEO_RETENTION_DAYS = 2  # Keep processed videos for 2 days
 RAW_VIDEO_RETENTION_DAYS = 2  # Keep raw videos max 2 days (or delete when processed)
 
@@ -110,6 +124,50 @@ def get_folder_size(folder):
                 total_size += os.path.getsize(filepath)
     return total_size / (1024**3)  # Convert to GB
 
+def get_manifest():
+    """
+    Segment manifest (videos table) if the database exists
+
+    Returns:
+        SegmentManifest or None (callers fall back to os.walk)
+    """
+    if not DB_PATH.exists():
+        return None
+    try:
+        return SegmentManifest(DB_PATH)
+    except sqlite3.Error as e:
+        print(f"⚠️  Segment manifest unavailable: {e}")
+        return None
+
+def get_manifest_usage_rate(manifest, window_hours=1.0):
+    """
+    Recording rate from segments registered in the last window (no 30s observation)
+
+    Returns:
+        float: GB/hour, or 0.0 if nothing was registered recently
+    """
+    since = datetime.now() - timedelta(hours=window_hours)
+    try:
+        recent_bytes = manifest.bytes_written_since(since)
+    except sqlite3.Error:
+        return 0.0
+    return (recent_bytes / (1024**3)) / window_hours
+
+def print_manifest_storage(manifest):
+    """Per-date raw video storage from the manifest"""
+    usage = manifest.bytes_by_date_camera()
+    if not usage:
+        return
+
+    print(f"\n{'='*70}")
+    print("RAW VIDEO STORAGE (segment manifest)")
+    print(f"{'='*70}")
+    for date_str in sorted(usage):
+        cameras = usage[date_str]
+        total_gb = sum(cameras.values()) / (1024**3)
+        print(f"   {date_str}: {total_gb:.2f} GB across {len(cameras)} camera(s)")
+    print(f"{'='*70}")
+
 def check_video_processed(video_date, camera_id):
     """
     Check if raw video has been processed by looking for results
@@ -382,6 +440,32 @@ def cleanup_screenshots(dry_run=False):
     print(f"{'='*70}\n")
     return freed_gb
 
+def cleanup_quarantine(dry_run=False):
+    """
+    Clean up quarantined segments (videos/YYYYMMDD/camera_id/quarantine/) older than retention.
+    Camera folders deleted by the raw video cleanup take their quarantine with them.
+
+    Returns:
+        float: GB freed
+    """
+    freed_gb = 0.0
+    for date_folder in get_date_folders(VIDEOS_DIR):
+        if get_date_age_days(date_folder.name) < QUARANTINE_RETENTION_DAYS:
+            continue
+        for quarantine_dir in date_folder.glob("*/quarantine"):
+            size_gb = get_folder_size(quarantine_dir)
+            label = f"{date_folder.name}/{quarantine_dir.parent.name}/quarantine"
+            if dry_run:
+                print(f"[DRY RUN] Would delete {label} ({size_gb:.3f} GB)")
+            else:
+                print(f"🗑️  Deleting {label} ({size_gb:.3f} GB)")
+                shutil.rmtree(quarantine_dir)
+            freed_gb += size_gb
+
+    if freed_gb:
+        print(f"Quarantine freed: {freed_gb:.3f} GB")
+    return freed_gb
+
 def smart_cleanup(target_free_gb, dry_run=False):
     """
     Intelligently delete old data to free up space
@@ -412,6 +496,7 @@ def smart_cleanup(target_free_gb, dry_run=False):
     print("Phase 1: Screenshot Cleanup")
     screenshot_freed = cleanup_screenshots(dry_run=dry_run)
     total_freed_gb += screenshot_freed
+    total_freed_gb += cleanup_quarantine(dry_run=dry_run)
 
     # Check if we've met target
     projected_free = current['free_gb'] + total_freed_gb
@@ -424,6 +509,9 @@ def smart_cleanup(target_free_gb, dry_run=False):
     print("Phase 2: Raw Video Cleanup (Age-Based)")
     print(f"{'='*70}")
 
+    manifest = get_manifest()
+    manifest_usage = manifest.bytes_by_date_camera() if manifest else {}
+
     video_folders = get_date_folders(VIDEOS_DIR)
     for date_folder in video_folders:
         date_str = date_folder.name
@@ -444,7 +532,12 @@ def smart_cleanup(target_free_gb, dry_run=False):
             # Decision logic: Delete if >= 2 days old (regardless of processing status)
             # This ensures corrupted/failed videos don't accumulate
             if age_days >= RAW_VIDEO_RETENTION_DAYS:
-                size_gb = get_folder_size(camera_folder)
+                # Size from manifest (indexed), os.walk only for unindexed folders
+                manifest_bytes = manifest_usage.get(date_str, {}).get(camera_id)
+                if manifest_bytes is not None:
+                    size_gb = manifest_bytes / (1024**3)
+                else:
+                    size_gb = get_folder_size(camera_folder)
                 reason = f">={RAW_VIDEO_RETENTION_DAYS} days old (hardware health)"
 
                 if dry_run:
@@ -452,6 +545,8 @@ def smart_cleanup(target_free_gb, dry_run=False):
                 else:
                     print(f"🗑️  Deleting {date_str}/{camera_id} ({size_gb:.2f} GB) - {reason}")
                     shutil.rmtree(camera_folder)
+                    if manifest:
+                        manifest.mark_deleted(date_str, [camera_id])
                 total_freed_gb += size_gb
 
                 # Check if target reached
@@ -522,6 +617,10 @@ def check_and_cleanup(min_space_gb, auto_cleanup=False, dry_run=False, use_predi
     print(f"Free Space:   {usage['free_gb']:.1f} GB")
     print(f"Minimum Req:  {min_space_gb:.1f} GB")
 
+    manifest = get_manifest()
+    if manifest:
+        print_manifest_storage(manifest)
+
     # ===== NEW: Intelligent prediction during recording hours =====
     prediction = None
     if use_prediction:
@@ -539,8 +638,13 @@ def check_and_cleanup(min_space_gb, auto_cleanup=False, dry_run=False, use_predi
         if recording_status['active'] or remaining_hours > 0:
             print(f"Status: {'Recording' if recording_status['active'] else 'Idle (within recording window)'}")
 
-            # Measure disk usage speed
-            speed_data = measure_disk_usage_speed(OBSERVATION_SECONDS)
+            # Recording rate from the manifest (last hour of segments); observe disk only as fallback
+            manifest_rate = get_manifest_usage_rate(manifest) if manifest else 0.0
+            if manifest_rate > 0.01:
+                print(f"Recording rate (manifest, last hour): {manifest_rate:.2f} GB/hour")
+                speed_data = {'gb_per_hour': manifest_rate}
+            else:
+                speed_data = measure_disk_usage_speed(OBSERVATION_SECONDS)
 
             # Only predict if we detected meaningful usage
             if speed_data['gb_per_hour'] > 0.01:  # More than 10 MB/hour
@@ -3,15 +3,35 @@
 Comprehensive Health Check for Restaurant Surveillance System
 Created: 2025-11-20
 Purpose: Perform 9-level diagnostic analysis of surveillance infrastructure
+
+Modified: 2026-10-18 - Level 7 reads today's segments from the segment manifest
+(videos table) for every camera; falls back to globbing camera_35 when empty
+
+Modified: 2026-10-18 - Level 7 reads per-camera FFmpeg progress telemetry
+(logs/video_capture/telemetry/{camera_id}.json written by capture) to separate
+camera/network problems (stalled, low fps) from local throughput problems
+(dropped frames, speed below real time)
+
+Modified: 2026-10-18 - Level 7 reports segments quarantined today by the capture
+integrity check (videos/YYYYMMDD/*/quarantine/*.reason.json) with their reasons
 """
 
 import os
+import sys
 import json
 import subprocess
 from datetime import datetime, timedelta
 from pathlib import Path
 import sqlite3
 
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+from video_capture.segment_manifest import SegmentManifest, PROCESSABLE_STATUSES
+
+# Capture telemetry thresholds
+TELEMETRY_STALE_SECONDS = 60    # No progress update -> stream stalled
+TELEMETRY_MIN_FPS_RATIO = 0.8   # fps below 80% of configured camera fps
+TELEMETRY_MIN_SPEED = 0.9       # Output falling behind real time
+
 class SurveillanceHealthChecker:
     def __init__(self):
         self.base_dir = Path("/home/smartahc/smartice/ASEOfSmartICE/production/RTX_3060")
@@ -277,7 +297,32 @@ class SurveillanceHealthChecker:
             today = datetime.now().strftime("%Y%m%d")
             today_dir = self.videos_dir / today / "camera_35"
 
-            if today_dir.exists():
+            # Preferred source: segments registered by capture (indexed query, all cameras)
+            segments = []
+            if self.db_path.exists():
+                try:
+                    segments = SegmentManifest(self.db_path).segments_for_date(today)
+                except sqlite3.Error:
+                    segments = []
+
+            per_camera = {}
+            if segments:
+                video_files = segments
+                total_size_gb = sum((seg['file_size_bytes'] or 0) + (seg.get('companion_size_bytes') or 0)
+                                    for seg in segments) / (1024**3)
+                latest_end = max(datetime.fromisoformat(seg['end_time']) for seg in segments if seg['end_time'])
+                latest_age = datetime.now() - latest_end
+                actively_recording = latest_age < timedelta(minutes=15)
+
+                for seg in segments:
+                    camera = per_camera.setdefault(seg['camera_id'], {
+                        "segments": 0, "bad_segments": 0, "latest_end": None
+                    })
+                    camera["segments"] += 1
+                    if seg['integrity_status'] not in PROCESSABLE_STATUSES:
+                        camera["bad_segments"] += 1
+                    camera["latest_end"] = max(camera["latest_end"] or "", seg['end_time'] or "")
+            elif today_dir.exists():
                 video_files = list(today_dir.glob("*.mp4"))
                 total_size_gb = sum(f.stat().st_size for f in video_files) / (1024**3)
 
@@ -317,15 +362,82 @@ class SurveillanceHealthChecker:
                 "actively_recording": actively_recording,
                 "latest_file_age_minutes": round(latest_age.total_seconds() / 60, 1) if latest_age else None,
                 "camera_connected": camera_connected,
-                "should_be_capturing": should_be_capturing
+                "should_be_capturing": should_be_capturing,
+                "source": "manifest" if segments else "filesystem",
+                "cameras": per_camera,
+                "quarantined_today": self.read_quarantine(today)
             }
 
+            telemetry = self.read_capture_telemetry()
+            self.report["levels"]["7_video_capture"]["telemetry"] = telemetry
+            if should_be_capturing:
+                for camera_id, camera in telemetry.items():
+                    if camera["issues"]:
+                        self.report["warnings"].append(f"{camera_id} capture: {', '.join(camera['issues'])}")
+
+            for camera_id, camera in per_camera.items():
+                if camera["bad_segments"]:
+                    self.report["warnings"].append(
+                        f"{camera_id}: {camera['bad_segments']}/{camera['segments']} segments today failed integrity check"
+                    )
+
             if should_be_capturing and not actively_recording:
                 self.report["critical_issues"].append("Camera should be capturing but no recent files detected")
 
         except Exception as e:
             self.report["levels"]["7_video_capture"] = {"status": "ERROR", "error": str(e)}
 
+    def read_capture_telemetry(self):
+        """Per-camera FFmpeg progress snapshots with a diagnosis for each camera"""
+        telemetry_dir = self.logs_dir / "video_capture" / "telemetry"
+        cameras = {}
+        if not telemetry_dir.exists():
+            return cameras
+
+        for snapshot_file in sorted(telemetry_dir.glob("*.json")):
+            try:
+                with open(snapshot_file) as f:
+                    snap = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+
+            issues = []
+            age = None
+            if snap.get("updated_at"):
+                age = (datetime.now() - datetime.fromisoformat(snap["updated_at"])).total_seconds()
+            if age is None or age > TELEMETRY_STALE_SECONDS:
+                issues.append("stalled (camera/network)")
+            else:
+                expected_fps = snap.get("expected_fps")
+                if expected_fps and snap.get("fps_avg", 0) < expected_fps * TELEMETRY_MIN_FPS_RATIO:
+                    issues.append(f"low fps {snap['fps_avg']}/{expected_fps} (camera/network)")
+                if snap.get("drop_frames", 0) > 0:
+                    issues.append(f"{snap['drop_frames']} dropped frames (throughput)")
+                if 0 < snap.get("speed_avg", 0) < TELEMETRY_MIN_SPEED:
+                    issues.append(f"speed {snap['speed_avg']}x (throughput)")
+
+            cameras[snap.get("camera_id", snapshot_file.stem)] = {
+                "age_seconds": round(age, 1) if age is not None else None,
+                "fps_avg": snap.get("fps_avg"),
+                "bitrate_kbps_avg": snap.get("bitrate_kbps_avg"),
+                "speed_avg": snap.get("speed_avg"),
+                "drop_frames": snap.get("drop_frames"),
+                "issues": issues
+            }
+        return cameras
+
+    def read_quarantine(self, date_str):
+        """Segments moved to videos/<date>/<camera>/quarantine/ by the integrity check, grouped by reason"""
+        reasons = {}
+        for reason_file in (self.videos_dir / date_str).glob("*/quarantine/**/*.reason.json"):
+            try:
+                with open(reason_file) as f:
+                    reason = json.load(f).get('reason') or "unknown"
+            except (OSError, ValueError):
+                reason = "unreadable reason file"
+            reasons[reason] = reasons.get(reason, 0) + 1
+        return {"count": sum(reasons.values()), "reasons": reasons}
+
     def check_level_8_processing_pipeline(self):
         """Level 8: Video Processing Pipeline"""
         try:
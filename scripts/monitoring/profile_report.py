@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Stage Profile Report - Compare Detection Timings across Sessions, Cameras and Versions
+Version: 1.0.0
+Created: 2026-10-18
+
+Purpose:
+- Reads the per-session stage profiles the detection script stores (v3.14.0+):
+  the session_profiles table of db/detection_data.db, or the JSON lines in
+  db/profiles/stage_profiles_YYYYMMDD.jsonl (--jsonl, e.g. copied from a node)
+- Groups sessions by session, camera, code version or backend and merges their
+  stage histograms, so p50/p95/p99 of a group are over all of its frames
+  (not an average of per-session percentiles)
+- --compare A B puts two groups side by side with the change per stage
+
+Usage:
+  python3 profile_report.py                               # Last 10 sessions
+  python3 profile_report.py --by camera --since 2026-10-01
+  python3 profile_report.py --by version --compare 3.13.0+3de1f44 3.14.0+a1b2c3d
+  python3 profile_report.py --by backend --camera camera_35
+  python3 profile_report.py --jsonl ../../db/profiles/*.jsonl --by version --json
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+from video_processing.stage_profiler import StageHistogram, STAGES, PERCENTILES, stage_table
+
+# Constants
+SCRIPT_DIR = Path(__file__).parent.resolve()
+PROJECT_DIR = SCRIPT_DIR.parent.parent
+DB_PATH = PROJECT_DIR / "db" / "detection_data.db"
+GROUP_FIELDS = {"session": "session_id", "camera": "camera_id", "version": "code_version", "backend": "backend"}
+DEFAULT_LAST = 10
+
+
+# ============================================================================
+# LOADING
+# ============================================================================
+
+def load_from_db(db_path: Path) -> List[Dict]:
+    """One record per session: {session_id, camera_id, code_version, backend, created, stages}"""
+    if not db_path.exists():
+        return []
+    conn = sqlite3.connect(str(db_path), timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute('''
+            SELECT * FROM session_profiles ORDER BY created_at, session_id
+        ''').fetchall()
+    except sqlite3.OperationalError:
+        return []   # Database from before v3.14.0
+    finally:
+        conn.close()
+
+    sessions: "OrderedDict[str, Dict]" = OrderedDict()
+    for row in rows:
+        record = sessions.setdefault(row["session_id"], {
+            "session_id": row["session_id"], "camera_id": row["camera_id"],
+            "code_version": row["code_version"], "backend": row["backend"],
+            "created": row["created_at"], "stages": {},
+        })
+        record["stages"][row["stage"]] = {
+            "samples": row["samples"], "total_ms": row["total_ms"], "max_ms": row["max_ms"],
+            "histogram": json.loads(row["histogram"]) if row["histogram"] else {},
+        }
+    return list(sessions.values())
+
+
+def load_from_jsonl(paths: List[Path]) -> List[Dict]:
+    """Records from stage_profiles_*.jsonl (a session profiled twice keeps its last line)"""
+    sessions: "OrderedDict[str, Dict]" = OrderedDict()
+    for path in paths:
+        with open(path) as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"⚠️  {path.name}:{line_no}: not JSON, skipped", file=sys.stderr)
+                    continue
+                sessions.pop(record.get("session_id"), None)
+                sessions[record.get("session_id")] = record
+    return sorted(sessions.values(), key=lambda r: r.get("created") or "")
+
+
+def filter_records(records: List[Dict], camera: str = None, since: str = None) -> List[Dict]:
+    if camera:
+        records = [r for r in records if r.get("camera_id") == camera]
+    if since:
+        records = [r for r in records if (r.get("created") or "") >= since]
+    return records
+
+
+# ============================================================================
+# GROUPING
+# ============================================================================
+
+def group_records(records: List[Dict], by: str) -> "OrderedDict[str, Dict]":
+    """{group value: {"sessions": n, "stages": {stage: merged StageHistogram}}}, first-seen order"""
+    field = GROUP_FIELDS[by]
+    groups: "OrderedDict[str, Dict]" = OrderedDict()
+    for record in records:
+        key = str(record.get(field) or "unknown")
+        group = groups.setdefault(key, {"sessions": 0, "stages": {}})
+        group["sessions"] += 1
+        for stage, data in record.get("stages", {}).items():
+            group["stages"].setdefault(stage, StageHistogram()).merge(StageHistogram.from_dict(data))
+    return groups
+
+
+def group_summary(group: Dict) -> Dict:
+    """JSON-friendly summary of a merged group"""
+    stages = {}
+    for stage, histogram in group["stages"].items():
+        stats = {"samples": histogram.count, "mean_ms": round(histogram.mean_ms, 3),
+                 "max_ms": round(histogram.max_ms, 3)}
+        for q in PERCENTILES:
+            stats[f"p{q}_ms"] = round(histogram.percentile(q), 3)
+        stages[stage] = stats
+    return {"sessions": group["sessions"], "stages": stages}
+
+
+def change(before: float, after: float) -> str:
+    if not before:
+        return ""
+    return f"{(after - before) / before:+.0%}"
+
+
+# ============================================================================
+# OUTPUT
+# ============================================================================
+
+def print_groups(groups: "OrderedDict[str, Dict]", by: str):
+    for key, group in groups.items():
+        print(f"\n{'='*78}")
+        print(f"{by}: {key}  ({group['sessions']} session(s))")
+        print(f"{'='*78}")
+        for line in stage_table(group["stages"]):
+            print(f"   {line}")
+
+
+def print_comparison(groups: "OrderedDict[str, Dict]", by: str, first: str, second: str) -> bool:
+    missing = [key for key in (first, second) if key not in groups]
+    if missing:
+        print(f"❌ No profiled sessions for {by} {', '.join(missing)} (have: {', '.join(groups) or 'none'})")
+        return False
+
+    a, b = groups[first]["stages"], groups[second]["stages"]
+    print(f"\n{'='*78}")
+    print(f"{by}: {first} ({groups[first]['sessions']} session(s)) -> {second} ({groups[second]['sessions']} session(s))")
+    print(f"{'='*78}")
+    print(f"   {'stage':<11}{'p50 A':>9}{'p50 B':>9}{'Δ':>7}{'p95 A':>9}{'p95 B':>9}{'Δ':>7}{'p99 A':>9}{'p99 B':>9}{'Δ':>7}")
+    for stage in STAGES + sorted((set(a) | set(b)) - set(STAGES)):
+        if stage not in a and stage not in b:
+            continue
+        row = f"   {stage:<11}"
+        for q in PERCENTILES:
+            before = a[stage].percentile(q) if stage in a else 0.0
+            after = b[stage].percentile(q) if stage in b else 0.0
+            row += f"{before:>9.1f}{after:>9.1f}{change(before, after):>7}"
+        print(row)
+    return True
+
+
+# ============================================================================
+# MAIN ENTRY POINT
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare detection stage profiles across sessions, cameras and code versions",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--db", default=str(DB_PATH), help="Database with session_profiles (default: db/detection_data.db)")
+    parser.add_argument("--jsonl", nargs="+", help="Read stage_profiles_*.jsonl files instead of the database")
+    parser.add_argument("--by", default="session", choices=list(GROUP_FIELDS),
+                       help="Group sessions by (default: session)")
+    parser.add_argument("--camera", help="Only this camera")
+    parser.add_argument("--since", help="Only sessions profiled on/after this date (YYYY-MM-DD)")
+    parser.add_argument("--last", type=int, default=DEFAULT_LAST,
+                       help=f"Only the last N sessions with --by session (default: {DEFAULT_LAST}, 0 = all)")
+    parser.add_argument("--compare", nargs=2, metavar=("A", "B"),
+                       help="Compare two groups of --by side by side")
+    parser.add_argument("--json", action="store_true", help="Print the grouped summary as JSON")
+    args = parser.parse_args()
+
+    if args.jsonl:
+        records = load_from_jsonl([Path(p) for p in args.jsonl])
+    else:
+        records = load_from_db(Path(args.db))
+    records = filter_records(records, args.camera, args.since)
+    if args.by == "session" and args.last and not args.compare:
+        records = records[-args.last:]
+    if not records:
+        print("❌ No stage profiles found (detection v3.14.0+ records them per session)")
+        return 1
+
+    groups = group_records(records, args.by)
+    if args.json:
+        print(json.dumps({key: group_summary(group) for key, group in groups.items()}, indent=2))
+        return 0
+    if args.compare:
+        return 0 if print_comparison(groups, args.by, *args.compare) else 1
+
+    print(f"📊 Stage profiles: {len(records)} session(s), grouped by {args.by} (times in ms)")
+    print_groups(groups, args.by)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Deadline Planner - Fit the Nightly Processing Run Before PROCESS_END_HOUR
+Version: 1.0.0
+Created: 2026-10-18
+
+Purpose:
+- The batch run used to start at midnight and simply log a warning when it was
+  still busy at PROCESS_END_HOUR, overlapping the next capture window
+- Before workers start, estimate how long the pending jobs will take from the
+  job table's own history and, if the run would overshoot the deadline,
+  degrade the least important cameras until it fits
+
+Cost model (per job, in wall seconds of one worker):
+    cost = ratio(camera) x duration x (FIXED + (1 - FIXED) x fps / BASE_FPS) [x HEADLESS]
+- ratio: median processing_seconds per video second of the camera's recent
+  done jobs (normalised back to full fps / annotated video); cameras without
+  history use the median of all cameras, then DEFAULT_COST_RATIO
+- FIXED: decode + model warm-up share of the cost that does not shrink with fps
+- Run time = sum(cost) / parallelism, where parallelism is the median number of
+  jobs that overlapped in recent batches (sum of job time / batch wall time)
+
+Degradation ladder (cameras_config.json "processing_priority", 1 = most important):
+    full -> reduced_fps (--fps 2) -> headless (no annotated video) -> deferred
+- Every camera goes one step down the ladder before any camera goes two,
+  least important cameras first; the run is re-projected after every step
+- Deferral is per job (newest segments of the least important cameras first)
+  and never touches priority-1 cameras; deferred jobs return to pending at the
+  next orchestrator start
+- If even the cheapest plan misses the deadline, the expected overrun is logged
+
+Plans and actuals:
+- The plan is logged and stored in the job table (plan_mode, plan_fps)
+- After the run, report_plan() compares it with what happened and writes
+  logs/processing_plans/plan_YYYYMMDD_HHMMSS.json
+
+Used by:
+- orchestration/process_videos_orchestrator.py --deadline
+
+Usage:
+    python3 deadline_planner.py --deadline 2026-10-19T06:00   # Dry run: print the plan
+"""
+
+import argparse
+import json
+import logging
+import statistics
+import sys
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+from orchestration.processing_jobs import (
+    ProcessingJobStore, PLAN_FULL, PLAN_REDUCED_FPS, PLAN_HEADLESS, PLAN_DEFERRED,
+    STATUS_DONE, STATUS_SKIPPED, STATUS_DEFERRED
+)
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+DATABASE_PATH = SCRIPT_DIR.parent.parent / "db" / "detection_data.db"
+CAMERAS_CONFIG_PATH = SCRIPT_DIR.parent / "config" / "cameras_config.json"
+PLANS_DIR = SCRIPT_DIR.parent.parent / "logs" / "processing_plans"
+
+# Cost model
+BASE_FPS = 5.0                  # Detection default --fps
+DEGRADED_FPS = 2.0              # --fps for reduced_fps / headless jobs
+FIXED_COST_FRACTION = 0.3       # Decode + warm-up share that does not scale with fps
+HEADLESS_COST_FACTOR = 0.7      # No drawing, no VideoWriter, no H.264 re-encode
+DEFAULT_COST_RATIO = 1.0        # Processing seconds per video second without any history
+DEFAULT_SEGMENT_SECONDS = 60    # Segment length when the manifest has no duration
+HISTORY_JOBS = 2000             # Done jobs read for ratios and parallelism
+HISTORY_JOBS_PER_CAMERA = 50    # Newest jobs per camera used for its ratio
+MIN_HISTORY_JOBS = 3            # Fewer than this -> fall back to the global ratio
+
+# Parallelism estimate
+BATCH_GAP_SECONDS = 600         # Jobs more than 10 min apart belong to different runs
+MIN_BATCH_JOBS = 3
+
+# Planning
+DEADLINE_SAFETY_MARGIN = 0.10   # Plan to finish with 10% of the window to spare
+DEFAULT_CAMERA_PRIORITY = 2     # Cameras without "processing_priority"
+PROTECTED_PRIORITY = 1          # Never deferred
+
+# Ladder: (mode, fps, headless); full runs at the detection default fps
+LADDER = [
+    (PLAN_FULL, None, False),
+    (PLAN_REDUCED_FPS, DEGRADED_FPS, False),
+    (PLAN_HEADLESS, DEGRADED_FPS, True),
+]
+
+
+# ============================================================================
+# COST MODEL
+# ============================================================================
+
+def cost_factor(fps: Optional[float], headless: bool) -> float:
+    """Relative cost of a run at `fps` (None = BASE_FPS) vs. a full annotated run"""
+    fps = BASE_FPS if fps is None else fps
+    factor = FIXED_COST_FRACTION + (1.0 - FIXED_COST_FRACTION) * min(fps / BASE_FPS, 1.0)
+    if headless:
+        factor *= HEADLESS_COST_FACTOR
+    return factor
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def estimate_cost_ratios(history: List[Dict]) -> Tuple[Dict[str, float], float]:
+    """
+    Full-fps processing seconds per video second, per camera and overall
+
+    Args:
+        history: ProcessingJobStore.completed_history() rows (newest first)
+    """
+    samples = defaultdict(list)
+    for row in history:
+        camera_samples = samples[row['camera_id']]
+        if len(camera_samples) >= HISTORY_JOBS_PER_CAMERA:
+            continue
+        duration = row['duration_seconds'] or DEFAULT_SEGMENT_SECONDS
+        factor = cost_factor(row['plan_fps'], row['plan_mode'] == PLAN_HEADLESS)
+        camera_samples.append(row['processing_seconds'] / (duration * factor))
+
+    ratios = {camera_id: statistics.median(values)
+              for camera_id, values in samples.items() if len(values) >= MIN_HISTORY_JOBS}
+    global_ratio = statistics.median(ratios.values()) if ratios else DEFAULT_COST_RATIO
+    return ratios, global_ratio
+
+
+def estimate_parallelism(history: List[Dict], max_workers: int) -> float:
+    """
+    Median effective number of concurrent jobs over recent batches, clipped to
+    [1, max_workers]; max(1, max_workers // 2) without usable history
+    """
+    spans = []
+    for row in history:
+        claimed = _parse_time(row['claimed_at'])
+        completed = _parse_time(row['completed_at'])
+        if claimed and completed and completed >= claimed:
+            spans.append((claimed, completed, row['processing_seconds']))
+    spans.sort(key=lambda span: span[0])
+
+    # Split into batches at idle gaps, then busy time / wall time per batch
+    batches = []
+    current = []
+    batch_end = None
+    for claimed, completed, seconds in spans:
+        if current and (claimed - batch_end).total_seconds() > BATCH_GAP_SECONDS:
+            batches.append(current)
+            current = []
+            batch_end = None
+        current.append((claimed, completed, seconds))
+        batch_end = completed if batch_end is None else max(batch_end, completed)
+    if current:
+        batches.append(current)
+
+    estimates = []
+    for batch in batches:
+        if len(batch) < MIN_BATCH_JOBS:
+            continue
+        wall = (max(span[1] for span in batch) - min(span[0] for span in batch)).total_seconds()
+        if wall > 0:
+            estimates.append(sum(span[2] for span in batch) / wall)
+
+    if not estimates:
+        return float(max(1, max_workers // 2))
+    return min(max(statistics.median(estimates), 1.0), float(max_workers))
+
+
+def load_camera_priorities(config_path: Path = CAMERAS_CONFIG_PATH) -> Dict[str, int]:
+    """camera_id -> processing_priority from cameras_config.json (missing = default)"""
+    try:
+        with open(config_path) as f:
+            cameras = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {camera_id: int(camera.get('processing_priority', DEFAULT_CAMERA_PRIORITY))
+            for camera_id, camera in cameras.items() if isinstance(camera, dict)}
+
+
+# ============================================================================
+# PLANNING
+# ============================================================================
+
+def build_plan(pending: List[Dict], history: List[Dict], priorities: Dict[str, int],
+               deadline: datetime, max_workers: int, now: Optional[datetime] = None) -> Dict:
+    """
+    Choose a ladder step per camera (and deferrals) so the projected run ends
+    before the deadline minus the safety margin
+
+    Args:
+        pending: ProcessingJobStore.pending_with_durations() rows (claim order)
+        history: ProcessingJobStore.completed_history() rows
+        priorities: camera_id -> processing_priority (1 = most important)
+    """
+    now = now or datetime.now()
+    ratios, global_ratio = estimate_cost_ratios(history)
+    parallelism = estimate_parallelism(history, max_workers)
+    window_seconds = max((deadline - now).total_seconds(), 0.0)
+    budget_seconds = window_seconds * (1.0 - DEADLINE_SAFETY_MARGIN)
+
+    jobs = []
+    for row in pending:
+        camera_id = row['camera_id']
+        duration = row['duration_seconds'] or DEFAULT_SEGMENT_SECONDS
+        jobs.append({
+            'job_id': row['job_id'],
+            'camera_id': camera_id,
+            'video_file': row['video_file'],
+            'full_cost': ratios.get(camera_id, global_ratio) * duration,
+            'deferred': False,
+        })
+
+    cameras = sorted({job['camera_id'] for job in jobs},
+                     key=lambda camera_id: (-priorities.get(camera_id, DEFAULT_CAMERA_PRIORITY), camera_id))
+    level = {camera_id: 0 for camera_id in cameras}
+
+    def job_cost(job):
+        if job['deferred']:
+            return 0.0
+        _, fps, headless = LADDER[level[job['camera_id']]]
+        return job['full_cost'] * cost_factor(fps, headless)
+
+    def projected():
+        return sum(job_cost(job) for job in jobs) / parallelism
+
+    # One ladder step at a time across all cameras, least important first
+    for step in range(1, len(LADDER)):
+        for camera_id in cameras:
+            if projected() <= budget_seconds:
+                break
+            level[camera_id] = step
+
+    # Then defer individual jobs: least important cameras, newest segments first
+    if projected() > budget_seconds:
+        for camera_id in cameras:
+            if priorities.get(camera_id, DEFAULT_CAMERA_PRIORITY) <= PROTECTED_PRIORITY:
+                continue
+            for job in reversed([job for job in jobs if job['camera_id'] == camera_id]):
+                if projected() <= budget_seconds:
+                    break
+                job['deferred'] = True
+
+    projected_seconds = projected()
+    plan_jobs = []
+    camera_summary = {}
+    for camera_id in cameras:
+        mode, fps, _ = LADDER[level[camera_id]]
+        camera_jobs = [job for job in jobs if job['camera_id'] == camera_id]
+        for job in camera_jobs:
+            plan_jobs.append({
+                'job_id': job['job_id'],
+                'camera_id': camera_id,
+                'video_file': job['video_file'],
+                'mode': PLAN_DEFERRED if job['deferred'] else mode,
+                'fps': None if job['deferred'] else fps,
+                'estimated_seconds': round(job_cost(job), 1),
+            })
+        camera_summary[camera_id] = {
+            'priority': priorities.get(camera_id, DEFAULT_CAMERA_PRIORITY),
+            'cost_ratio': round(ratios.get(camera_id, global_ratio), 3),
+            'ratio_source': 'history' if camera_id in ratios else 'default',
+            'mode': mode,
+            'jobs': len(camera_jobs),
+            'deferred': sum(1 for job in camera_jobs if job['deferred']),
+            'estimated_seconds': round(sum(job_cost(job) for job in camera_jobs), 1),
+        }
+
+    return {
+        'created_at': now.isoformat(timespec='seconds'),
+        'deadline': deadline.isoformat(timespec='seconds'),
+        'parallelism': round(parallelism, 2),
+        'window_seconds': round(window_seconds),
+        'budget_seconds': round(budget_seconds),
+        'projected_seconds': round(projected_seconds),
+        'projected_finish': datetime.fromtimestamp(now.timestamp() + projected_seconds).isoformat(timespec='seconds'),
+        'fits': projected_seconds <= window_seconds,
+        'cameras': camera_summary,
+        'jobs': plan_jobs,
+    }
+
+
+def log_plan(plan: Dict, logger: logging.Logger):
+    """Plan summary, one line per camera"""
+    modes = Counter(job['mode'] for job in plan['jobs'])
+    icon = "🗓️ " if plan['fits'] else "⏰"
+    logger.info(f"{icon} Deadline plan: {len(plan['jobs'])} job(s), deadline {plan['deadline']}, "
+                f"projected finish {plan['projected_finish']} "
+                f"({plan['projected_seconds'] / 60:.0f} of {plan['window_seconds'] / 60:.0f} min, "
+                f"~{plan['parallelism']} jobs in parallel)")
+    if modes.keys() - {PLAN_FULL}:
+        logger.info(f"   Modes: {dict(modes)}")
+    for camera_id, camera in plan['cameras'].items():
+        deferred = f", {camera['deferred']} deferred" if camera['deferred'] else ""
+        logger.info(f"   {camera_id} (priority {camera['priority']}): {camera['jobs']} job(s) {camera['mode']}"
+                    f"{deferred}, ~{camera['estimated_seconds'] / 60:.1f} worker-min "
+                    f"[{camera['cost_ratio']}s/s {camera['ratio_source']}]")
+    if not plan['fits']:
+        overrun = plan['projected_seconds'] - plan['window_seconds']
+        logger.warning(f"⏰ Even the cheapest plan overruns the deadline by ~{overrun / 60:.0f} min")
+
+
+def plan_run(job_store: ProcessingJobStore, logger: logging.Logger, deadline: datetime,
+             max_workers: int, camera_filter: Optional[List[str]] = None,
+             cameras_config: Path = CAMERAS_CONFIG_PATH) -> Optional[Dict]:
+    """Build, log and store the plan for the pending jobs; None if nothing is pending"""
+    pending = job_store.pending_with_durations(camera_filter)
+    if not pending:
+        return None
+    plan = build_plan(pending, job_store.completed_history(HISTORY_JOBS),
+                      load_camera_priorities(cameras_config), deadline, max_workers)
+    job_store.apply_plan((job['job_id'], job['mode'], job['fps']) for job in plan['jobs'])
+    log_plan(plan, logger)
+    return plan
+
+
+# ============================================================================
+# PLAN VS ACTUALS
+# ============================================================================
+
+def report_plan(job_store: ProcessingJobStore, logger: logging.Logger, plan: Dict,
+                plans_dir: Path = PLANS_DIR) -> Optional[Path]:
+    """Compare the plan with the finished run, log it and write the JSON report"""
+    finished_at = datetime.now()
+    results = {row['job_id']: row for row in job_store.job_results(job['job_id'] for job in plan['jobs'])}
+
+    actual_cameras = {}
+    for camera_id, camera in plan['cameras'].items():
+        camera_results = [results.get(job['job_id'], {}) for job in plan['jobs'] if job['camera_id'] == camera_id]
+        statuses = Counter(row.get('status') for row in camera_results)
+        actual_cameras[camera_id] = {
+            'done': statuses[STATUS_DONE] + statuses[STATUS_SKIPPED],
+            'deferred': statuses[STATUS_DEFERRED],
+            'not_done': sum(count for status, count in statuses.items()
+                            if status not in (STATUS_DONE, STATUS_SKIPPED, STATUS_DEFERRED)),
+            'processing_seconds': round(sum(row.get('processing_seconds') or 0 for row in camera_results), 1),
+        }
+
+    started_at = datetime.fromisoformat(plan['created_at'])
+    deadline = datetime.fromisoformat(plan['deadline'])
+    elapsed = (finished_at - started_at).total_seconds()
+    estimated_work = sum(camera['estimated_seconds'] for camera in plan['cameras'].values())
+    actual_work = sum(camera['processing_seconds'] for camera in actual_cameras.values())
+    plan['actual'] = {
+        'finished_at': finished_at.isoformat(timespec='seconds'),
+        'elapsed_seconds': round(elapsed),
+        'met_deadline': finished_at <= deadline,
+        'work_seconds': round(actual_work),
+        'work_vs_estimate': round(actual_work / estimated_work, 2) if estimated_work else None,
+        'cameras': actual_cameras,
+    }
+
+    icon = "✅" if finished_at <= deadline else "⏰"
+    logger.info(f"{icon} Plan vs actual: finished {finished_at.strftime('%H:%M:%S')} "
+                f"(projected {plan['projected_finish'][11:]}, deadline {plan['deadline'][11:]}), "
+                f"worker time {actual_work / 60:.1f} min vs {estimated_work / 60:.1f} min estimated")
+    for camera_id, actual in actual_cameras.items():
+        planned = plan['cameras'][camera_id]
+        logger.info(f"   {camera_id}: {actual['done']}/{planned['jobs'] - planned['deferred']} done, "
+                    f"{actual['deferred']} deferred, {actual['not_done']} not done, "
+                    f"{actual['processing_seconds'] / 60:.1f} vs {planned['estimated_seconds'] / 60:.1f} worker-min")
+
+    try:
+        plans_dir.mkdir(parents=True, exist_ok=True)
+        path = plans_dir / f"plan_{started_at.strftime('%Y%m%d_%H%M%S')}.json"
+        with open(path, 'w') as f:
+            json.dump(plan, f, indent=2)
+        return path
+    except OSError as e:
+        logger.warning(f"Could not write plan report: {e}")
+        return None
+
+
+# ============================================================================
+# CLI (dry run)
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the deadline plan for the pending processing jobs (dry run)")
+    parser.add_argument("--deadline", required=True, help="ISO datetime the run must finish by")
+    parser.add_argument("--max-workers", type=int, default=8, help="Orchestrator --max-workers")
+    parser.add_argument("--cameras", nargs='+', help="Only plan these cameras")
+    parser.add_argument("--json", action="store_true", help="Print the full plan as JSON")
+    args = parser.parse_args()
+
+    job_store = ProcessingJobStore(DATABASE_PATH)
+    pending = job_store.pending_with_durations(args.cameras)
+    if not pending:
+        print("No pending jobs")
+        return 0
+    plan = build_plan(pending, job_store.completed_history(HISTORY_JOBS), load_camera_priorities(),
+                      datetime.fromisoformat(args.deadline), args.max_workers)
+
+    if args.json:
+        print(json.dumps(plan, indent=2))
+    else:
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+        log_plan(plan, logging.getLogger("deadline_planner"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
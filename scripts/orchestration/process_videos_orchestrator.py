@@ -1,8 +1,138 @@
 #!/usr/bin/env python3
 """
 Multi-Camera Video Processing Orchestrator with Dynamic GPU Worker Management
-Version: 3.1.0
-Last Updated: 2025-11-16
+Version: 3.11.3
+Last Updated: 2026-10-18
+
+Modified 2026-10-18 (per-camera ROI config):
+- config/table_region_config_{camera_id}.json, when it exists, is now passed to
+  the detection job as --config (it was only logged, every camera ran on the
+  shared config); otherwise --config is the shared file
+- The detection script compiles each config once per content hash and
+  resolution (roi_compiler.py, cached in cache/roi/)
+
+Modified 2026-10-18 (event-adaptive sampling):
+- --adaptive-fps passes --adaptive-fps to every detection job: base rate while
+  all tables/division are stable, peak rate around transitions (detection
+  v3.11.0, per-camera bounds in cameras_config.json "adaptive_fps")
+- A deadline plan's reduced fps becomes the peak rate (--max-fps) instead of
+  the fixed rate
+
+Modified 2026-10-18 (CPU thread budgets):
+- Each detection subprocess gets explicit torch intra-/inter-op, OpenCV and
+  OMP/MKL/OpenBLAS thread counts from thread_budget.py: usable cores split
+  evenly between the current worker count, so N workers no longer start
+  N x cores threads
+- --pin-cores gives every worker slot its own core range; running jobs are
+  re-pinned whenever the worker count scales (new jobs get the new sizes)
+- --thread-budget {auto,on,off}: auto applies it when scaling on the CPU
+  backend; --torch-threads/--cv-threads/--reserve-cores override the split
+- thread_budget.py benchmark measures frames/s per worker count and budget mode
+
+Modified 2026-10-18 (multi-node processing):
+- --queue URL: run as a processing node of a coordinator (work_queue.py serve)
+  instead of the local job table; claims, heartbeats and complete/fail go over
+  HTTP, discovery/planning/re-queueing stay on the coordinator
+- --path-map COORD=LOCAL rewrites the coordinator's video paths to this
+  node's shared-storage mount
+- Node mode ships the finished session (sessions + state rows) from the local
+  database to the coordinator, which ingests it and completes the job in one
+  transaction under the worker's lease (a lost lease discards it); a failed upload fails
+  the job so it is retried instead of being marked done without its data
+- complete()/fail() now carry the worker id: a job whose lease went stale and
+  was reclaimed elsewhere can no longer be overwritten by the late worker
+
+Modified 2026-10-18 (streamed detection output + hung-job watchdog):
+- Detection output is read line by line while the job runs (DetectionRun):
+  "@@PROGRESS {json}" lines (frame, progress, fps, stage timings) update the
+  job's progress, the frame summary is parsed on the fly and everything else
+  is dropped instead of being buffered until exit
+- Only the last 50 stderr lines are kept; failure reports use that tail
+- Watchdog: a job with no progress line for --stall-seconds (default 300) is
+  killed and re-queued; job_store attempts (--max-attempts) cap the retries
+- The monitoring loop logs per-job progress every tick
+
+Modified 2026-10-18 (resumable sessions):
+- Detection checkpoints every session and resumes an interrupted one on the
+  next run (detection v3.6.0), so a retried job continues where the dead worker
+  stopped; the orchestrator logs the resume point
+- Exit code 3 (session still checkpointing in another process) is retried later
+  instead of being reported as a detection error
+
+Modified 2026-10-18 (deadline-aware scheduling):
+- --deadline ISO: before workers start, deadline_planner.py projects the run
+  time of the pending jobs from job history (per-camera cost per video second,
+  measured parallelism) and, if it would overshoot, degrades the least
+  important cameras (cameras_config.json processing_priority): --fps 2, then
+  --headless, then deferral of their newest segments to the next run
+- Plan is stored per job (plan_mode/plan_fps), logged up front and compared
+  with the actual run at the end (logs/processing_plans/plan_*.json)
+- Deferred jobs go back to pending at the next orchestrator start
+
+Modified 2026-10-18 (pluggable resource monitors):
+- Scaling policy lives in ResourceMonitor (resource_monitors.py); backends only
+  collect metrics: DynamicGPUMonitor (pynvml / nvidia-smi) and
+  CPUResourceMonitor (/proc: utilisation per core, load, MemAvailable, PSI)
+- --resource-monitor {auto,gpu,cpu}: auto uses the GPU when one answers and the
+  CPU backend otherwise, so CPU-only hosts scale on real signals too
+
+Modified 2026-10-18 (throughput-driven scaling):
+- Worker count follows measured throughput instead of fixed utilisation
+  thresholds: ThroughputMeter attributes each finished job's processed frames
+  (detection summary) over its run time; ThroughputController measures
+  aggregate frames/s after every scaling step and hill-climbs - keep adding
+  workers while one more worker buys >= 5%, step back and hold at the knee
+- Temperature and free-memory limits stay hard guards (shed a worker above
+  75°C / below 1GB free, never add above 70°C / below 2GB free, emergency stop)
+- Every decision is logged with the measured frames/s and gain
+- --scaling thresholds keeps the v3.0.0 threshold/cooldown policy
+- Worker ids only increase (a worker still finishing its last job after a
+  scale-down never shares an id with its replacement); the core-range slot is
+  the lowest slot free among the active workers
+
+Modified 2026-10-18 (segment integrity):
+- Filesystem discovery validates the MP4 box structure of every file it has not
+  seen before (segment_integrity.py); undecodable files go to the camera folder's
+  quarantine/ (videos/YYYYMMDD/camera_id/quarantine/)
+  instead of the job table. Manifest rows were already validated by capture
+- The analytics segment is validated before detection gets it (falls back to
+  the archive segment)
+- quarantine/ folders are never scanned
+
+Modified 2026-10-18 (dual-stream capture):
+- Detection runs on the low-resolution analytics segment recorded next to the
+  archive segment (videos/YYYYMMDD/camera_id/analytics/<same name>) when one
+  exists; ROI configs are rescaled by the detection script's ROI compiler
+- Job identity, missing-file checks and manifest bookkeeping stay on the archive file
+- --stream archive forces the main stream
+
+Modified 2026-10-18 (near-real-time mode):
+- --near-realtime: keep running during a capture window, re-reading the manifest
+  every --poll-seconds and processing segments --lag-seconds after they close
+  (today's footage included); stops after --until once the queue is drained
+- Resource budget so capture is never starved: --max-workers cap, --nice,
+  --max-load (1-min load average per CPU above which no new job is claimed)
+- Batch runs (default mode) only see what near-real-time mode left behind
+
+Modified 2026-10-18 (segment manifest):
+- Discovery reads the videos table filled by capture (segment_manifest.py):
+  unprocessed, integrity-ok segments from yesterday and earlier
+- Filesystem scan only enqueues files the manifest knows nothing about
+  (footage recorded before the manifest existed, manual copies, segments whose
+  registration failed): each listed folder is diffed against the manifest per
+  file, so one registered segment does not hide the rest of its date
+- Successful jobs set videos.is_processed = 1
+- New --discovery {auto,manifest,filesystem} option
+
+Modified 2026-10-18:
+- Replaced filesystem scan + processed-set diff with processing_jobs claim table
+  (see processing_jobs.py): UNIQUE(camera_id, video_file), atomic claim,
+  heartbeat while the detection subprocess runs, done/skipped/failed on exit
+- Discovery only lists camera folders whose mtime changed since the last pass
+  and enqueues with INSERT OR IGNORE - cost is O(new files), not O(history)
+- Workers pull jobs straight from the table (race-free across threads and
+  across concurrent orchestrator runs); crashed claims are reclaimed after 5 min
+- Failed jobs are retried up to 3 attempts
 
 Modified 2025-11-16:
 - Added date filtering to skip today's videos (process only yesterday and earlier)
@@ -44,20 +174,30 @@ Author: ASEOfSmartICE Team
 import os
 import subprocess
 import threading
-import queue
 import time
 import logging
 import json
 import sqlite3
 from pathlib import Path
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import defaultdict, deque
 from typing import Dict, List, Optional, Tuple, Set
 import argparse
 import re
 import sys
 import platform
 
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+from orchestration.processing_jobs import (
+    ProcessingJobStore, default_worker_id, HEARTBEAT_INTERVAL_SECONDS, MAX_JOB_ATTEMPTS, PLAN_HEADLESS
+)
+from video_capture.segment_manifest import SegmentManifest, analytics_segment_for, PROCESSABLE_STATUSES
+from video_capture.segment_integrity import check_segment, validate_segment, QUARANTINE_SUBDIR
+from orchestration.resource_monitors import ResourceMonitor, CPUResourceMonitor
+from orchestration.deadline_planner import plan_run, report_plan
+from orchestration.work_queue import RemoteJobStore, WorkQueueError, LeaseLostError, parse_path_maps
+from orchestration.thread_budget import ThreadBudgetPlanner, pin_process, DEFAULT_RESERVE_CORES
+
 # Try to import pynvml for GPU monitoring
 try:
     import pynvml
@@ -75,6 +215,7 @@ except ImportError:
 SCRIPT_DIR = Path(__file__).parent.resolve()
 VIDEOS_DIR = SCRIPT_DIR.parent.parent / "videos"
 LOGS_DIR = SCRIPT_DIR.parent.parent / "logs"
+PLANS_DIR = LOGS_DIR / "processing_plans"
 DETECTION_SCRIPT = SCRIPT_DIR.parent / "video_processing" / "table_and_region_state_detection.py"
 DATABASE_PATH = SCRIPT_DIR.parent.parent / "db" / "detection_data.db"
 
@@ -96,8 +237,35 @@ GPU_UTIL_SCALE_DOWN_THRESHOLD = 85  # % - Remove workers
 
 # Memory thresholds
 MIN_MEMORY_FREE_GB = 2.0  # Minimum free memory to scale up
+HARD_MIN_MEMORY_FREE_GB = 1.0  # Below this a worker is shed immediately
 SCALE_COOLDOWN_SECONDS = 60  # Wait time between scaling decisions
 
+# Throughput-driven scaling (hill-climb on aggregate processed frames/s)
+THROUGHPUT_SETTLE_SECONDS = 30      # Ignore this long after a step (model load, warm-up)
+THROUGHPUT_WINDOW_SECONDS = 120     # Minimum measurement window per worker count
+THROUGHPUT_MIN_GAIN = 0.05          # One more worker must add >= 5% frames/s to stay
+THROUGHPUT_HOLD_SECONDS = 900       # Stay at the knee this long before probing upwards again
+THROUGHPUT_HISTORY_SECONDS = 3600   # Finished-job history kept for measurements
+
+# Near-real-time mode defaults (surveillance_service.py overrides from system_config.json)
+NEAR_REALTIME_LAG_SECONDS = 120      # Process a segment 2 minutes after capture closed it
+NEAR_REALTIME_POLL_SECONDS = 60      # Re-read the manifest every minute
+NEAR_REALTIME_MAX_LOAD = 0.75        # Don't claim new jobs above this load average per CPU
+
+# Detection summary line reporting frames run through the models
+PROCESSED_FRAMES_PATTERN = re.compile(r"Processed frames:\s*(\d+)")
+RESUMED_PATTERN = re.compile(r"Resuming session \S+ from frame (\d+)")
+
+# Streamed detection output + hung-job watchdog
+PROGRESS_PREFIX = "@@PROGRESS "     # Structured progress line printed by detection (JSON payload)
+JOB_STALL_SECONDS = 300             # No progress line for this long = hung job (killed, re-queued)
+KILL_GRACE_SECONDS = 10             # SIGTERM -> SIGKILL
+STDERR_TAIL_LINES = 50              # stderr kept per job for failure reports
+
+# Detection exit codes besides 0 (done) / 1 (error)
+EXIT_SKIPPED = 2        # Session already complete
+EXIT_IN_PROGRESS = 3    # Session checkpointed by another live process
+
 # Log rotation settings
 LOG_RETENTION_DAYS = 14  # Keep 2 weeks of logs
 
@@ -106,7 +274,7 @@ LOG_RETENTION_DAYS = 14  # Keep 2 weeks of logs
 # GPU MONITORING
 # ============================================================================
 
-class DynamicGPUMonitor:
+class DynamicGPUMonitor(ResourceMonitor):
     """
     Dynamic GPU monitoring and worker scaling for RTX 3060
 
@@ -115,35 +283,33 @@ class DynamicGPUMonitor:
     - Thermal throttling: 83-85°C
     - Start with 1 worker, scale based on metrics
 
-    Uses pynvml (preferred) or falls back to nvidia-smi
+    Uses pynvml (preferred) or falls back to nvidia-smi.
+    Modified 2026-10-18: Scaling policy moved to ResourceMonitor (resource_monitors.py),
+    shared with the CPU backend; this class only collects GPU metrics.
     """
 
-    def __init__(self, logger: logging.Logger,
-                 min_workers: int = DEFAULT_MIN_WORKERS,
-                 max_workers: int = DEFAULT_MAX_WORKERS):
-        self.logger = logger
-        self.min_workers = min_workers
-        self.max_workers = max_workers
+    name = "gpu"
 
-        # RTX 3060 thresholds (from research)
-        self.TEMP_SCALE_UP_THRESHOLD = TEMP_SCALE_UP_THRESHOLD
-        self.TEMP_SCALE_DOWN_THRESHOLD = TEMP_SCALE_DOWN_THRESHOLD
-        self.TEMP_EMERGENCY_THRESHOLD = TEMP_EMERGENCY_THRESHOLD
+    # RTX 3060 thresholds (from research)
+    TEMP_SCALE_UP_THRESHOLD = TEMP_SCALE_UP_THRESHOLD
+    TEMP_SCALE_DOWN_THRESHOLD = TEMP_SCALE_DOWN_THRESHOLD
+    TEMP_EMERGENCY_THRESHOLD = TEMP_EMERGENCY_THRESHOLD
 
-        self.GPU_UTIL_SCALE_UP_THRESHOLD = GPU_UTIL_SCALE_UP_THRESHOLD
-        self.GPU_UTIL_SCALE_DOWN_THRESHOLD = GPU_UTIL_SCALE_DOWN_THRESHOLD
+    UTIL_SCALE_UP_THRESHOLD = GPU_UTIL_SCALE_UP_THRESHOLD
+    UTIL_SCALE_DOWN_THRESHOLD = GPU_UTIL_SCALE_DOWN_THRESHOLD
 
-        self.MIN_MEMORY_FREE_GB = MIN_MEMORY_FREE_GB
-        self.SCALE_COOLDOWN_SECONDS = SCALE_COOLDOWN_SECONDS
+    MIN_MEMORY_FREE_GB = MIN_MEMORY_FREE_GB
+    HARD_MIN_MEMORY_FREE_GB = HARD_MIN_MEMORY_FREE_GB
+    SCALE_COOLDOWN_SECONDS = SCALE_COOLDOWN_SECONDS
 
-        # State tracking
-        self.last_scale_time = 0
-        self.is_available = False
+    def __init__(self, logger: logging.Logger,
+                 min_workers: int = DEFAULT_MIN_WORKERS,
+                 max_workers: int = DEFAULT_MAX_WORKERS):
         self.use_pynvml = False
         self.handle = None
 
         # Initialize GPU monitoring
-        self._initialize()
+        super().__init__(logger, min_workers, max_workers)
 
     def _initialize(self):
         """Initialize GPU monitoring (try pynvml first, fall back to nvidia-smi)"""
@@ -213,6 +379,7 @@ class DynamicGPUMonitor:
 
             return {
                 'temperature': temp,
+                'utilization': util.gpu,
                 'gpu_utilization': util.gpu,
                 'memory_free_gb': mem_free_gb,
                 'memory_total_gb': mem_total_gb,
@@ -246,6 +413,7 @@ class DynamicGPUMonitor:
 
             return {
                 'temperature': values[0],
+                'utilization': values[1],
                 'gpu_utilization': values[1],
                 'memory_free_gb': mem_free_mb / 1024,
                 'memory_total_gb': mem_total_mb / 1024,
@@ -258,56 +426,8 @@ class DynamicGPUMonitor:
             self.logger.error(f"Error reading GPU metrics (nvidia-smi): {e}")
             return None
 
-    def should_scale_up(self, metrics: Dict, current_workers: int) -> bool:
-        """Check if conditions allow adding a worker"""
-        if not metrics:
-            return False
-
-        # Already at max
-        if current_workers >= self.max_workers:
-            return False
-
-        # Cooldown period
-        if time.time() - self.last_scale_time < self.SCALE_COOLDOWN_SECONDS:
-            return False
-
-        # All conditions must be met (conservative scaling)
+    def describe(self, metrics: Dict) -> str:
         return (
-            metrics['temperature'] < self.TEMP_SCALE_UP_THRESHOLD and
-            metrics['gpu_utilization'] < self.GPU_UTIL_SCALE_UP_THRESHOLD and
-            metrics['memory_free_gb'] > self.MIN_MEMORY_FREE_GB
-        )
-
-    def should_scale_down(self, metrics: Dict, current_workers: int) -> bool:
-        """Check if we need to reduce workers"""
-        if not metrics:
-            return False
-
-        # Already at minimum
-        if current_workers <= self.min_workers:
-            return False
-
-        # Any condition triggers scale down (aggressive)
-        return (
-            metrics['temperature'] > self.TEMP_SCALE_DOWN_THRESHOLD or
-            metrics['gpu_utilization'] > self.GPU_UTIL_SCALE_DOWN_THRESHOLD or
-            metrics['memory_free_gb'] < 1.0
-        )
-
-    def is_emergency(self, metrics: Dict) -> bool:
-        """Check if emergency stop needed"""
-        if not metrics:
-            return False
-
-        return metrics['temperature'] >= self.TEMP_EMERGENCY_THRESHOLD
-
-    def record_scaling(self):
-        """Record that we just scaled"""
-        self.last_scale_time = time.time()
-
-    def log_metrics(self, metrics: Dict):
-        """Log GPU metrics to logger"""
-        self.logger.info(
             f"GPU: {metrics['temperature']}°C | "
             f"Util: {metrics['gpu_utilization']}% | "
             f"Mem: {metrics['memory_free_gb']:.1f}GB free / "
@@ -324,6 +444,149 @@ class DynamicGPUMonitor:
                 pass
 
 
+def create_resource_monitor(backend: str, logger: logging.Logger,
+                            min_workers: int = DEFAULT_MIN_WORKERS,
+                            max_workers: int = DEFAULT_MAX_WORKERS) -> ResourceMonitor:
+    """'gpu', 'cpu' or 'auto' (GPU if one answers, otherwise CPU/RAM from /proc)"""
+    if backend == 'cpu':
+        return CPUResourceMonitor(logger, min_workers, max_workers)
+    monitor = DynamicGPUMonitor(logger, min_workers, max_workers)
+    if backend == 'auto' and not monitor.is_available:
+        logger.info("No GPU telemetry - scaling on CPU/RAM metrics")
+        return CPUResourceMonitor(logger, min_workers, max_workers)
+    return monitor
+
+
+# ============================================================================
+# THROUGHPUT CONTROLLER
+# ============================================================================
+
+class ThroughputMeter:
+    """
+    Aggregate processed frames/s across workers
+
+    Each finished job contributes its processed frames spread evenly over its
+    run time. A window is only measured up to the start of the oldest job still
+    running, so every job overlapping it has already reported its frames.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running: Dict[int, float] = {}              # worker key -> job start
+        self.finished: List[Tuple[float, float, int]] = []  # (start, end, frames)
+
+    def job_started(self, key: int):
+        with self.lock:
+            self.running[key] = time.time()
+
+    def job_finished(self, key: int, frames: int):
+        now = time.time()
+        with self.lock:
+            started = self.running.pop(key, now)
+            self.finished.append((started, now, frames))
+            cutoff = now - THROUGHPUT_HISTORY_SECONDS
+            self.finished = [entry for entry in self.finished if entry[1] >= cutoff]
+
+    def measure(self, window_start: float) -> Tuple[Optional[float], float]:
+        """(frames/s over [window_start, window_end], window_end); None if the window is empty"""
+        with self.lock:
+            window_end = min([time.time()] + list(self.running.values()))
+            if window_end <= window_start:
+                return None, window_end
+            frames = 0.0
+            for start, end, count in self.finished:
+                overlap = min(end, window_end) - max(start, window_start)
+                if overlap > 0:
+                    frames += count * overlap / max(end - start, 1e-6)
+        return frames / (window_end - window_start), window_end
+
+
+class ThroughputController:
+    """
+    Hill-climbs the worker count to the knee of the throughput curve
+
+    After each step: wait THROUGHPUT_SETTLE_SECONDS, measure frames/s over at
+    least THROUGHPUT_WINDOW_SECONDS, compare with the previous worker count.
+    - Step up paid off (gain >= THROUGHPUT_MIN_GAIN) -> step up again
+    - It did not -> step back down and hold for THROUGHPUT_HOLD_SECONDS
+    - Measurements taken while the queue ran dry are discarded (supply-bound)
+    decide() only proposes; the caller applies the hard (thermal/memory) guards.
+    """
+
+    def __init__(self, logger: logging.Logger, meter: ThroughputMeter):
+        self.logger = logger
+        self.meter = meter
+        self.throughput_by_workers: Dict[int, float] = {}
+        self.step_from: Optional[int] = None  # Worker count before the last step
+        self.step_time = time.time()
+        self.hold_until = 0.0
+        self.starved = False
+
+    def note_step(self, from_workers: int, to_workers: int):
+        """Worker count changed (by us or by a guard) - start a new measurement"""
+        self.step_from = from_workers if from_workers != to_workers else None
+        self.restart()
+
+    def restart(self):
+        self.step_time = time.time()
+        self.starved = False
+
+    def hold(self):
+        self.hold_until = time.time() + THROUGHPUT_HOLD_SECONDS
+
+    def decide(self, workers: int, jobs_waiting: int, max_workers: int) -> int:
+        """+1 / -1 / 0 worker"""
+        if jobs_waiting == 0:
+            self.starved = True
+
+        window_start = self.step_time + THROUGHPUT_SETTLE_SECONDS
+        if time.time() < window_start + THROUGHPUT_WINDOW_SECONDS:
+            return 0
+        rate, window_end = self.meter.measure(window_start)
+        if rate is None or window_end - window_start < THROUGHPUT_WINDOW_SECONDS:
+            return 0  # Jobs overlapping the window still running
+        if self.starved:
+            self.logger.debug(f"Throughput: queue ran dry during measurement at {workers} worker(s), re-measuring")
+            self.step_from = None
+            self.restart()
+            return 0
+
+        self.throughput_by_workers[workers] = rate
+        previous = self.throughput_by_workers.get(self.step_from) if self.step_from is not None else None
+        step_from = self.step_from
+        self.step_from = None
+        self.restart()
+
+        if previous is None:
+            # Baseline at this worker count (start-up or end of a hold)
+            if workers < max_workers and time.time() >= self.hold_until:
+                self.logger.info(f"📈 Throughput: {rate:.1f} frames/s at {workers} worker(s) - probing {workers + 1}")
+                return 1
+            self.logger.debug(f"Throughput: {rate:.1f} frames/s at {workers} worker(s) - holding")
+            return 0
+
+        gain = (rate - previous) / previous if previous > 0 else float('inf')
+        if step_from < workers:
+            if gain >= THROUGHPUT_MIN_GAIN:
+                if workers < max_workers:
+                    self.logger.info(f"📈 Throughput: {rate:.1f} frames/s at {workers} worker(s), "
+                                     f"{gain:+.1%} vs {step_from} - scaling UP to {workers + 1}")
+                    return 1
+                self.logger.info(f"📈 Throughput: {rate:.1f} frames/s at {workers} worker(s), "
+                                 f"{gain:+.1%} vs {step_from} - at max workers")
+                self.hold()
+                return 0
+            self.logger.info(f"📉 Throughput: {rate:.1f} frames/s at {workers} worker(s), "
+                             f"{gain:+.1%} vs {step_from} (< {THROUGHPUT_MIN_GAIN:.0%}) - "
+                             f"knee at {step_from}, scaling DOWN and holding {THROUGHPUT_HOLD_SECONDS // 60} min")
+            self.hold()
+            return -1
+
+        self.logger.info(f"📊 Throughput: {rate:.1f} frames/s at {workers} worker(s), "
+                         f"{gain:+.1%} vs {step_from} - holding")
+        return 0
+
+
 # ============================================================================
 # LOGGING SETUP
 # ============================================================================
@@ -398,45 +661,6 @@ def cleanup_old_logs(logs_dir: Path, retention_days: int):
 # DATABASE DUPLICATE CHECKING
 # ============================================================================
 
-def get_processed_videos(logger: logging.Logger) -> Set[str]:
-    """
-    Get set of already processed video filenames from database
-
-    Modified 2025-12-10: Query 'sessions' table instead of non-existent 'videos' table
-    This matches the duplicate check in table_and_region_state_detection.py
-
-    Returns: Set of video filenames that have been processed
-    """
-    processed_videos = set()
-
-    if not DATABASE_PATH.exists():
-        logger.warning(f"Database not found at {DATABASE_PATH}, skipping duplicate check")
-        return processed_videos
-
-    try:
-        conn = sqlite3.connect(str(DATABASE_PATH))
-        cursor = conn.cursor()
-
-        # Modified 2025-12-10: Query sessions table (actual table used by detection script)
-        # video_file column contains the filename of processed videos
-        cursor.execute("""
-            SELECT DISTINCT video_file
-            FROM sessions
-            WHERE video_file IS NOT NULL
-        """)
-
-        for row in cursor.fetchall():
-            processed_videos.add(row[0])
-
-        conn.close()
-        logger.info(f"Found {len(processed_videos)} already processed videos in database (sessions table)")
-
-    except sqlite3.Error as e:
-        logger.error(f"Database error while checking for duplicates: {e}")
-
-    return processed_videos
-
-
 def extract_date_from_path(video_path: str) -> Optional[str]:
     """
     Extract date from video path structure: videos/YYYYMMDD/camera_id/filename.mp4
@@ -478,10 +702,46 @@ def extract_timestamp(video_filename: str) -> str:
     return "00000000_000000"  # Default for sorting
 
 
-def discover_videos(videos_dir: Path, camera_filter: Optional[List[str]] = None,
-                   logger: Optional[logging.Logger] = None) -> Dict[str, List[str]]:
+def discover_from_manifest(manifest: SegmentManifest, job_store: ProcessingJobStore,
+                           camera_filter: Optional[List[str]] = None,
+                           logger: Optional[logging.Logger] = None,
+                           lag_seconds: Optional[int] = None) -> int:
     """
-    Discover videos in videos directory, filtering by date and checking for duplicates
+    Enqueue unprocessed segments registered by capture (indexed query, no directory walk)
+
+    Batch mode (lag_seconds=None): segments from YESTERDAY and earlier.
+    Near-real-time mode: any segment that closed at least lag_seconds ago (today included).
+    Only segments with a processable integrity status are returned.
+
+    Returns: Number of newly enqueued jobs
+    """
+    if lag_seconds is None:
+        today = datetime.now().strftime("%Y-%m-%d")
+        segments = manifest.unprocessed_segments(before_date=today, camera_ids=camera_filter)
+    else:
+        ended_before = datetime.now() - timedelta(seconds=lag_seconds)
+        segments = manifest.unprocessed_segments(ended_before=ended_before, camera_ids=camera_filter)
+
+    new_jobs = []
+    for segment in segments:
+        priority = int(extract_timestamp(segment['video_filename']).replace('_', ''))
+        new_jobs.append((segment['camera_id'], segment['file_path'],
+                         segment['video_date'].replace('-', ''), priority))
+
+    added = job_store.enqueue_many(new_jobs)
+
+    if logger:
+        logger.info(f"Manifest discovery: {len(segments)} unprocessed segment(s), {added} newly enqueued")
+
+    return added
+
+
+def discover_videos(videos_dir: Path, job_store: ProcessingJobStore,
+                   camera_filter: Optional[List[str]] = None,
+                   logger: Optional[logging.Logger] = None,
+                   manifest: Optional[SegmentManifest] = None) -> int:
+    """
+    Discover new videos and enqueue them in the processing_jobs table
 
     Expected structure: videos/YYYYMMDD/camera_id/camera_id_YYYYMMDD_HHMMSS.mp4
 
@@ -489,16 +749,18 @@ def discover_videos(videos_dir: Path, camera_filter: Optional[List[str]] = None,
     - Only includes videos from YESTERDAY and earlier (current_date - 1)
     - Skips TODAY's videos (may still be recording)
 
-    Duplicate checking:
-    - Queries database for already processed videos
-    - Skips videos that exist in videos table with is_processed = 1
+    Duplicate checking (Modified 2026-10-18):
+    - Camera folders whose mtime is unchanged since the last pass are not listed
+    - New files are inserted with INSERT OR IGNORE on UNIQUE(camera_id, video_file),
+      so already queued/processed videos cost nothing
+    - Files registered by capture (manifest) were enqueued by manifest discovery
+      and are skipped file by file; only the changed folders' camera/date pairs
+      are looked up (indexed), never the whole manifest
 
-    Returns: dict of {camera_id: [video_paths]} sorted by timestamp (oldest first)
+    Returns: Number of newly enqueued jobs
     """
-    videos_by_camera = defaultdict(list)
-
     if not videos_dir.exists():
-        return videos_by_camera
+        return 0
 
     # Get current date and yesterday's date (cutoff for processing)
     today = datetime.now().strftime("%Y%m%d")
@@ -507,68 +769,194 @@ def discover_videos(videos_dir: Path, camera_filter: Optional[List[str]] = None,
     if logger:
         logger.info(f"Date filter: Processing videos from {yesterday} and earlier (skipping today: {today})")
 
-    # Get already processed videos from database
-    processed_videos = get_processed_videos(logger) if logger else set()
+    scanned_dirs = job_store.get_scanned_dirs()
 
     # Counters for logging
-    total_found = 0
+    dirs_listed = 0
+    dirs_unchanged = 0
     skipped_today = 0
-    skipped_duplicate = 0
-    added = 0
-
-    # Find all mp4 files in date/camera_id structure
-    for video_file in videos_dir.rglob("*.mp4"):
-        total_found += 1
-
-        camera_id = extract_camera_id(video_file.name)
-        if not camera_id:
+    in_manifest = 0
+    registered: Dict[Tuple[str, str], Set[str]] = {}   # (camera_id, YYYYMMDD) -> filenames, this pass only
+    quarantined = 0
+    new_jobs = []
+    listed_dirs = []
+
+    # Candidate folders: videos/, videos/YYYYMMDD/, videos/YYYYMMDD/camera_id/
+    # (glob at fixed depth never lists the files inside camera folders)
+    video_dirs = {videos_dir}
+    video_dirs.update(p for p in videos_dir.glob("*") if p.is_dir())
+    video_dirs.update(p for p in videos_dir.glob("*/*") if p.is_dir())
+
+    for video_dir in sorted(video_dirs):
+        if QUARANTINE_SUBDIR in video_dir.relative_to(videos_dir).parts:
             continue
 
-        # Filter by camera if specified
-        if camera_filter and camera_id not in camera_filter:
-            continue
-
-        # Extract date from path (videos/YYYYMMDD/camera_id/...)
-        video_date = extract_date_from_path(str(video_file))
+        video_date = extract_date_from_path(str(video_dir))
 
-        # Skip today's videos (may still be recording)
+        # Skip today's folders (may still be recording) - not marked as scanned
         if video_date == today:
             skipped_today += 1
-            if logger:
-                logger.debug(f"Skipping today's video: {video_file.name}")
             continue
 
-        # Skip videos without valid date (shouldn't happen with proper structure)
-        if not video_date:
-            if logger:
-                logger.warning(f"Could not extract date from: {video_file}")
+        try:
+            mtime = video_dir.stat().st_mtime
+        except OSError:
             continue
 
-        # Check if already processed in database
-        if video_file.name in processed_videos:
-            skipped_duplicate += 1
-            if logger:
-                logger.debug(f"Skipping already processed: {video_file.name}")
+        if scanned_dirs.get(str(video_dir)) == mtime:
+            dirs_unchanged += 1
             continue
 
-        # Add to processing list
-        videos_by_camera[camera_id].append(str(video_file))
-        added += 1
+        dirs_listed += 1
+        for video_file in video_dir.glob("*.mp4"):
+            camera_id = extract_camera_id(video_file.name)
+            if not camera_id:
+                continue
+
+            file_date = extract_date_from_path(str(video_file))
+            if file_date == today:
+                continue
+
+            # Skip videos without valid date (shouldn't happen with proper structure)
+            if not file_date:
+                if logger:
+                    logger.warning(f"Could not extract date from: {video_file}")
+                continue
+
+            # Registered by capture: manifest discovery owns it (integrity already checked)
+            if manifest is not None:
+                key = (camera_id, file_date)
+                if key not in registered:
+                    registered[key] = manifest.registered_filenames(
+                        camera_id, f"{file_date[:4]}-{file_date[4:6]}-{file_date[6:]}")
+                if video_file.name in registered[key]:
+                    in_manifest += 1
+                    continue
+
+            # Container check once per file (known files were checked when first seen)
+            if not job_store.is_known(camera_id, video_file.name):
+                verdict = check_segment(video_file)
+                if verdict.get('quarantined'):
+                    quarantined += 1
+                    if logger:
+                        logger.warning(f"Quarantined {video_file.name}: {verdict['reason']}")
+                    continue
+
+            # Priority = timestamp (older videos first)
+            priority = int(extract_timestamp(video_file.name).replace('_', ''))
+            new_jobs.append((camera_id, str(video_file), file_date, priority))
 
-    # Sort videos by timestamp within each camera (oldest first for priority queue)
-    for camera_id in videos_by_camera:
-        videos_by_camera[camera_id].sort(key=lambda v: extract_timestamp(os.path.basename(v)))
+        listed_dirs.append((str(video_dir), mtime))
+
+    added = job_store.enqueue_many(new_jobs)
+    job_store.mark_dirs_scanned(listed_dirs)
 
     # Log summary
     if logger:
         logger.info(f"Video discovery summary:")
-        logger.info(f"  Total videos found: {total_found}")
-        logger.info(f"  Skipped (today): {skipped_today}")
-        logger.info(f"  Skipped (already processed): {skipped_duplicate}")
-        logger.info(f"  Added to queue: {added}")
-        logger.info(f"  Cameras: {len(videos_by_camera)}")
+        logger.info(f"  Folders listed: {dirs_listed} (unchanged, skipped: {dirs_unchanged})")
+        logger.info(f"  Skipped (today folders): {skipped_today}")
+        logger.info(f"  Skipped (already in manifest): {in_manifest}")
+        logger.info(f"  Videos seen in changed folders: {len(new_jobs)}")
+        logger.info(f"  Quarantined (failed container check): {quarantined}")
+        logger.info(f"  Newly enqueued: {added}")
 
-    return dict(videos_by_camera)
+    return added
+
+
+# ============================================================================
+# DETECTION SUBPROCESS
+# ============================================================================
+
+class DetectionRun:
+    """
+    Detection subprocess with its output streamed line by line
+
+    stdout: PROGRESS_PREFIX lines update `progress` / `last_progress`; the frame
+    summary and resume lines are parsed as they arrive; other lines are dropped.
+    stderr: only the last STDERR_TAIL_LINES lines are kept.
+    """
+
+    def __init__(self, cmd: List[str], extra_env: Optional[Dict[str, str]] = None):
+        # Unbuffered child stdout, otherwise progress arrives in 4-8KB bursts
+        env = dict(os.environ, PYTHONUNBUFFERED="1", **(extra_env or {}))
+        self.process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            env=env
+        )
+        self.started_at = time.time()
+        self.last_progress = self.started_at
+        self.progress: Dict = {}
+        self.processed_frames = 0
+        self.resumed_from: Optional[int] = None
+        self.stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+
+        self._readers = [
+            threading.Thread(target=self._read_stdout, daemon=True),
+            threading.Thread(target=self._read_stderr, daemon=True),
+        ]
+        for reader in self._readers:
+            reader.start()
+
+    def _read_stdout(self):
+        for line in self.process.stdout:
+            if line.startswith(PROGRESS_PREFIX):
+                try:
+                    self.progress = json.loads(line[len(PROGRESS_PREFIX):])
+                except ValueError:
+                    continue
+                self.last_progress = time.time()
+                continue
+            frames_match = PROCESSED_FRAMES_PATTERN.search(line)
+            if frames_match:
+                self.processed_frames = int(frames_match.group(1))
+            resumed_match = RESUMED_PATTERN.search(line)
+            if resumed_match:
+                self.resumed_from = int(resumed_match.group(1))
+
+    def _read_stderr(self):
+        for line in self.process.stderr:
+            self.stderr_tail.append(line.rstrip("\n"))
+
+    def wait(self, timeout: float) -> Optional[int]:
+        """Exit code, or None if still running after `timeout` seconds"""
+        try:
+            return self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return None
+
+    def stalled_for(self) -> float:
+        """Seconds since the last progress line (or since start)"""
+        return time.time() - self.last_progress
+
+    def kill(self) -> int:
+        """SIGTERM, then SIGKILL after KILL_GRACE_SECONDS; returns the exit code"""
+        self.process.terminate()
+        try:
+            return self.process.wait(timeout=KILL_GRACE_SECONDS)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            return self.process.wait()
+
+    def finish(self):
+        """Wait for the readers to drain the pipes after exit"""
+        for reader in self._readers:
+            reader.join(timeout=5)
+
+    def stderr_text(self) -> str:
+        return "\n".join(self.stderr_tail)
+
+    def describe_progress(self) -> str:
+        """e.g. '42% frame 504/1200 @ 11.3 fps' or the current phase"""
+        progress = self.progress
+        if 'progress' not in progress:
+            return progress.get('phase', 'starting')
+        return (f"{progress['progress']:.0f}% frame {progress.get('frame', '?')}/{progress.get('end_frame', '?')} "
+                f"@ {progress.get('fps', 0):.1f} fps")
 
 
 # ============================================================================
@@ -576,10 +964,16 @@ def discover_videos(videos_dir: Path, camera_filter: Optional[List[str]] = None,
 # ============================================================================
 
 class ProcessingJob:
-    """Represents a single video processing job"""
+    """Represents a single video processing job (a claimed processing_jobs row)"""
 
     def __init__(self, camera_id: str, video_path: str, priority: int,
-                 duration: Optional[int] = None, config_path: Optional[str] = None):
+                 duration: Optional[int] = None, config_path: Optional[str] = None,
+                 job_id: Optional[int] = None, worker_id: Optional[str] = None,
+                 attempts: int = 1, plan_fps: Optional[float] = None,
+                 headless: bool = False):
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.attempts = attempts
         self.camera_id = camera_id
         self.video_path = video_path
         self.priority = priority  # Lower number = higher priority (older videos)
@@ -587,34 +981,86 @@ class ProcessingJob:
         self.config_path = config_path
         self.video_name = os.path.basename(video_path)
 
+        # Deadline plan: degraded detection settings (None/False = full run)
+        self.plan_fps = plan_fps
+        self.headless = headless
+
+        # Running detection subprocess (progress for the monitoring loop)
+        self.run: Optional[DetectionRun] = None
+
+        # Worker slot running the job (thread budget / core range)
+        self.slot = 0
+
     def __lt__(self, other):
         """Compare by priority for queue ordering"""
         return self.priority < other.priority
 
+    @classmethod
+    def from_row(cls, row: Dict, duration: Optional[int] = None,
+                 config_path: Optional[str] = None) -> 'ProcessingJob':
+        """Build from a claimed processing_jobs row"""
+        return cls(row['camera_id'], row['video_path'], row['priority'] or 0,
+                   duration, config_path, job_id=row['job_id'],
+                   worker_id=row['worker_id'], attempts=row['attempts'],
+                   plan_fps=row.get('plan_fps'), headless=row.get('plan_mode') == PLAN_HEADLESS)
+
 
 class ProcessingQueue:
     """
     GPU-aware processing queue with dynamic worker scaling
 
-    Starts with 1 worker, scales up/down based on GPU metrics
+    Starts with 1 worker, scales up/down based on GPU (or CPU/RAM) metrics.
+    Modified 2026-10-18: Workers claim jobs from the processing_jobs table.
     """
 
-    def __init__(self, logger: logging.Logger, gpu_monitor: DynamicGPUMonitor,
-                 max_workers: int = DEFAULT_MAX_WORKERS):
+    def __init__(self, logger: logging.Logger, resource_monitor: ResourceMonitor,
+                 job_store: ProcessingJobStore,
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 camera_filter: Optional[List[str]] = None,
+                 duration: Optional[int] = None,
+                 config_path: Optional[str] = None,
+                 manifest: Optional[SegmentManifest] = None):
         self.logger = logger
-        self.gpu_monitor = gpu_monitor
+        self.resource_monitor = resource_monitor
+        self.job_store = job_store
+        self.manifest = manifest
         self.max_workers = max_workers
-        self.min_workers = gpu_monitor.min_workers
+        self.min_workers = resource_monitor.min_workers
+        self.camera_filter = camera_filter
+        self.duration = duration
+        self.config_path = config_path
+
+        # Resource budget (near-real-time mode): skip claiming while the host is busy
+        self.max_load_per_cpu: Optional[float] = None
+
+        # Dual-stream capture: decode the sub-stream copy instead of the archive
+        self.use_analytics_stream = True
+
+        # Watchdog: kill and re-queue jobs without a progress line for this long
+        self.stall_seconds = JOB_STALL_SECONDS
+
+        # Multi-node: ship finished sessions to the coordinator before completing
+        self.results_publisher = None
+
+        # Event-adaptive sampling in the detection jobs (--adaptive-fps)
+        self.adaptive_fps = False
+
+        # CPU thread budget per detection subprocess (None = library defaults)
+        self.thread_budget: Optional[ThreadBudgetPlanner] = None
+
+        # Worker scaling policy: 'throughput' (hill-climb, thermal guards) or 'thresholds'
+        self.scaling_mode = 'throughput'
+        self.throughput_meter = ThroughputMeter()
+        self.throughput_controller = ThroughputController(logger, self.throughput_meter)
 
         # Dynamic worker management
         self.current_worker_count = 0
+        self.next_worker_id = 0          # Never reused: log lines and claims stay unambiguous
+        self.worker_slots = {}           # Active worker id -> thread budget slot (retired ids removed)
         self.worker_threads = []
         self.worker_lock = threading.Lock()
         self.stop_event = threading.Event()
 
-        # Job queue (priority queue - older videos first)
-        self.job_queue = queue.PriorityQueue()
-
         # Active jobs tracking (for monitoring)
         self.active_jobs = {}
         self.active_jobs_lock = threading.Lock()
@@ -622,23 +1068,55 @@ class ProcessingQueue:
         # Statistics
         self.jobs_completed = 0
         self.jobs_failed = 0
+        self.jobs_skipped = 0
         self.total_processing_time = 0
         self.start_time = None
 
-        # GPU monitoring thread
-        self.gpu_monitoring_thread = None
+        # Resource monitoring thread
+        self.monitoring_thread = None
+
+    def _mark_video_processed(self, job: ProcessingJob):
+        """Flag the segment in the manifest so discovery never returns it again"""
+        if self.manifest is None:
+            return
+        try:
+            self.manifest.mark_processed(job.camera_id, job.video_name)
+        except sqlite3.Error as e:
+            self.logger.warning(f"[{job.camera_id}] Could not mark {job.video_name} processed in manifest: {e}")
+
+    def _over_load_budget(self) -> bool:
+        """True if the 1-minute load average per CPU exceeds the budget"""
+        if self.max_load_per_cpu is None or not hasattr(os, "getloadavg"):
+            return False
+        load_per_cpu = os.getloadavg()[0] / (os.cpu_count() or 1)
+        return load_per_cpu > self.max_load_per_cpu
 
-    def add_job(self, job: ProcessingJob):
-        """Add a job to the queue"""
-        self.job_queue.put(job)
+    def claim_job(self, worker_name: str) -> Optional[ProcessingJob]:
+        """Atomically claim the next pending job from the job table"""
+        if self._over_load_budget():
+            self.logger.debug(f"[{worker_name}] Load above budget, not claiming")
+            return None
+        try:
+            row = self.job_store.claim(default_worker_id(worker_name), self.camera_filter)
+        except WorkQueueError as e:
+            self.logger.warning(f"[{worker_name}] Claim failed: {e}")
+            return None
+        if row is None:
+            return None
+        return ProcessingJob.from_row(row, self.duration, self.config_path)
 
     def get_queue_status(self) -> Dict:
         """Get current queue status"""
         with self.active_jobs_lock:
             active_count = len(self.active_jobs)
 
+        try:
+            outstanding = self.job_store.outstanding_count(self.camera_filter)
+        except (sqlite3.Error, WorkQueueError):
+            outstanding = active_count
+
         return {
-            'jobs_waiting': self.job_queue.qsize(),
+            'jobs_waiting': max(0, outstanding - active_count),
             'jobs_running': active_count,
             'jobs_completed': self.jobs_completed,
             'jobs_failed': self.jobs_failed,
@@ -649,7 +1127,11 @@ class ProcessingQueue:
     def _add_worker(self):
         """Add a new worker thread"""
         with self.worker_lock:
-            worker_id = self.current_worker_count
+            worker_id = self.next_worker_id
+            self.next_worker_id += 1
+            used = set(self.worker_slots.values())
+            self.worker_slots[worker_id] = next(slot for slot in range(len(used) + 1) if slot not in used)
+            self.worker_threads[:] = [t for t in self.worker_threads if t.is_alive()]
             thread = threading.Thread(
                 target=self._worker_thread,
                 args=(worker_id,),
@@ -659,16 +1141,42 @@ class ProcessingQueue:
             thread.start()
             self.worker_threads.append(thread)
             self.current_worker_count += 1
-            self.gpu_monitor.record_scaling()
-            self.logger.info(f"➕ Added worker {worker_id}, total: {self.current_worker_count}")
+            self.resource_monitor.record_scaling()
+            self.throughput_controller.note_step(self.current_worker_count - 1, self.current_worker_count)
+            self.logger.info(f"➕ Added worker {worker_id} (slot {self.worker_slots[worker_id]}), "
+                             f"total: {self.current_worker_count}")
+            self._rebalance_threads()
 
     def _remove_worker(self):
         """Signal one worker to stop (it will finish current job)"""
         with self.worker_lock:
             if self.current_worker_count > self.min_workers:
+                # Newest worker retires after its current job
+                retired = max(self.worker_slots)
+                del self.worker_slots[retired]
                 self.current_worker_count -= 1
-                self.gpu_monitor.record_scaling()
-                self.logger.info(f"➖ Reduced workers to {self.current_worker_count}")
+                self.resource_monitor.record_scaling()
+                self.throughput_controller.note_step(self.current_worker_count + 1, self.current_worker_count)
+                self.logger.info(f"➖ Reduced workers to {self.current_worker_count} (worker {retired} retiring)")
+                self._rebalance_threads()
+
+    def _rebalance_threads(self):
+        """
+        Re-pin running detections to their slot's core range for the new worker
+        count (thread pool sizes are fixed per process; new jobs get new sizes)
+        """
+        if self.thread_budget is None:
+            return
+        if not self.thread_budget.pin:
+            if self.current_worker_count > 0:
+                self.logger.debug(f"Thread budget: {self.thread_budget.describe(self.current_worker_count)}")
+            return
+        with self.active_jobs_lock:
+            running = [job for job in self.active_jobs.values() if job.run is not None]
+        for job in running:
+            budget = self.thread_budget.allocate(job.slot, self.current_worker_count)
+            if budget.cores and pin_process(job.run.process.pid, budget.cores):
+                self.logger.debug(f"[{job.camera_id}] Re-pinned to {budget.describe()}")
 
     def process_job(self, job: ProcessingJob) -> bool:
         """
@@ -680,58 +1188,161 @@ class ProcessingQueue:
         # Register job
         with self.active_jobs_lock:
             self.active_jobs[worker_id] = job
+        self.throughput_meter.job_started(worker_id)
+        processed_frames = 0
 
         try:
-            self.logger.info(f"[{job.camera_id}] START: {job.video_name}")
+            if not Path(job.video_path).exists():
+                self.logger.warning(f"[{job.camera_id}] MISSING: {job.video_name} (deleted before processing)")
+                # On a node the file may only be missing from this node's mount: let another node retry
+                self.job_store.fail(job.job_id, None, "video file not found",
+                                    retry=self.results_publisher is not None, worker_id=job.worker_id)
+                self.jobs_failed += 1
+                return False
+
+            detection_video = analytics_segment_for(job.video_path) if self.use_analytics_stream else None
+            if detection_video is not None:
+                verdict = validate_segment(detection_video)
+                if verdict['status'] not in PROCESSABLE_STATUSES:
+                    self.logger.warning(f"[{job.camera_id}] Analytics segment unusable ({verdict['reason']}), "
+                                        f"using archive stream")
+                    detection_video = None
+            stream_note = " [analytics stream]" if detection_video else ""
+            if job.plan_fps:
+                stream_note += f" [plan: {job.plan_fps:g} fps{', headless' if job.headless else ''}]"
+            self.logger.info(f"[{job.camera_id}] START: {job.video_name} (attempt {job.attempts}){stream_note}")
 
             # Build command
             cmd = [
                 "python3",
                 str(DETECTION_SCRIPT),
-                "--video", job.video_path
+                "--video", str(detection_video or job.video_path)
             ]
 
             if job.duration:
                 cmd.extend(["--duration", str(job.duration)])
 
+            if self.adaptive_fps:
+                cmd.append("--adaptive-fps")
+            if job.plan_fps:
+                cmd.extend(["--max-fps" if self.adaptive_fps else "--fps", f"{job.plan_fps:g}"])
+            if job.headless:
+                cmd.append("--headless")
+
+            extra_env = None
+            if self.thread_budget is not None:
+                budget = self.thread_budget.allocate(job.slot, self.current_worker_count)
+                cmd.extend(budget.detection_args())
+                extra_env = budget.env()
+                self.logger.debug(f"[{job.camera_id}] Thread budget: {budget.describe()}")
+
             if job.config_path:
-                # Check for camera-specific config
+                # Camera-specific config when present (passed explicitly; the detection
+                # script compiles and caches it per content hash and resolution)
                 camera_config = Path(job.config_path).parent / f"table_region_config_{job.camera_id}.json"
                 if camera_config.exists():
                     self.logger.debug(f"[{job.camera_id}] Using camera-specific config: {camera_config.name}")
+                    cmd.extend(["--config", str(camera_config)])
                 else:
                     self.logger.debug(f"[{job.camera_id}] Using default config: {Path(job.config_path).name}")
+                    cmd.extend(["--config", str(job.config_path)])
 
-            # Execute
+            # Execute (no timeout for long videos). Output is streamed by the
+            # DetectionRun reader threads; every HEARTBEAT_INTERVAL_SECONDS we
+            # refresh the claim and check the watchdog: progress lines keep a
+            # long video alive, a hung decoder stops them.
             start_time = time.time()
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=None  # No timeout for long videos
-            )
+            run = DetectionRun(cmd, extra_env)
+            job.run = run
+            stalled = False
+            while True:
+                returncode = run.wait(HEARTBEAT_INTERVAL_SECONDS)
+                if returncode is not None:
+                    break
+                if run.stalled_for() > self.stall_seconds:
+                    self.logger.error(
+                        f"[{job.camera_id}] HUNG: {job.video_name} | no progress for {run.stalled_for():.0f}s "
+                        f"(last: {run.describe_progress()}), killing"
+                    )
+                    returncode = run.kill()
+                    stalled = True
+                    break
+                if job.job_id is not None and not self.job_store.heartbeat(job.job_id, job.worker_id):
+                    self.logger.warning(
+                        f"[{job.camera_id}] Claim lost for {job.video_name} (heartbeat rejected)"
+                    )
+            run.finish()
             elapsed = time.time() - start_time
+            processed_frames = run.processed_frames
+            stderr = run.stderr_text()
+            if run.resumed_from is not None:
+                self.logger.info(f"[{job.camera_id}] RESUMED: {job.video_name} from checkpoint "
+                                 f"(frame {run.resumed_from})")
 
             # Log result
-            if result.returncode == 0:
+            if stalled:
+                retry = self.job_store.fail(
+                    job.job_id, returncode,
+                    f"stalled: no progress for {self.stall_seconds}s\n{stderr}", elapsed,
+                    worker_id=job.worker_id
+                )
+                self.logger.error(
+                    f"[{job.camera_id}] KILLED (stalled): {job.video_name} | "
+                    f"Duration: {elapsed:.1f}s | "
+                    f"Attempt {job.attempts}{' (will retry)' if retry else ' (giving up)'}"
+                )
+                if stderr:
+                    self.logger.error(f"[{job.camera_id}] Last stderr lines:\n{stderr}")
+                self.jobs_failed += 1
+                return False
+            elif returncode in (0, EXIT_SKIPPED) and not self._publish_results(job, returncode, elapsed):
+                self.jobs_failed += 1
+                return False
+            elif returncode == 0:
                 self.logger.info(
                     f"[{job.camera_id}] SUCCESS: {job.video_name} | "
-                    f"Duration: {elapsed:.1f}s"
+                    f"Duration: {elapsed:.1f}s | Frames: {processed_frames}"
                 )
+                self.job_store.complete(job.job_id, 0, elapsed, worker_id=job.worker_id)
+                self._mark_video_processed(job)
                 self.jobs_completed += 1
                 self.total_processing_time += elapsed
                 return True
+            elif returncode == EXIT_SKIPPED:
+                # Detection found an existing session for this video
+                self.logger.info(f"[{job.camera_id}] SKIPPED (already processed): {job.video_name}")
+                self.job_store.complete(job.job_id, EXIT_SKIPPED, elapsed, skipped=True,
+                                        worker_id=job.worker_id)
+                self._mark_video_processed(job)
+                self.jobs_skipped += 1
+                return True
+            elif returncode == EXIT_IN_PROGRESS:
+                retry = self.job_store.fail(job.job_id, returncode,
+                                            "session in progress in another process", elapsed,
+                                            worker_id=job.worker_id)
+                self.logger.warning(f"[{job.camera_id}] BUSY: {job.video_name} is being processed elsewhere"
+                                    f"{' (will retry)' if retry else ' (giving up)'}")
+                self.jobs_failed += 1
+                return False
             else:
+                retry = self.job_store.fail(job.job_id, returncode, stderr, elapsed,
+                                            worker_id=job.worker_id)
                 self.logger.error(
                     f"[{job.camera_id}] FAILED: {job.video_name} | "
-                    f"Duration: {elapsed:.1f}s"
+                    f"Duration: {elapsed:.1f}s | "
+                    f"Attempt {job.attempts}{' (will retry)' if retry else ' (giving up)'}"
                 )
-                self.logger.error(f"[{job.camera_id}] Error output: {result.stderr}")
+                self.logger.error(f"[{job.camera_id}] Error output (last {STDERR_TAIL_LINES} lines): {stderr}")
                 self.jobs_failed += 1
                 return False
 
         except Exception as e:
             self.logger.error(f"[{job.camera_id}] EXCEPTION: {job.video_name} | {e}")
+            if job.job_id is not None:
+                try:
+                    self.job_store.fail(job.job_id, None, str(e), worker_id=job.worker_id)
+                except WorkQueueError as queue_error:
+                    self.logger.error(f"[{job.camera_id}] Could not report failure: {queue_error}")
             self.jobs_failed += 1
             return False
 
@@ -739,6 +1350,31 @@ class ProcessingQueue:
             # Unregister job
             with self.active_jobs_lock:
                 self.active_jobs.pop(worker_id, None)
+            self.throughput_meter.job_finished(worker_id, processed_frames)
+
+    def _publish_results(self, job: ProcessingJob, returncode: int, elapsed: float) -> bool:
+        """
+        Node mode: upload this video's finished session(s) to the coordinator,
+        which completes the job in the same transaction while our lease holds.
+        Returns False if the upload did not go through (job failed, retried) or
+        the lease was lost (the new owner's run counts, ours is discarded).
+        """
+        if self.results_publisher is None:
+            return True
+        try:
+            counts = self.results_publisher(job.job_id, job.worker_id, job.camera_id, job.video_name,
+                                            returncode, elapsed, returncode == EXIT_SKIPPED)
+            self.logger.debug(f"[{job.camera_id}] Published results for {job.video_name}: {counts}")
+            return True
+        except LeaseLostError as e:
+            self.logger.warning(f"[{job.camera_id}] Claim lost for {job.video_name}, results not ingested: {e}")
+            return False
+        except (WorkQueueError, sqlite3.Error) as e:
+            retry = self.job_store.fail(job.job_id, None, f"results upload failed: {e}", elapsed,
+                                        worker_id=job.worker_id)
+            self.logger.error(f"[{job.camera_id}] UPLOAD FAILED: {job.video_name} | {e}"
+                              f"{' (will retry)' if retry else ' (giving up)'}")
+            return False
 
     def _worker_thread(self, worker_id: int):
         """Worker thread that processes jobs from queue"""
@@ -746,100 +1382,116 @@ class ProcessingQueue:
 
         while not self.stop_event.is_set():
             try:
-                # Check if this worker should exit (over limit)
-                if worker_id >= self.current_worker_count:
+                # Check if this worker should exit (retired by a scale-down)
+                slot = self.worker_slots.get(worker_id)
+                if slot is None:
                     self.logger.info(f"[Worker {worker_id}] Exiting (over limit)")
                     break
 
-                # Get next job (with timeout to check shutdown flag)
-                try:
-                    job = self.job_queue.get(timeout=5)
-                except queue.Empty:
+                # Claim next job (idle workers poll every 5s to check shutdown flag)
+                job = self.claim_job(f"worker-{worker_id}")
+                if job is None:
+                    self.stop_event.wait(5)
                     continue
 
-                # Check again if we should still be running
-                if worker_id >= self.current_worker_count:
-                    # Put job back
-                    self.job_queue.put(job)
-                    self.logger.info(f"[Worker {worker_id}] Exiting (over limit)")
-                    break
-
                 # Process job
+                job.slot = slot
                 self.process_job(job)
-                self.job_queue.task_done()
 
             except Exception as e:
                 self.logger.error(f"[Worker {worker_id}] Error: {e}")
 
         self.logger.info(f"[Worker {worker_id}] Stopped")
 
-    def _gpu_monitoring_thread(self):
-        """Monitor GPU and adjust worker count dynamically"""
-        self.logger.info("GPU monitoring thread started")
+    def _scale_by_throughput(self, metrics: Optional[Dict], status: Dict):
+        """Hill-climb on measured frames/s; temperature/memory limits are hard guards"""
+        workers = self.current_worker_count
+        if self.resource_monitor.exceeds_hard_limits(metrics, workers):
+            self.logger.warning(f"⚠️  Scaling DOWN (hard limit): {self.resource_monitor.describe(metrics)}")
+            self._remove_worker()
+            return
+
+        step = self.throughput_controller.decide(workers, status['jobs_waiting'], self.max_workers)
+        if step > 0:
+            if not self.resource_monitor.allows_scale_up(metrics):
+                self.logger.info(f"Throughput suggests {workers + 1} workers, held by guard "
+                                 f"({self.resource_monitor.describe(metrics)})")
+                self.throughput_controller.restart()
+                return
+            self._add_worker()
+        elif step < 0:
+            self._remove_worker()
+
+    def _resource_monitoring_thread(self):
+        """Monitor host resources and adjust worker count dynamically"""
+        self.logger.info(f"Resource monitoring thread started "
+                         f"(backend: {self.resource_monitor.name}, scaling: {self.scaling_mode})")
 
         while not self.stop_event.is_set():
             try:
                 # Get metrics
-                metrics = self.gpu_monitor.get_metrics()
+                metrics = self.resource_monitor.get_metrics()
 
                 if metrics:
                     # Log current state
-                    self.gpu_monitor.log_metrics(metrics)
-
-                    # Log queue status
-                    status = self.get_queue_status()
-                    self.logger.info(
-                        f"Queue: {status['jobs_running']} running | "
-                        f"{status['jobs_waiting']} waiting | "
-                        f"{status['jobs_completed']} completed | "
-                        f"{status['jobs_failed']} failed | "
-                        f"Workers: {status['current_workers']}/{status['max_workers']}"
+                    self.resource_monitor.log_metrics(metrics)
+
+                # Log queue status
+                status = self.get_queue_status()
+                self.logger.info(
+                    f"Queue: {status['jobs_running']} running | "
+                    f"{status['jobs_waiting']} waiting | "
+                    f"{status['jobs_completed']} completed | "
+                    f"{status['jobs_failed']} failed | "
+                    f"Workers: {status['current_workers']}/{status['max_workers']}"
+                )
+                with self.active_jobs_lock:
+                    running = [job for job in self.active_jobs.values() if job.run is not None]
+                if running:
+                    self.logger.info("Progress: " + " | ".join(
+                        f"{job.camera_id} {job.run.describe_progress()}" for job in running
+                    ))
+
+                # Emergency check
+                if metrics and self.resource_monitor.is_emergency(metrics):
+                    self.logger.error(
+                        f"🚨 EMERGENCY: {self.resource_monitor.describe(metrics)}! "
+                        f"Reducing to minimum workers..."
                     )
+                    # Reduce to minimum
+                    while self.current_worker_count > self.min_workers:
+                        self._remove_worker()
+                    # Wait 2 minutes for cooldown
+                    self.logger.info("Waiting 120 seconds for cooldown...")
+                    time.sleep(120)
+                    continue
 
-                    # Emergency check
-                    if self.gpu_monitor.is_emergency(metrics):
-                        self.logger.error(
-                            f"🚨 EMERGENCY: GPU temperature {metrics['temperature']}°C! "
-                            f"Reducing to minimum workers..."
-                        )
-                        # Reduce to minimum
-                        while self.current_worker_count > self.min_workers:
-                            self._remove_worker()
-                        # Wait 2 minutes for cooldown
-                        self.logger.info("Waiting 120 seconds for GPU cooldown...")
-                        time.sleep(120)
-                        continue
+                if self.scaling_mode == 'throughput':
+                    self._scale_by_throughput(metrics, status)
 
+                elif metrics:
                     # Scale down check (aggressive)
-                    if self.gpu_monitor.should_scale_down(metrics, self.current_worker_count):
-                        self.logger.warning(
-                            f"⚠️  Scaling DOWN: Temp={metrics['temperature']}°C, "
-                            f"Util={metrics['gpu_utilization']}%, "
-                            f"Free Mem={metrics['memory_free_gb']:.1f}GB"
-                        )
+                    if self.resource_monitor.should_scale_down(metrics, self.current_worker_count):
+                        self.logger.warning(f"⚠️  Scaling DOWN: {self.resource_monitor.describe(metrics)}")
                         self._remove_worker()
 
                     # Scale up check (conservative)
-                    elif self.gpu_monitor.should_scale_up(metrics, self.current_worker_count):
-                        self.logger.info(
-                            f"✅ Scaling UP: Conditions favorable "
-                            f"(Temp={metrics['temperature']}°C, "
-                            f"Util={metrics['gpu_utilization']}%, "
-                            f"Free Mem={metrics['memory_free_gb']:.1f}GB)"
-                        )
+                    elif self.resource_monitor.should_scale_up(metrics, self.current_worker_count):
+                        self.logger.info(f"✅ Scaling UP: Conditions favorable "
+                                         f"({self.resource_monitor.describe(metrics)})")
                         self._add_worker()
 
                 # Wait 30 seconds before next check
                 time.sleep(GPU_CHECK_INTERVAL)
 
             except Exception as e:
-                self.logger.error(f"GPU monitoring error: {e}")
+                self.logger.error(f"Resource monitoring error: {e}")
                 time.sleep(GPU_CHECK_INTERVAL)
 
-        self.logger.info("GPU monitoring thread stopped")
+        self.logger.info("Resource monitoring thread stopped")
 
     def start_workers(self, initial_workers: int = 1):
-        """Start initial worker threads and GPU monitoring"""
+        """Start initial worker threads and resource monitoring"""
         self.start_time = time.time()
         self.logger.info(f"Starting with {initial_workers} worker thread(s)")
 
@@ -847,24 +1499,49 @@ class ProcessingQueue:
         for i in range(initial_workers):
             self._add_worker()
 
-        # Start GPU monitoring thread
-        self.gpu_monitoring_thread = threading.Thread(
-            target=self._gpu_monitoring_thread,
-            name="GPU-Monitor",
+        # Start resource monitoring thread
+        self.monitoring_thread = threading.Thread(
+            target=self._resource_monitoring_thread,
+            name="Resource-Monitor",
             daemon=True
         )
-        self.gpu_monitoring_thread.start()
+        self.monitoring_thread.start()
 
         return self.worker_threads
 
-    def wait_for_completion(self):
-        """Wait for all jobs to complete"""
-        self.job_queue.join()
+    def wait_for_completion(self, discover_fn=None, poll_seconds: int = NEAR_REALTIME_POLL_SECONDS,
+                            run_until: Optional[datetime] = None):
+        """
+        Wait until the job table has no pending/running jobs for our cameras
+
+        Near-real-time mode: discover_fn() is called every poll_seconds until
+        run_until; after that, the remaining queue is drained and we return.
+        """
+        last_discovery = time.time()
+        while True:
+            continuous = discover_fn is not None and (run_until is None or datetime.now() < run_until)
+
+            if continuous and time.time() - last_discovery >= poll_seconds:
+                try:
+                    discover_fn()
+                except Exception as e:
+                    self.logger.error(f"Discovery error: {e}")
+                last_discovery = time.time()
+
+            with self.active_jobs_lock:
+                active_count = len(self.active_jobs)
+            if not continuous and active_count == 0:
+                try:
+                    if self.job_store.outstanding_count(self.camera_filter) == 0:
+                        break
+                except WorkQueueError as e:
+                    self.logger.warning(f"Queue status unavailable: {e}")
+            time.sleep(5)
         self.stop_event.set()
 
-        # Wait for GPU monitoring thread to stop
-        if self.gpu_monitoring_thread and self.gpu_monitoring_thread.is_alive():
-            self.gpu_monitoring_thread.join(timeout=5)
+        # Wait for resource monitoring thread to stop
+        if self.monitoring_thread and self.monitoring_thread.is_alive():
+            self.monitoring_thread.join(timeout=5)
 
     def get_statistics(self) -> Dict:
         """Get final processing statistics"""
@@ -875,6 +1552,7 @@ class ProcessingQueue:
             'total_jobs': total_jobs,
             'jobs_completed': self.jobs_completed,
             'jobs_failed': self.jobs_failed,
+            'jobs_skipped': self.jobs_skipped,
             'total_time': total_time,
             'avg_time_per_job': self.total_processing_time / self.jobs_completed if self.jobs_completed > 0 else 0,
             'success_rate': (self.jobs_completed / total_jobs * 100) if total_jobs > 0 else 0
@@ -887,50 +1565,108 @@ class ProcessingQueue:
 # MAIN PROCESSING ORCHESTRATOR
 # ============================================================================
 
-def process_with_queue(videos_by_camera: Dict[str, List[str]], logger: logging.Logger,
+def process_with_queue(job_store: ProcessingJobStore, logger: logging.Logger,
                       duration: Optional[int] = None, config_path: Optional[str] = None,
                       max_workers: int = DEFAULT_MAX_WORKERS,
-                      min_workers: int = DEFAULT_MIN_WORKERS):
+                      min_workers: int = DEFAULT_MIN_WORKERS,
+                      camera_filter: Optional[List[str]] = None,
+                      manifest: Optional[SegmentManifest] = None,
+                      discover_fn=None, poll_seconds: int = NEAR_REALTIME_POLL_SECONDS,
+                      run_until: Optional[datetime] = None,
+                      max_load_per_cpu: Optional[float] = None,
+                      use_analytics_stream: bool = True,
+                      scaling_mode: str = 'throughput',
+                      resource_monitor_backend: str = 'auto',
+                      deadline: Optional[datetime] = None,
+                      stall_seconds: int = JOB_STALL_SECONDS,
+                      thread_budget: Optional[ThreadBudgetPlanner] = None,
+                      adaptive_fps: bool = False):
     """
-    Process videos using dynamic GPU-aware worker scaling
+    Process pending jobs using dynamic GPU-aware worker scaling
+
+    With discover_fn (near-real-time mode) the queue keeps refilling until run_until.
+    With a deadline (batch mode) the pending jobs are planned to finish before it.
+    thread_budget in 'auto' mode only applies when scaling on the CPU backend.
     """
-    if not videos_by_camera:
+    node_mode = isinstance(job_store, RemoteJobStore)
+    plan = None
+    if deadline is not None and node_mode:
+        logger.warning("--deadline is ignored on a processing node (plan on the coordinator)")
+    elif deadline is not None and discover_fn is None:
+        plan = plan_run(job_store, logger, deadline, max_workers, camera_filter)
+
+    try:
+        pending_jobs = job_store.list_jobs('pending', camera_filter)
+    except WorkQueueError as e:
+        logger.error(f"Work queue unavailable: {e}")
+        return
+    if discover_fn is None and not pending_jobs and job_store.outstanding_count(camera_filter) == 0:
         logger.error("No videos to process")
         return
 
-    # Initialize GPU monitor
-    gpu_monitor = DynamicGPUMonitor(logger, min_workers, max_workers)
-
-    # Initialize processing queue
-    processing_queue = ProcessingQueue(logger, gpu_monitor, max_workers)
-
-    # Create jobs (priority = timestamp, older videos first)
-    total_jobs = 0
-    for camera_id, video_paths in videos_by_camera.items():
-        for video_path in video_paths:
-            timestamp = extract_timestamp(os.path.basename(video_path))
-            priority = int(timestamp.replace('_', ''))  # Convert to int for priority
-
-            job = ProcessingJob(camera_id, video_path, priority, duration, config_path)
-            processing_queue.add_job(job)
-            total_jobs += 1
+    # Initialize resource monitor (GPU, or CPU/RAM on hosts without one)
+    resource_monitor = create_resource_monitor(resource_monitor_backend, logger, min_workers, max_workers)
+
+    # Initialize processing queue (workers claim from the job table)
+    processing_queue = ProcessingQueue(logger, resource_monitor, job_store, max_workers,
+                                       camera_filter, duration, config_path, manifest)
+    processing_queue.max_load_per_cpu = max_load_per_cpu
+    processing_queue.use_analytics_stream = use_analytics_stream
+    processing_queue.scaling_mode = scaling_mode
+    processing_queue.stall_seconds = stall_seconds
+    if thread_budget is not None and thread_budget.mode == 'auto' and resource_monitor.name == 'gpu':
+        thread_budget = None
+    processing_queue.thread_budget = thread_budget
+    processing_queue.adaptive_fps = adaptive_fps
+    if node_mode:
+        processing_queue.results_publisher = job_store.publish_results
+
+    jobs_by_camera = defaultdict(list)
+    for job in pending_jobs:
+        jobs_by_camera[job['camera_id']].append(job['video_file'])
 
     logger.info("="*80)
     logger.info("MULTI-CAMERA VIDEO PROCESSING WITH DYNAMIC GPU WORKER SCALING")
     logger.info("="*80)
-    logger.info(f"Cameras: {len(videos_by_camera)}")
-    logger.info(f"Total jobs: {total_jobs}")
+    logger.info(f"Cameras: {len(jobs_by_camera)}")
+    logger.info(f"Pending jobs: {len(pending_jobs)}")
+    if node_mode:
+        logger.info(f"Work queue: {job_store.url} (processing node, results published to the coordinator)")
     logger.info(f"Worker range: {min_workers} - {max_workers} (starts with {min_workers})")
-    logger.info(f"GPU thresholds: Scale-up <{TEMP_SCALE_UP_THRESHOLD}°C, Scale-down >{TEMP_SCALE_DOWN_THRESHOLD}°C, Emergency >={TEMP_EMERGENCY_THRESHOLD}°C")
+    logger.info(f"Resource monitor: {resource_monitor.name} "
+                f"({'available' if resource_monitor.is_available else 'no metrics - fixed worker count'})")
+    if resource_monitor.TEMP_SCALE_UP_THRESHOLD is not None:
+        logger.info(f"Thermal thresholds: Scale-up <{resource_monitor.TEMP_SCALE_UP_THRESHOLD}°C, "
+                    f"Scale-down >{resource_monitor.TEMP_SCALE_DOWN_THRESHOLD}°C, "
+                    f"Emergency >={resource_monitor.TEMP_EMERGENCY_THRESHOLD}°C")
+    if scaling_mode == 'throughput':
+        logger.info(f"Scaling: throughput hill-climb (+1 worker must add >={THROUGHPUT_MIN_GAIN:.0%} frames/s, "
+                    f"{THROUGHPUT_WINDOW_SECONDS}s windows, {THROUGHPUT_HOLD_SECONDS // 60} min hold at the knee)")
+    else:
+        logger.info(f"Scaling: GPU thresholds ({SCALE_COOLDOWN_SECONDS}s cooldown)")
     if duration:
         logger.info(f"Processing duration: {duration}s per video")
+    logger.info(f"Detection input: {'analytics sub-stream when recorded' if use_analytics_stream else 'archive stream'}")
+    if adaptive_fps:
+        logger.info("Sampling: event-adaptive (--adaptive-fps, bounds from cameras_config.json adaptive_fps)")
+    if deadline is not None:
+        logger.info(f"Deadline: {deadline.strftime('%Y-%m-%d %H:%M:%S')}")
+    if thread_budget is not None:
+        logger.info(f"Thread budget: {thread_budget.describe(min_workers)} (re-split as workers scale)")
+    logger.info(f"Watchdog: kill + re-queue after {stall_seconds}s without progress "
+                f"(max {job_store.max_attempts} attempts per job)")
+    if discover_fn is not None:
+        logger.info(f"Near-real-time mode: polling every {poll_seconds}s until "
+                    f"{run_until.strftime('%Y-%m-%d %H:%M:%S') if run_until else 'stopped'}")
+        if max_load_per_cpu is not None:
+            logger.info(f"Load budget: {max_load_per_cpu:.2f} per CPU (no new claims above)")
     logger.info("="*80)
 
     # Show job details
-    for camera_id, video_paths in videos_by_camera.items():
-        logger.info(f"{camera_id}: {len(video_paths)} video(s)")
-        for video_path in video_paths:
-            logger.debug(f"   - {os.path.basename(video_path)}")
+    for camera_id, video_files in jobs_by_camera.items():
+        logger.info(f"{camera_id}: {len(video_files)} video(s)")
+        for video_file in video_files:
+            logger.debug(f"   - {video_file}")
 
     logger.info("="*80)
     logger.info("Starting processing...")
@@ -939,8 +1675,8 @@ def process_with_queue(videos_by_camera: Dict[str, List[str]], logger: logging.L
     # Start worker threads (includes GPU monitoring)
     worker_threads = processing_queue.start_workers(initial_workers=min_workers)
 
-    # Wait for all jobs to complete
-    processing_queue.wait_for_completion()
+    # Wait for all jobs to complete (keeps discovering in near-real-time mode)
+    processing_queue.wait_for_completion(discover_fn, poll_seconds, run_until)
 
     # Get statistics
     stats = processing_queue.get_statistics()
@@ -951,19 +1687,30 @@ def process_with_queue(videos_by_camera: Dict[str, List[str]], logger: logging.L
     logger.info(f"Total jobs: {stats['total_jobs']}")
     logger.info(f"Completed: {stats['jobs_completed']}")
     logger.info(f"Failed: {stats['jobs_failed']}")
+    logger.info(f"Skipped (already processed): {stats['jobs_skipped']}")
+    try:
+        logger.info(f"Job table: {job_store.status_counts()}")
+    except WorkQueueError as e:
+        logger.warning(f"Job table unavailable: {e}")
     logger.info(f"Success rate: {stats['success_rate']:.1f}%")
     logger.info(f"Total time: {stats['total_time']:.1f}s ({stats['total_time']/60:.1f} minutes)")
     logger.info(f"Avg time per job: {stats['avg_time_per_job']:.1f}s")
     logger.info("="*80)
 
+    # Deadline plan vs what actually happened
+    if plan is not None:
+        plan_file = report_plan(job_store, logger, plan, PLANS_DIR)
+        if plan_file:
+            logger.info(f"Plan report: {plan_file}")
+
     # Log final GPU metrics
-    final_metrics = gpu_monitor.get_metrics()
+    final_metrics = resource_monitor.get_metrics()
     if final_metrics:
-        logger.info("Final GPU state:")
-        gpu_monitor.log_metrics(final_metrics)
+        logger.info(f"Final {resource_monitor.name.upper()} state:")
+        resource_monitor.log_metrics(final_metrics)
 
     # Cleanup GPU monitor
-    gpu_monitor.shutdown()
+    resource_monitor.shutdown()
 
 
 # ============================================================================
@@ -992,18 +1739,32 @@ Examples:
   # Enable debug logging
   python3 process_videos_orchestrator.py --log-level DEBUG
 
+  # Near-real-time: process segments 2 min after capture closes them, until 22:05
+  python3 process_videos_orchestrator.py --near-realtime --lag-seconds 120 \
+      --until 2025-12-10T22:05:00 --max-workers 1 --nice 10 --max-load 0.75
+
+  # Extra processing node pulling from a coordinator (work_queue.py serve)
+  python3 process_videos_orchestrator.py --queue http://coordinator:8765 --queue-token secret \
+      --path-map /home/smarticeadmin/videos=/mnt/restaurant/videos
+
 Workflow:
-1. Script scans videos/ folder for all .mp4 files
+1. Reads unprocessed segments from the capture manifest (videos table);
+   lists changed videos/ camera folders and enqueues files the manifest doesn't have
 2. Filters videos by date (only YESTERDAY and earlier, skips TODAY)
-3. Checks database for already processed videos (skips duplicates)
-4. Groups videos by camera_id (extracted from filename)
-5. Creates priority queue (older videos first)
+3. Enqueues new videos in processing_jobs (UNIQUE camera_id + video_file)
+4. Failed jobs with attempts left are re-queued (max 3 attempts)
+5. Workers atomically claim jobs (older videos first) and heartbeat while running
 6. Starts with 1 worker thread
-7. GPU monitoring thread checks metrics every 30s
-8. Dynamically scales workers based on real-time GPU health:
+7. Resource monitoring thread checks metrics every 30s (GPU, or CPU/RAM via
+   /proc when no GPU answers; --resource-monitor gpu|cpu forces a backend)
+8. Dynamically scales workers on measured throughput (--scaling throughput, default):
+   - Measure aggregate processed frames/s for 2+ min after each step
+   - Keep adding workers while one more adds >=5%; otherwise step back, hold 15 min
+   - Hard guards: never add above 70°C or below 2GB free, shed above 75°C or below 1GB
+   - Emergency stop: temp >=80°C (reduce to minimum, wait 2 mins)
+   --scaling thresholds (v3.0.0 policy):
    - Scale UP if: temp <70°C AND util <70% AND mem >2GB (conservative)
    - Scale DOWN if: temp >75°C OR util >85% OR mem <1GB (aggressive)
-   - Emergency stop: temp >=80°C (reduce to minimum, wait 2 mins)
    - Cooldown: 60 seconds between scaling decisions
 9. Logs all events to logs/processing_YYYYMMDD_HHMMSS.log
 10. Generates statistics report at completion
@@ -1014,11 +1775,11 @@ Date Filtering (v3.1.0):
 - Extracts date from folder structure: videos/YYYYMMDD/camera_id/
 - Prevents errors from processing 18GB+ incomplete videos
 
-Duplicate Prevention (v3.1.0):
-- Queries local database (db/detection_data.db)
-- Checks videos table for is_processed = 1
-- Skips videos already successfully processed
-- Prevents wasted GPU cycles on re-processing
+Duplicate Prevention (v3.2.0):
+- processing_jobs table in local database (db/detection_data.db)
+- One row per (camera_id, video_file); re-discovery is a no-op
+- Atomic claims: concurrent workers/orchestrators never share a video
+- Stale claims (no heartbeat for 5 min) are reclaimed automatically
 
 Video Naming Convention:
   camera_{id}_{date}_{time}.mp4
@@ -1040,7 +1801,7 @@ Log Files:
     parser.add_argument("--config", default=str(SCRIPT_DIR.parent / "config" / "table_region_config.json"),
                        help="Path to ROI config file")
     parser.add_argument("--list", action="store_true",
-                       help="List all discovered videos and exit")
+                       help="List pending jobs (after discovery) and exit")
     parser.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS,
                        help=f"Maximum worker threads (default: {DEFAULT_MAX_WORKERS})")
     parser.add_argument("--min-workers", type=int, default=DEFAULT_MIN_WORKERS,
@@ -1048,6 +1809,61 @@ Log Files:
     parser.add_argument("--log-level", default="INFO",
                        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
                        help="Logging level (default: INFO)")
+    parser.add_argument("--discovery", default="auto",
+                       choices=["auto", "manifest", "filesystem"],
+                       help="Video discovery source: auto (manifest + filesystem for unregistered files), "
+                            "manifest (videos table only), filesystem (folder scan only)")
+
+    parser.add_argument("--near-realtime", action="store_true",
+                       help="Keep processing segments shortly after capture closes them (manifest only)")
+    parser.add_argument("--lag-seconds", type=int, default=NEAR_REALTIME_LAG_SECONDS,
+                       help=f"Near-real-time: minimum age of a closed segment (default: {NEAR_REALTIME_LAG_SECONDS})")
+    parser.add_argument("--poll-seconds", type=int, default=NEAR_REALTIME_POLL_SECONDS,
+                       help=f"Near-real-time: manifest poll interval (default: {NEAR_REALTIME_POLL_SECONDS})")
+    parser.add_argument("--until",
+                       help="Near-real-time: stop discovering at this ISO time (e.g. 2025-12-10T22:05:00), then drain")
+    parser.add_argument("--max-load", type=float,
+                       help="Do not claim new jobs while 1-min load average per CPU exceeds this")
+    parser.add_argument("--nice", type=int, default=0,
+                       help="Lower CPU priority of this process and its workers (0-19)")
+    parser.add_argument("--stream", default="analytics", choices=["analytics", "archive"],
+                       help="Detection input: analytics sub-stream segment when one was recorded (default), "
+                            "or always the archive segment")
+    parser.add_argument("--resource-monitor", default="auto", choices=["auto", "gpu", "cpu"],
+                       help="Scaling metrics backend: auto (GPU if available, else CPU/RAM), "
+                            "gpu (pynvml/nvidia-smi) or cpu (/proc load, utilisation, memory, pressure)")
+    parser.add_argument("--scaling", default="throughput", choices=["throughput", "thresholds"],
+                       help="Worker scaling: hill-climb on measured frames/s with thermal guards (default), "
+                            "or fixed GPU temperature/utilisation thresholds")
+    parser.add_argument("--stall-seconds", type=int, default=JOB_STALL_SECONDS,
+                       help=f"Kill and re-queue a job with no progress for this long (default: {JOB_STALL_SECONDS})")
+    parser.add_argument("--max-attempts", type=int, default=MAX_JOB_ATTEMPTS,
+                       help=f"Attempts per job before it is marked failed (default: {MAX_JOB_ATTEMPTS})")
+    parser.add_argument("--deadline",
+                       help="Finish by this ISO datetime (e.g. 2026-10-19T06:00): degrade or defer "
+                            "low-priority cameras if the projected run would overshoot (batch mode)")
+    parser.add_argument("--adaptive-fps", action="store_true",
+                       help="Detection samples at a low base rate while states are stable and speeds up "
+                            "around transitions (per-camera bounds: cameras_config.json adaptive_fps)")
+    parser.add_argument("--thread-budget", default="auto", choices=["auto", "on", "off"],
+                       help="Split CPU cores between detection workers (explicit torch/OpenCV/OMP "
+                            "thread counts): auto = on the CPU resource monitor only (default)")
+    parser.add_argument("--pin-cores", action="store_true",
+                       help="Thread budget: pin each worker slot to its own core range")
+    parser.add_argument("--reserve-cores", type=int, default=DEFAULT_RESERVE_CORES,
+                       help=f"Thread budget: cores left for capture/OS (default: {DEFAULT_RESERVE_CORES})")
+    parser.add_argument("--torch-threads", type=int,
+                       help="Thread budget: fixed torch intra-op threads per worker (default: cores / workers)")
+    parser.add_argument("--cv-threads", type=int,
+                       help="Thread budget: fixed OpenCV threads per worker (default: cores / workers)")
+    parser.add_argument("--queue",
+                       help="Run as a processing node: claim jobs from this coordinator URL "
+                            "(python3 work_queue.py serve) instead of the local job table")
+    parser.add_argument("--queue-token", default=os.environ.get("WORK_QUEUE_TOKEN"),
+                       help="Shared secret for --queue (default: $WORK_QUEUE_TOKEN)")
+    parser.add_argument("--path-map", action="append", metavar="COORD=LOCAL",
+                       help="Rewrite coordinator video path prefix COORD to LOCAL (shared storage "
+                            "mounted elsewhere on this node); repeatable")
 
     args = parser.parse_args()
 
@@ -1061,37 +1877,121 @@ Log Files:
     videos_dir = Path(args.videos_dir)
     config_path = args.config
 
-    # Discover videos (with date filtering and duplicate checking)
-    logger.info(f"Scanning for videos in: {videos_dir}")
-    videos_by_camera = discover_videos(videos_dir, args.cameras, logger)
-
-    if not videos_by_camera:
-        logger.error("No videos found")
+    # Resource budget: niceness is inherited by the detection subprocesses
+    if args.nice > 0 and hasattr(os, "nice"):
+        os.nice(args.nice)
+        logger.info(f"Running with nice +{args.nice}")
+
+    thread_budget = None
+    if args.thread_budget != "off":
+        thread_budget = ThreadBudgetPlanner(args.thread_budget, args.pin_cores, args.reserve_cores,
+                                            args.torch_threads, args.cv_threads)
+
+    run_until = datetime.fromisoformat(args.until) if args.until else None
+    deadline = datetime.fromisoformat(args.deadline) if args.deadline else None
+    if args.near_realtime:
+        args.discovery = "manifest"
+        if args.max_load is None:
+            args.max_load = NEAR_REALTIME_MAX_LOAD
+
+    # Processing node: the coordinator owns discovery, planning and re-queueing
+    if args.queue:
+        try:
+            path_maps = parse_path_maps(args.path_map)
+        except ValueError as e:
+            logger.error(str(e))
+            return
+        job_store = RemoteJobStore(args.queue, args.queue_token, path_maps,
+                                   DATABASE_PATH, args.max_attempts)
+        logger.info(f"Processing node of {args.queue}"
+                    + "".join(f" | {source} -> {target}" for source, target in path_maps))
+        if args.list:
+            print(f"\nCoordinator job table: {job_store.status_counts()}\n")
+            return
+        start_time = datetime.now()
+        process_with_queue(job_store, logger, args.duration, config_path, args.max_workers,
+                           args.min_workers, args.cameras, None, None, args.poll_seconds, None,
+                           args.max_load, args.stream == "analytics", args.scaling,
+                           args.resource_monitor, deadline, args.stall_seconds, thread_budget,
+                           args.adaptive_fps)
+        total_duration = (datetime.now() - start_time).total_seconds()
+        logger.info(f"Total session time: {total_duration:.1f}s ({total_duration/60:.1f} minutes)")
+        logger.info(f"Log file: {log_file}")
         return
 
+    # Job table (claims, dedup, retries)
+    job_store = ProcessingJobStore(DATABASE_PATH, max_attempts=args.max_attempts)
+    requeued = job_store.requeue_failed()
+    if requeued:
+        logger.info(f"Re-queued {requeued} failed job(s) with attempts remaining")
+    undeferred = job_store.reset_plans()
+    if undeferred:
+        logger.info(f"Re-queued {undeferred} job(s) deferred by the last deadline plan")
+
+    # Discover videos (with date filtering; dedup via UNIQUE key)
+    manifest = None
+    if args.discovery in ("auto", "manifest"):
+        try:
+            manifest = SegmentManifest(DATABASE_PATH)
+            discover_from_manifest(manifest, job_store, args.cameras, logger,
+                                   args.lag_seconds if args.near_realtime else None)
+        except sqlite3.Error as e:
+            logger.error(f"Segment manifest unavailable: {e}")
+
+    if args.discovery in ("auto", "filesystem"):
+        logger.info(f"Scanning for videos in: {videos_dir}")
+        discover_videos(videos_dir, job_store, args.cameras, logger, manifest=manifest)
+
     # List mode
     if args.list:
-        print(f"\n📹 Discovered Videos:")
-        for camera_id, video_paths in videos_by_camera.items():
-            print(f"\n{camera_id}: {len(video_paths)} video(s)")
-            for video_path in video_paths:
-                video_name = os.path.basename(video_path)
+        pending_jobs = job_store.list_jobs('pending', args.cameras)
+        jobs_by_camera = defaultdict(list)
+        for job in pending_jobs:
+            jobs_by_camera[job['camera_id']].append(job['video_file'])
+
+        print(f"\n📹 Pending Jobs:")
+        for camera_id, video_files in jobs_by_camera.items():
+            print(f"\n{camera_id}: {len(video_files)} video(s)")
+            for video_name in video_files:
                 timestamp = extract_timestamp(video_name)
                 print(f"   {timestamp} - {video_name}")
-        print()
+        print(f"\nJob table: {job_store.status_counts()}\n")
         return
 
     # Process with queue
     start_time = datetime.now()
     logger.info(f"Session start: {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
 
+    if args.near_realtime:
+        if manifest is None:
+            logger.error("Near-real-time mode requires the segment manifest")
+            return
+
+        def discover_fn():
+            discover_from_manifest(manifest, job_store, args.cameras, logger, args.lag_seconds)
+    else:
+        discover_fn = None
+
     process_with_queue(
-        videos_by_camera,
+        job_store,
         logger,
         args.duration,
         config_path,
         args.max_workers,
-        args.min_workers
+        args.min_workers,
+        args.cameras,
+        manifest,
+        discover_fn,
+        args.poll_seconds,
+        run_until,
+        args.max_load,
+        args.stream == "analytics",
+        args.scaling,
+        args.resource_monitor,
+        deadline,
+        args.stall_seconds,
+        thread_budget,
+        args.adaptive_fps
     )
 
     end_time = datetime.now()
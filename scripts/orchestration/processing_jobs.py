@@ -0,0 +1,649 @@
+#!/usr/bin/env python3
+"""
+Processing Job Store - Atomic Job-Claim Table for Video Processing
+Version: 1.3.0
+Created: 2026-10-18
+Modified: 2026-10-18 - complete_leased(): completion inside the caller's transaction, only
+          while the worker's lease is live (work_queue.py /results)
+Modified: 2026-10-18 - Leases: complete()/fail() take the claiming worker_id and only
+          apply while that worker still holds the job (multi-node work_queue.py)
+Modified: 2026-10-18 - Deadline plans: plan_mode/plan_fps columns, 'deferred' status,
+          history queries for deadline_planner.py
+
+Purpose:
+- Replace "walk videos/ + diff against every processed video_file" discovery
+- One row per (camera_id, video_file) - UNIQUE key makes enqueue idempotent
+- Workers claim jobs atomically (BEGIN IMMEDIATE), heartbeat while running,
+  then mark them done / skipped / failed
+- Stale claims (worker or orchestrator crashed) are reclaimed automatically
+
+Lifecycle:
+    pending --claim--> running --complete--> done | skipped
+       |                  |  \\--fail------> pending (retry) | failed
+       |                  \\--heartbeat stale--> reclaimed by next claim
+       \\--plan: deferred--> deferred --reset_plans (next run)--> pending
+
+Why:
+- get_processed_videos() loaded every video_file ever processed into a set,
+  so discovery cost grew with months of history
+- Concurrent workers/orchestrators could process the same file twice
+- Now discovery cost is O(new files) and dedup is a unique-index lookup
+
+Usage:
+    from processing_jobs import ProcessingJobStore
+
+    store = ProcessingJobStore(DATABASE_PATH)
+    store.enqueue("camera_35", "/path/camera_35_20251209_180441.mp4")
+    job = store.claim("host:1234:worker-1")
+    store.heartbeat(job["job_id"], "host:1234:worker-1")
+    store.complete(job["job_id"], exit_code=0, processing_seconds=42.0,
+                   worker_id="host:1234:worker-1")
+"""
+
+import os
+import socket
+import sqlite3
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# Job status values
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_SKIPPED = "skipped"    # Detection exited 2 (already processed)
+STATUS_FAILED = "failed"
+STATUS_DEFERRED = "deferred"  # Deadline plan: not this run (reset_plans() re-queues)
+
+# Plan modes (deadline_planner.py) - how a job is run, cheapest last
+PLAN_FULL = "full"
+PLAN_REDUCED_FPS = "reduced_fps"
+PLAN_HEADLESS = "headless"      # Reduced fps + no annotated output video
+PLAN_DEFERRED = "deferred"
+
+# Claim/heartbeat timing
+HEARTBEAT_INTERVAL_SECONDS = 30      # Workers refresh heartbeat_at this often
+STALE_CLAIM_SECONDS = 300            # Running job without heartbeat for 5 min = abandoned
+MAX_JOB_ATTEMPTS = 3                 # Give up after this many claims
+
+JOBS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS processing_jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    camera_id TEXT NOT NULL,
+    video_file TEXT NOT NULL,
+    video_path TEXT NOT NULL,
+    video_date TEXT,
+    priority INTEGER DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER DEFAULT 0,
+    worker_id TEXT,
+    claimed_at TIMESTAMP,
+    heartbeat_at TIMESTAMP,
+    completed_at TIMESTAMP,
+    exit_code INTEGER,
+    processing_seconds REAL,
+    error_message TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(camera_id, video_file)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claimable ON processing_jobs(status, priority, job_id)
+    WHERE status IN ('pending', 'running');
+CREATE INDEX IF NOT EXISTS idx_jobs_camera_date ON processing_jobs(camera_id, video_date);
+
+-- Directory mtimes from the last discovery pass (unchanged dirs are not re-listed)
+CREATE TABLE IF NOT EXISTS job_discovery_dirs (
+    dir_path TEXT PRIMARY KEY,
+    dir_mtime REAL NOT NULL,
+    scanned_at TIMESTAMP
+);
+"""
+
+
+# Columns added on top of the v1.0.0 processing_jobs table
+JOB_COLUMNS = {
+    "plan_mode": "TEXT",    # PLAN_* (NULL = full)
+    "plan_fps": "REAL",     # Detection --fps for this job (NULL = detection default)
+}
+
+
+def _now() -> str:
+    """Timestamp format shared by all job columns (sortable as text)"""
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def default_worker_id(suffix: str = "") -> str:
+    """host:pid[:suffix] - unique across orchestrators sharing one database"""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    return f"{worker_id}:{suffix}" if suffix else worker_id
+
+
+class ProcessingJobStore:
+    """
+    SQLite-backed job table with atomic claim/heartbeat/complete
+    Version: 1.0.0
+
+    Each call opens its own short-lived connection, so one store instance
+    can be shared by all worker threads (sqlite3 connections are per-thread).
+    """
+
+    def __init__(self, db_path: Path, stale_seconds: int = STALE_CLAIM_SECONDS,
+                 max_attempts: int = MAX_JOB_ATTEMPTS):
+        self.db_path = Path(db_path)
+        self.stale_seconds = stale_seconds
+        self.max_attempts = max_attempts
+        self.ensure_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # ------------------------------------------------------------------
+    # Schema
+    # ------------------------------------------------------------------
+
+    def ensure_schema(self):
+        """Create processing_jobs (and backfill from sessions on first creation)"""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            existed = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='processing_jobs'"
+            ).fetchone() is not None
+            conn.executescript(JOBS_SCHEMA)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(processing_jobs)").fetchall()]
+            for column, column_type in JOB_COLUMNS.items():
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE processing_jobs ADD COLUMN {column} {column_type}")
+            if not existed:
+                self._backfill_from_sessions(conn)
+        finally:
+            conn.close()
+
+    def _backfill_from_sessions(self, conn: sqlite3.Connection):
+        """
+        One-time import of already-processed videos so they are never re-queued.
+        Runs only when the jobs table is first created.
+        """
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(sessions)").fetchall()]
+        if "video_file" not in columns or "camera_id" not in columns:
+            return
+        conn.execute(f"""
+            INSERT OR IGNORE INTO processing_jobs
+                (camera_id, video_file, video_path, status, completed_at)
+            SELECT camera_id, video_file, video_file, '{STATUS_DONE}', end_time
+            FROM sessions
+            WHERE camera_id IS NOT NULL AND video_file IS NOT NULL
+        """)
+
+    # ------------------------------------------------------------------
+    # Enqueue
+    # ------------------------------------------------------------------
+
+    def enqueue(self, camera_id: str, video_path: str, video_date: Optional[str] = None,
+                priority: int = 0) -> bool:
+        """Add one video. Returns True if it was new (False = already known)."""
+        return self.enqueue_many([(camera_id, video_path, video_date, priority)]) == 1
+
+    def enqueue_many(self, jobs: Iterable[Tuple[str, str, Optional[str], int]]) -> int:
+        """
+        Insert (camera_id, video_path, video_date, priority) tuples.
+        Known (camera_id, video_file) pairs are ignored via the UNIQUE key.
+
+        Returns:
+            Number of newly added jobs
+        """
+        rows = [
+            (camera_id, Path(video_path).name, str(video_path), video_date, priority)
+            for camera_id, video_path, video_date, priority in jobs
+        ]
+        if not rows:
+            return 0
+
+        conn = self._connect()
+        try:
+            before = conn.total_changes
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("""
+                INSERT OR IGNORE INTO processing_jobs
+                    (camera_id, video_file, video_path, video_date, priority)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+            conn.execute("COMMIT")
+            return conn.total_changes - before
+        finally:
+            conn.close()
+
+    def is_known(self, camera_id: str, video_file: str) -> bool:
+        """Indexed lookup - replaces loading every processed filename into a set"""
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT 1 FROM processing_jobs WHERE camera_id = ? AND video_file = ?",
+                (camera_id, video_file)
+            ).fetchone() is not None
+        finally:
+            conn.close()
+
+    def get_scanned_dirs(self) -> Dict[str, float]:
+        """{dir_path: mtime} recorded by the last discovery pass"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT dir_path, dir_mtime FROM job_discovery_dirs").fetchall()
+            return {row[0]: row[1] for row in rows}
+        finally:
+            conn.close()
+
+    def mark_dirs_scanned(self, dirs: Iterable[Tuple[str, float]]):
+        """Remember (dir_path, mtime) so the next pass can skip unchanged dirs"""
+        now = _now()
+        rows = [(str(path), mtime, now) for path, mtime in dirs]
+        if not rows:
+            return
+        conn = self._connect()
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO job_discovery_dirs (dir_path, dir_mtime, scanned_at) VALUES (?, ?, ?)",
+                rows
+            )
+        finally:
+            conn.close()
+
+    def requeue_failed(self) -> int:
+        """Give failed jobs with attempts left another chance (called at startup)"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE processing_jobs SET status = ?, worker_id = NULL "
+                "WHERE status = ? AND attempts < ?",
+                (STATUS_PENDING, STATUS_FAILED, self.max_attempts)
+            )
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Deadline plans
+    # ------------------------------------------------------------------
+
+    def reset_plans(self) -> int:
+        """Drop the previous run's plan: deferred jobs back to pending, plan columns cleared"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute(
+                "UPDATE processing_jobs SET status = ? WHERE status = ?",
+                (STATUS_PENDING, STATUS_DEFERRED)
+            )
+            conn.execute(
+                "UPDATE processing_jobs SET plan_mode = NULL, plan_fps = NULL "
+                "WHERE status = ? AND plan_mode IS NOT NULL",
+                (STATUS_PENDING,)
+            )
+            conn.execute("COMMIT")
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def apply_plan(self, assignments: Iterable[Tuple[int, str, Optional[float]]]) -> int:
+        """
+        Store (job_id, plan_mode, plan_fps) for pending jobs; PLAN_DEFERRED jobs
+        become 'deferred' and are not claimable until reset_plans().
+
+        Returns:
+            Number of jobs updated
+        """
+        rows = [(mode, fps, STATUS_DEFERRED if mode == PLAN_DEFERRED else STATUS_PENDING, job_id, STATUS_PENDING)
+                for job_id, mode, fps in assignments]
+        if not rows:
+            return 0
+        conn = self._connect()
+        try:
+            before = conn.total_changes
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "UPDATE processing_jobs SET plan_mode = ?, plan_fps = ?, status = ? "
+                "WHERE job_id = ? AND status = ?",
+                rows
+            )
+            conn.execute("COMMIT")
+            return conn.total_changes - before
+        finally:
+            conn.close()
+
+    def _has_videos_table(self, conn: sqlite3.Connection) -> bool:
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='videos'"
+        ).fetchone() is not None
+
+    def pending_with_durations(self, camera_ids: Optional[List[str]] = None) -> List[Dict]:
+        """Pending jobs in claim order, with the segment duration from the videos table (NULL if unknown)"""
+        camera_clause = ""
+        params: List = [STATUS_PENDING]
+        if camera_ids:
+            camera_clause = f"AND j.camera_id IN ({','.join('?' * len(camera_ids))})"
+            params.extend(camera_ids)
+
+        conn = self._connect()
+        try:
+            duration = "v.duration_seconds" if self._has_videos_table(conn) else "NULL"
+            join = ("LEFT JOIN videos v ON v.camera_id = j.camera_id AND v.video_filename = j.video_file"
+                    if duration != "NULL" else "")
+            rows = conn.execute(f"""
+                SELECT j.job_id, j.camera_id, j.video_file, {duration} AS duration_seconds
+                FROM processing_jobs j {join}
+                WHERE j.status = ? {camera_clause}
+                ORDER BY j.priority, j.job_id
+            """, params).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def completed_history(self, limit: int = 2000) -> List[Dict]:
+        """
+        Most recent finished jobs with processing time (newest first): camera_id,
+        processing_seconds, claimed_at, completed_at, plan_mode, plan_fps,
+        duration_seconds (videos table, NULL if unknown)
+        """
+        conn = self._connect()
+        try:
+            duration = "v.duration_seconds" if self._has_videos_table(conn) else "NULL"
+            join = ("LEFT JOIN videos v ON v.camera_id = j.camera_id AND v.video_filename = j.video_file"
+                    if duration != "NULL" else "")
+            rows = conn.execute(f"""
+                SELECT j.camera_id, j.processing_seconds, j.claimed_at, j.completed_at,
+                       j.plan_mode, j.plan_fps, {duration} AS duration_seconds
+                FROM processing_jobs j {join}
+                WHERE j.status = ? AND j.processing_seconds > 0 AND j.completed_at IS NOT NULL
+                ORDER BY j.completed_at DESC
+                LIMIT ?
+            """, (STATUS_DONE, limit)).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def job_results(self, job_ids: Iterable[int]) -> List[Dict]:
+        """Current state of the given jobs (plan vs actual reporting)"""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return []
+        conn = self._connect()
+        try:
+            rows = []
+            for i in range(0, len(job_ids), 500):  # SQLite host parameter limit
+                chunk = job_ids[i:i + 500]
+                rows.extend(conn.execute(
+                    f"SELECT job_id, camera_id, status, processing_seconds, completed_at, plan_mode "
+                    f"FROM processing_jobs WHERE job_id IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall())
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Claim / heartbeat / complete
+    # ------------------------------------------------------------------
+
+    def claim(self, worker_id: str, camera_ids: Optional[List[str]] = None) -> Optional[Dict]:
+        """
+        Atomically claim the next job (highest priority = lowest number first).
+
+        Pending jobs and running jobs whose heartbeat went stale are eligible.
+        BEGIN IMMEDIATE takes the write lock before the SELECT, so two workers
+        (threads or processes) can never claim the same row.
+
+        Returns:
+            Job row as dict, or None if nothing is claimable
+        """
+        stale_cutoff = (datetime.now() - timedelta(seconds=self.stale_seconds)).isoformat(timespec="seconds")
+        camera_clause = ""
+        params: List = [STATUS_PENDING, STATUS_RUNNING, stale_cutoff]
+        if camera_ids:
+            camera_clause = f"AND camera_id IN ({','.join('?' * len(camera_ids))})"
+            params.extend(camera_ids)
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+
+            # Abandoned jobs that already used all their attempts are failed, not reclaimed
+            conn.execute(
+                "UPDATE processing_jobs SET status = ?, error_message = 'max attempts reached (stale claim)' "
+                "WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+                (STATUS_FAILED, STATUS_RUNNING, stale_cutoff, self.max_attempts)
+            )
+
+            row = conn.execute(f"""
+                SELECT * FROM processing_jobs
+                WHERE (status = ? OR (status = ? AND heartbeat_at < ?))
+                {camera_clause}
+                ORDER BY priority, job_id
+                LIMIT 1
+            """, params).fetchone()
+
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            now = _now()
+            conn.execute("""
+                UPDATE processing_jobs
+                SET status = ?, worker_id = ?, claimed_at = ?, heartbeat_at = ?,
+                    attempts = attempts + 1, exit_code = NULL, error_message = NULL
+                WHERE job_id = ?
+            """, (STATUS_RUNNING, worker_id, now, now, row["job_id"]))
+            conn.execute("COMMIT")
+
+            job = dict(row)
+            job.update(status=STATUS_RUNNING, worker_id=worker_id, claimed_at=now,
+                       heartbeat_at=now, attempts=row["attempts"] + 1)
+            return job
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        """
+        Refresh heartbeat. Returns False if the claim was lost
+        (job reclaimed by someone else after going stale).
+        """
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE processing_jobs SET heartbeat_at = ? "
+                "WHERE job_id = ? AND worker_id = ? AND status = ?",
+                (_now(), job_id, worker_id, STATUS_RUNNING)
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def complete(self, job_id: int, exit_code: int = 0, processing_seconds: Optional[float] = None,
+                 skipped: bool = False, worker_id: Optional[str] = None) -> bool:
+        """
+        Mark job done (or skipped when detection reported it as already processed)
+
+        With worker_id the update is a lease check: it only applies while that
+        worker still holds the job, so a slow node whose claim went stale and was
+        reclaimed cannot overwrite the new owner's result.
+
+        Returns:
+            False if the lease was lost (nothing was written)
+        """
+        status = STATUS_SKIPPED if skipped else STATUS_DONE
+        return self._finish(job_id, status, exit_code, processing_seconds, None, worker_id)
+
+    def complete_leased(self, conn: sqlite3.Connection, job_id: int, worker_id: str, exit_code: int = 0,
+                        processing_seconds: Optional[float] = None, skipped: bool = False) -> bool:
+        """
+        complete() on the caller's connection, inside its transaction (the
+        coordinator commits a node's results and the completion together).
+
+        Stricter lease than complete(): the job must be running for worker_id
+        with a heartbeat newer than stale_seconds, i.e. not yet reclaimable.
+        A job this worker already completed matches again, so a retried request
+        after a lost response is idempotent.
+
+        Returns:
+            False if the lease is lost or stale (nothing was written)
+        """
+        stale_cutoff = (datetime.now() - timedelta(seconds=self.stale_seconds)).isoformat(timespec="seconds")
+        status = STATUS_SKIPPED if skipped else STATUS_DONE
+        cursor = conn.execute("""
+            UPDATE processing_jobs
+            SET status = ?, exit_code = ?, processing_seconds = ?, error_message = NULL,
+                completed_at = ?, heartbeat_at = NULL
+            WHERE job_id = ? AND worker_id = ?
+              AND ((status = ? AND heartbeat_at >= ?) OR status IN (?, ?))
+        """, (status, exit_code, processing_seconds, _now(), job_id, worker_id,
+              STATUS_RUNNING, stale_cutoff, STATUS_DONE, STATUS_SKIPPED))
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: int, exit_code: Optional[int], error_message: str,
+             processing_seconds: Optional[float] = None, retry: bool = True,
+             worker_id: Optional[str] = None) -> bool:
+        """
+        Record a failure. The job goes back to pending while attempts remain
+        (retry=False fails it permanently, e.g. the video file is gone).
+        worker_id: lease check as in complete()
+
+        Returns:
+            True if the job will be retried
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT attempts FROM processing_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+
+        retry = retry and row is not None and row["attempts"] < self.max_attempts
+        applied = self._finish(job_id, STATUS_PENDING if retry else STATUS_FAILED,
+                               exit_code, processing_seconds, (error_message or "")[:2000], worker_id)
+        return retry and applied
+
+    def _finish(self, job_id: int, status: str, exit_code: Optional[int],
+                processing_seconds: Optional[float], error_message: Optional[str],
+                worker_id: Optional[str] = None) -> bool:
+        lease_clause = ""
+        params: List = [status, exit_code, processing_seconds, error_message,
+                        _now() if status != STATUS_PENDING else None, job_id]
+        if worker_id is not None:
+            lease_clause = "AND worker_id = ? AND status = ?"
+            params.extend([worker_id, STATUS_RUNNING])
+
+        conn = self._connect()
+        try:
+            cursor = conn.execute(f"""
+                UPDATE processing_jobs
+                SET status = ?, exit_code = ?, processing_seconds = ?, error_message = ?,
+                    completed_at = ?, heartbeat_at = NULL
+                WHERE job_id = ? {lease_clause}
+            """, params)
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def get_job(self, job_id: int) -> Optional[Dict]:
+        """Single job row as dict (None if unknown)"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT * FROM processing_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+
+    def outstanding_count(self, camera_ids: Optional[List[str]] = None) -> int:
+        """Pending + running jobs (work not finished yet)"""
+        camera_clause = ""
+        params: List = [STATUS_PENDING, STATUS_RUNNING]
+        if camera_ids:
+            camera_clause = f"AND camera_id IN ({','.join('?' * len(camera_ids))})"
+            params.extend(camera_ids)
+
+        conn = self._connect()
+        try:
+            return conn.execute(
+                f"SELECT COUNT(*) FROM processing_jobs WHERE status IN (?, ?) {camera_clause}",
+                params
+            ).fetchone()[0]
+        finally:
+            conn.close()
+
+    def list_jobs(self, status: str = STATUS_PENDING,
+                  camera_ids: Optional[List[str]] = None) -> List[Dict]:
+        """Jobs in a given status, in claim order"""
+        camera_clause = ""
+        params: List = [status]
+        if camera_ids:
+            camera_clause = f"AND camera_id IN ({','.join('?' * len(camera_ids))})"
+            params.extend(camera_ids)
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT * FROM processing_jobs WHERE status = ? {camera_clause} "
+                f"ORDER BY priority, job_id",
+                params
+            ).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def status_counts(self) -> Dict[str, int]:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM processing_jobs GROUP BY status"
+            ).fetchall()
+            return {row[0]: row[1] for row in rows}
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    # Self-check against a throwaway database: two threads racing for the same jobs
+    import tempfile
+    import threading
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ProcessingJobStore(Path(tmp) / "jobs.db")
+        added = store.enqueue_many(
+            ("camera_35", f"/videos/20251209/camera_35/camera_35_20251209_18{i:02d}00.mp4", "20251209", 0)
+            for i in range(20)
+        )
+        again = store.enqueue("camera_35", "/videos/20251209/camera_35/camera_35_20251209_180000.mp4")
+        print(f"Enqueued {added} jobs, duplicate enqueue accepted: {again}")
+
+        claimed: Dict[str, List[int]] = {"a": [], "b": []}
+
+        def worker(name):
+            while True:
+                job = store.claim(default_worker_id(name))
+                if job is None:
+                    return
+                claimed[name].append(job["job_id"])
+                store.complete(job["job_id"], exit_code=0, processing_seconds=0.1)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in claimed]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        all_ids = claimed["a"] + claimed["b"]
+        print(f"Worker a: {len(claimed['a'])} jobs, worker b: {len(claimed['b'])} jobs")
+        print(f"Double claims: {len(all_ids) - len(set(all_ids))}")
+        print(f"Status counts: {store.status_counts()}")
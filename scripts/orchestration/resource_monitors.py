@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Resource Monitors - Pluggable Host Metrics for Worker Scaling
+Version: 1.0.0
+Created: 2026-10-18
+
+Purpose:
+- Worker scaling in process_videos_orchestrator.py only had a signal on hosts
+  with an NVIDIA GPU (pynvml / nvidia-smi); CPU-only staging boxes and GPU
+  outages left it blind
+- ResourceMonitor holds the scaling policy once, over normalised metrics;
+  backends only collect them:
+    DynamicGPUMonitor (process_videos_orchestrator.py) - pynvml / nvidia-smi
+    CPUResourceMonitor (this file)                     - /proc (Linux)
+
+Normalised metrics (every backend):
+- utilization:     % busy (GPU SM utilisation / CPU non-idle time)
+- memory_free_gb:  free GPU memory / MemAvailable
+- memory_total_gb, memory_used_gb, memory_percent
+- temperature:     °C, or None when the backend has no sensor
+- timestamp
+
+CPU backend extras:
+- per_core_utilization (list, %), load_1m, load_per_cpu, cpu_count
+- cpu_pressure / memory_pressure / memory_pressure_full: PSI "some"/"full"
+  avg10 (%) from /proc/pressure, None on kernels without PSI
+- temperature from /sys/class/thermal when a zone is exposed
+
+Policy (ResourceMonitor):
+- should_scale_up / should_scale_down / is_emergency: threshold policy
+  (--scaling thresholds)
+- exceeds_hard_limits / allows_scale_up: hard guards around the throughput
+  controller (--scaling throughput)
+- Thresholds are class attributes, overridden per backend
+
+Usage:
+    python3 process_videos_orchestrator.py --resource-monitor cpu
+    python3 resource_monitors.py          # Print two CPU samples
+"""
+
+import glob
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+# CPU backend thresholds
+CPU_UTIL_SCALE_UP_THRESHOLD = 70       # % - Safe to add workers
+CPU_UTIL_SCALE_DOWN_THRESHOLD = 90     # % - Remove workers
+CPU_TEMP_SCALE_UP_THRESHOLD = 80       # °C - package/zone temperature
+CPU_TEMP_SCALE_DOWN_THRESHOLD = 90
+CPU_TEMP_EMERGENCY_THRESHOLD = 95
+CPU_PRESSURE_SCALE_DOWN = 40.0         # % PSI cpu "some" avg10 - runnable tasks waiting
+MEMORY_PRESSURE_SCALE_DOWN = 10.0      # % PSI memory "some" avg10 - reclaim stalls
+MEMORY_PRESSURE_EMERGENCY = 20.0       # % PSI memory "full" avg10 - host is thrashing
+CPU_FIRST_SAMPLE_SECONDS = 0.5         # /proc/stat delta for the very first reading
+
+PROC_STAT = "/proc/stat"
+PROC_MEMINFO = "/proc/meminfo"
+PROC_PRESSURE_DIR = "/proc/pressure"
+THERMAL_ZONES_GLOB = "/sys/class/thermal/thermal_zone*/temp"
+
+
+class ResourceMonitor:
+    """
+    Base class: scaling policy over normalised metrics
+
+    Subclasses implement _initialize(), get_metrics() and describe(), and
+    override the threshold attributes. A threshold of None disables that check
+    (e.g. temperature on a host without sensors).
+    """
+
+    name = "none"
+
+    TEMP_SCALE_UP_THRESHOLD: Optional[float] = None
+    TEMP_SCALE_DOWN_THRESHOLD: Optional[float] = None
+    TEMP_EMERGENCY_THRESHOLD: Optional[float] = None
+    UTIL_SCALE_UP_THRESHOLD = 70
+    UTIL_SCALE_DOWN_THRESHOLD = 85
+    MIN_MEMORY_FREE_GB = 2.0        # Needed to add a worker
+    HARD_MIN_MEMORY_FREE_GB = 1.0   # Below this a worker is shed immediately
+    SCALE_COOLDOWN_SECONDS = 60
+
+    def __init__(self, logger: logging.Logger, min_workers: int = 1, max_workers: int = 8):
+        self.logger = logger
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.last_scale_time = 0
+        self.is_available = False
+        self._initialize()
+
+    # ------------------------------------------------------------------
+    # Backend interface
+    # ------------------------------------------------------------------
+
+    def _initialize(self):
+        raise NotImplementedError
+
+    def get_metrics(self) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def describe(self, metrics: Dict) -> str:
+        raise NotImplementedError
+
+    def _under_pressure(self, metrics: Dict) -> bool:
+        """Backend-specific stall signal (CPU: PSI); counts as a hard limit"""
+        return False
+
+    def shutdown(self):
+        pass
+
+    # ------------------------------------------------------------------
+    # Policy
+    # ------------------------------------------------------------------
+
+    def _temp_below(self, metrics: Dict, threshold: Optional[float]) -> bool:
+        temperature = metrics.get('temperature')
+        return threshold is None or temperature is None or temperature < threshold
+
+    def _temp_above(self, metrics: Dict, threshold: Optional[float]) -> bool:
+        temperature = metrics.get('temperature')
+        return threshold is not None and temperature is not None and temperature > threshold
+
+    def should_scale_up(self, metrics: Dict, current_workers: int) -> bool:
+        """Check if conditions allow adding a worker"""
+        if not metrics:
+            return False
+
+        # Already at max
+        if current_workers >= self.max_workers:
+            return False
+
+        # Cooldown period
+        if time.time() - self.last_scale_time < self.SCALE_COOLDOWN_SECONDS:
+            return False
+
+        # All conditions must be met (conservative scaling)
+        return (
+            self._temp_below(metrics, self.TEMP_SCALE_UP_THRESHOLD) and
+            metrics['utilization'] < self.UTIL_SCALE_UP_THRESHOLD and
+            metrics['memory_free_gb'] > self.MIN_MEMORY_FREE_GB and
+            not self._under_pressure(metrics)
+        )
+
+    def should_scale_down(self, metrics: Dict, current_workers: int) -> bool:
+        """Check if we need to reduce workers"""
+        if not metrics:
+            return False
+
+        # Already at minimum
+        if current_workers <= self.min_workers:
+            return False
+
+        # Any condition triggers scale down (aggressive)
+        return (
+            self._temp_above(metrics, self.TEMP_SCALE_DOWN_THRESHOLD) or
+            metrics['utilization'] > self.UTIL_SCALE_DOWN_THRESHOLD or
+            metrics['memory_free_gb'] < self.HARD_MIN_MEMORY_FREE_GB or
+            self._under_pressure(metrics)
+        )
+
+    def is_emergency(self, metrics: Dict) -> bool:
+        """Check if emergency stop needed"""
+        if not metrics:
+            return False
+        temperature = metrics.get('temperature')
+        return (self.TEMP_EMERGENCY_THRESHOLD is not None and temperature is not None and
+                temperature >= self.TEMP_EMERGENCY_THRESHOLD)
+
+    def exceeds_hard_limits(self, metrics: Optional[Dict], current_workers: int) -> bool:
+        """Thermal/memory guard for throughput scaling: shed a worker whatever the throughput"""
+        if not metrics or current_workers <= self.min_workers:
+            return False
+        return (
+            self._temp_above(metrics, self.TEMP_SCALE_DOWN_THRESHOLD) or
+            metrics['memory_free_gb'] < self.HARD_MIN_MEMORY_FREE_GB or
+            self._under_pressure(metrics)
+        )
+
+    def allows_scale_up(self, metrics: Optional[Dict]) -> bool:
+        """Thermal/memory guard for throughput scaling: may another worker start?"""
+        if not metrics:
+            return True  # No telemetry - throughput is the only signal
+        return (
+            self._temp_below(metrics, self.TEMP_SCALE_UP_THRESHOLD) and
+            metrics['memory_free_gb'] > self.MIN_MEMORY_FREE_GB and
+            not self._under_pressure(metrics)
+        )
+
+    def record_scaling(self):
+        """Record that we just scaled"""
+        self.last_scale_time = time.time()
+
+    def log_metrics(self, metrics: Dict):
+        """Log metrics to logger"""
+        self.logger.info(self.describe(metrics))
+
+
+# ============================================================================
+# CPU / RAM BACKEND (/proc)
+# ============================================================================
+
+def read_cpu_times(path: str = PROC_STAT) -> Dict[str, Tuple[int, int]]:
+    """{'cpu': (busy, total), 'cpu0': ..., ...} jiffies since boot"""
+    times = {}
+    with open(path) as f:
+        for line in f:
+            if not line.startswith("cpu"):
+                break
+            fields = line.split()
+            values = [int(v) for v in fields[1:]]
+            idle = values[3] + (values[4] if len(values) > 4 else 0)  # idle + iowait
+            total = sum(values[:8])  # guest time is already counted in user/nice
+            times[fields[0]] = (total - idle, total)
+    return times
+
+
+def read_meminfo(path: str = PROC_MEMINFO) -> Dict[str, int]:
+    """/proc/meminfo values in kB"""
+    info = {}
+    with open(path) as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            parts = rest.split()
+            if parts:
+                info[key] = int(parts[0])
+    return info
+
+
+def read_pressure(resource: str, kind: str = "some") -> Optional[float]:
+    """PSI avg10 (%) for cpu/memory/io, None without /proc/pressure"""
+    try:
+        with open(os.path.join(PROC_PRESSURE_DIR, resource)) as f:
+            for line in f:
+                fields = line.split()
+                if fields and fields[0] == kind:
+                    for field in fields[1:]:
+                        key, _, value = field.partition("=")
+                        if key == "avg10":
+                            return float(value)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def read_temperature() -> Optional[float]:
+    """Hottest thermal zone in °C, None if no zone is exposed"""
+    readings = []
+    for path in glob.glob(THERMAL_ZONES_GLOB):
+        try:
+            with open(path) as f:
+                readings.append(int(f.read().strip()) / 1000.0)
+        except (OSError, ValueError):
+            continue
+    return max(readings) if readings else None
+
+
+class CPUResourceMonitor(ResourceMonitor):
+    """
+    CPU/RAM backend for hosts without a GPU (Linux /proc)
+
+    Utilisation is measured between consecutive get_metrics() calls, i.e. over
+    the monitoring interval, not as an instantaneous sample.
+    """
+
+    name = "cpu"
+
+    TEMP_SCALE_UP_THRESHOLD = CPU_TEMP_SCALE_UP_THRESHOLD
+    TEMP_SCALE_DOWN_THRESHOLD = CPU_TEMP_SCALE_DOWN_THRESHOLD
+    TEMP_EMERGENCY_THRESHOLD = CPU_TEMP_EMERGENCY_THRESHOLD
+    UTIL_SCALE_UP_THRESHOLD = CPU_UTIL_SCALE_UP_THRESHOLD
+    UTIL_SCALE_DOWN_THRESHOLD = CPU_UTIL_SCALE_DOWN_THRESHOLD
+
+    def _initialize(self):
+        self.previous_times = None
+        try:
+            self.previous_times = read_cpu_times()
+            read_meminfo()
+            self.is_available = True
+            psi = "with" if read_pressure("cpu") is not None else "without"
+            self.logger.info(f"✅ CPU resource monitor initialized: {os.cpu_count()} CPUs ({psi} pressure stall info)")
+        except (OSError, ValueError, IndexError) as e:
+            self.is_available = False
+            self.logger.warning(f"❌ CPU resource monitor not available ({e}) - using default worker count")
+
+    def get_metrics(self) -> Optional[Dict]:
+        """Current CPU/RAM metrics (normalised keys + CPU extras)"""
+        if not self.is_available:
+            return None
+        try:
+            if self.previous_times is None:
+                self.previous_times = read_cpu_times()
+                time.sleep(CPU_FIRST_SAMPLE_SECONDS)
+            current_times = read_cpu_times()
+            utilization = {}
+            for cpu, (busy, total) in current_times.items():
+                prev_busy, prev_total = self.previous_times.get(cpu, (0, 0))
+                elapsed = total - prev_total
+                utilization[cpu] = 100.0 * (busy - prev_busy) / elapsed if elapsed > 0 else 0.0
+            self.previous_times = current_times
+
+            meminfo = read_meminfo()
+            mem_total_gb = meminfo['MemTotal'] / (1024**2)
+            mem_available_gb = meminfo.get('MemAvailable', meminfo.get('MemFree', 0)) / (1024**2)
+            cpu_count = os.cpu_count() or 1
+            load_1m = os.getloadavg()[0]
+
+            return {
+                'utilization': utilization.get('cpu', 0.0),
+                'per_core_utilization': [utilization[cpu] for cpu in sorted(utilization, key=self._core_index)
+                                         if cpu != 'cpu'],
+                'load_1m': load_1m,
+                'load_per_cpu': load_1m / cpu_count,
+                'cpu_count': cpu_count,
+                'temperature': read_temperature(),
+                'memory_free_gb': mem_available_gb,
+                'memory_total_gb': mem_total_gb,
+                'memory_used_gb': mem_total_gb - mem_available_gb,
+                'memory_percent': (1 - mem_available_gb / mem_total_gb) * 100 if mem_total_gb > 0 else 0,
+                'cpu_pressure': read_pressure("cpu"),
+                'memory_pressure': read_pressure("memory"),
+                'memory_pressure_full': read_pressure("memory", "full"),
+                'timestamp': datetime.now().isoformat()
+            }
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.error(f"Error reading CPU metrics: {e}")
+            return None
+
+    @staticmethod
+    def _core_index(cpu: str) -> int:
+        return int(cpu[3:]) if cpu[3:].isdigit() else -1
+
+    def _under_pressure(self, metrics: Dict) -> bool:
+        cpu_pressure = metrics.get('cpu_pressure')
+        memory_pressure = metrics.get('memory_pressure')
+        return ((cpu_pressure is not None and cpu_pressure > CPU_PRESSURE_SCALE_DOWN) or
+                (memory_pressure is not None and memory_pressure > MEMORY_PRESSURE_SCALE_DOWN))
+
+    def is_emergency(self, metrics: Dict) -> bool:
+        """Overheating, or the host is thrashing (all tasks stalled on memory)"""
+        if super().is_emergency(metrics):
+            return True
+        full = metrics.get('memory_pressure_full') if metrics else None
+        return full is not None and full >= MEMORY_PRESSURE_EMERGENCY
+
+    def describe(self, metrics: Dict) -> str:
+        cores = metrics['per_core_utilization']
+        text = f"CPU: {metrics['utilization']:.1f}%"
+        if cores:
+            text += f" (cores {min(cores):.0f}-{max(cores):.0f}%)"
+        text += (f" | Load: {metrics['load_per_cpu']:.2f}/CPU | "
+                 f"Mem: {metrics['memory_free_gb']:.1f}GB available / {metrics['memory_total_gb']:.1f}GB total "
+                 f"({metrics['memory_percent']:.1f}%)")
+        if metrics['cpu_pressure'] is not None:
+            text += f" | PSI cpu {metrics['cpu_pressure']:.1f}% mem {metrics['memory_pressure']:.1f}%"
+        if metrics['temperature'] is not None:
+            text += f" | {metrics['temperature']:.0f}°C"
+        return text
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    monitor = CPUResourceMonitor(logging.getLogger("resource_monitors"))
+    for _ in range(2):
+        sample = monitor.get_metrics()
+        if sample:
+            monitor.log_metrics(sample)
+            print(f"   scale up: {monitor.should_scale_up(sample, 1)} | "
+                  f"scale down: {monitor.should_scale_down(sample, 2)} | "
+                  f"hard limit: {monitor.exceeds_hard_limits(sample, 2)} | "
+                  f"emergency: {monitor.is_emergency(sample)}")
+        time.sleep(1)
@@ -1,8 +1,24 @@
 #!/usr/bin/env python3
 """
 ASE Restaurant Surveillance Service - Automated Daemon
-Version: 2.4.0
+Version: 2.6.0
 Created: 2025-11-16
+Modified: 2026-10-18 - v2.6.0: Batch processing is planned against PROCESS_END_HOUR
+  - The orchestrator gets --deadline (next PROCESS_END_HOUR:00) and degrades or
+    defers low-priority cameras up front instead of just overrunning
+  - Camera importance: "processing_priority" in cameras_config.json (1 = highest)
+
+Modified: 2026-10-18 - v2.5.0: Near-real-time processing during capture windows
+  - When capture starts, a second orchestrator runs with --near-realtime and
+    processes each segment ~lag_seconds after capture closes it
+  - Opt-in: system_config.json "near_realtime_processing": {"enabled": true}
+    (shipped disabled; the nightly batch run is unchanged without it)
+  - Resource budget from the same block: max_workers, nice,
+    max_load_per_cpu (no new claims above it)
+  - Runs until the window ends + lag, then drains its queue and exits
+  - Overnight batch run only handles leftovers (job table skips processed segments)
+  - Health check restarts it if it dies inside a capture window
+
 Modified: 2025-11-22 - v2.3.0: CRITICAL FIX - Increased SIGTERM timeout for video finalization
   - Increased timeout from 10s to 30s to allow FFmpeg to properly close MP4 files
   - Prevents "moov atom not found" corruption when capture ends
@@ -56,7 +72,8 @@ Usage:
 Architecture:
     Main Thread: Service controller and scheduler
     Thread 1: Video capture (11:30 AM - 2 PM, 5 PM - 10 PM - dual windows)
-    Thread 2: Video processing (12:00 AM - 11:00 PM target completion)
+    Thread 2: Video processing (12:00 AM - 11:00 PM target completion, leftovers only)
+    Process:  Near-real-time processing (during capture windows, lag + resource budget)
     Thread 3: Disk space monitoring (every hour)
     Thread 4: GPU monitoring (every 5 minutes)
     Thread 5: Database sync (every hour)
@@ -69,7 +86,7 @@ import signal
 import threading
 import subprocess
 from pathlib import Path
-from datetime import datetime, time as dt_time
+from datetime import datetime, timedelta, time as dt_time
 from typing import Optional
 import logging
 import json
@@ -99,6 +116,7 @@ def load_system_config():
                 {"start_hour": 17, "start_minute": 30, "end_hour": 22, "end_minute": 0}
             ],
             "processing_window": {"start_hour": 0, "end_hour": 23},
+            "near_realtime_processing": {"enabled": False},
             "monitoring_intervals": {
                 "disk_check_seconds": 3600,
                 "gpu_check_seconds": 300,
@@ -115,6 +133,15 @@ CAPTURE_WINDOWS = _config["capture_windows"]
 PROCESS_START_HOUR = _config["processing_window"]["start_hour"]
 PROCESS_END_HOUR = _config["processing_window"]["end_hour"]
 
+# Near-real-time processing (v2.5.0) - Loaded from config, disabled if missing
+_near_realtime = _config.get("near_realtime_processing", {})
+NEAR_REALTIME_ENABLED = _near_realtime.get("enabled", False)
+NEAR_REALTIME_LAG_SECONDS = _near_realtime.get("lag_seconds", 120)
+NEAR_REALTIME_POLL_SECONDS = _near_realtime.get("poll_seconds", 60)
+NEAR_REALTIME_MAX_WORKERS = _near_realtime.get("max_workers", 1)
+NEAR_REALTIME_NICE = _near_realtime.get("nice", 10)
+NEAR_REALTIME_MAX_LOAD = _near_realtime.get("max_load_per_cpu", 0.75)
+
 # Monitoring intervals (seconds) - Loaded from config
 DISK_CHECK_INTERVAL = _config["monitoring_intervals"]["disk_check_seconds"]
 GPU_CHECK_INTERVAL = _config["monitoring_intervals"]["gpu_check_seconds"]
@@ -133,11 +160,13 @@ class SurveillanceService:
         self.running = False
         self.capture_process = None
         self.processing_process = None
+        self.realtime_process = None  # v2.5.0: Near-real-time orchestrator
         self.current_capture_window = None  # Track which window is currently active
 
         # Thread locks to prevent race conditions
         self.capture_lock = threading.Lock()
         self.processing_lock = threading.Lock()
+        self.realtime_lock = threading.Lock()
 
         # Monitoring threads
         self.threads = []
@@ -353,12 +382,63 @@ class SurveillanceService:
                 self.logger.info(f"  Duration: {duration}s ({duration/60:.1f} minutes)")
             except Exception as e:
                 self.logger.error(f"Failed to start video capture: {e}")
+                return
+
+        # v2.5.0: Process this window's segments as they close
+        self.start_near_realtime_processing(window)
+
+    def start_near_realtime_processing(self, window):
+        """
+        Start the near-real-time orchestrator for a capture window (thread-safe)
+        Added: 2026-10-18 - v2.5.0
+
+        Runs until window end + lag (so the last segment is picked up), then drains
+        its queue and exits. Output goes to its own log file (no PIPE to fill up).
+        """
+        if not NEAR_REALTIME_ENABLED:
+            return
+
+        with self.realtime_lock:
+            if self.realtime_process and self.realtime_process.poll() is None:
+                self.logger.info("Near-real-time processing already running")
+                return
+
+            now = datetime.now()
+            window_end = now.replace(hour=window["end_hour"], minute=window["end_minute"],
+                                     second=0, microsecond=0)
+            run_until = window_end + timedelta(seconds=NEAR_REALTIME_LAG_SECONDS + NEAR_REALTIME_POLL_SECONDS)
+            orchestrator_script = PROJECT_ROOT / "scripts" / "orchestration" / "process_videos_orchestrator.py"
+
+            cmd = [
+                "python3", str(orchestrator_script),
+                "--near-realtime",
+                "--lag-seconds", str(NEAR_REALTIME_LAG_SECONDS),
+                "--poll-seconds", str(NEAR_REALTIME_POLL_SECONDS),
+                "--until", run_until.isoformat(timespec="seconds"),
+                "--min-workers", "1",
+                "--max-workers", str(NEAR_REALTIME_MAX_WORKERS),
+                "--nice", str(NEAR_REALTIME_NICE),
+                "--max-load", str(NEAR_REALTIME_MAX_LOAD)
+            ]
+
+            try:
+                self.realtime_process = subprocess.Popen(
+                    cmd,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL
+                )
+                self.logger.info(f"Near-real-time processing started (PID: {self.realtime_process.pid})")
+                self.logger.info(f"  Lag: {NEAR_REALTIME_LAG_SECONDS}s | Workers: 1-{NEAR_REALTIME_MAX_WORKERS} | "
+                                 f"nice +{NEAR_REALTIME_NICE} | Max load/CPU: {NEAR_REALTIME_MAX_LOAD}")
+                self.logger.info(f"  Runs until: {run_until.strftime('%H:%M:%S')} (then drains queue)")
+            except Exception as e:
+                self.logger.error(f"Failed to start near-real-time processing: {e}")
 
     def start_video_processing(self):
         """
         Start video processing if in processing hours (thread-safe)
         Processes previous day's videos captured during 11:30 AM - 2 PM and 5 PM - 10 PM
-        Target completion: 11 PM (warning logged if exceeded)
+        Must finish by PROCESS_END_HOUR: the orchestrator plans against --deadline
         """
         with self.processing_lock:  # Prevent race condition from multiple threads
             if not self.is_in_time_window(PROCESS_START_HOUR, PROCESS_END_HOUR):
@@ -369,13 +449,21 @@ class SurveillanceService:
                 self.logger.info("Video processing already running")
                 return
 
-            self.logger.info("Starting video processing (previous day's footage)...")
-            self.logger.info(f"Target completion: {PROCESS_END_HOUR:02d}:00 (warning if exceeded)")
+            if NEAR_REALTIME_ENABLED:
+                self.logger.info("Starting video processing (leftovers not handled in near-real-time)...")
+            else:
+                self.logger.info("Starting video processing (previous day's footage)...")
+            deadline = datetime.now().replace(hour=PROCESS_END_HOUR, minute=0, second=0, microsecond=0)
+            if deadline <= datetime.now():
+                deadline += timedelta(days=1)
+            self.logger.info(f"Deadline: {deadline.strftime('%Y-%m-%d %H:%M')} "
+                             f"(low-priority cameras degraded/deferred if the plan overruns)")
             orchestrator_script = PROJECT_ROOT / "scripts" / "orchestration" / "process_videos_orchestrator.py"
 
             try:
                 self.processing_process = subprocess.Popen(
-                    ["python3", str(orchestrator_script)],
+                    ["python3", str(orchestrator_script),
+                     "--deadline", deadline.isoformat(timespec="minutes")],
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE
                 )
@@ -466,6 +554,7 @@ class SurveillanceService:
                     'timestamp': datetime.now().isoformat(),
                     'capture_running': self.capture_process and self.capture_process.poll() is None,
                     'processing_running': self.processing_process and self.processing_process.poll() is None,
+                    'realtime_running': self.realtime_process and self.realtime_process.poll() is None,
                     'threads_alive': sum(1 for t in self.threads if t.is_alive())
                 }
 
@@ -477,6 +566,9 @@ class SurveillanceService:
                     if not status['capture_running']:
                         self.logger.warning("Capture stopped unexpectedly, restarting...")
                         self.start_video_capture()
+                    elif NEAR_REALTIME_ENABLED and not status['realtime_running']:
+                        self.logger.warning("Near-real-time processing not running, restarting...")
+                        self.start_near_realtime_processing(window)
 
                 # Restart processing if it should be running but isn't
                 if self.is_in_time_window(PROCESS_START_HOUR, PROCESS_END_HOUR):
@@ -585,6 +677,9 @@ class SurveillanceService:
             window_name = "Morning" if window["start_hour"] == 11 else "Evening"
             self.logger.info(f"  {window_name}: {window['start_hour']:02d}:{window['start_minute']:02d} - {window['end_hour']:02d}:{window['end_minute']:02d}")
         self.logger.info(f"Processing hours: {PROCESS_START_HOUR:02d}:00 - {PROCESS_END_HOUR:02d}:00 (target completion)")
+        if NEAR_REALTIME_ENABLED:
+            self.logger.info(f"Near-real-time processing: ON (lag {NEAR_REALTIME_LAG_SECONDS}s, "
+                             f"max {NEAR_REALTIME_MAX_WORKERS} worker(s), nice +{NEAR_REALTIME_NICE})")
         self.logger.info("=" * 70)
 
         # Start monitoring threads
@@ -628,6 +723,18 @@ class SurveillanceService:
             self.logger.info("Stopping video capture...")
             self._stop_capture_process(process_name="capture", timeout=30)
 
+        # Stop near-real-time processing (v2.5.0) - unfinished jobs are reclaimed later
+        if self.realtime_process and self.realtime_process.poll() is None:
+            self.logger.info("Stopping near-real-time processing...")
+            try:
+                self.realtime_process.terminate()
+                self.realtime_process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.realtime_process.kill()
+                self.realtime_process.wait(timeout=5)
+            except Exception as e:
+                self.logger.error(f"Error stopping near-real-time processing: {e}")
+
         # Stop processing process
         if self.processing_process and self.processing_process.poll() is None:
             self.logger.info("Stopping video processing...")
@@ -686,6 +793,8 @@ class SurveillanceService:
 
             in_process_window = self.is_in_time_window(PROCESS_START_HOUR, PROCESS_END_HOUR)
             print(f"Processing window: {'🟢 ACTIVE' if in_process_window else '🔴 INACTIVE'}")
+            print(f"Near-real-time processing: {'🟢 ENABLED' if NEAR_REALTIME_ENABLED else '⚪ DISABLED'}"
+                  f" (lag {NEAR_REALTIME_LAG_SECONDS}s)")
 
             return True
         except OSError:
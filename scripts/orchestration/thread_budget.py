@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Thread Budget - CPU Thread Allocation for Concurrent Detection Workers
+Version: 1.0.0
+Created: 2026-10-18
+
+Purpose:
+- Every detection subprocess sizes its torch, OpenCV and BLAS/OpenMP thread
+  pools to all cores by default; N workers on a CPU host then run N x cores
+  threads that thrash caches and the scheduler, and total frames/s drops below
+  what fewer workers would do
+- ThreadBudgetPlanner splits the usable cores between the current number of
+  workers and gives each worker explicit counts:
+    intra-op   torch.set_num_threads + OMP/MKL/OpenBLAS env limits
+    inter-op   torch.set_num_interop_threads (1, 2 with >= 8 cores per worker)
+    cv         cv2.setNumThreads + FFmpeg decode threads
+    cores      optional CPU affinity (--pin-cores): worker slot i gets its own core range
+- Allocations follow the worker count: each job is sized for the count at its
+  start, and pinned jobs that are already running are re-pinned when the
+  orchestrator scales (thread pool sizes cannot change inside a running process)
+
+Benchmark:
+    # frames/s for 1, 2 and 4 concurrent workers with default pools, budgeted pools
+    # and budgeted + pinned pools (throwaway databases, headless)
+    python3 thread_budget.py benchmark --video ../../videos/20251209/camera_35/camera_35_20251209_180441.mp4 \\
+        --workers 1 2 4 --duration 60
+
+    # What the planner would hand out
+    python3 thread_budget.py plan --workers 3
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+BENCHMARKS_DIR = SCRIPT_DIR.parent.parent / "logs" / "thread_benchmarks"
+
+DEFAULT_RESERVE_CORES = 1            # Left for the orchestrator, capture and the OS
+INTEROP_SPLIT_CORES = 8              # Workers with this many cores get 2 inter-op threads
+
+# Libraries that read their pool size from the environment at import time
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+                   "NUMEXPR_NUM_THREADS", "VECLIB_MAXIMUM_THREADS")
+
+BENCHMARK_MODES = ("default", "budget", "pinned")
+
+
+def available_cores() -> List[int]:
+    """CPUs this process may run on (respects cgroups/taskset where supported)"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def format_cores(cores: List[int]) -> str:
+    """[0, 1, 2, 3, 8] -> "0-3,8" (taskset list format)"""
+    ranges = []
+    for core in sorted(cores):
+        if ranges and core == ranges[-1][1] + 1:
+            ranges[-1][1] = core
+        else:
+            ranges.append([core, core])
+    return ",".join(f"{a}-{b}" if a != b else str(a) for a, b in ranges)
+
+
+def pin_process(pid: int, cores: List[int]) -> bool:
+    """
+    Move every thread of a running process onto `cores` (Linux). Affinity is
+    per thread, so the main pid alone would leave existing pool threads behind.
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        return False
+    task_dir = Path(f"/proc/{pid}/task")
+    thread_ids = [int(t.name) for t in task_dir.iterdir()] if task_dir.exists() else [pid]
+    pinned = False
+    for tid in thread_ids:
+        try:
+            os.sched_setaffinity(tid, cores)
+            pinned = True
+        except OSError:
+            continue  # Thread exited meanwhile
+    return pinned
+
+
+class ThreadBudget:
+    """Thread counts (and optional cores) for one detection subprocess"""
+
+    def __init__(self, intra_op: int, inter_op: int, cv_threads: int, cores: Optional[List[int]] = None):
+        self.intra_op = intra_op
+        self.inter_op = inter_op
+        self.cv_threads = cv_threads
+        self.cores = cores
+
+    def env(self) -> Dict[str, str]:
+        """Environment for the child (must be set before torch/numpy are imported)"""
+        env = {name: str(self.intra_op) for name in THREAD_ENV_VARS}
+        env["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = f"threads;{self.cv_threads}"
+        return env
+
+    def detection_args(self) -> List[str]:
+        """table_and_region_state_detection.py flags"""
+        args = ["--torch-threads", str(self.intra_op),
+                "--interop-threads", str(self.inter_op),
+                "--cv-threads", str(self.cv_threads)]
+        if self.cores:
+            args.extend(["--cpu-cores", format_cores(self.cores)])
+        return args
+
+    def describe(self) -> str:
+        text = f"{self.intra_op} intra / {self.inter_op} inter-op, cv {self.cv_threads}"
+        if self.cores:
+            text += f", cores {format_cores(self.cores)}"
+        return text
+
+    def to_dict(self) -> Dict:
+        return {"intra_op": self.intra_op, "inter_op": self.inter_op,
+                "cv_threads": self.cv_threads, "cores": self.cores}
+
+
+class ThreadBudgetPlanner:
+    """
+    Splits usable cores evenly between the running workers
+
+    mode: 'auto' (only applied when scaling on the CPU backend), 'on' or 'off'
+    torch_threads / cv_threads: fixed per-worker overrides
+    """
+
+    def __init__(self, mode: str = "auto", pin: bool = False,
+                 reserve_cores: int = DEFAULT_RESERVE_CORES,
+                 torch_threads: Optional[int] = None, cv_threads: Optional[int] = None,
+                 cores: Optional[List[int]] = None):
+        self.mode = mode
+        self.pin = pin
+        self.torch_threads = torch_threads
+        self.cv_threads = cv_threads
+        all_cores = cores if cores is not None else available_cores()
+        # Never reserve everything: a single-core host still gets one worker core
+        reserve = min(reserve_cores, len(all_cores) - 1) if len(all_cores) > 1 else 0
+        self.cores = all_cores[reserve:]
+
+    def cores_per_worker(self, workers: int) -> int:
+        return max(1, len(self.cores) // max(1, workers))
+
+    def allocate(self, slot: int, workers: int) -> ThreadBudget:
+        """
+        Budget for worker `slot` while `workers` workers run. Slots past the
+        worker count (a worker finishing its last job after a scale-down)
+        share the range of slot % workers.
+        """
+        workers = max(1, workers)
+        per_worker = self.cores_per_worker(workers)
+        intra_op = self.torch_threads or per_worker
+        inter_op = 2 if per_worker >= INTEROP_SPLIT_CORES else 1
+        cv_threads = self.cv_threads or per_worker
+
+        cores = None
+        if self.pin:
+            start = (slot % workers) * per_worker % len(self.cores)
+            cores = self.cores[start:start + per_worker] or self.cores[:per_worker]
+        return ThreadBudget(intra_op, inter_op, cv_threads, cores)
+
+    def describe(self, workers: int) -> str:
+        return (f"{len(self.cores)} usable core(s) ({format_cores(self.cores)}), "
+                f"{workers} worker(s) x {self.allocate(0, workers).describe()}"
+                f"{' [pinned]' if self.pin else ''}")
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def run_benchmark_config(video: str, workers: int, mode: str, duration: int,
+                         planner: ThreadBudgetPlanner, work_dir: Path) -> Dict:
+    """Run `workers` concurrent detections of the same video, measure total frames/s"""
+    # Lazy import: the orchestrator imports this module
+    sys.path.insert(0, str(SCRIPT_DIR.parent))
+    from orchestration.process_videos_orchestrator import DetectionRun, DETECTION_SCRIPT
+
+    runs = []
+    budgets = []
+    started = time.time()
+    for slot in range(workers):
+        run_dir = work_dir / f"{mode}_{workers}_{slot}"
+        run_dir.mkdir(parents=True, exist_ok=True)
+        cmd = ["python3", str(DETECTION_SCRIPT), "--video", video, "--duration", str(duration),
+               "--headless", "--output", str(run_dir), "--db", str(run_dir / "detection_data.db")]
+        env = None
+        if mode != "default":
+            planner.pin = mode == "pinned"
+            budget = planner.allocate(slot, workers)
+            budgets.append(budget.to_dict())
+            cmd.extend(budget.detection_args())
+            env = budget.env()
+        runs.append(DetectionRun(cmd, env))
+
+    exit_codes = []
+    for run in runs:
+        exit_codes.append(run.process.wait())
+        run.finish()
+    wall = time.time() - started
+    frames = sum(run.processed_frames for run in runs)
+    return {
+        "mode": mode,
+        "workers": workers,
+        "wall_seconds": round(wall, 1),
+        "frames": frames,
+        "frames_per_second": round(frames / wall, 2) if wall > 0 else 0.0,
+        "exit_codes": exit_codes,
+        "budgets": budgets,
+    }
+
+
+def benchmark(video: str, worker_counts: List[int], modes: List[str], duration: int,
+              reserve_cores: int = DEFAULT_RESERVE_CORES) -> Path:
+    """Throughput per (mode, worker count); results printed and saved as JSON"""
+    planner = ThreadBudgetPlanner("on", reserve_cores=reserve_cores)
+    print(f"🧪 Thread budget benchmark: {Path(video).name}, {duration}s per run, "
+          f"{len(planner.cores)} usable cores")
+    results = []
+    with tempfile.TemporaryDirectory(prefix="thread_benchmark_") as tmp:
+        for workers in worker_counts:
+            for mode in modes:
+                print(f"   ▶️  {workers} worker(s), {mode} ...", flush=True)
+                result = run_benchmark_config(video, workers, mode, duration, planner, Path(tmp))
+                failed = [code for code in result["exit_codes"] if code != 0]
+                print(f"      {result['frames_per_second']:.2f} frames/s "
+                      f"({result['frames']} frames in {result['wall_seconds']}s)"
+                      f"{f' - {len(failed)} run(s) failed' if failed else ''}")
+                results.append(result)
+
+    best = max(results, key=lambda r: r["frames_per_second"]) if results else None
+    print("\n" + "=" * 60)
+    print(f"{'Workers':>8} {'Mode':>10} {'frames/s':>10}")
+    for result in results:
+        marker = "  <- best" if result is best else ""
+        print(f"{result['workers']:>8} {result['mode']:>10} {result['frames_per_second']:>10.2f}{marker}")
+    print("=" * 60)
+
+    BENCHMARKS_DIR.mkdir(parents=True, exist_ok=True)
+    report = BENCHMARKS_DIR / f"thread_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    report.write_text(json.dumps({
+        "video": video, "duration": duration, "cores": planner.cores,
+        "results": results, "best": best,
+    }, indent=2))
+    print(f"📄 Report: {report}")
+    return report
+
+
+# ============================================================================
+# MAIN ENTRY POINT
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="CPU thread budgets for concurrent detection workers",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python3 thread_budget.py plan --workers 4 --pin-cores
+  python3 thread_budget.py benchmark --video VIDEO.mp4 --workers 1 2 4 --duration 60
+        """
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    plan_parser = sub.add_parser("plan", help="Show per-worker allocations")
+    plan_parser.add_argument("--workers", type=int, required=True)
+    plan_parser.add_argument("--pin-cores", action="store_true")
+    plan_parser.add_argument("--reserve-cores", type=int, default=DEFAULT_RESERVE_CORES)
+
+    bench_parser = sub.add_parser("benchmark", help="Measure frames/s per configuration")
+    bench_parser.add_argument("--video", required=True, help="Video to process (same file for every run)")
+    bench_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+                              help="Concurrent worker counts to try (default: 1 2 4)")
+    bench_parser.add_argument("--modes", nargs="+", default=list(BENCHMARK_MODES), choices=BENCHMARK_MODES,
+                              help="default (library pools), budget, pinned (budget + core affinity)")
+    bench_parser.add_argument("--duration", type=int, default=60, help="Seconds of video per run (default: 60)")
+    bench_parser.add_argument("--reserve-cores", type=int, default=DEFAULT_RESERVE_CORES)
+
+    args = parser.parse_args()
+
+    if args.command == "plan":
+        planner = ThreadBudgetPlanner("on", args.pin_cores, args.reserve_cores)
+        print(planner.describe(args.workers))
+        for slot in range(args.workers):
+            print(f"   worker {slot}: {planner.allocate(slot, args.workers).describe()}")
+    elif args.command == "benchmark":
+        benchmark(args.video, args.workers, args.modes, args.duration, args.reserve_cores)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,831 @@
+#!/usr/bin/env python3
+"""
+Shared Work Queue - Multi-Node Processing over HTTP
+Version: 1.1.0
+Created: 2026-10-18
+Modified: 2026-10-18 - /results carries job_id/worker_id: results are ingested and the job
+          completed in one transaction, only under a live lease (409 otherwise)
+Modified: 2026-10-18 - /results uses the coordinator's own schema, token required off loopback
+Modified: 2026-10-18 - session_profiles rows (stage timings) ship with the session
+Modified: 2026-10-18 - camera_events rows ship with the session (frame quality gate)
+
+Purpose:
+- Let several processing nodes share one processing_jobs table: one host
+  (the coordinator) owns db/detection_data.db and serves the job table over
+  HTTP; nodes run the normal orchestrator with --queue URL and pull jobs from it
+- Segments live on shared storage (NFS/SMB); --path-map rewrites the
+  coordinator's video paths to the node's mount point
+- Each node runs detection into its own local database and ships the finished
+  session (sessions + table_states + division_states + camera_events + session_profiles
+  rows) back to the coordinator before completing the job
+
+Guarantees:
+- Claims stay atomic: the coordinator claims through ProcessingJobStore
+  (BEGIN IMMEDIATE), so two nodes can never get the same job
+- Leases: nodes heartbeat through the coordinator; a node that stops
+  heartbeating loses the job after STALE_CLAIM_SECONDS and its late
+  complete/fail is rejected (worker_id lease check in processing_jobs.py)
+- Idempotent ingestion: a session is written in one transaction as
+  INSERT OR REPLACE (sessions) + delete/re-insert of its state rows, so a
+  retried or duplicated /results call leaves exactly one copy
+- Results and completion are one transaction (/results completes the job):
+  it commits only while the sending worker holds a live lease
+  (ProcessingJobStore.complete_leased). A stale or reclaimed node gets 409 and
+  nothing it sent is written, so one video never ends up with sessions from
+  two workers; if ingestion fails the job is failed (and retried), never
+  marked done without its data
+
+Security:
+- serve refuses a non-loopback --host without a token; the X-Queue-Token
+  header is compared in constant time
+- /results never executes node-supplied SQL: result tables are created from
+  the coordinator's own RESULT_TABLES, incoming columns are checked against
+  PRAGMA table_info (unknown ones reject the payload) and identifiers are quoted
+
+Endpoints (JSON in, JSON out, X-Queue-Token header when a token is set):
+    GET  /status                              job table counts
+    POST /claim      {worker_id, camera_ids}  -> {job} or {job: null}
+    POST /heartbeat  {job_id, worker_id}      -> {ok}
+    POST /complete   {job_id, worker_id, exit_code, processing_seconds, skipped} -> {ok}
+    POST /fail       {job_id, worker_id, exit_code, error_message, processing_seconds, retry} -> {retry}
+    POST /results    {job_id, worker_id, exit_code, processing_seconds, skipped, sessions}
+                     -> {sessions, table_states, division_states, camera_events, session_profiles}
+                        (job completed; 409 when the lease is lost)
+    POST /outstanding {camera_ids}            -> {count}
+    POST /jobs       {status, camera_ids}     -> {jobs}
+
+Usage:
+    # Coordinator (also runs the normal orchestrator for discovery/processing)
+    python3 work_queue.py serve --port 8765 --token secret
+
+    # Node
+    python3 process_videos_orchestrator.py --queue http://coordinator:8765 \\
+        --queue-token secret --path-map /srv/videos=/mnt/restaurant/videos
+
+    # Two local processes standing in for two nodes
+    python3 work_queue.py selftest
+"""
+
+import argparse
+import hmac
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+from orchestration.processing_jobs import (
+    ProcessingJobStore, default_worker_id, STATUS_DONE, MAX_JOB_ATTEMPTS, STALE_CLAIM_SECONDS
+)
+from video_capture.segment_manifest import SegmentManifest
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+DATABASE_PATH = SCRIPT_DIR.parent.parent / "db" / "detection_data.db"
+
+DEFAULT_PORT = 8765
+TOKEN_HEADER = "X-Queue-Token"
+REQUEST_TIMEOUT_SECONDS = 30
+REQUEST_RETRIES = 3                  # Transport errors only (HTTP errors are not retried)
+RETRY_BACKOFF_SECONDS = 2
+
+# Detection result tables shipped from node to coordinator (session_id keyed)
+SESSION_TABLE = "sessions"
+STATE_TABLES = ("table_states", "division_states", "camera_events", "session_profiles")
+
+# The coordinator's schema for them: same columns as init_database() in
+# table_and_region_state_detection.py (sessions including SESSION_COLUMNS).
+# Only these statements are ever executed on the coordinator; add new
+# detection columns here too, or nodes shipping them are rejected.
+RESULT_TABLES = {
+    "sessions": """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY, camera_id TEXT, video_file TEXT NOT NULL,
+            start_time TEXT NOT NULL, end_time TEXT, total_frames INTEGER, fps REAL,
+            resolution TEXT, config_file TEXT,
+            processing_status TEXT, error_message TEXT, checkpoint_frame INTEGER,
+            checkpoint_state TEXT, checkpoint_at TEXT, cascade_escalation_rate REAL,
+            effective_fps REAL, fps_profile TEXT, frames_skipped_dark INTEGER,
+            frames_skipped_blurred INTEGER, frames_skipped_repeat INTEGER, config_hash TEXT
+        )""",
+    "division_states": """
+        CREATE TABLE IF NOT EXISTS division_states (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, camera_id TEXT,
+            frame_number INTEGER NOT NULL, timestamp REAL NOT NULL, state TEXT NOT NULL,
+            walking_area_waiters INTEGER, service_area_waiters INTEGER, screenshot_path TEXT,
+            FOREIGN KEY (session_id) REFERENCES sessions(session_id)
+        )""",
+    "table_states": """
+        CREATE TABLE IF NOT EXISTS table_states (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, camera_id TEXT,
+            frame_number INTEGER NOT NULL, timestamp REAL NOT NULL, table_id TEXT NOT NULL,
+            state TEXT NOT NULL, customers_count INTEGER, waiters_count INTEGER, screenshot_path TEXT,
+            FOREIGN KEY (session_id) REFERENCES sessions(session_id)
+        )""",
+    "camera_events": """
+        CREATE TABLE IF NOT EXISTS camera_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, camera_id TEXT,
+            event_type TEXT NOT NULL, frame_number INTEGER NOT NULL, end_frame INTEGER,
+            media_seconds REAL, duration_seconds REAL, timestamp REAL NOT NULL, details TEXT,
+            FOREIGN KEY (session_id) REFERENCES sessions(session_id)
+        )""",
+    "session_profiles": """
+        CREATE TABLE IF NOT EXISTS session_profiles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, camera_id TEXT,
+            code_version TEXT, backend TEXT, stage TEXT NOT NULL, samples INTEGER NOT NULL,
+            total_ms REAL, mean_ms REAL, p50_ms REAL, p95_ms REAL, p99_ms REAL, max_ms REAL,
+            histogram TEXT, created_at TEXT,
+            FOREIGN KEY (session_id) REFERENCES sessions(session_id)
+        )""",
+}
+_result_columns: Optional[Dict[str, Dict[str, str]]] = None
+
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+
+class WorkQueueError(Exception):
+    """Coordinator unreachable or request rejected"""
+
+
+class LeaseLostError(WorkQueueError):
+    """The worker no longer holds the job (stale heartbeat or reclaimed) - HTTP 409"""
+
+
+# ============================================================================
+# RESULTS (node side: collect, coordinator side: ingest)
+# ============================================================================
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> Optional[Dict[str, str]]:
+    """{column: type} of a table, None if it does not exist (table is one of ours, never from a request)"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()
+    if row is None:
+        return None
+    return {col[1]: col[2] for col in conn.execute(f"PRAGMA table_info({_quote(table)})").fetchall()}
+
+
+def _quote(identifier: str) -> str:
+    """SQLite identifier quoting ("a""b")"""
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+
+def collect_session_results(db_path: Path, camera_id: str, video_file: str) -> Dict:
+    """
+    Finished detection sessions for one video from a node's local database
+
+    Returns:
+        {"sessions": [{"session": row, "table_states": [rows], "division_states": [rows],
+         "camera_events": [rows], "session_profiles": [rows]}]}
+        (rows without their local autoincrement id)
+    """
+    payload: Dict = {"sessions": []}
+    db_path = Path(db_path)
+    if not db_path.exists():
+        return payload
+
+    conn = sqlite3.connect(str(db_path), timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        columns = {table: _table_columns(conn, table) for table in (SESSION_TABLE,) + STATE_TABLES}
+        if columns[SESSION_TABLE] is None:
+            return payload
+
+        finished = "end_time IS NOT NULL"
+        if "processing_status" in columns[SESSION_TABLE]:
+            finished = "(processing_status = 'complete' OR (processing_status IS NULL AND end_time IS NOT NULL))"
+        sessions = conn.execute(
+            f"SELECT * FROM {SESSION_TABLE} WHERE camera_id = ? AND video_file = ? AND {finished}",
+            (camera_id, video_file)
+        ).fetchall()
+
+        for session in sessions:
+            entry = {"session": dict(session)}
+            for table in STATE_TABLES:
+                if columns[table] is None:
+                    continue
+                rows = conn.execute(
+                    f"SELECT * FROM {table} WHERE session_id = ? ORDER BY id", (session["session_id"],)
+                ).fetchall()
+                entry[table] = [{k: row[k] for k in row.keys() if k != "id"} for row in rows]
+            payload["sessions"].append(entry)
+        return payload
+    finally:
+        conn.close()
+
+
+def _result_schema() -> Dict[str, Dict[str, str]]:
+    """{table: {column: type}} of RESULT_TABLES (parsed once through an in-memory database)"""
+    global _result_columns
+    if _result_columns is None:
+        conn = sqlite3.connect(":memory:")
+        for create_sql in RESULT_TABLES.values():
+            conn.execute(create_sql)
+        _result_columns = {table: _table_columns(conn, table) for table in RESULT_TABLES}
+        conn.close()
+    return _result_columns
+
+
+def ensure_result_tables(conn: sqlite3.Connection):
+    """
+    Create missing result tables from the coordinator's own schema and add the
+    columns an older database lacks. Schemas sent by nodes are never executed.
+    """
+    for table, columns in _result_schema().items():
+        existing = _table_columns(conn, table)
+        if existing is None:
+            conn.execute(RESULT_TABLES[table])
+            continue
+        for column, column_type in columns.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {_quote(table)} ADD COLUMN {_quote(column)} {column_type}")
+
+
+def _insert_rows(conn: sqlite3.Connection, table: str, rows: List[Dict], known: Dict[str, str],
+                 replace: bool = False):
+    """Insert node rows; a column the coordinator's table does not have rejects the payload"""
+    verb = "INSERT OR REPLACE" if replace else "INSERT"
+    for row in rows:
+        columns = list(row.keys())
+        unknown = [c for c in columns if c not in known]
+        if unknown:
+            raise ValueError(f"unknown {table} column(s): {', '.join(map(str, unknown[:5]))}")
+        conn.execute(
+            f"{verb} INTO {_quote(table)} ({', '.join(map(_quote, columns))}) "
+            f"VALUES ({', '.join('?' * len(columns))})",
+            [row[c] for c in columns]
+        )
+
+
+def ingest_session_results(job_store: ProcessingJobStore, payload: Dict) -> Dict[str, int]:
+    """
+    Write shipped sessions into the coordinator database and complete their job
+
+    One transaction for the whole payload plus the completion: each session row
+    is upserted and its state rows replaced, then payload job_id is completed
+    for payload worker_id under complete_leased(). Without a live lease the
+    transaction rolls back and LeaseLostError is raised (HTTP 409); retrying
+    the same payload under the same lease is a no-op.
+    Tables and columns come from the coordinator's schema (RESULT_TABLES);
+    rows with columns it does not know raise ValueError (HTTP 400).
+
+    Returns:
+        Row counts written per table
+    """
+    job_id, worker_id = int(payload["job_id"]), payload["worker_id"]
+    if not worker_id:
+        raise ValueError("worker_id required")
+    counts = {SESSION_TABLE: 0, **{table: 0 for table in STATE_TABLES}}
+
+    conn = sqlite3.connect(str(job_store.db_path), timeout=30, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        ensure_result_tables(conn)
+        known = {table: _table_columns(conn, table) for table in counts}
+
+        for entry in payload.get("sessions") or []:
+            session = entry["session"]
+            session_id = session["session_id"]
+            _insert_rows(conn, SESSION_TABLE, [session], known[SESSION_TABLE], replace=True)
+            counts[SESSION_TABLE] += 1
+            for table in STATE_TABLES:
+                if table not in entry:
+                    continue
+                conn.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,))
+                _insert_rows(conn, table, entry[table], known[table])
+                counts[table] += len(entry[table])
+
+        if not job_store.complete_leased(conn, job_id, worker_id, payload.get("exit_code", 0),
+                                         payload.get("processing_seconds"), bool(payload.get("skipped"))):
+            raise LeaseLostError(f"job {job_id} is not held by {worker_id}")
+        conn.execute("COMMIT")
+        return counts
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+# ============================================================================
+# COORDINATOR (HTTP server around ProcessingJobStore)
+# ============================================================================
+
+class WorkQueueServer(ThreadingHTTPServer):
+    """Serves one ProcessingJobStore to remote nodes"""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], db_path: Path, token: Optional[str] = None,
+                 stale_seconds: int = STALE_CLAIM_SECONDS, max_attempts: int = MAX_JOB_ATTEMPTS,
+                 verbose: bool = True):
+        super().__init__(address, WorkQueueHandler)
+        self.db_path = Path(db_path)
+        self.token = token
+        self.verbose = verbose
+        self.job_store = ProcessingJobStore(self.db_path, stale_seconds, max_attempts)
+        self.manifest = SegmentManifest(self.db_path)
+
+    def log(self, message: str):
+        if self.verbose:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}", flush=True)
+
+    def mark_processed(self, job_id: int):
+        """Same bookkeeping as a local successful job: flag the segment in the manifest"""
+        job = self.job_store.get_job(job_id)
+        if job is None:
+            return
+        try:
+            self.manifest.mark_processed(job["camera_id"], job["video_file"])
+        except sqlite3.Error as e:
+            self.log(f"⚠️  Could not mark {job['video_file']} processed in manifest: {e}")
+
+
+class WorkQueueHandler(BaseHTTPRequestHandler):
+    server: WorkQueueServer
+
+    def log_message(self, format, *args):
+        pass  # Request lines are noise; the server logs job transitions itself
+
+    def _reply(self, status: int, body: Dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self) -> bool:
+        if self.server.token and not hmac.compare_digest(
+                self.headers.get(TOKEN_HEADER, "").encode("utf-8"), self.server.token.encode("utf-8")):
+            self._reply(403, {"error": "invalid token"})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path == "/status":
+            self._reply(200, {"status_counts": self.server.job_store.status_counts()})
+        else:
+            self._reply(404, {"error": f"unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            handler = {
+                "/claim": self._claim,
+                "/heartbeat": self._heartbeat,
+                "/complete": self._complete,
+                "/fail": self._fail,
+                "/results": self._results,
+                "/outstanding": self._outstanding,
+                "/jobs": self._jobs,
+            }.get(self.path)
+            if handler is None:
+                self._reply(404, {"error": f"unknown endpoint {self.path}"})
+                return
+            self._reply(200, handler(request))
+        except LeaseLostError as e:
+            self._reply(409, {"error": f"lease lost: {e}"})
+        except (KeyError, ValueError, TypeError, AttributeError) as e:
+            self._reply(400, {"error": f"bad request: {e}"})
+        except sqlite3.Error as e:
+            self._reply(503, {"error": f"database error: {e}"})
+
+    def _claim(self, request: Dict) -> Dict:
+        job = self.server.job_store.claim(request["worker_id"], request.get("camera_ids"))
+        if job is not None:
+            self.server.log(f"▶️  {job['worker_id']} claimed job {job['job_id']} "
+                            f"({job['camera_id']}/{job['video_file']}, attempt {job['attempts']})")
+        return {"job": job}
+
+    def _heartbeat(self, request: Dict) -> Dict:
+        return {"ok": self.server.job_store.heartbeat(int(request["job_id"]), request["worker_id"])}
+
+    def _complete(self, request: Dict) -> Dict:
+        job_id = int(request["job_id"])
+        ok = self.server.job_store.complete(
+            job_id, request.get("exit_code", 0), request.get("processing_seconds"),
+            skipped=bool(request.get("skipped")), worker_id=request["worker_id"]
+        )
+        if ok:
+            self.server.mark_processed(job_id)
+            self.server.log(f"✅ {request['worker_id']} completed job {job_id}")
+        else:
+            self.server.log(f"⚠️  Rejected complete for job {job_id} from {request['worker_id']} (lease lost)")
+        return {"ok": ok}
+
+    def _fail(self, request: Dict) -> Dict:
+        job_id = int(request["job_id"])
+        retry = self.server.job_store.fail(
+            job_id, request.get("exit_code"), request.get("error_message", ""),
+            request.get("processing_seconds"), retry=request.get("retry", True),
+            worker_id=request["worker_id"]
+        )
+        self.server.log(f"❌ {request['worker_id']} failed job {job_id}{' (will retry)' if retry else ''}")
+        return {"retry": retry}
+
+    def _results(self, request: Dict) -> Dict:
+        job_id = int(request["job_id"])
+        try:
+            counts = ingest_session_results(self.server.job_store, request)
+        except LeaseLostError:
+            self.server.log(f"⚠️  Rejected results for job {job_id} from {request['worker_id']} (lease lost)")
+            raise
+        self.server.mark_processed(job_id)
+        self.server.log(f"📥 {request['worker_id']} completed job {job_id} with {counts[SESSION_TABLE]} session(s): "
+                        + ", ".join(f"{n} {t}" for t, n in counts.items() if t != SESSION_TABLE))
+        return counts
+
+    def _outstanding(self, request: Dict) -> Dict:
+        return {"count": self.server.job_store.outstanding_count(request.get("camera_ids"))}
+
+    def _jobs(self, request: Dict) -> Dict:
+        return {"jobs": self.server.job_store.list_jobs(request.get("status", "pending"),
+                                                        request.get("camera_ids"))}
+
+
+def serve(db_path: Path, host: str = "0.0.0.0", port: int = DEFAULT_PORT, token: Optional[str] = None,
+          stale_seconds: int = STALE_CLAIM_SECONDS, max_attempts: int = MAX_JOB_ATTEMPTS):
+    """Run the coordinator until interrupted (a token is required unless bound to loopback)"""
+    if not token and host not in LOOPBACK_HOSTS:
+        raise WorkQueueError(f"Refusing to serve on {host} without a token "
+                             f"(set --token / $WORK_QUEUE_TOKEN, or --host 127.0.0.1)")
+    server = WorkQueueServer((host, port), db_path, token, stale_seconds, max_attempts)
+    print(f"📡 Work queue serving {db_path} on http://{socket.gethostname()}:{server.server_address[1]}"
+          f"{' (token required)' if token else ''}")
+    print(f"   Job table: {server.job_store.status_counts()}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️  Work queue stopped")
+    finally:
+        server.server_close()
+
+
+# ============================================================================
+# NODE CLIENT (drop-in for ProcessingJobStore in the orchestrator)
+# ============================================================================
+
+def parse_path_maps(specs: Optional[List[str]]) -> List[Tuple[str, str]]:
+    """["/srv/videos=/mnt/videos", ...] -> [("/srv/videos", "/mnt/videos"), ...] (longest prefix first)"""
+    maps = []
+    for spec in specs or []:
+        source, sep, target = spec.partition("=")
+        if not sep or not source:
+            raise ValueError(f"Invalid path map '{spec}' (expected COORDINATOR_PREFIX=LOCAL_PREFIX)")
+        maps.append((source.rstrip("/"), target.rstrip("/")))
+    return sorted(maps, key=lambda m: len(m[0]), reverse=True)
+
+
+class RemoteJobStore:
+    """
+    ProcessingJobStore interface backed by a coordinator's /claim, /heartbeat, ...
+
+    Only the calls a processing node makes are supported (claim, heartbeat,
+    complete, fail, outstanding_count, list_jobs, status_counts); discovery,
+    planning and re-queueing stay on the coordinator.
+    """
+
+    def __init__(self, url: str, token: Optional[str] = None,
+                 path_maps: Optional[List[Tuple[str, str]]] = None,
+                 results_db: Path = DATABASE_PATH, max_attempts: int = MAX_JOB_ATTEMPTS):
+        self.url = url.rstrip("/")
+        self.token = token
+        self.path_maps = path_maps or []
+        self.results_db = Path(results_db)
+        self.max_attempts = max_attempts  # Informational - the coordinator enforces its own limit
+        self.completed_by_results = set()  # Job ids /results already completed (complete() is a no-op)
+
+    def _request(self, endpoint: str, body: Optional[Dict] = None, retries: int = REQUEST_RETRIES) -> Dict:
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers[TOKEN_HEADER] = self.token
+
+        last_error: Optional[Exception] = None
+        for attempt in range(retries):
+            request = urllib.request.Request(f"{self.url}{endpoint}", data=data, headers=headers,
+                                             method="POST" if data is not None else "GET")
+            try:
+                with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT_SECONDS) as response:
+                    return json.loads(response.read() or b"{}")
+            except urllib.error.HTTPError as e:
+                try:
+                    detail = json.loads(e.read()).get("error", e.reason)
+                except ValueError:
+                    detail = e.reason
+                error = LeaseLostError if e.code == 409 else WorkQueueError
+                raise error(f"{endpoint}: HTTP {e.code} {detail}")
+            except (urllib.error.URLError, OSError) as e:
+                last_error = e
+                if attempt < retries - 1:
+                    time.sleep(RETRY_BACKOFF_SECONDS * (attempt + 1))
+        raise WorkQueueError(f"{endpoint}: coordinator unreachable ({last_error})")
+
+    def map_path(self, path: str) -> str:
+        """Coordinator video path -> path on this node's shared-storage mount"""
+        for source, target in self.path_maps:
+            if path == source or path.startswith(source + "/"):
+                return target + path[len(source):]
+        return path
+
+    def claim(self, worker_id: str, camera_ids: Optional[List[str]] = None) -> Optional[Dict]:
+        job = self._request("/claim", {"worker_id": worker_id, "camera_ids": camera_ids}).get("job")
+        if job is not None:
+            job["video_path"] = self.map_path(job["video_path"])
+        return job
+
+    def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        """
+        Refresh the lease. A coordinator outage is not a lost claim: keep
+        running and let the lease check on complete() decide.
+        """
+        try:
+            return bool(self._request("/heartbeat", {"job_id": job_id, "worker_id": worker_id}, retries=1)["ok"])
+        except WorkQueueError:
+            return True
+
+    def complete(self, job_id: int, exit_code: int = 0, processing_seconds: Optional[float] = None,
+                 skipped: bool = False, worker_id: Optional[str] = None) -> bool:
+        if job_id in self.completed_by_results:
+            self.completed_by_results.discard(job_id)
+            return True
+        return bool(self._request("/complete", {
+            "job_id": job_id, "worker_id": worker_id, "exit_code": exit_code,
+            "processing_seconds": processing_seconds, "skipped": skipped,
+        })["ok"])
+
+    def fail(self, job_id: int, exit_code: Optional[int], error_message: str,
+             processing_seconds: Optional[float] = None, retry: bool = True,
+             worker_id: Optional[str] = None) -> bool:
+        return bool(self._request("/fail", {
+            "job_id": job_id, "worker_id": worker_id, "exit_code": exit_code,
+            "error_message": (error_message or "")[:2000],
+            "processing_seconds": processing_seconds, "retry": retry,
+        })["retry"])
+
+    def publish_results(self, job_id: int, worker_id: str, camera_id: str, video_file: str,
+                        exit_code: int = 0, processing_seconds: Optional[float] = None,
+                        skipped: bool = False) -> Dict[str, int]:
+        """
+        Ship this node's finished session(s) for a video to the coordinator,
+        which completes the job in the same transaction.
+        Raises LeaseLostError when this worker no longer holds the job.
+        """
+        payload = collect_session_results(self.results_db, camera_id, video_file)
+        payload.update(job_id=job_id, worker_id=worker_id, exit_code=exit_code,
+                       processing_seconds=processing_seconds, skipped=skipped)
+        counts = self._request("/results", payload)
+        self.completed_by_results.add(job_id)
+        return counts
+
+    def outstanding_count(self, camera_ids: Optional[List[str]] = None) -> int:
+        return int(self._request("/outstanding", {"camera_ids": camera_ids})["count"])
+
+    def list_jobs(self, status: str = "pending", camera_ids: Optional[List[str]] = None) -> List[Dict]:
+        return self._request("/jobs", {"status": status, "camera_ids": camera_ids})["jobs"]
+
+    def status_counts(self) -> Dict[str, int]:
+        return self._request("/status")["status_counts"]
+
+
+# ============================================================================
+# SELF-TEST (coordinator + two local node processes)
+# ============================================================================
+
+SIM_NODE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY, camera_id TEXT, video_file TEXT NOT NULL,
+    start_time TEXT NOT NULL, end_time TEXT, total_frames INTEGER, processing_status TEXT
+);
+CREATE TABLE IF NOT EXISTS table_states (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, camera_id TEXT,
+    frame_number INTEGER NOT NULL, timestamp REAL NOT NULL, table_id TEXT NOT NULL, state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS division_states (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, camera_id TEXT,
+    frame_number INTEGER NOT NULL, timestamp REAL NOT NULL, state TEXT NOT NULL
+);
+"""
+
+
+def simulate_node(url: str, name: str, node_db: Path, token: Optional[str] = None):
+    """
+    Stand-in for a processing node: claim, heartbeat, write a fake session into
+    the node's own database, publish it (twice - a retry must stay idempotent),
+    complete (a no-op after /results).
+    Prints the claimed job ids as JSON on the last line.
+    """
+    conn = sqlite3.connect(str(node_db))
+    conn.executescript(SIM_NODE_SCHEMA)
+    conn.close()
+
+    store = RemoteJobStore(url, token, results_db=node_db)
+    worker_id = default_worker_id(name)
+    claimed = []
+    while True:
+        job = store.claim(worker_id)
+        if job is None:
+            break
+        claimed.append(job["job_id"])
+        store.heartbeat(job["job_id"], worker_id)
+
+        session_id = f"{job['camera_id']}_{Path(job['video_file']).stem}_{name}"
+        conn = sqlite3.connect(str(node_db))
+        conn.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, 'complete')",
+                     (session_id, job["camera_id"], job["video_file"],
+                      datetime.now().isoformat(), datetime.now().isoformat(), 30))
+        conn.execute("DELETE FROM table_states WHERE session_id = ?", (session_id,))
+        conn.execute("DELETE FROM division_states WHERE session_id = ?", (session_id,))
+        for frame in range(3):
+            conn.execute("INSERT INTO table_states (session_id, camera_id, frame_number, timestamp, "
+                         "table_id, state) VALUES (?, ?, ?, ?, 'T1', 'IDLE')",
+                         (session_id, job["camera_id"], frame, frame / 5))
+            conn.execute("INSERT INTO division_states (session_id, camera_id, frame_number, timestamp, "
+                         "state) VALUES (?, ?, ?, ?, 'GREEN')",
+                         (session_id, job["camera_id"], frame, frame / 5))
+        conn.commit()
+        conn.close()
+
+        store.publish_results(job["job_id"], worker_id, job["camera_id"], job["video_file"], 0, 0.1)
+        store.publish_results(job["job_id"], worker_id, job["camera_id"], job["video_file"], 0, 0.1)
+        store.complete(job["job_id"], 0, 0.1, worker_id=worker_id)
+    print(json.dumps({"node": name, "claimed": claimed}))
+
+
+def selftest() -> bool:
+    """Coordinator in this process, two nodes as subprocesses, throwaway databases"""
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        coordinator_db = tmp / "coordinator.db"
+        store = ProcessingJobStore(coordinator_db)
+        store.enqueue_many(
+            ("camera_35", f"/srv/videos/20251209/camera_35/camera_35_20251209_18{i:02d}00.mp4", "20251209", 0)
+            for i in range(20)
+        )
+
+        server = WorkQueueServer(("127.0.0.1", 0), coordinator_db, token="selftest", verbose=False)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        print(f"📡 Coordinator on {url}, 20 jobs queued")
+
+        nodes = [
+            subprocess.Popen([sys.executable, __file__, "simulate-node", url, "--name", name,
+                              "--node-db", str(tmp / f"{name}.db"), "--token", "selftest"],
+                             stdout=subprocess.PIPE, text=True)
+            for name in ("node-a", "node-b")
+        ]
+        claimed = []
+        for node in nodes:
+            out, _ = node.communicate(timeout=120)
+            result = json.loads(out.strip().splitlines()[-1])
+            print(f"   {result['node']}: {len(result['claimed'])} jobs")
+            claimed.extend(result["claimed"])
+
+        # Lease check: a complete from a worker that does not hold the job is rejected
+        remote = RemoteJobStore(url, "selftest")
+        stale_ok = remote.complete(claimed[0], 0, 1.0, worker_id="other-host:1:worker-0")
+
+        # Results from a worker without the lease are rejected (409) and nothing is written
+        lease = {"job_id": claimed[0], "worker_id": "other-host:1:worker-0"}
+        try:
+            remote._request("/results", dict(lease, sessions=[
+                {"session": {"session_id": "stale", "video_file": "stale", "start_time": "x"}}]))
+            stale_results_ok = True
+        except LeaseLostError:
+            stale_results_ok = False
+
+        # Payload SQL is never executed and unknown/injected columns are rejected
+        hostile = [
+            dict(lease, tables={"sessions": {"sql": "DROP TABLE sessions", "columns": {}}}, sessions=[
+                {"session": {"session_id": "x", "video_file": "x", "start_time": "x"}}]),
+            dict(lease, sessions=[{"session": {"session_id": "y", "video_file": "y", "start_time": "y",
+                                               "x) VALUES (1); DROP TABLE sessions; --": 1}}]),
+        ]
+        hostile_rejected = 0
+        for payload in hostile:
+            try:
+                remote._request("/results", payload)
+            except WorkQueueError:
+                hostile_rejected += 1
+        unauthorized = RemoteJobStore(url, "wrong-token")
+        try:
+            unauthorized.status_counts()
+            bad_token_ok = True
+        except WorkQueueError:
+            bad_token_ok = False
+
+        server.shutdown()
+        server.server_close()
+
+        conn = sqlite3.connect(str(coordinator_db))
+        sessions = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        rejected_rows = conn.execute(
+            "SELECT COUNT(*) FROM sessions WHERE session_id IN ('stale', 'x', 'y')").fetchone()[0]
+        table_rows = conn.execute("SELECT COUNT(*) FROM table_states").fetchone()[0]
+        division_rows = conn.execute("SELECT COUNT(*) FROM division_states").fetchone()[0]
+        conn.close()
+        counts = store.status_counts()
+
+        checks = {
+            "no double claims": len(claimed) == len(set(claimed)) == 20,
+            "all jobs done": counts == {STATUS_DONE: 20},
+            "one session per job": sessions == 20,
+            "state rows ingested once": table_rows == 60 and division_rows == 60,
+            "stale complete rejected": not stale_ok,
+            "stale results rejected (409), nothing written": not stale_results_ok and rejected_rows == 0,
+            "payload SQL ignored, unknown columns rejected": hostile_rejected == 2 and rejected_rows == 0,
+            "wrong token rejected": not bad_token_ok,
+        }
+        for check, ok in checks.items():
+            print(f"   {'✅' if ok else '❌'} {check}")
+        print(f"   Job table: {counts} | sessions {sessions}, table_states {table_rows}, "
+              f"division_states {division_rows}")
+        return all(checks.values())
+
+
+# ============================================================================
+# MAIN ENTRY POINT
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Shared work queue for multi-node video processing",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Coordinator: serve the local job table to processing nodes
+  python3 work_queue.py serve --port 8765 --token secret
+
+  # Check a running coordinator
+  python3 work_queue.py status http://coordinator:8765 --token secret
+
+  # Coordinator + two local node processes on throwaway databases
+  python3 work_queue.py selftest
+        """
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = sub.add_parser("serve", help="Serve the processing_jobs table over HTTP")
+    serve_parser.add_argument("--db", default=str(DATABASE_PATH), help=f"Database (default: {DATABASE_PATH})")
+    serve_parser.add_argument("--host", default="0.0.0.0", help="Bind address (default: 0.0.0.0)")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default: {DEFAULT_PORT})")
+    serve_parser.add_argument("--token", default=os.environ.get("WORK_QUEUE_TOKEN"),
+                              help="Shared secret nodes must send (default: $WORK_QUEUE_TOKEN; "
+                                   "required unless --host is loopback)")
+    serve_parser.add_argument("--stale-seconds", type=int, default=STALE_CLAIM_SECONDS,
+                              help=f"Lease length without heartbeat (default: {STALE_CLAIM_SECONDS})")
+    serve_parser.add_argument("--max-attempts", type=int, default=MAX_JOB_ATTEMPTS,
+                              help=f"Attempts per job (default: {MAX_JOB_ATTEMPTS})")
+
+    status_parser = sub.add_parser("status", help="Show a coordinator's job table counts")
+    status_parser.add_argument("url")
+    status_parser.add_argument("--token", default=os.environ.get("WORK_QUEUE_TOKEN"))
+
+    sim_parser = sub.add_parser("simulate-node", help=argparse.SUPPRESS)
+    sim_parser.add_argument("url")
+    sim_parser.add_argument("--name", required=True)
+    sim_parser.add_argument("--node-db", required=True)
+    sim_parser.add_argument("--token")
+
+    sub.add_parser("selftest", help="Coordinator + two node processes on throwaway databases")
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        try:
+            serve(Path(args.db), args.host, args.port, args.token, args.stale_seconds, args.max_attempts)
+        except WorkQueueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+    elif args.command == "status":
+        print(json.dumps(RemoteJobStore(args.url, args.token).status_counts(), indent=2))
+    elif args.command == "simulate-node":
+        simulate_node(args.url, args.name, Path(args.node_db), args.token)
+    elif args.command == "selftest":
+        sys.exit(0 if selftest() else 1)
+
+
+if __name__ == "__main__":
+    main()
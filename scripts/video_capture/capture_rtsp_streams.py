@@ -1,8 +1,69 @@
 #!/usr/bin/env python3
 """
 RTSP Video Capture Script for Multi-Camera Restaurant Monitoring
-Version: 5.3.0
-Last Updated: 2025-12-10
+Version: 5.11.0
+Last Updated: 2026-10-18
+Modified: Keyframe index sidecars - 2026-10-18
+  - Every processable segment (and its analytics copy) gets a
+    <name>.mp4.kfidx.json sidecar (keyframe_index.py) listing keyframe times,
+    frame numbers and byte offsets, read from the fragment headers at close time
+  - Detection uses it to seek (--start/--end) and for keyframe-only previews
+
+Modified: Segment integrity check at close time - 2026-10-18
+  - Every closed segment is validated from its MP4 box structure (ftyp, moov,
+    complete moof+mdat fragments, estimated duration) by segment_integrity.py
+  - Empty/corrupt segments move to videos/YYYYMMDD/camera_id/quarantine/ (with
+    their analytics copy and sidecars) and a .reason.json, and are registered as
+    such, so they never reach a worker
+
+Modified: Dual-stream capture - 2026-10-18
+  - Cameras with "analytics_substream": true record their "substream_path" too,
+    from the same FFmpeg process, into {camera_dir}/analytics/ with the archive
+    segment's filename (segmenter and respawn modes)
+  - Manifest rows carry analytics_path; the orchestrator runs detection on it
+  - FFmpeg repeatedly dying right after start with the sub-stream attached
+    drops back to archive-only for the session
+
+Modified: RTSP probe instead of ping - 2026-10-18
+  - Pre-capture check uses rtsp_probe.py (TCP connect + RTSP OPTIONS/DESCRIBE
+    under a strict timeout) via check_camera_stream(); no ping subprocess
+  - Catches wrong credentials / stream path before FFmpeg is started
+  - ping_host()/check_network_quality() kept for compatibility
+
+Modified: Asyncio capture supervisor - 2026-10-18
+  - Segmenter mode runs every camera from one asyncio event loop
+    (capture_supervisor.py): async TCP health probe instead of ping subprocesses,
+    restart backoff, stall watchdog and segment-list timers per camera
+  - Deterministic SIGTERM/SIGINT shutdown: stop FFmpeg, register last segments,
+    write telemetry, log summaries, then exit
+  - --supervisor threads keeps one thread per camera
+
+Modified: Non-blocking FFmpeg progress telemetry - 2026-10-18
+  - FFmpeg runs with -nostats -progress pipe:1; FFmpegTelemetry drains stdout and
+    stderr on reader threads (no PIPE deadlock, see v5.3.0 note below)
+  - Rolling per-camera fps / bitrate / speed / dropped + duplicated frames in memory,
+    logged every 60s and written to logs/video_capture/telemetry/{camera_id}.json
+  - _detect_error_patterns() runs again on every stderr line; failure context
+    includes the last stderr lines. It only logs: total_reconnects counts FFmpeg
+    restarts (segmenter/supervisor restart, failed per-segment retry), not
+    matching stderr lines
+  - comprehensive_health_check.py level 7 reads the telemetry files
+
+Modified: Continuous segmenting FFmpeg - 2026-10-18
+  - New default capture mode "segmenter": one long-running FFmpeg per camera with
+    the segment muxer (-f segment, strftime names, reset timestamps) instead of a
+    new process + RTSP handshake + probe + ping every 60s
+  - Python supervises: tails -segment_list to register closed segments, restarts
+    FFmpeg only when it exits early, reports segment-boundary gaps
+  - --capture-mode respawn keeps the previous per-segment behaviour
+
+Modified: Segment manifest - 2026-10-18
+  - Every finished segment is registered in the videos table (segment_manifest.py)
+    with path, camera, start/end time, duration, bytes, integrity status, exit code
+  - Orchestrator discovery, disk accounting and health checks query this index
+    instead of walking videos/
+  - Manifest errors are logged and never interrupt recording
+
 FIX: subprocess PIPE deadlock causing capture to stop after ~155 segments - 2025-12-10
   - Changed subprocess.Popen() stdout/stderr from PIPE to DEVNULL
   - PIPE buffers (64KB) fill up and cause Popen() to block indefinitely
@@ -94,12 +155,19 @@ import platform
 import signal
 import sys
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
 import argparse
 import logging
 from logging.handlers import RotatingFileHandler
 import re
+from collections import deque
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+from video_capture.segment_manifest import SegmentManifest, ANALYTICS_SUBDIR, PROCESSABLE_STATUSES
+from video_capture.rtsp_probe import probe_camera_sync
+from video_capture.segment_integrity import check_segment
+from video_capture.keyframe_index import write_index
 
 # Script configuration
 SCRIPT_DIR = Path(__file__).parent.resolve()
@@ -125,6 +193,38 @@ FFMPEG_PROBESIZE = 5000000  # Probe size: 5MB for quick startup
 FFMPEG_RTSP_TRANSPORT = "tcp"  # Use TCP for reliability
 FFMPEG_STREAM_COPY = True  # No re-encoding (copy stream directly)
 
+# ============================================================================
+# SEGMENTER MODE (v5.5.0)
+# ============================================================================
+CAPTURE_MODE = "segmenter"  # "segmenter" (one FFmpeg per camera) or "respawn" (one per segment)
+SEGMENT_LIST_POLL_SECONDS = 2  # How often the supervisor tails the segment list
+SEGMENT_GAP_WARN_SECONDS = 1.0  # Boundary gaps above this are logged as warnings
+CAPTURE_SUPERVISOR = "asyncio"  # v5.7.0: "asyncio" (one event loop) or "threads" (one thread per camera)
+
+# ============================================================================
+# DUAL-STREAM CAPTURE (v5.9.0)
+# ============================================================================
+# Cameras with "analytics_substream": true and a "substream_path" also record
+# the low-resolution sub-stream into {camera_dir}/analytics/ (same filenames),
+# in the same FFmpeg process as the archive stream. Detection runs on those.
+# Off by default. To enable for a camera: find its sub-stream path (camera web
+# UI or vendor docs, e.g. /media/video2), check it opens with
+#   ffprobe -rtsp_transport tcp rtsp://user:pass@ip:554/<path>
+# then set "substream_path" to it and "analytics_substream": true in
+# config/cameras_config.json (or manage_cameras.py) and restart capture.
+ANALYTICS_MATCH_SECONDS = 3  # Sub-stream segment may open a GOP earlier/later than the main one
+ANALYTICS_EARLY_EXIT_SECONDS = 30  # FFmpeg dying this fast with the sub-stream attached...
+ANALYTICS_MAX_EARLY_EXITS = 2  # ...this many times in a row -> archive-only for the session
+
+# ============================================================================
+# PROGRESS TELEMETRY (v5.6.0)
+# ============================================================================
+TELEMETRY_DIR = LOGS_DIR / "telemetry"  # {camera_id}.json snapshots for the health check
+TELEMETRY_SAMPLES = 60  # Rolling window of -progress blocks (~0.5s each)
+TELEMETRY_WRITE_SECONDS = 10  # Snapshot file refresh interval
+TELEMETRY_LOG_SECONDS = 60  # Summary log line interval
+STDERR_TAIL_LINES = 50  # Last stderr lines kept for error context
+
 # ============================================================================
 # LOGGING CONFIGURATION (NEW in v5.0.0)
 # ============================================================================
@@ -359,6 +459,211 @@ def check_network_quality(host_ip, max_rtt_ms=500):
     return True, rtt_ms, f"✅ Network healthy: {rtt_ms:.1f}ms RTT"
 
 
+def check_camera_stream(camera_id, config, max_rtt_ms=500, timeout=3.0):
+    """
+    v5.8.0: Pre-capture check via rtsp_probe (TCP connect + RTSP OPTIONS/DESCRIBE),
+    no ping subprocess. Same return shape as check_network_quality().
+
+    Fails only on an unreachable port or RTT over threshold. RTSP refusals
+    (401/403/404) and other DESCRIBE oddities warn: FFmpeg gets the final say,
+    same as the asyncio supervisor's probe.
+
+    Returns:
+        tuple: (is_healthy: bool, rtt_ms: float or None, message: str)
+    """
+    result = probe_camera_sync(camera_id, config, timeout=timeout)
+    rtt_ms = result['tcp_rtt_ms']
+
+    if not result['reachable']:
+        return False, None, f"❌ Camera unreachable: {result['error']}"
+    if rtt_ms is not None and rtt_ms > max_rtt_ms:
+        return False, rtt_ms, f"❌ Network too slow: {rtt_ms:.1f}ms > {max_rtt_ms}ms threshold"
+    if result['rtsp_status'] in (401, 403, 404):
+        return True, rtt_ms, f"⚠️  RTSP {result['rtsp_status']}: {result['error']} - starting FFmpeg anyway"
+    if not result['stream_available']:
+        return True, rtt_ms, f"⚠️  Camera reachable ({rtt_ms:.1f}ms TCP) but stream not confirmed: {result['error']}"
+
+    return True, rtt_ms, f"✅ RTSP stream available: {rtt_ms:.1f}ms TCP, {result['describe_ms']:.1f}ms OPTIONS+DESCRIBE"
+
+
+# ============================================================================
+# FFMPEG PROGRESS TELEMETRY (v5.6.0)
+# ============================================================================
+
+class FFmpegTelemetry:
+    """
+    Drains FFmpeg's -progress output (stdout) and stderr on reader threads.
+
+    Why threads: v5.3.0 moved stdout/stderr to DEVNULL because an unread PIPE
+    fills its 64KB buffer and blocks FFmpeg. Reading both pipes continuously
+    removes that risk and brings back per-camera fps / bitrate / speed /
+    dropped-frame data and stderr error patterns.
+
+    Keeps a rolling window of progress samples in memory, logs a summary every
+    TELEMETRY_LOG_SECONDS and writes logs/video_capture/telemetry/{camera_id}.json
+    every TELEMETRY_WRITE_SECONDS for the health check.
+    """
+
+    def __init__(self, camera_id, logger, expected_fps=None):
+        self.camera_id = camera_id
+        self.logger = logger
+        self.expected_fps = expected_fps
+        self.lock = threading.Lock()
+        self.samples = deque(maxlen=TELEMETRY_SAMPLES)
+        self.stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+        self.threads = []
+        self.pid = None
+        self.processes_started = 0
+
+        # Counters of finished processes (FFmpeg counters restart per process)
+        self._frames_base = 0
+        self._drop_base = 0
+        self._dup_base = 0
+        self._last_write = 0
+        self._last_log = time.time()
+
+    def begin_process(self, pid):
+        """Roll per-process FFmpeg counters into the session totals"""
+        with self.lock:
+            if self.samples:
+                last = self.samples[-1]
+                self._frames_base += last['frame']
+                self._drop_base += last['drop_frames']
+                self._dup_base += last['dup_frames']
+            self.samples.clear()
+            self.pid = pid
+            self.processes_started += 1
+
+    def attach(self, process, on_stderr_line=None):
+        """Start draining a freshly started FFmpeg (stdout=-progress pipe:1, stderr)"""
+        self.begin_process(process.pid)
+        self.threads = [
+            threading.Thread(target=self._read_progress, args=(process.stdout,), daemon=True),
+            threading.Thread(target=self._read_stderr, args=(process.stderr, on_stderr_line), daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def detach(self, timeout=5):
+        """Wait for reader threads after the process exited (pipes hit EOF)"""
+        for thread in self.threads:
+            thread.join(timeout=timeout)
+        self.threads = []
+        self.write()
+
+    @staticmethod
+    def _number(value, suffix=""):
+        try:
+            return float(value.strip().rstrip(suffix)) if value and value.strip() != "N/A" else 0.0
+        except ValueError:
+            return 0.0
+
+    def _read_progress(self, stream):
+        block = {}
+        try:
+            for line in iter(stream.readline, ''):
+                key, _, value = line.strip().partition('=')
+                if not key:
+                    continue
+                block[key] = value
+                if key == 'progress':
+                    self.record_progress(block)
+                    block = {}
+        except (ValueError, OSError):
+            pass  # Pipe closed underneath us
+
+    def _read_stderr(self, stream, on_line):
+        try:
+            for line in iter(stream.readline, ''):
+                line = line.rstrip()
+                if not line:
+                    continue
+                self.record_stderr(line)
+                if on_line:
+                    on_line(line)
+        except (ValueError, OSError):
+            pass
+
+    def record_stderr(self, line):
+        with self.lock:
+            self.stderr_tail.append(f"{datetime.now().strftime('%H:%M:%S')} {line}")
+
+    def seconds_since_progress(self):
+        """Seconds since the last -progress block (None before the first one)"""
+        with self.lock:
+            return time.time() - self.samples[-1]['time'] if self.samples else None
+
+    def record_progress(self, block):
+        """Store one parsed -progress block (key=value lines up to progress=...)"""
+        sample = {
+            'time': time.time(),
+            'frame': int(self._number(block.get('frame'))),
+            'fps': self._number(block.get('fps')),
+            'bitrate_kbps': self._number(block.get('bitrate'), 'kbits/s'),
+            'speed': self._number(block.get('speed'), 'x'),
+            'drop_frames': int(self._number(block.get('drop_frames'))),
+            'dup_frames': int(self._number(block.get('dup_frames'))),
+            'total_size': int(self._number(block.get('total_size'))),
+            'out_time_seconds': self._number(block.get('out_time_us')) / 1000000,
+        }
+        with self.lock:
+            self.samples.append(sample)
+
+        now = sample['time']
+        if now - self._last_write >= TELEMETRY_WRITE_SECONDS:
+            self.write()
+        if now - self._last_log >= TELEMETRY_LOG_SECONDS:
+            self._last_log = now
+            snap = self.snapshot()
+            self.logger.info(
+                f"fps {snap['fps_avg']:.1f} | {snap['bitrate_kbps_avg']:.0f} kbits/s | "
+                f"speed {snap['speed_avg']:.2f}x | dropped {snap['drop_frames']} | dup {snap['dup_frames']}",
+                extra={'component': 'TELEMETRY'}
+            )
+
+    def snapshot(self):
+        """Current + rolling metrics as a JSON-serialisable dict"""
+        with self.lock:
+            samples = list(self.samples)
+            tail = list(self.stderr_tail)[-5:]
+
+        last = samples[-1] if samples else None
+
+        def average(key):
+            values = [s[key] for s in samples if s[key] > 0]
+            return round(sum(values) / len(values), 2) if values else 0.0
+
+        return {
+            'camera_id': self.camera_id,
+            'pid': self.pid,
+            'processes_started': self.processes_started,
+            'updated_at': datetime.fromtimestamp(last['time']).isoformat(timespec='seconds') if last else None,
+            'expected_fps': self.expected_fps,
+            'fps': last['fps'] if last else 0.0,
+            'fps_avg': average('fps'),
+            'bitrate_kbps_avg': average('bitrate_kbps'),
+            'speed_avg': average('speed'),
+            'frames': self._frames_base + (last['frame'] if last else 0),
+            'drop_frames': self._drop_base + (last['drop_frames'] if last else 0),
+            'dup_frames': self._dup_base + (last['dup_frames'] if last else 0),
+            'segment_out_time_seconds': last['out_time_seconds'] if last else 0.0,
+            'stderr_tail': tail,
+        }
+
+    def write(self):
+        """Atomically publish the snapshot for comprehensive_health_check.py"""
+        self._last_write = time.time()
+        try:
+            TELEMETRY_DIR.mkdir(parents=True, exist_ok=True)
+            target = TELEMETRY_DIR / f"{self.camera_id}.json"
+            temp = target.with_suffix('.json.tmp')
+            with open(temp, 'w') as f:
+                json.dump(self.snapshot(), f, indent=2)
+            os.replace(temp, target)
+        except OSError as e:
+            self.logger.debug(f"Telemetry write failed: {e}", extra={'component': 'TELEMETRY'})
+
+
 # ============================================================================
 # DIRECT FFMPEG RTSP CAPTURE (NEW in v4.0.0)
 # ============================================================================
@@ -382,10 +687,17 @@ class DirectFFmpegCapture:
     - Performance metrics
     """
 
-    def __init__(self, camera_id, config, segment_duration=SEGMENT_DURATION_SECONDS, rtsp_transport='tcp'):
+    def __init__(self, camera_id, config, segment_duration=SEGMENT_DURATION_SECONDS, rtsp_transport='tcp',
+                 manifest=None):
         self.camera_id = camera_id
+        self.manifest = manifest  # v5.4.0: SegmentManifest (None = don't register segments)
         self.config = config
         self.rtsp_url = self._build_rtsp_url()
+        # v5.9.0: Optional low-resolution analytics stream recorded alongside
+        self.analytics_url = None
+        if config.get('analytics_substream') and config.get('substream_path'):
+            self.analytics_url = self._build_rtsp_url(config['substream_path'])
+        self.analytics_early_exits = 0
         self.segment_duration = segment_duration
         self.rtsp_transport = rtsp_transport  # v5.1.0: Configurable transport
         self.is_capturing = False
@@ -398,6 +710,9 @@ class DirectFFmpegCapture:
         # Enhanced logging (v5.0.0)
         self.logger = get_camera_logger(camera_id)
 
+        # v5.6.0: Progress telemetry (reader threads on FFmpeg stdout/stderr)
+        self.telemetry = FFmpegTelemetry(camera_id, self.logger, config.get('fps'))
+
         # Connection tracking (v5.0.0)
         self.connection_attempts = 0
         self.successful_segments = 0
@@ -409,11 +724,113 @@ class DirectFFmpegCapture:
         self.last_popen_start_time = None
         self.last_popen_duration = None
 
-    def _build_rtsp_url(self):
-        """Build RTSP URL from camera config"""
+    def _build_rtsp_url(self, stream_path=None):
+        """Build RTSP URL from camera config (main stream unless stream_path given)"""
         return (f"rtsp://{self.config['username']}:{self.config['password']}"
                 f"@{self.config['ip']}:{self.config['port']}"
-                f"{self.config['stream_path']}")
+                f"{stream_path or self.config['stream_path']}")
+
+    def _input_args(self, url):
+        """RTSP input options shared by main and analytics inputs"""
+        return [
+            '-rtsp_transport', self.rtsp_transport,
+            '-stimeout', str(FFMPEG_TIMEOUT),
+            '-analyzeduration', str(FFMPEG_ANALYZEDURATION),
+            '-probesize', str(FFMPEG_PROBESIZE),
+            '-i', url,
+        ]
+
+    def _analytics_segment(self, output_file):
+        """
+        v5.9.0: Find the sub-stream segment covering the same span as output_file
+        and give it the same filename under analytics/ (renaming an open file is
+        safe on POSIX, FFmpeg keeps writing through its descriptor).
+        """
+        if self.analytics_url is None:
+            return None
+        output_file = Path(output_file)
+        analytics_dir = output_file.parent / ANALYTICS_SUBDIR
+        target = analytics_dir / output_file.name
+        if target.exists():
+            return target
+
+        match = re.search(r'_(\d{8}_\d{6})\.mp4$', output_file.name)
+        if not match:
+            return None
+        started = datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+        for offset in sorted(range(-ANALYTICS_MATCH_SECONDS, ANALYTICS_MATCH_SECONDS + 1), key=abs):
+            name = f"{self.camera_id}_{(started + timedelta(seconds=offset)).strftime('%Y%m%d_%H%M%S')}.mp4"
+            candidate = analytics_dir / name
+            if candidate.exists():
+                try:
+                    candidate.rename(target)
+                    return target
+                except OSError as e:
+                    self.logger.warning(f"Could not align analytics segment {name}: {e}", extra={'component': 'ANALYTICS'})
+                    return candidate
+        self.logger.warning(f"No analytics segment for {output_file.name}", extra={'component': 'ANALYTICS'})
+        return None
+
+    def _note_ffmpeg_exit(self, ran_for):
+        """
+        v5.9.0: The analytics input shares the archive's FFmpeg process. If FFmpeg
+        keeps dying right after start, drop the sub-stream so the archive survives.
+        """
+        if self.analytics_url is None:
+            return
+        if ran_for >= ANALYTICS_EARLY_EXIT_SECONDS:
+            self.analytics_early_exits = 0
+            return
+        self.analytics_early_exits += 1
+        if self.analytics_early_exits >= ANALYTICS_MAX_EARLY_EXITS:
+            self.analytics_url = None
+            self.logger.error(f"FFmpeg exited within {ANALYTICS_EARLY_EXIT_SECONDS}s {self.analytics_early_exits}x "
+                              f"with the analytics sub-stream attached - recording archive stream only "
+                              f"for the rest of this session", extra={'component': 'ANALYTICS'})
+
+    def _register_segment(self, output_file, started_at, duration_seconds, exit_code):
+        """
+        Register a finished segment in the videos table (v5.4.0).
+        Never raises - a database hiccup must not stop recording.
+
+        v5.10.0: The MP4 box structure is validated first (segment_integrity.py);
+        undecodable segments are moved to the camera folder's quarantine/ (with
+        the analytics copy) and registered as 'empty'/'corrupt' so they are never
+        queued for processing.
+
+        v5.11.0: Processable segments get a keyframe index sidecar.
+        """
+        analytics_file = self._analytics_segment(output_file)
+        status, reason = None, None
+        try:
+            verdict = check_segment(output_file, exit_code, analytics_path=analytics_file)
+            status, reason = verdict['status'], verdict.get('reason')
+            if verdict.get('quarantined'):
+                self.logger.warning(f"Quarantined {Path(output_file).name}: {reason}", extra={'component': 'INTEGRITY'})
+                output_file = verdict['path']
+                analytics_file = verdict.get('analytics_path', analytics_file)
+        except Exception as e:
+            self.logger.warning(f"Integrity check failed for {Path(output_file).name}: {e}", extra={'component': 'INTEGRITY'})
+
+        if status in PROCESSABLE_STATUSES:
+            for segment in filter(None, (output_file, analytics_file)):
+                try:
+                    write_index(segment)
+                except Exception as e:
+                    self.logger.warning(f"Keyframe index failed for {Path(segment).name}: {e}", extra={'component': 'KFINDEX'})
+
+        if self.manifest is None:
+            return status
+        try:
+            status = self.manifest.register_segment(
+                self.camera_id, output_file, started_at, duration_seconds, exit_code=exit_code,
+                integrity_status=status, analytics_path=analytics_file, integrity_reason=reason
+            )
+            self.logger.debug(f"Manifest: {Path(output_file).name} registered ({status})", extra={'component': 'MANIFEST'})
+            return status
+        except Exception as e:
+            self.logger.warning(f"Manifest registration failed for {Path(output_file).name}: {e}", extra={'component': 'MANIFEST'})
+            return None
 
     def _generate_filename(self, segment_number=1):
         """Generate standardized filename: camera_{id}_{date}_{time}_partN.mp4"""
@@ -464,15 +881,29 @@ class DirectFFmpegCapture:
             '-probesize', str(FFMPEG_PROBESIZE),  # Quick probe
             # Input stream
             '-i', self.rtsp_url,
+        ]
+        if self.analytics_url:
+            # v5.9.0: Second input = sub-stream, written to analytics/ with the same name
+            ffmpeg_cmd += self._input_args(self.analytics_url)
+            ffmpeg_cmd += ['-map', '0:v', '-map', '0:a?']
+        ffmpeg_cmd += [
             # Encoding settings
             '-c:v', 'copy' if FFMPEG_STREAM_COPY else 'libx264',
             '-c:a', 'copy',
             # Output settings
             '-movflags', '+frag_keyframe+empty_moov',
             '-t', str(self.segment_duration),
+            # v5.6.0: Machine-readable progress on stdout (drained by FFmpegTelemetry)
+            '-nostats', '-progress', 'pipe:1',
             '-y',
             output_path
         ]
+        if self.analytics_url:
+            analytics_file = Path(output_path).parent / ANALYTICS_SUBDIR / Path(output_path).name
+            analytics_file.parent.mkdir(parents=True, exist_ok=True)
+            ffmpeg_cmd += ['-map', '1:v', '-c:v', 'copy', '-an',
+                           '-movflags', '+frag_keyframe+empty_moov',
+                           '-t', str(self.segment_duration), '-y', str(analytics_file)]
 
         # Log the full command (DEBUG level only)
         cmd_str = ' '.join(ffmpeg_cmd)
@@ -485,17 +916,23 @@ class DirectFFmpegCapture:
             # Previous issue: subprocess.PIPE buffers (64KB) fill up after many segments
             # causing Popen() to block indefinitely (deadlock)
             # Fix: Use DEVNULL instead of PIPE since we don't need FFmpeg output
+            # v5.6.0: PIPEs are back, but drained continuously by FFmpegTelemetry
+            # reader threads from the moment the process starts
             # ================================================================
 
             self.last_popen_start_time = time.time()
             self.logger.info(f"[POPEN_TIMING] Calling Popen() for segment {segment_number}...", extra={'component': 'FFMPEG_START'})
 
-            # Start FFmpeg process with DEVNULL to prevent PIPE buffer deadlock
+            # v5.6.0: PIPEs drained by telemetry reader threads (never left unread)
             ffmpeg_process = subprocess.Popen(
                 ffmpeg_cmd,
-                stdout=subprocess.DEVNULL,  # v5.3.0: Fix PIPE deadlock
-                stderr=subprocess.DEVNULL   # v5.3.0: Fix PIPE deadlock
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                stdin=subprocess.DEVNULL,
+                text=True,
+                bufsize=1
             )
+            self.telemetry.attach(ffmpeg_process, self._detect_error_patterns)
 
             self.last_popen_duration = time.time() - self.last_popen_start_time
             self.logger.info(f"[POPEN_TIMING] Popen() completed in {self.last_popen_duration:.3f}s", extra={'component': 'FFMPEG_START'})
@@ -523,6 +960,9 @@ class DirectFFmpegCapture:
         Wait for FFmpeg segment to complete with enhanced error logging.
         Returns True if successful, False if error.
 
+        Modified in v5.6.0:
+        - Joins telemetry reader threads and logs per-segment metrics
+
         Modified in v5.3.0:
         - Updated to work with DEVNULL (stdout/stderr no longer available)
         - Simplified error handling since we can't read FFmpeg output
@@ -541,9 +981,9 @@ class DirectFFmpegCapture:
             return_code = ffmpeg_process.wait()
             segment_duration = time.time() - segment_start
 
-            # v5.3.0: stdout/stderr are DEVNULL, so we can't read them
-            # This is intentional to prevent PIPE buffer deadlock
-            # Trade-off: We lose detailed FFmpeg output but gain stability
+            # v5.6.0: Reader threads hit EOF once FFmpeg exits
+            self.telemetry.detach()
+            self._log_segment_performance(segment_number)
 
             if return_code == 0:
                 self.successful_segments += 1
@@ -556,8 +996,7 @@ class DirectFFmpegCapture:
                 self.logger.error(f"Segment duration before failure: {segment_duration:.1f}s", extra={'component': 'FFMPEG_ERROR'})
                 self.logger.error(f"[SEGMENT_STATS] Total successful: {self.successful_segments}, failed: {self.failed_segments}", extra={'component': 'FFMPEG_ERROR'})
 
-                # v5.3.0: Can't read stderr anymore due to DEVNULL
-                # Log state context instead
+                # v5.6.0: Context includes the last stderr lines again
                 self._log_error_context()
 
                 return False
@@ -570,51 +1009,19 @@ class DirectFFmpegCapture:
             self.logger.error(f"[SEGMENT_STATS] Total successful: {self.successful_segments}, failed: {self.failed_segments}", extra={'component': 'FFMPEG_ERROR'})
             return False
 
-    def _parse_ffmpeg_performance(self, stderr, segment_number):
+    def _log_segment_performance(self, segment_number):
         """
-        Parse FFmpeg stderr output to extract performance metrics.
-
-        Looks for:
-        - Frame count and frame rate
-        - Bitrate
-        - Dropped frames
-        - Speed (real-time factor)
+        Log performance metrics for a finished segment from progress telemetry.
+        Replaces the v5.0.0 stderr stats-line parser (-nostats now; -progress is
+        structured and arrives continuously).
         """
-        try:
-            # Look for final statistics line (appears at end of FFmpeg output)
-            # Example: "frame= 1500 fps= 30 q=-1.0 Lsize= 45678kB time=00:00:50.00 bitrate=7481.6kbits/s speed=1.0x"
-            for line in stderr.split('\n'):
-                if 'frame=' in line and 'fps=' in line:
-                    # Extract metrics using regex
-                    frame_match = re.search(r'frame=\s*(\d+)', line)
-                    fps_match = re.search(r'fps=\s*([\d.]+)', line)
-                    bitrate_match = re.search(r'bitrate=\s*([\d.]+)kbits/s', line)
-                    speed_match = re.search(r'speed=\s*([\d.]+)x', line)
-
-                    if frame_match:
-                        frames = int(frame_match.group(1))
-                        self.logger.debug(f"Segment {segment_number}: {frames} frames captured", extra={'component': 'PERFORMANCE'})
-
-                    if fps_match:
-                        fps = float(fps_match.group(1))
-                        self.logger.debug(f"Segment {segment_number}: {fps:.1f} fps", extra={'component': 'PERFORMANCE'})
-
-                    if bitrate_match:
-                        bitrate = float(bitrate_match.group(1))
-                        self.logger.info(f"Segment {segment_number}: {bitrate:.0f} kbits/s", extra={'component': 'PERFORMANCE'})
-
-                    if speed_match:
-                        speed = float(speed_match.group(1))
-                        self.logger.debug(f"Segment {segment_number}: {speed:.2f}x real-time", extra={'component': 'PERFORMANCE'})
-
-            # Check for dropped frames
-            if 'drop' in stderr.lower() or 'duplicate' in stderr.lower():
-                for line in stderr.split('\n'):
-                    if 'drop' in line.lower() or 'duplicate' in line.lower():
-                        self.logger.warning(f"Frame quality issue: {line.strip()}", extra={'component': 'PERFORMANCE'})
-
-        except Exception as e:
-            self.logger.debug(f"Could not parse performance metrics: {e}", extra={'component': 'PERFORMANCE'})
+        snap = self.telemetry.snapshot()
+        self.logger.info(f"Segment {segment_number}: {snap['bitrate_kbps_avg']:.0f} kbits/s", extra={'component': 'PERFORMANCE'})
+        self.logger.debug(f"Segment {segment_number}: {snap['frames']} frames total, {snap['fps_avg']:.1f} fps, "
+                          f"{snap['speed_avg']:.2f}x real-time", extra={'component': 'PERFORMANCE'})
+        if snap['drop_frames'] or snap['dup_frames']:
+            self.logger.warning(f"Frame quality issue: dropped={snap['drop_frames']} duplicated={snap['dup_frames']}",
+                                extra={'component': 'PERFORMANCE'})
 
     def _detect_error_patterns(self, stderr):
         """
@@ -626,6 +1033,10 @@ class DirectFFmpegCapture:
         - Invalid stream
         - Network unreachable
         - Protocol errors
+
+        Logging only: reconnects are counted where FFmpeg is actually restarted.
+        Benign notices ("Estimating duration from bitrate", normal for RTSP) are
+        not patterns.
         """
         error_patterns = {
             'connection': [
@@ -641,7 +1052,6 @@ class DirectFFmpegCapture:
             'stream': [
                 (r'Invalid data found', 'Invalid stream data - possible corruption'),
                 (r'Could not find codec', 'Codec not supported'),
-                (r'Estimating duration from bitrate', 'Stream duration unknown (normal for RTSP)'),
             ],
             'rtsp': [
                 (r'RTSP.*error', 'RTSP protocol error'),
@@ -653,9 +1063,6 @@ class DirectFFmpegCapture:
             for pattern, description in patterns:
                 if re.search(pattern, stderr, re.IGNORECASE):
                     self.logger.error(f"Detected {category} issue: {description}", extra={'component': 'ERROR_DETECTION'})
-                    if category == 'connection':
-                        self.total_reconnects += 1
-                        self.logger.warning(f"Total reconnection attempts: {self.total_reconnects}", extra={'component': 'ERROR_DETECTION'})
 
     def _log_error_context(self):
         """
@@ -674,6 +1081,8 @@ class DirectFFmpegCapture:
         self.logger.error(f"  Total reconnects: {self.total_reconnects}", extra={'component': 'ERROR_CONTEXT'})
         self.logger.error(f"  Last connection: {self.last_connection_time.strftime('%H:%M:%S')}" if self.last_connection_time else "  Last connection: N/A", extra={'component': 'ERROR_CONTEXT'})
         self.logger.error(f"  Segment duration: {self.segment_duration}s", extra={'component': 'ERROR_CONTEXT'})
+        for line in list(self.telemetry.stderr_tail)[-10:]:
+            self.logger.error(f"  ffmpeg: {line}", extra={'component': 'ERROR_CONTEXT'})
         self.logger.error("=" * 70, extra={'component': 'ERROR_CONTEXT'})
 
     def capture_video(self, duration_seconds, output_dir):
@@ -712,8 +1121,8 @@ class DirectFFmpegCapture:
         self.logger.info("=" * 70, extra={'component': 'SESSION_START'})
 
         # Check network before starting
-        self.logger.info(f"Checking network connectivity to {self.config['ip']}...", extra={'component': 'NETWORK_CHECK'})
-        is_healthy, rtt_ms, msg = check_network_quality(self.config['ip'])
+        self.logger.info(f"Probing RTSP stream at {self.config['ip']}:{self.config['port']}...", extra={'component': 'NETWORK_CHECK'})
+        is_healthy, rtt_ms, msg = check_camera_stream(self.camera_id, self.config)
         self.logger.info(msg, extra={'component': 'NETWORK_CHECK'})
 
         if not is_healthy:
@@ -758,6 +1167,7 @@ class DirectFFmpegCapture:
 
                 # Start FFmpeg for this segment
                 segment_start = time.time()
+                segment_started_at = datetime.now()
                 self.ffmpeg_process = self._start_ffmpeg_segment(
                     str(output_file),
                     self.current_segment
@@ -775,6 +1185,11 @@ class DirectFFmpegCapture:
                 success = self._wait_for_segment(self.ffmpeg_process, self.current_segment)
                 segment_duration = time.time() - segment_start
 
+                # v5.4.0: Register segment (success or failure) while we know everything about it
+                if output_file.exists():
+                    self._register_segment(output_file, segment_started_at, segment_duration,
+                                           self.ffmpeg_process.returncode)
+
                 if success:
                     # Check if file was created
                     if output_file.exists():
@@ -795,6 +1210,7 @@ class DirectFFmpegCapture:
 
                 else:
                     # Segment failed - try to restart
+                    self.total_reconnects += 1
                     self.logger.warning(f"Restarting capture after failure (attempt {self.current_segment})", extra={'component': 'CAPTURE_LOOP'})
                     time.sleep(5)  # Brief pause before retry
                     self.current_segment += 1
@@ -874,6 +1290,291 @@ class DirectFFmpegCapture:
             self.capture_thread.join(timeout=5)
 
 
+class SegmentingFFmpegCapture(DirectFFmpegCapture):
+    """
+    One long-running FFmpeg per camera using the segment muxer (v5.5.0).
+
+    Instead of a new process (RTSP handshake + probing) every segment, FFmpeg
+    stays connected and rolls files itself:
+    - -f segment -segment_time N -segment_atclocktime 1: clock-aligned boundaries
+    - -reset_timestamps 1: every file starts at t=0 (processing reads them standalone)
+    - -strftime 1: same camera_{id}_{YYYYMMDD_HHMMSS}.mp4 names as respawn mode
+    - -segment_list (csv): FFmpeg appends a line when a file is closed; Python
+      tails it to register segments in the manifest and measure boundary gaps
+
+    Python only supervises: restart FFmpeg if it exits early, register files,
+    and report gaps (stream-time within a process, wall-clock across restarts).
+    """
+
+    def __init__(self, camera_id, config, segment_duration=SEGMENT_DURATION_SECONDS, rtsp_transport='tcp',
+                 manifest=None):
+        super().__init__(camera_id, config, segment_duration, rtsp_transport, manifest)
+        self.segmenter_restarts = 0
+        self.segment_gaps = []          # Seconds between consecutive segments
+        self._registered_files = set()
+        self._list_offset = 0
+        self._prev_stream_end = None    # Stream time of last closed segment (same process)
+        self._last_segment_end = None   # Wall-clock end of last closed segment
+        self.segment_lists_dir = LOGS_DIR / "segment_lists"
+
+    def build_segmenter_cmd(self, output_path, duration, list_path):
+        """
+        FFmpeg command for one long-running segmenting process.
+
+        v5.9.0: With an analytics sub-stream, the same process reads both inputs
+        and runs a second segment muxer into analytics/. Both cut at the same
+        wall-clock boundaries (-segment_atclocktime); only the archive output
+        keeps a segment list, _analytics_segment() pairs the files by name.
+        """
+        segment_args = [
+            '-f', 'segment',
+            '-segment_time', str(self.segment_duration),
+            '-segment_atclocktime', '1',
+            '-reset_timestamps', '1',
+            '-strftime', '1',
+            '-segment_format', 'mp4',
+            '-segment_format_options', 'movflags=+frag_keyframe+empty_moov',
+            '-t', str(int(duration)),
+        ]
+        pattern = f"{self.camera_id}_%Y%m%d_%H%M%S.mp4"
+
+        cmd = ['ffmpeg', '-nostdin'] + self._input_args(self.rtsp_url)
+        if self.analytics_url:
+            cmd += self._input_args(self.analytics_url)
+            cmd += ['-map', '0:v', '-map', '0:a?']
+        cmd += [
+            '-c:v', 'copy' if FFMPEG_STREAM_COPY else 'libx264',
+            '-c:a', 'copy',
+        ] + segment_args + [
+            '-segment_list', str(list_path),
+            '-segment_list_type', 'csv',
+            '-nostats', '-progress', 'pipe:1',  # v5.6.0: telemetry
+            '-y',
+            str(output_path / pattern)
+        ]
+        if self.analytics_url:
+            analytics_dir = output_path / ANALYTICS_SUBDIR
+            analytics_dir.mkdir(parents=True, exist_ok=True)
+            cmd += ['-map', '1:v', '-c:v', 'copy', '-an'] + segment_args + ['-y', str(analytics_dir / pattern)]
+        return cmd
+
+    def _start_segmenter(self, output_path, duration, list_path):
+        """Start the long-running segmenting FFmpeg (stdout/stderr drained by telemetry)"""
+        self.connection_attempts += 1
+        ffmpeg_cmd = self.build_segmenter_cmd(output_path, duration, list_path)
+
+        cmd_str_redacted = re.sub(r'rtsp://[^:]+:([^@]+)@', r'rtsp://***:***@', ' '.join(ffmpeg_cmd))
+        self.logger.debug(f"FFmpeg command: {cmd_str_redacted}", extra={'component': 'SEGMENTER'})
+
+        try:
+            process = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                       stdin=subprocess.DEVNULL, text=True, bufsize=1)
+            self.telemetry.attach(process, self._detect_error_patterns)
+            self.last_connection_time = datetime.now()
+            self.logger.info(f"Segmenter started (PID: {process.pid}, {int(duration)}s, "
+                             f"{self.segment_duration}s segments)", extra={'component': 'SEGMENTER'})
+            return process
+        except Exception as e:
+            self.logger.error(f"Failed to start segmenter: {e}", extra={'component': 'SEGMENTER'})
+            self.logger.error(f"Command: {cmd_str_redacted}", extra={'component': 'SEGMENTER'})
+            return None
+
+    def _segment_start_time(self, file_path, fallback_duration):
+        """Wall-clock start from the strftime filename"""
+        match = re.search(r'_(\d{8}_\d{6})\.mp4$', file_path.name)
+        if match:
+            return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+        return datetime.now() - timedelta(seconds=fallback_duration)
+
+    def _record_segment(self, file_path, duration, exit_code, stream_start=None, stream_end=None):
+        """Register one closed segment and measure the gap to the previous one"""
+        started_at = self._segment_start_time(file_path, duration)
+
+        if stream_start is not None and self._prev_stream_end is not None:
+            gap = max(0.0, stream_start - self._prev_stream_end)
+        elif self._last_segment_end is not None:
+            gap = max(0.0, (started_at - self._last_segment_end).total_seconds())
+        else:
+            gap = None
+
+        if gap is not None:
+            self.segment_gaps.append(gap)
+            if gap > SEGMENT_GAP_WARN_SECONDS:
+                self.logger.warning(f"Gap before {file_path.name}: {gap:.2f}s", extra={'component': 'SEGMENT_GAP'})
+
+        if stream_end is not None:
+            self._prev_stream_end = stream_end
+        self._last_segment_end = started_at + timedelta(seconds=duration)
+        self._registered_files.add(file_path.name)
+
+        status = self._register_segment(file_path, started_at, duration, exit_code)
+        if status in (None, 'ok'):
+            self.successful_segments += 1
+        else:
+            self.failed_segments += 1
+        size_mb = file_path.stat().st_size / (1024 * 1024) if file_path.exists() else 0
+        self.logger.info(f"Segment closed: {file_path.name} ({duration:.1f}s, {size_mb:.1f} MB)",
+                         extra={'component': 'SEGMENTER'})
+        return size_mb
+
+    def _collect_closed_segments(self, output_path, list_path):
+        """Read new complete lines from the CSV segment list (filename,start,end)"""
+        if not list_path.exists():
+            return 0.0
+        total_mb = 0.0
+        with open(list_path, 'r') as f:
+            f.seek(self._list_offset)
+            while True:
+                line = f.readline()
+                if not line or not line.endswith('\n'):
+                    break  # Partial line: FFmpeg is still writing it
+                self._list_offset = f.tell()
+                parts = line.strip().rsplit(',', 2)
+                if len(parts) != 3:
+                    continue
+                name, start, end = parts[0].strip('"'), float(parts[1]), float(parts[2])
+                file_path = output_path / Path(name).name
+                if file_path.name in self._registered_files:
+                    continue
+                total_mb += self._record_segment(file_path, end - start, 0, start, end)
+        return total_mb
+
+    def _sweep_unlisted_segments(self, output_path, process_started, exit_code):
+        """Register files FFmpeg opened but never listed (process died mid-segment)"""
+        total_mb = 0.0
+        for file_path in sorted(output_path.glob(f"{self.camera_id}_*.mp4")):
+            if file_path.name in self._registered_files:
+                continue
+            mtime = file_path.stat().st_mtime
+            if mtime < process_started:
+                continue
+            started_at = self._segment_start_time(file_path, 0)
+            duration = max(0.0, mtime - started_at.timestamp())
+            total_mb += self._record_segment(file_path, duration, exit_code)
+        return total_mb
+
+    def capture_video(self, duration_seconds, output_dir):
+        """
+        Capture with one supervised FFmpeg per camera (restarted only on failure).
+        """
+        date_str = datetime.now().strftime("%Y%m%d")
+        output_path = Path(output_dir) / date_str / self.camera_id
+        output_path.mkdir(parents=True, exist_ok=True)
+        lists_dir = self.segment_lists_dir
+        lists_dir.mkdir(parents=True, exist_ok=True)
+
+        self.logger.info("=" * 70, extra={'component': 'SESSION_START'})
+        self.logger.info("STARTING SEGMENTING FFMPEG CAPTURE SESSION", extra={'component': 'SESSION_START'})
+        self.logger.info("=" * 70, extra={'component': 'SESSION_START'})
+        self.logger.info(f"RTSP URL: rtsp://***@{self.config['ip']}:{self.config['port']}{self.config['stream_path']}", extra={'component': 'SESSION_START'})
+        self.logger.info(f"Target duration: {duration_seconds}s ({duration_seconds/60:.1f} minutes)", extra={'component': 'SESSION_START'})
+        self.logger.info(f"Segment duration: {self.segment_duration}s (segment muxer, single connection)", extra={'component': 'SESSION_START'})
+        if self.analytics_url:
+            self.logger.info(f"Analytics stream: {self.config['substream_path']} -> {ANALYTICS_SUBDIR}/", extra={'component': 'SESSION_START'})
+        self.logger.info(f"Output directory: {output_path}", extra={'component': 'SESSION_START'})
+        self.logger.info(f"Transport: {self.rtsp_transport.upper()}", extra={'component': 'SESSION_START'})
+        self.logger.info("=" * 70, extra={'component': 'SESSION_START'})
+
+        # Stream check once per session (not per segment)
+        is_healthy, rtt_ms, msg = check_camera_stream(self.camera_id, self.config)
+        self.logger.info(msg, extra={'component': 'NETWORK_CHECK'})
+        if not is_healthy:
+            self.logger.error("Network unhealthy, aborting capture", extra={'component': 'NETWORK_CHECK'})
+            return False
+
+        self.session_start_time = time.time()
+        self.is_capturing = True
+        total_size_mb = 0.0
+
+        try:
+            while self.is_capturing:
+                remaining = duration_seconds - (time.time() - self.session_start_time)
+                if remaining < 1:
+                    self.logger.info(f"Target duration reached: {duration_seconds}s", extra={'component': 'SEGMENTER'})
+                    break
+
+                list_path = lists_dir / f"{self.camera_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+                self._list_offset = 0
+                self._prev_stream_end = None
+                process_started = time.time()
+                self.ffmpeg_process = self._start_segmenter(output_path, remaining, list_path)
+                if self.ffmpeg_process is None:
+                    break
+
+                # Supervise: tail the segment list while FFmpeg runs
+                while self.is_capturing and self.ffmpeg_process.poll() is None:
+                    time.sleep(SEGMENT_LIST_POLL_SECONDS)
+                    total_size_mb += self._collect_closed_segments(output_path, list_path)
+
+                if self.ffmpeg_process.poll() is None:
+                    self.ffmpeg_process.terminate()
+                    try:
+                        self.ffmpeg_process.wait(timeout=10)
+                    except subprocess.TimeoutExpired:
+                        self.ffmpeg_process.kill()
+                        self.ffmpeg_process.wait(timeout=5)
+
+                exit_code = self.ffmpeg_process.returncode
+                self.telemetry.detach()
+                total_size_mb += self._collect_closed_segments(output_path, list_path)
+                total_size_mb += self._sweep_unlisted_segments(output_path, process_started, exit_code)
+
+                if not self.is_capturing:
+                    break
+                if time.time() - self.session_start_time >= duration_seconds - 1:
+                    break
+
+                # Exited early: connection lost or camera closed the stream
+                self._note_ffmpeg_exit(time.time() - process_started)
+                self.segmenter_restarts += 1
+                self.total_reconnects += 1
+                self.logger.warning(f"Segmenter exited early (exit code: {exit_code}), restarting in "
+                                    f"{FFMPEG_RECONNECT_DELAY_MAX}s (restart #{self.segmenter_restarts})",
+                                    extra={'component': 'SEGMENTER'})
+                self._log_error_context()
+                time.sleep(FFMPEG_RECONNECT_DELAY_MAX)
+
+        except KeyboardInterrupt:
+            self.logger.warning("INTERRUPTED BY USER", extra={'component': 'SEGMENTER'})
+
+        finally:
+            self.is_capturing = False
+            if self.ffmpeg_process and self.ffmpeg_process.poll() is None:
+                self.logger.info("Stopping FFmpeg process...", extra={'component': 'CLEANUP'})
+                self.ffmpeg_process.terminate()
+                try:
+                    self.ffmpeg_process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    self.ffmpeg_process.kill()
+
+        return self.log_session_summary(time.time() - self.session_start_time, total_size_mb)
+
+    def log_session_summary(self, session_duration, total_size_mb):
+        """Session summary incl. boundary gaps; returns True if any segment was recorded"""
+        segments = self.successful_segments + self.failed_segments
+        gaps = self.segment_gaps
+
+        self.logger.info("=" * 70, extra={'component': 'SESSION_SUMMARY'})
+        self.logger.info("CAPTURE SESSION COMPLETE (segmenter)", extra={'component': 'SESSION_SUMMARY'})
+        self.logger.info("=" * 70, extra={'component': 'SESSION_SUMMARY'})
+        self.logger.info(f"Actual duration: {session_duration:.1f}s ({session_duration/60:.1f} minutes)", extra={'component': 'SESSION_SUMMARY'})
+        self.logger.info(f"Segments: {segments} (ok: {self.successful_segments}, partial/empty: {self.failed_segments})", extra={'component': 'SESSION_SUMMARY'})
+        self.logger.info(f"FFmpeg processes: {self.connection_attempts} (restarts: {self.segmenter_restarts})", extra={'component': 'SESSION_SUMMARY'})
+        self.logger.info(f"Total size: {total_size_mb:.1f} MB", extra={'component': 'SESSION_SUMMARY'})
+        snap = self.telemetry.snapshot()
+        self.logger.info(f"Frames: {snap['frames']} (dropped: {snap['drop_frames']}, duplicated: {snap['dup_frames']})", extra={'component': 'SESSION_SUMMARY'})
+        if gaps:
+            self.logger.info(f"Boundary gaps: total {sum(gaps):.2f}s, max {max(gaps):.2f}s, "
+                             f"mean {sum(gaps)/len(gaps):.3f}s over {len(gaps)} boundaries "
+                             f"({sum(1 for g in gaps if g > SEGMENT_GAP_WARN_SECONDS)} > {SEGMENT_GAP_WARN_SECONDS}s)",
+                             extra={'component': 'SESSION_SUMMARY'})
+        if segments == 0:
+            self.logger.error("NO SEGMENTS CREATED - CAPTURE FAILED", extra={'component': 'SESSION_SUMMARY'})
+        self.logger.info("=" * 70, extra={'component': 'SESSION_SUMMARY'})
+
+        return segments > 0
+
+
 # ============================================================================
 # LEGACY OPENCV CAPTURE (Preserved for compatibility)
 # ============================================================================
@@ -956,10 +1657,15 @@ def load_cameras_config():
         )
 
 
-def capture_all_cameras(duration_seconds, output_dir, camera_filter=None, segment_duration=SEGMENT_DURATION_SECONDS, use_opencv=False, rtsp_transport='tcp'):
+def capture_all_cameras(duration_seconds, output_dir, camera_filter=None, segment_duration=SEGMENT_DURATION_SECONDS, use_opencv=False, rtsp_transport='tcp',
+                        capture_mode=CAPTURE_MODE, supervisor=CAPTURE_SUPERVISOR):
     """
     Capture from all enabled cameras in parallel.
 
+    Enhanced in v5.7.0:
+    - supervisor="asyncio" (segmenter mode): all cameras on one event loop
+      (capture_supervisor.py) instead of one thread per camera
+
     Enhanced in v5.1.0:
     - Added rtsp_transport parameter for UDP fallback
 
@@ -971,6 +1677,13 @@ def capture_all_cameras(duration_seconds, output_dir, camera_filter=None, segmen
 
     cameras = load_cameras_config()
 
+    # v5.4.0: Segment manifest (shared by all camera threads)
+    try:
+        manifest = SegmentManifest()
+    except Exception as e:
+        logger.warning(f"Segment manifest unavailable ({e}), segments will not be indexed")
+        manifest = None
+
     # Filter cameras if specified
     if camera_filter:
         cameras = {k: v for k, v in cameras.items()
@@ -989,7 +1702,9 @@ def capture_all_cameras(duration_seconds, output_dir, camera_filter=None, segmen
     logger.info(f"Segment duration: {segment_duration}s ({segment_duration/60:.1f} minutes)")
     logger.info(f"Output: {output_dir}")
     logger.info(f"Cameras: {', '.join(cameras.keys())}")
-    logger.info(f"Capture mode: {'Legacy OpenCV' if use_opencv else 'Direct FFmpeg (native reconnection)'}")
+    logger.info(f"Capture mode: {'Legacy OpenCV' if use_opencv else f'Direct FFmpeg ({capture_mode})'}")
+    if capture_mode == "segmenter":
+        logger.info(f"Supervisor: {supervisor}")
     if not use_opencv:
         logger.info(f"Reconnection: Enabled (no gaps)")
         logger.info(f"Transport: {rtsp_transport.upper()}")  # v5.1.0: Log transport mode
@@ -1009,20 +1724,29 @@ def capture_all_cameras(duration_seconds, output_dir, camera_filter=None, segmen
             logger.info(f"[{camera_id}] Tip: Remove --use-opencv flag for better reliability")
             # Would create CameraCapture object here
             raise NotImplementedError("Legacy OpenCV mode not implemented in this version")
+        elif capture_mode == "segmenter":
+            # v5.5.0: One long-running FFmpeg per camera (segment muxer)
+            capture = SegmentingFFmpegCapture(camera_id, config, segment_duration, rtsp_transport, manifest)
         else:
             # Use new direct FFmpeg mode
             # v5.1.0: Pass transport parameter
-            capture = DirectFFmpegCapture(camera_id, config, segment_duration, rtsp_transport)
+            capture = DirectFFmpegCapture(camera_id, config, segment_duration, rtsp_transport, manifest)
 
         captures[camera_id] = capture
         _active_captures.append(capture)
-        thread = capture.start_capture_async(duration_seconds, output_dir)
-        threads.append(thread)
 
-    # Wait for all to complete
-    logger.info("Waiting for all captures to complete...")
-    for thread in threads:
-        thread.join()
+    if capture_mode == "segmenter" and supervisor == "asyncio":
+        # v5.7.0: One event loop supervises every camera (installs its own SIGTERM/SIGINT handling)
+        from video_capture.capture_supervisor import run_supervisor
+        run_supervisor(list(captures.values()), duration_seconds, output_dir, SEGMENT_LIST_POLL_SECONDS)
+    else:
+        for capture in captures.values():
+            threads.append(capture.start_capture_async(duration_seconds, output_dir))
+
+        # Wait for all to complete
+        logger.info("Waiting for all captures to complete...")
+        for thread in threads:
+            thread.join()
 
     logger.info("=" * 70)
     logger.info("ALL CAPTURES COMPLETE!")
@@ -1054,6 +1778,12 @@ Examples:
   # Capture from multiple specific cameras
   python3 capture_rtsp_streams.py --duration 1800 --cameras camera_35 camera_22
 
+  # One thread per camera instead of the asyncio supervisor
+  python3 capture_rtsp_streams.py --duration 3600 --supervisor threads
+
+  # Previous behaviour: new FFmpeg process per segment
+  python3 capture_rtsp_streams.py --duration 3600 --capture-mode respawn
+
   # Use UDP transport (fallback for TCP timeout issues)
   python3 capture_rtsp_streams.py --duration 3600 --rtsp-transport udp
 
@@ -1105,6 +1835,10 @@ Legacy OpenCV Mode (v3.x):
                        help="Use legacy OpenCV mode instead of direct FFmpeg (not recommended)")
     parser.add_argument("--rtsp-transport", default="tcp", choices=["tcp", "udp"],
                        help="RTSP transport protocol: tcp (default, reliable) or udp (fallback for timeout issues)")
+    parser.add_argument("--capture-mode", default=CAPTURE_MODE, choices=["segmenter", "respawn"],
+                       help=f"segmenter: one FFmpeg per camera rolling segments; respawn: one FFmpeg per segment (default: {CAPTURE_MODE})")
+    parser.add_argument("--supervisor", default=CAPTURE_SUPERVISOR, choices=["asyncio", "threads"],
+                       help=f"Segmenter supervision: asyncio (one event loop for all cameras) or threads (default: {CAPTURE_SUPERVISOR})")
     parser.add_argument("--log-level", default="INFO",
                        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
                        help="Logging level (default: INFO)")
@@ -1131,6 +1865,7 @@ Legacy OpenCV Mode (v3.x):
     logger.info(f"Start time: {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
     logger.info(f"Log level: {args.log_level}")
     logger.info(f"RTSP Transport: {args.rtsp_transport.upper()}")
+    logger.info(f"Capture mode: {args.capture_mode}")
     logger.info(f"Segment duration: {args.segment_duration}s (reduced from 600s in v4.0)")
     logger.info(f"Log files: {LOGS_DIR}")
 
@@ -1140,7 +1875,9 @@ Legacy OpenCV Mode (v3.x):
         args.cameras,
         args.segment_duration,
         args.use_opencv,
-        args.rtsp_transport
+        args.rtsp_transport,
+        args.capture_mode,
+        args.supervisor
     )
 
     end_time = datetime.now()
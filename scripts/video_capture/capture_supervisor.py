@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Asyncio Capture Supervisor - All Cameras on One Event Loop
+Version: 1.1.1
+Created: 2026-10-18
+Modified: Health probe uses rtsp_probe.probe_camera (RTSP OPTIONS/DESCRIBE) - 2026-10-18
+Modified: Only TCP reachability gates FFmpeg starts; RTSP/auth failures are warnings - 2026-10-18
+
+Purpose:
+- Replace thread-per-camera capture (each thread blocked in ffmpeg_process.wait()
+  and running its own ping subprocess) with one asyncio event loop that owns
+  every camera's FFmpeg subprocess
+- Sized for 40+ cameras per box: no Python thread or helper process per camera,
+  per-check cost is a coroutine wake-up
+
+Per camera (CameraSupervisor):
+- Health probe: rtsp_probe.probe_camera - TCP connect + RTSP OPTIONS/DESCRIBE
+  (no ping subprocess). Only an unreachable port holds the start back; an RTSP
+  refusal (401/403/404, no video) is logged and FFmpeg still gets to try, since
+  it may handle the camera's auth where the probe does not
+- One segmenting FFmpeg (SegmentingFFmpegCapture.build_segmenter_cmd) started with
+  asyncio.create_subprocess_exec; -progress/stderr drained by coroutines into
+  the camera's FFmpegTelemetry
+- Timers: segment-list tail every poll interval (registers closed segments in
+  the manifest), stall watchdog on progress, session deadline (-t plus a
+  DEADLINE_GRACE_SECONDS backstop)
+- Restart with exponential backoff (reset after a stable run)
+
+Shutdown:
+- SIGTERM/SIGINT set one asyncio.Event; every camera terminates FFmpeg
+  (SIGTERM, then SIGKILL after FFMPEG_STOP_TIMEOUT_SECONDS), registers its last
+  segments, writes telemetry and logs its summary before the loop exits
+
+Usage (from capture_rtsp_streams.py, default for segmenter mode):
+    python3 capture_rtsp_streams.py --duration 3600 --supervisor asyncio
+"""
+
+import asyncio
+import logging
+import signal
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+
+from video_capture.rtsp_probe import probe_camera
+
+# Supervisor timing
+PROBE_TIMEOUT_SECONDS = 5          # Whole RTSP probe (connect + OPTIONS + DESCRIBE)
+RESTART_BACKOFF_INITIAL = 2        # Seconds before first restart
+RESTART_BACKOFF_MAX = 60           # Cap for exponential backoff
+STABLE_RUN_SECONDS = 120           # A run this long resets the backoff
+STALL_TIMEOUT_SECONDS = 30         # No -progress block for this long -> restart FFmpeg
+FFMPEG_STOP_TIMEOUT_SECONDS = 10   # SIGTERM grace period before SIGKILL
+DEADLINE_GRACE_SECONDS = 15        # FFmpeg stops itself via -t; enforce if it overruns
+
+
+class CameraSupervisor:
+    """Runs one camera's capture session as a coroutine"""
+
+    def __init__(self, capture, duration_seconds, output_dir, stop_event, poll_seconds):
+        self.capture = capture  # SegmentingFFmpegCapture (state, manifest, telemetry, logger)
+        self.duration_seconds = duration_seconds
+        self.output_dir = Path(output_dir)
+        self.stop_event = stop_event
+        self.poll_seconds = poll_seconds
+        self.logger = capture.logger
+        self.process = None
+        self.total_size_mb = 0.0
+
+    async def _sleep(self, seconds):
+        """Sleep that returns early on shutdown"""
+        try:
+            await asyncio.wait_for(self.stop_event.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def probe(self):
+        """RTSP probe (TCP connect + OPTIONS/DESCRIBE) on the shared loop; True when the port answers"""
+        config = self.capture.config
+        result = await probe_camera(self.capture.camera_id, config, timeout=PROBE_TIMEOUT_SECONDS)
+        if not result['reachable']:
+            self.logger.warning(f"Probe failed ({config['ip']}:{config['port']}): {result['error']}",
+                                extra={'component': 'PROBE'})
+            return False
+        if not result['stream_available']:
+            self.logger.warning(f"RTSP check failed ({config['ip']}:{config['port']}, "
+                                f"RTSP {result['rtsp_status']}): {result['error']} - starting FFmpeg anyway",
+                                extra={'component': 'PROBE'})
+        return True
+
+    async def _drain_progress(self, stream):
+        block = {}
+        async for raw in stream:
+            key, _, value = raw.decode(errors='replace').strip().partition('=')
+            if not key:
+                continue
+            block[key] = value
+            if key == 'progress':
+                self.capture.telemetry.record_progress(block)
+                block = {}
+
+    async def _drain_stderr(self, stream):
+        async for raw in stream:
+            line = raw.decode(errors='replace').rstrip()
+            if line:
+                self.capture.telemetry.record_stderr(line)
+                self.capture._detect_error_patterns(line)
+
+    async def _stop_process(self):
+        if self.process is None or self.process.returncode is not None:
+            return
+        self.process.terminate()
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout=FFMPEG_STOP_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            self.logger.warning("Force killing FFmpeg process", extra={'component': 'CLEANUP'})
+            self.process.kill()
+            await self.process.wait()
+
+    async def _collect(self, output_path, list_path, process_started=None, exit_code=None):
+        """Manifest registration is blocking SQLite/file I/O -> run off the loop"""
+        loop = asyncio.get_running_loop()
+        size = await loop.run_in_executor(None, self.capture._collect_closed_segments, output_path, list_path)
+        if process_started is not None:
+            size += await loop.run_in_executor(None, self.capture._sweep_unlisted_segments,
+                                               output_path, process_started, exit_code)
+        self.total_size_mb += size
+
+    async def _run_ffmpeg(self, output_path, remaining, deadline):
+        """One FFmpeg lifetime: start, tail segment list, watch for stalls, stop"""
+        capture = self.capture
+        list_path = capture.segment_lists_dir / f"{capture.camera_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        capture._list_offset = 0
+        capture._prev_stream_end = None
+
+        cmd = capture.build_segmenter_cmd(output_path, remaining, list_path)
+        process_started = time.time()
+        capture.connection_attempts += 1
+        self.process = await asyncio.create_subprocess_exec(
+            *cmd, stdin=subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        capture.telemetry.begin_process(self.process.pid)
+        capture.last_connection_time = datetime.now()
+        self.logger.info(f"Segmenter started (PID: {self.process.pid}, {int(remaining)}s)",
+                         extra={'component': 'SUPERVISOR'})
+
+        readers = [asyncio.create_task(self._drain_progress(self.process.stdout)),
+                   asyncio.create_task(self._drain_stderr(self.process.stderr))]
+        wait_task = asyncio.create_task(self.process.wait())
+        stop_task = asyncio.create_task(self.stop_event.wait())
+
+        try:
+            while not wait_task.done():
+                await asyncio.wait({wait_task, stop_task}, timeout=self.poll_seconds,
+                                   return_when=asyncio.FIRST_COMPLETED)
+                await self._collect(output_path, list_path)
+
+                if stop_task.done():
+                    break
+                if asyncio.get_running_loop().time() > deadline + DEADLINE_GRACE_SECONDS:
+                    self.logger.warning("FFmpeg overran session deadline, stopping it", extra={'component': 'SUPERVISOR'})
+                    break
+                idle = capture.telemetry.seconds_since_progress()
+                running_for = time.time() - process_started
+                if running_for > STALL_TIMEOUT_SECONDS and (idle is None or idle > STALL_TIMEOUT_SECONDS):
+                    self.logger.warning(f"No progress for {STALL_TIMEOUT_SECONDS}s, restarting FFmpeg",
+                                        extra={'component': 'SUPERVISOR'})
+                    break
+        finally:
+            stop_task.cancel()
+            await self._stop_process()
+            await wait_task
+            await asyncio.gather(*readers, return_exceptions=True)
+
+        exit_code = self.process.returncode
+        await self._collect(output_path, list_path, process_started, exit_code)
+        await asyncio.get_running_loop().run_in_executor(None, capture.telemetry.write)
+        return exit_code, time.time() - process_started
+
+    async def run(self):
+        capture = self.capture
+        date_str = datetime.now().strftime("%Y%m%d")
+        output_path = self.output_dir / date_str / capture.camera_id
+        output_path.mkdir(parents=True, exist_ok=True)
+        capture.segment_lists_dir.mkdir(parents=True, exist_ok=True)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.duration_seconds
+        capture.session_start_time = time.time()
+        capture.is_capturing = True
+        backoff = RESTART_BACKOFF_INITIAL
+
+        self.logger.info(f"Supervising capture: {self.duration_seconds}s, {capture.segment_duration}s segments -> {output_path}",
+                         extra={'component': 'SUPERVISOR'})
+
+        try:
+            while not self.stop_event.is_set():
+                remaining = deadline - loop.time()
+                if remaining < 1:
+                    break
+
+                if not await self.probe():
+                    await self._sleep(min(backoff, remaining))
+                    backoff = min(backoff * 2, RESTART_BACKOFF_MAX)
+                    continue
+
+                exit_code, ran_for = await self._run_ffmpeg(output_path, remaining, deadline)
+
+                if self.stop_event.is_set() or deadline - loop.time() < 1:
+                    break
+                if ran_for >= STABLE_RUN_SECONDS:
+                    backoff = RESTART_BACKOFF_INITIAL
+
+                capture._note_ffmpeg_exit(ran_for)
+                capture.segmenter_restarts += 1
+                capture.total_reconnects += 1
+                self.logger.warning(f"Segmenter exited early (exit code: {exit_code}, ran {ran_for:.0f}s), "
+                                    f"restarting in {backoff}s (restart #{capture.segmenter_restarts})",
+                                    extra={'component': 'SUPERVISOR'})
+                await self._sleep(backoff)
+                backoff = min(backoff * 2, RESTART_BACKOFF_MAX)
+        finally:
+            capture.is_capturing = False
+            await self._stop_process()
+
+        return capture.log_session_summary(time.time() - capture.session_start_time, self.total_size_mb)
+
+
+async def supervise_cameras(captures, duration_seconds, output_dir, poll_seconds=2):
+    """Run all camera supervisors until their deadlines or SIGTERM/SIGINT"""
+    logger = logging.LoggerAdapter(logging.getLogger(), {'camera_id': 'SYSTEM', 'component': 'SUPERVISOR'})
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+
+    def request_stop(sig_name):
+        if not stop_event.is_set():
+            logger.warning(f"Received {sig_name}, stopping all cameras...")
+            stop_event.set()
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, request_stop, sig.name)
+
+    supervisors = [CameraSupervisor(capture, duration_seconds, output_dir, stop_event, poll_seconds)
+                   for capture in captures]
+    logger.info(f"Asyncio supervisor: {len(supervisors)} camera(s) on one event loop")
+
+    results = await asyncio.gather(*(s.run() for s in supervisors), return_exceptions=True)
+
+    succeeded = 0
+    for supervisor, result in zip(supervisors, results):
+        if isinstance(result, Exception):
+            supervisor.logger.error(f"Supervisor crashed: {result!r}", extra={'component': 'SUPERVISOR'})
+        elif result:
+            succeeded += 1
+    logger.info(f"Asyncio supervisor finished: {succeeded}/{len(supervisors)} camera(s) recorded segments")
+    return succeeded
+
+
+def run_supervisor(captures, duration_seconds, output_dir, poll_seconds=2):
+    """Blocking entry point used by capture_all_cameras()"""
+    return asyncio.run(supervise_cameras(captures, duration_seconds, output_dir, poll_seconds))
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Keyframe Index - Per-Segment Keyframe Sidecars for Seeking and Chunking
+Version: 1.0.0
+Created: 2026-10-18
+
+Purpose:
+- Detection always decoded a segment from frame 0, even to look at one minute
+  of a long recording or to grab a few preview frames
+- Capture writes fragmented MP4 (+frag_keyframe), so every fragment starts on a
+  keyframe and its moof header already carries the start time, first sample
+  number and sync flag - segment_integrity.inspect_mp4() reads them without
+  decoding anything
+- This module stores that list next to the segment as <name>.mp4.kfidx.json so
+  readers can seek straight to a keyframe and split work on keyframe boundaries
+
+Sidecar format:
+    {"version": 1, "video": "camera_35_20251209_180441.mp4", "size_bytes": 81234567,
+     "duration_seconds": 60.0, "fps": 20.0, "frames": 1200,
+     "keyframes": [{"time": 0.0, "frame": 0, "offset": 345}, ...]}
+
+    time:   seconds from the first frame of the segment
+    frame:  frame number of the keyframe (matches detection's frame_idx)
+    offset: byte offset of the fragment's moof box
+
+- A sidecar is stale when size_bytes no longer matches the file; it is rebuilt
+  on the next load_or_build_index()
+- Non-fragmented files get an empty keyframe list; readers fall back to a
+  sequential decode
+
+Used by:
+- video_capture/capture_rtsp_streams.py: writes the sidecar when a segment closes
+- video_processing/table_and_region_state_detection.py: --start/--end seek and
+  --keyframes-only preview
+
+Usage:
+    python3 keyframe_index.py FILE [FILE ...]                 # Build + show summary
+    python3 keyframe_index.py --scan videos/20251209           # Write missing/stale sidecars
+    python3 keyframe_index.py FILE --chunks 4                  # Keyframe-aligned work ranges
+    python3 keyframe_index.py FILE --clip 12.5 30 -o clip.mp4  # Stream-copy clip from keyframe
+"""
+
+import argparse
+import bisect
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+from video_capture.segment_integrity import inspect_mp4
+from video_capture.segment_manifest import KEYFRAME_SIDECAR_SUFFIX as SIDECAR_SUFFIX
+
+INDEX_VERSION = 1
+CLIP_TIMEOUT_SECONDS = 120
+
+
+def sidecar_path(video_path) -> Path:
+    """videos/.../camera_35_20251209_180441.mp4 -> .../camera_35_20251209_180441.mp4.kfidx.json"""
+    video_path = Path(video_path)
+    return video_path.with_name(video_path.name + SIDECAR_SUFFIX)
+
+
+def build_index(video_path) -> Dict:
+    """Scan the segment's moof headers and return the keyframe index (not written)"""
+    video_path = Path(video_path)
+    info = inspect_mp4(video_path, collect_fragments=True)
+    duration = info.get('duration_seconds')
+    frames = info.get('samples')
+    fps = round(frames / duration, 3) if frames and duration else None
+
+    keyframes = [
+        {'time': fragment['time'], 'frame': fragment['frame'], 'offset': fragment['offset']}
+        for fragment in info.get('fragment_index', [])
+        if fragment['keyframe']
+    ]
+    return {
+        'version': INDEX_VERSION,
+        'video': video_path.name,
+        'size_bytes': info['size_bytes'],
+        'duration_seconds': duration,
+        'fps': fps,
+        'frames': frames,
+        'keyframes': keyframes,
+    }
+
+
+def write_index(video_path, index: Optional[Dict] = None) -> Path:
+    """Build (unless given) and write the sidecar atomically; returns its path"""
+    if index is None:
+        index = build_index(video_path)
+    path = sidecar_path(video_path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_index(video_path) -> Optional[Dict]:
+    """Sidecar contents, or None if missing, unreadable or stale"""
+    video_path = Path(video_path)
+    path = sidecar_path(video_path)
+    try:
+        with open(path) as f:
+            index = json.load(f)
+        if index.get('version') != INDEX_VERSION:
+            return None
+        if index.get('size_bytes') != video_path.stat().st_size:
+            return None
+        return index
+    except (OSError, ValueError):
+        return None
+
+
+def load_or_build_index(video_path, write: bool = True) -> Dict:
+    """Sidecar if fresh, otherwise scan the file (and write the sidecar if possible)"""
+    index = load_index(video_path)
+    if index is not None:
+        return index
+    index = build_index(video_path)
+    if write:
+        try:
+            write_index(video_path, index)
+        except OSError:
+            pass  # Read-only archive - the in-memory index still works
+    return index
+
+
+# ============================================================================
+# QUERIES
+# ============================================================================
+
+def keyframe_at(index: Dict, seconds: float) -> Dict:
+    """Last keyframe at or before `seconds` (first keyframe / frame 0 if none)"""
+    keyframes = index.get('keyframes') or []
+    if not keyframes:
+        return {'time': 0.0, 'frame': 0, 'offset': None}
+    times = [kf['time'] for kf in keyframes]
+    position = bisect.bisect_right(times, seconds) - 1
+    return keyframes[max(position, 0)]
+
+
+def keyframes_between(index: Dict, start: float = 0.0, end: Optional[float] = None) -> List[Dict]:
+    """Keyframes with start <= time < end"""
+    return [kf for kf in index.get('keyframes') or []
+            if kf['time'] >= start and (end is None or kf['time'] < end)]
+
+
+def split_chunks(index: Dict, count: int) -> List[Tuple[float, Optional[float]]]:
+    """
+    Split a segment into up to `count` (start, end) ranges in seconds, each
+    starting on a keyframe; the last range ends at None (end of file).
+    Fewer ranges come back when there are fewer keyframes than `count`.
+    """
+    keyframes = index.get('keyframes') or []
+    duration = index.get('duration_seconds')
+    if count <= 1 or len(keyframes) < 2 or not duration:
+        return [(0.0, None)]
+
+    starts = []
+    for i in range(count):
+        kf = keyframe_at(index, duration * i / count)
+        if not starts or kf['time'] > starts[-1]:
+            starts.append(kf['time'])
+    return [(start, starts[i + 1] if i + 1 < len(starts) else None) for i, start in enumerate(starts)]
+
+
+def clip_command(video_path, start: float, end: Optional[float], output_path, index: Optional[Dict] = None) -> List[str]:
+    """
+    FFmpeg stream-copy command for [start, end): the cut begins at the keyframe
+    at or before `start`, so no re-encode is needed
+    """
+    if index is None:
+        index = load_or_build_index(video_path)
+    kf_time = keyframe_at(index, start)['time']
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y', '-ss', f"{kf_time:.3f}", '-i', str(video_path)]
+    if end is not None:
+        cmd += ['-t', f"{max(end - kf_time, 0.0):.3f}"]
+    cmd += ['-c', 'copy', '-movflags', '+faststart', str(output_path)]
+    return cmd
+
+
+def extract_clip(video_path, start: float, end: Optional[float], output_path) -> bool:
+    """Run clip_command(); True on success"""
+    cmd = clip_command(video_path, start, end, output_path)
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=CLIP_TIMEOUT_SECONDS)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"❌ Clip failed: {e}", file=sys.stderr)
+        return False
+    if result.returncode != 0:
+        print(f"❌ Clip failed: {result.stderr.strip()}", file=sys.stderr)
+        return False
+    return True
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def format_index(path, index: Dict) -> str:
+    keyframes = index['keyframes']
+    gop = None
+    if len(keyframes) >= 2:
+        gop = (keyframes[-1]['time'] - keyframes[0]['time']) / (len(keyframes) - 1)
+    duration = index['duration_seconds']
+    line = (f"{Path(path).name}: {len(keyframes)} keyframes, "
+            f"{duration if duration is not None else '?'}s @ {index['fps'] or '?'} fps")
+    if gop:
+        line += f", every {gop:.2f}s"
+    return line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query keyframe index sidecars for MP4 segments")
+    parser.add_argument("files", nargs="*", help="Segment files")
+    parser.add_argument("--scan", metavar="DIR", help="Write missing/stale sidecars for every .mp4 under DIR")
+    parser.add_argument("--chunks", type=int, metavar="N", help="Print N keyframe-aligned ranges")
+    parser.add_argument("--clip", nargs=2, type=float, metavar=("START", "END"), help="Extract [START, END) seconds")
+    parser.add_argument("-o", "--output", help="Output file for --clip")
+    parser.add_argument("--json", action="store_true", help="Print the full index as JSON")
+    args = parser.parse_args()
+
+    if args.scan:
+        written = fresh = failed = 0
+        for video in sorted(Path(args.scan).rglob("*.mp4")):
+            if load_index(video) is not None:
+                fresh += 1
+                continue
+            try:
+                write_index(video)
+                written += 1
+            except (OSError, ValueError, IndexError) as e:
+                print(f"⚠️  {video}: {e}", file=sys.stderr)
+                failed += 1
+        print(f"📑 Keyframe index: {written} written, {fresh} up to date, {failed} failed")
+        return 0 if failed == 0 else 1
+
+    if not args.files:
+        parser.error("give FILE(s) or --scan DIR")
+    if args.clip and (len(args.files) != 1 or not args.output):
+        parser.error("--clip needs exactly one FILE and -o OUTPUT")
+
+    for path in args.files:
+        index = load_or_build_index(path)
+        if args.json:
+            print(json.dumps(index, indent=2))
+        else:
+            print(format_index(path, index))
+        if args.chunks:
+            for start, end in split_chunks(index, args.chunks):
+                print(f"   {start:8.3f}s -> {'end' if end is None else f'{end:.3f}s'}")
+
+    if args.clip:
+        start, end = args.clip
+        if not extract_clip(args.files[0], start, end, args.output):
+            return 1
+        print(f"✂️  Clip written: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
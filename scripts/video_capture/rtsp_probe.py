@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+RTSP Camera Probe - Concurrent Reachability and Stream Availability
+Version: 1.1.0
+Created: 2026-10-18
+Modified: 2026-10-18 - Digest auth per RFC 2617/7616: qop=auth (cnonce, nc), MD5-sess,
+          SHA-256, opaque; self-test responder verifies the digest
+
+Purpose:
+- Replace ping subprocesses and sequential OpenCV test connections with one
+  asyncio probe that checks every camera in parallel under a strict timeout
+- Per camera: TCP connect to the RTSP port (RTT), RTSP OPTIONS, then DESCRIBE
+  (Basic/Digest auth handled) to confirm the stream exists and has video
+- Digest: RFC 2617/7616 with or without qop=auth, algorithms MD5, MD5-sess,
+  SHA-256 and SHA-256-sess; a Digest challenge is preferred over Basic
+
+Used by:
+- video_capture/capture_rtsp_streams.py + capture_supervisor.py (pre-capture check)
+- deployment/manage_cameras.py (test camera / --test)
+- deployment/interactive_start.py (camera connection test step)
+
+Result (one dict per camera):
+    reachable         TCP connect succeeded
+    tcp_rtt_ms        TCP connect time
+    rtsp_status       Status code of the last RTSP response (200, 401, 404, ...)
+    stream_available  DESCRIBE returned 200 with a video media section
+    describe_ms       OPTIONS + DESCRIBE time
+    error             Short reason when something failed
+
+Usage:
+    python3 rtsp_probe.py                      # Probe all cameras in cameras_config.json
+    python3 rtsp_probe.py --cameras camera_35 --timeout 2 --json
+    python3 rtsp_probe.py --self-test          # Against a local fake RTSP responder
+"""
+
+import asyncio
+import base64
+import functools
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+CAMERAS_CONFIG = SCRIPT_DIR.parent / "config" / "cameras_config.json"
+
+PROBE_TIMEOUT_SECONDS = 3.0   # Whole probe (connect + OPTIONS + DESCRIBE) per camera
+MAX_CONCURRENT_PROBES = 64    # Upper bound on simultaneous sockets
+USER_AGENT = "ASE-RTSP-Probe/1.0"
+
+
+def _camera_url(config: Dict) -> str:
+    return (f"rtsp://{config.get('ip', '')}:{config.get('port', 554)}"
+            f"{config.get('stream_path', '/media/video1')}")
+
+
+DIGEST_HASHES = {'MD5': hashlib.md5, 'SHA-256': hashlib.sha256}
+
+
+def _parse_params(params: str) -> Dict[str, str]:
+    """realm="x", qop="auth,auth-int", stale=FALSE -> {'realm': 'x', 'qop': 'auth,auth-int', 'stale': 'FALSE'}"""
+    return {key.lower(): quoted if quoted or unquoted == '' else unquoted
+            for key, quoted, unquoted in re.findall(r'(\w+)\s*=\s*(?:"([^"]*)"|([^,\s]*))', params)}
+
+
+def _parse_challenge(header: str) -> Dict[str, str]:
+    """WWW-Authenticate: Digest realm="x", nonce="y" -> {'scheme': 'digest', 'realm': ..., 'nonce': ...}"""
+    scheme, _, params = header.strip().partition(' ')
+    return dict(_parse_params(params), scheme=scheme.lower())
+
+
+def _pick_challenge(headers: List[str]) -> Dict[str, str]:
+    """Digest over Basic when the camera offers both (one WWW-Authenticate header each)"""
+    challenges = [_parse_challenge(header) for header in headers]
+    return next((c for c in challenges if c['scheme'] == 'digest'), challenges[0])
+
+
+def _qop_options(challenge: Dict[str, str]):
+    return [q.strip().lower() for q in challenge.get('qop', '').split(',') if q.strip()]
+
+
+def _digest_response(challenge: Dict[str, str], method: str, uri: str, username: str, password: str,
+                     nc: str, cnonce: str) -> str:
+    """RFC 2617/7616 response value (qop=auth when offered, *-sess algorithms)"""
+    algorithm = challenge.get('algorithm', 'MD5').upper()
+    session = algorithm.endswith('-SESS')
+    hash_name = algorithm[:-len('-SESS')] if session else algorithm
+    if hash_name not in DIGEST_HASHES:
+        raise ValueError(f"unsupported Digest algorithm {challenge.get('algorithm')}")
+
+    def digest(text: str) -> str:
+        return DIGEST_HASHES[hash_name](text.encode()).hexdigest()
+
+    realm, nonce = challenge.get('realm', ''), challenge.get('nonce', '')
+    ha1 = digest(f"{username}:{realm}:{password}")
+    if session:
+        ha1 = digest(f"{ha1}:{nonce}:{cnonce}")
+    ha2 = digest(f"{method}:{uri}")
+    if 'auth' in _qop_options(challenge):
+        return digest(f"{ha1}:{nonce}:{nc}:{cnonce}:auth:{ha2}")
+    return digest(f"{ha1}:{nonce}:{ha2}")
+
+
+def _authorization(challenge: Dict[str, str], method: str, url: str, username: str, password: str,
+                   nonce_count: int = 1, cnonce: Optional[str] = None) -> str:
+    if challenge.get('scheme') == 'basic':
+        token = base64.b64encode(f"{username}:{password}".encode()).decode()
+        return f"Basic {token}"
+
+    nc = f"{nonce_count:08x}"
+    cnonce = cnonce or os.urandom(8).hex()
+    response = _digest_response(challenge, method, url, username, password, nc, cnonce)
+    realm, nonce = challenge.get('realm', ''), challenge.get('nonce', '')
+    header = (f'Digest username="{username}", realm="{realm}", nonce="{nonce}", '
+              f'uri="{url}", response="{response}"')
+    if 'algorithm' in challenge:
+        header += f", algorithm={challenge['algorithm']}"
+    if 'opaque' in challenge:
+        header += ', opaque="%s"' % challenge['opaque']
+    if 'auth' in _qop_options(challenge):
+        header += f', qop=auth, nc={nc}, cnonce="{cnonce}"'
+    return header
+
+
+class _RTSPSession:
+    """Minimal RTSP client over one TCP connection (OPTIONS/DESCRIBE only)"""
+
+    def __init__(self, reader, writer, url, username, password):
+        self.reader = reader
+        self.writer = writer
+        self.url = url
+        self.username = username
+        self.password = password
+        self.cseq = 0
+        self.challenge = None
+        self.nonce_count = 0      # Digest nc: requests sent with the current nonce
+
+    async def request(self, method: str, extra_headers: Optional[Dict[str, str]] = None):
+        for _ in range(2):  # Second pass only after a 401 challenge
+            self.cseq += 1
+            headers = {'CSeq': str(self.cseq), 'User-Agent': USER_AGENT}
+            headers.update(extra_headers or {})
+            if self.challenge:
+                self.nonce_count += 1
+                headers['Authorization'] = _authorization(self.challenge, method, self.url,
+                                                          self.username, self.password, self.nonce_count)
+            lines = [f"{method} {self.url} RTSP/1.0"] + [f"{k}: {v}" for k, v in headers.items()]
+            self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+            await self.writer.drain()
+
+            status, response_headers, body = await self._read_response()
+            if status == 401 and self.challenge is None and response_headers.get('www-authenticate'):
+                self.challenge = _pick_challenge(response_headers['www-authenticate'])
+                self.nonce_count = 0
+                continue
+            return status, response_headers, body
+        return status, response_headers, body
+
+    async def _read_response(self):
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode(errors='replace').split("\r\n")
+        match = re.match(r'RTSP/\d\.\d\s+(\d+)', lines[0])
+        status = int(match.group(1)) if match else 0
+        headers = {'www-authenticate': []}   # One entry per challenge (Basic and Digest may both come)
+        for line in lines[1:]:
+            key, _, value = line.partition(':')
+            key = key.strip().lower()
+            if key == 'www-authenticate':
+                headers[key].append(value.strip())
+            elif key:
+                headers.setdefault(key, value.strip())
+        body = b""
+        length = int(headers.get('content-length', 0) or 0)
+        if length:
+            body = await self.reader.readexactly(length)
+        return status, headers, body.decode(errors='replace')
+
+
+def _empty_result(camera_id: str, config: Dict) -> Dict:
+    return {
+        'camera_id': camera_id,
+        'ip': config.get('ip'),
+        'port': config.get('port', 554),
+        'reachable': False,
+        'tcp_rtt_ms': None,
+        'rtsp_status': None,
+        'stream_available': False,
+        'describe_ms': None,
+        'error': None,
+    }
+
+
+async def _probe(result: Dict, config: Dict, describe: bool):
+    """Fills `result` in place so a timeout keeps whatever was learned (e.g. TCP RTT)"""
+    writer = None
+    try:
+        start = time.monotonic()
+        reader, writer = await asyncio.open_connection(result['ip'], result['port'])
+        result['reachable'] = True
+        result['tcp_rtt_ms'] = round((time.monotonic() - start) * 1000, 1)
+
+        session = _RTSPSession(reader, writer, _camera_url(config),
+                               config.get('username', ''), config.get('password', ''))
+        rtsp_start = time.monotonic()
+        status, _, _ = await session.request("OPTIONS")
+        result['rtsp_status'] = status
+        if describe and status in (200, 401, 405):
+            status, _, body = await session.request("DESCRIBE", {'Accept': 'application/sdp'})
+            result['rtsp_status'] = status
+            result['stream_available'] = status == 200 and 'm=video' in body
+        result['describe_ms'] = round((time.monotonic() - rtsp_start) * 1000, 1)
+
+        if result['rtsp_status'] == 401:
+            result['error'] = "authentication failed"
+        elif describe and not result['stream_available']:
+            result['error'] = f"no video stream (RTSP {result['rtsp_status']})"
+    except asyncio.CancelledError:
+        raise
+    except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+        result['error'] = str(e) or e.__class__.__name__
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def probe_camera(camera_id: str, config: Dict, timeout: float = PROBE_TIMEOUT_SECONDS,
+                       describe: bool = True) -> Dict:
+    """Probe one camera; never raises, never takes longer than `timeout`"""
+    result = _empty_result(camera_id, config)
+    try:
+        await asyncio.wait_for(_probe(result, config, describe), timeout=timeout)
+    except asyncio.TimeoutError:
+        stage = "RTSP response" if result['reachable'] else "TCP connect"
+        result['error'] = f"timeout after {timeout:.1f}s waiting for {stage}"
+    return result
+
+
+async def probe_cameras_async(cameras: Dict[str, Dict], timeout: float = PROBE_TIMEOUT_SECONDS,
+                              describe: bool = True) -> Dict[str, Dict]:
+    """Probe all cameras concurrently -> {camera_id: result}"""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_PROBES)
+
+    async def bounded(camera_id, config):
+        async with semaphore:
+            return await probe_camera(camera_id, config, timeout, describe)
+
+    results = await asyncio.gather(*(bounded(cid, cfg) for cid, cfg in cameras.items()))
+    return {result['camera_id']: result for result in results}
+
+
+def probe_cameras(cameras: Dict[str, Dict], timeout: float = PROBE_TIMEOUT_SECONDS,
+                  describe: bool = True) -> Dict[str, Dict]:
+    """Blocking wrapper for scripts without an event loop"""
+    return asyncio.run(probe_cameras_async(cameras, timeout, describe))
+
+
+def probe_camera_sync(camera_id: str, config: Dict, timeout: float = PROBE_TIMEOUT_SECONDS,
+                      describe: bool = True) -> Dict:
+    return probe_cameras({camera_id: config}, timeout, describe)[camera_id]
+
+
+def format_result(result: Dict) -> str:
+    """One-line human readable summary"""
+    target = f"{result['ip']}:{result['port']}"
+    if result['stream_available']:
+        return (f"✅ {result['camera_id']} ({target}) stream OK - "
+                f"TCP {result['tcp_rtt_ms']}ms, RTSP {result['describe_ms']}ms")
+    if result['reachable']:
+        return f"⚠️  {result['camera_id']} ({target}) reachable, {result['error'] or 'RTSP ' + str(result['rtsp_status'])}"
+    return f"❌ {result['camera_id']} ({target}) unreachable: {result['error']}"
+
+
+# ============================================================================
+# SELF-TEST (fake RTSP responder)
+# ============================================================================
+
+FAKE_SDP = ("v=0\r\no=- 0 0 IN IP4 127.0.0.1\r\ns=fake\r\nt=0 0\r\n"
+            "m=video 0 RTP/AVP 96\r\na=rtpmap:96 H264/90000\r\n")
+
+
+FAKE_USER, FAKE_PASSWORD = "admin", "secret"
+FAKE_CHALLENGE = {'scheme': 'digest', 'realm': 'fake', 'nonce': 'abc123', 'qop': 'auth,auth-int',
+                  'algorithm': 'MD5', 'opaque': 'xyz'}
+
+
+def _fake_digest_ok(head: str, method: str, challenge: Dict[str, str]) -> bool:
+    """Server side of the Digest exchange: recompute the response from the known password"""
+    match = re.search(r'Authorization:\s*Digest\s+(.*)', head)
+    if not match:
+        return False
+    auth = _parse_params(match.group(1))
+    if auth.get('username') != FAKE_USER or auth.get('nonce') != challenge['nonce']:
+        return False
+    if 'auth' in _qop_options(challenge) and (auth.get('qop') != 'auth' or not auth.get('cnonce')):
+        return False
+    expected = _digest_response(challenge, method, auth.get('uri', ''), FAKE_USER, FAKE_PASSWORD,
+                                auth.get('nc', ''), auth.get('cnonce', ''))
+    return auth.get('response') == expected
+
+
+async def _fake_rtsp_handler(reader, writer, require_auth=True, video=True, challenge=None):
+    """Answers OPTIONS/DESCRIBE like a camera (Digest challenge on DESCRIBE, response verified)"""
+    challenge = challenge or FAKE_CHALLENGE
+    offer = ", ".join(f'{k}="{v}"' if k != 'algorithm' else f"{k}={v}"
+                      for k, v in challenge.items() if k != 'scheme')
+    try:
+        while True:
+            head = (await reader.readuntil(b"\r\n\r\n")).decode()
+            method = head.split(' ', 1)[0]
+            cseq = re.search(r'CSeq:\s*(\d+)', head).group(1)
+            if method == "OPTIONS":
+                reply = f"RTSP/1.0 200 OK\r\nCSeq: {cseq}\r\nPublic: OPTIONS, DESCRIBE, SETUP, PLAY\r\n\r\n"
+            elif require_auth and not _fake_digest_ok(head, method, challenge):
+                reply = (f"RTSP/1.0 401 Unauthorized\r\nCSeq: {cseq}\r\n"
+                         f'WWW-Authenticate: Basic realm="fake"\r\n'
+                         f"WWW-Authenticate: Digest {offer}\r\n\r\n")
+            else:
+                sdp = FAKE_SDP if video else FAKE_SDP.split("m=")[0]
+                reply = (f"RTSP/1.0 200 OK\r\nCSeq: {cseq}\r\nContent-Type: application/sdp\r\n"
+                         f"Content-Length: {len(sdp)}\r\n\r\n{sdp}")
+            writer.write(reply.encode())
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _silent_handler(reader, writer):
+    """Accepts TCP but never answers (hung camera firmware)"""
+    try:
+        await reader.read()
+    finally:
+        writer.close()
+
+
+async def _self_test():
+    sess_challenge = dict(FAKE_CHALLENGE, qop='auth', algorithm='MD5-sess')
+    legacy_challenge = {'scheme': 'digest', 'realm': 'fake', 'nonce': 'abc123'}   # RFC 2069, no qop
+    good = await asyncio.start_server(_fake_rtsp_handler, '127.0.0.1', 0)
+    sess = await asyncio.start_server(functools.partial(_fake_rtsp_handler, challenge=sess_challenge), '127.0.0.1', 0)
+    legacy = await asyncio.start_server(functools.partial(_fake_rtsp_handler, challenge=legacy_challenge),
+                                        '127.0.0.1', 0)
+    hung = await asyncio.start_server(_silent_handler, '127.0.0.1', 0)
+    servers = [good, sess, legacy, hung]
+    closed_port = good.sockets[0].getsockname()[1] + 1  # Nothing listening (normally)
+
+    def camera(server, password=FAKE_PASSWORD, port=None):
+        return {'ip': '127.0.0.1', 'port': port or server.sockets[0].getsockname()[1],
+                'username': FAKE_USER, 'password': password, 'stream_path': '/media/video1'}
+
+    cameras = {
+        'camera_ok': camera(good),
+        'camera_md5_sess': camera(sess),
+        'camera_no_qop': camera(legacy),
+        'camera_bad_password': camera(good, password='wrong'),
+        'camera_hung': camera(hung),
+        'camera_closed': camera(None, port=closed_port),
+    }
+
+    timeout = 1.0
+    start = time.monotonic()
+    results = await probe_cameras_async(cameras, timeout=timeout)
+    elapsed = time.monotonic() - start
+
+    for server in servers:
+        server.close()
+
+    for result in results.values():
+        print(format_result(result))
+    print(f"\n⏱️  {len(cameras)} cameras probed in {elapsed:.2f}s (timeout {timeout}s each)")
+
+    checks = [
+        results['camera_ok']['stream_available'],
+        results['camera_md5_sess']['stream_available'],
+        results['camera_no_qop']['stream_available'],
+        not results['camera_bad_password']['stream_available'] and results['camera_bad_password']['rtsp_status'] == 401,
+        not results['camera_hung']['stream_available'] and 'timeout' in (results['camera_hung']['error'] or ''),
+        not results['camera_closed']['reachable'],
+        elapsed < timeout * 2,  # Concurrent, not sequential
+    ]
+    print("✅ Self-test passed" if all(checks) else f"❌ Self-test failed: {checks}")
+    return all(checks)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Probe RTSP cameras concurrently (TCP + OPTIONS/DESCRIBE)")
+    parser.add_argument("--cameras", nargs='+', help="Camera IDs to probe (default: all enabled)")
+    parser.add_argument("--timeout", type=float, default=PROBE_TIMEOUT_SECONDS,
+                        help=f"Per-camera timeout in seconds (default: {PROBE_TIMEOUT_SECONDS})")
+    parser.add_argument("--no-describe", action="store_true", help="Only TCP + OPTIONS")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--self-test", action="store_true", help="Run against a local fake RTSP responder")
+    args = parser.parse_args()
+
+    if args.self_test:
+        return 0 if asyncio.run(_self_test()) else 1
+
+    with open(CAMERAS_CONFIG) as f:
+        cameras = json.load(f)
+    cameras = {cid: cfg for cid, cfg in cameras.items()
+               if (args.cameras and cid in args.cameras) or (not args.cameras and cfg.get('enabled', True))}
+
+    results = probe_cameras(cameras, args.timeout, describe=not args.no_describe)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results.values():
+            print(format_result(result))
+    return 0 if all(r['stream_available'] or args.no_describe and r['reachable'] for r in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Segment Integrity - Container-Level MP4 Validation and Quarantine
+Version: 1.2.0
+Created: 2026-10-18
+Modified: fragment_index carries first frame number and keyframe flag per fragment (keyframe_index.py) - 2026-10-18
+Modified: Quarantine per camera folder (<date>/<camera>/quarantine/), analytics copy and
+          keyframe sidecars move with the segment - 2026-10-18
+
+Purpose:
+- Truncated segments from killed FFmpeg processes used to reach the processing
+  queue, where each one cost a worker, a subprocess start and a model load just
+  to fail with "moov atom not found"
+- This module reads only MP4 box headers (plus the small moov/moof boxes) -
+  no decoding, no ffprobe subprocess - and decides whether a segment is
+  decodable before anyone queues it
+- Bad segments are moved to videos/YYYYMMDD/camera_id/quarantine/ with a
+  <name>.reason.json next to them. The paired analytics segment
+  (quarantine/analytics/<name>) and the keyframe sidecars move with it, so
+  nothing left in the camera folder points at a quarantined segment, and the
+  quarantine is deleted together with the camera folder
+
+Checks:
+- ftyp first, moov present, at least one video track (hdlr 'vide')
+- Fragmented MP4 (+frag_keyframe+empty_moov): count moof+mdat pairs that are
+  complete on disk; a truncated tail after complete fragments is 'partial'
+  (decodable), no complete fragment at all is 'corrupt'
+- Non-fragmented MP4: mdat present and not truncated
+- Duration estimate: tfdt + trun/tfhd/trex sample durations over the video
+  track timescale (fragmented), mdhd/mvhd duration otherwise
+
+Statuses (shared with segment_manifest.py):
+    ok | partial      -> processable
+    empty | corrupt   -> quarantined
+    missing           -> nothing to move
+
+Used by:
+- video_capture/capture_rtsp_streams.py: every segment at close time
+- orchestration/process_videos_orchestrator.py: filesystem discovery, and the
+  analytics sub-stream segment before it is handed to detection
+- video_capture/keyframe_index.py: inspect_mp4(collect_fragments=True) is the
+  keyframe scan behind the .kfidx.json sidecars
+
+Usage:
+    python3 segment_integrity.py FILE [FILE ...]           # Report only
+    python3 segment_integrity.py --scan videos/20251209    # Report a folder tree
+    python3 segment_integrity.py --scan videos/20251209 --quarantine
+"""
+
+import json
+import shutil
+import struct
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+from video_capture.segment_manifest import (
+    INTEGRITY_OK, INTEGRITY_PARTIAL, INTEGRITY_EMPTY, INTEGRITY_MISSING, INTEGRITY_CORRUPT,
+    PROCESSABLE_STATUSES, MIN_VALID_SEGMENT_BYTES, ANALYTICS_SUBDIR, companion_files
+)
+
+QUARANTINE_SUBDIR = "quarantine"     # videos/YYYYMMDD/camera_id/quarantine/
+
+MIN_SEGMENT_DURATION_SECONDS = 1.0   # Shorter than this is not worth a detection run
+
+# Boxes whose children we parse (everything else is skipped by size)
+CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl", b"mvex", b"moof", b"traf", b"edts"}
+MAX_METADATA_BOX_BYTES = 16 * 1024 * 1024  # moov/moof larger than this is treated as corrupt
+
+# tfhd / trun flag bits (ISO/IEC 14496-12)
+TFHD_BASE_DATA_OFFSET = 0x000001
+TFHD_SAMPLE_DESCRIPTION_INDEX = 0x000002
+TFHD_DEFAULT_SAMPLE_DURATION = 0x000008
+TFHD_DEFAULT_SAMPLE_SIZE = 0x000010
+TFHD_DEFAULT_SAMPLE_FLAGS = 0x000020
+TRUN_DATA_OFFSET = 0x000001
+TRUN_FIRST_SAMPLE_FLAGS = 0x000004
+TRUN_SAMPLE_DURATION = 0x000100
+TRUN_SAMPLE_SIZE = 0x000200
+TRUN_SAMPLE_FLAGS = 0x000400
+TRUN_SAMPLE_CTO = 0x000800
+SAMPLE_IS_NON_SYNC = 0x00010000   # sample_flags bit: not a keyframe
+
+
+# ============================================================================
+# BOX PARSING
+# ============================================================================
+
+def _iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None):
+    """Yield (type, payload_start, box_end) for boxes inside an in-memory buffer"""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                return
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            return
+        yield box_type, pos + header, pos + size
+        pos += size
+
+
+def _full_box(data: bytes, pos: int):
+    """(version, flags, payload_pos) of a FullBox"""
+    version_flags = struct.unpack_from(">I", data, pos)[0]
+    return version_flags >> 24, version_flags & 0xFFFFFF, pos + 4
+
+
+def _parse_moov(data: bytes, info: Dict):
+    """Tracks (id -> timescale, handler), movie duration, trex defaults"""
+    tracks = {}
+    trex_defaults = {}
+
+    def walk(start, end, track):
+        for box_type, payload, box_end in _iter_boxes(data, start, end):
+            if box_type == b"trak":
+                track = {}
+                walk(payload, box_end, track)
+                if 'track_id' in track:
+                    tracks[track['track_id']] = track
+                continue
+            if box_type in CONTAINER_BOXES:
+                if box_type == b"mvex":
+                    info['fragmented'] = True
+                walk(payload, box_end, track)
+            elif box_type == b"mvhd":
+                version, _, pos = _full_box(data, payload)
+                if version == 1:
+                    timescale, duration = struct.unpack_from(">IQ", data, pos + 16)
+                else:
+                    timescale, duration = struct.unpack_from(">II", data, pos + 8)
+                info['movie_timescale'] = timescale
+                info['movie_duration'] = duration
+            elif box_type == b"tkhd" and track is not None:
+                version, _, pos = _full_box(data, payload)
+                track['track_id'] = struct.unpack_from(">I", data, pos + (16 if version == 1 else 8))[0]
+            elif box_type == b"mdhd" and track is not None:
+                version, _, pos = _full_box(data, payload)
+                if version == 1:
+                    track['timescale'], track['duration'] = struct.unpack_from(">IQ", data, pos + 16)
+                else:
+                    track['timescale'], track['duration'] = struct.unpack_from(">II", data, pos + 8)
+            elif box_type == b"hdlr" and track is not None:
+                track['handler'] = data[payload + 8:payload + 12].decode('latin-1')
+            elif box_type == b"trex":
+                _, _, pos = _full_box(data, payload)
+                track_id, _, default_duration, _, default_flags = struct.unpack_from(">IIIII", data, pos)
+                trex_defaults[track_id] = (default_duration, default_flags)
+            elif box_type == b"mehd":
+                info['fragmented'] = True
+
+    walk(0, len(data), None)
+    return tracks, trex_defaults
+
+
+def _parse_moof(data: bytes, track_id: int, defaults) -> Dict:
+    """
+    One track's run in a moof: base_time (tfdt, None if absent), duration and
+    samples (sum over truns), keyframe (first sample is a sync sample)
+    """
+    default_duration, default_flags = defaults
+    result = {'base_time': None, 'duration': 0, 'samples': 0, 'keyframe': None}
+    for box_type, payload, box_end in _iter_boxes(data):
+        if box_type != b"traf":
+            continue
+        traf_track = None
+        traf_duration, traf_flags = default_duration, default_flags
+        for child, child_payload, _ in _iter_boxes(data, payload, box_end):
+            if child == b"tfhd":
+                _, flags, pos = _full_box(data, child_payload)
+                traf_track = struct.unpack_from(">I", data, pos)[0]
+                pos += 4
+                if flags & TFHD_BASE_DATA_OFFSET:
+                    pos += 8
+                if flags & TFHD_SAMPLE_DESCRIPTION_INDEX:
+                    pos += 4
+                if flags & TFHD_DEFAULT_SAMPLE_DURATION:
+                    traf_duration = struct.unpack_from(">I", data, pos)[0]
+                    pos += 4
+                if flags & TFHD_DEFAULT_SAMPLE_SIZE:
+                    pos += 4
+                if flags & TFHD_DEFAULT_SAMPLE_FLAGS:
+                    traf_flags = struct.unpack_from(">I", data, pos)[0]
+            elif traf_track != track_id:
+                continue
+            elif child == b"tfdt":
+                version, _, pos = _full_box(data, child_payload)
+                result['base_time'] = struct.unpack_from(">Q" if version == 1 else ">I", data, pos)[0]
+            elif child == b"trun":
+                _, flags, pos = _full_box(data, child_payload)
+                sample_count = struct.unpack_from(">I", data, pos)[0]
+                pos += 4
+                if flags & TRUN_DATA_OFFSET:
+                    pos += 4
+                first_flags = None
+                if flags & TRUN_FIRST_SAMPLE_FLAGS:
+                    first_flags = struct.unpack_from(">I", data, pos)[0]
+                    pos += 4
+
+                fields = [bit for bit in (TRUN_SAMPLE_DURATION, TRUN_SAMPLE_SIZE,
+                                          TRUN_SAMPLE_FLAGS, TRUN_SAMPLE_CTO) if flags & bit]
+                stride = 4 * len(fields)
+                if flags & TRUN_SAMPLE_DURATION:
+                    for i in range(sample_count):
+                        result['duration'] += struct.unpack_from(">I", data, pos + i * stride)[0]
+                else:
+                    result['duration'] += sample_count * traf_duration
+                if first_flags is None and flags & TRUN_SAMPLE_FLAGS and sample_count:
+                    first_flags = struct.unpack_from(">I", data, pos + 4 * fields.index(TRUN_SAMPLE_FLAGS))[0]
+                if result['keyframe'] is None and sample_count:
+                    sample_flags = traf_flags if first_flags is None else first_flags
+                    result['keyframe'] = not sample_flags & SAMPLE_IS_NON_SYNC
+                result['samples'] += sample_count
+    return result
+
+
+def inspect_mp4(path, collect_fragments: bool = False) -> Dict:
+    """
+    Walk the top-level boxes of an MP4 file (headers only, moov/moof read fully).
+
+    Returns a dict with: size_bytes, boxes (top-level types in order), has_ftyp,
+    has_moov, fragmented, fragments (complete moof+mdat pairs), truncated
+    (last box runs past EOF), video_track, timescale, samples, duration_seconds,
+    and - with collect_fragments - fragment_index: one dict per complete
+    fragment {time (s from first fragment), frame (first sample number),
+    offset (moof byte offset), keyframe (first sample is a sync sample)}
+    """
+    path = Path(path)
+    size = path.stat().st_size
+    info = {
+        'size_bytes': size, 'boxes': [], 'has_ftyp': False, 'has_moov': False,
+        'has_mdat': False, 'fragmented': False, 'fragments': 0, 'truncated': False,
+        'truncated_box': None, 'video_track': None, 'duration_seconds': None,
+    }
+    moofs = []          # (offset, bytes) of moofs followed by a complete mdat
+    fragment_index = []
+    tracks, trex_defaults = {}, {}
+    pending_moof = None
+
+    with open(path, 'rb') as f:
+        pos = 0
+        while pos + 8 <= size:
+            f.seek(pos)
+            header = f.read(16)
+            box_size, box_type = struct.unpack_from(">I4s", header, 0)
+            header_len = 8
+            if box_size == 1:
+                box_size = struct.unpack_from(">Q", header, 8)[0]
+                header_len = 16
+            elif box_size == 0:
+                box_size = size - pos
+            if box_size < header_len:
+                info['truncated'] = True
+                info['truncated_box'] = box_type.decode('latin-1', 'replace')
+                break
+
+            info['boxes'].append(box_type.decode('latin-1', 'replace'))
+            if pos + box_size > size:
+                info['truncated'] = True
+                info['truncated_box'] = box_type.decode('latin-1', 'replace')
+                break
+
+            if box_type == b"ftyp":
+                info['has_ftyp'] = pos == 0
+            elif box_type in (b"moov", b"moof"):
+                if box_size > MAX_METADATA_BOX_BYTES:
+                    info['truncated'] = True
+                    info['truncated_box'] = box_type.decode('latin-1')
+                    break
+                f.seek(pos + header_len)
+                payload = f.read(box_size - header_len)
+                if box_type == b"moov":
+                    info['has_moov'] = True
+                    tracks, trex_defaults = _parse_moov(payload, info)
+                else:
+                    info['fragmented'] = True
+                    pending_moof = (pos, payload)
+            elif box_type == b"mdat":
+                info['has_mdat'] = True
+                if pending_moof is not None:
+                    moofs.append(pending_moof)
+                    pending_moof = None
+            pos += box_size
+
+    video = next((t for t in tracks.values() if t.get('handler') == 'vide'), None)
+    if video:
+        info['video_track'] = video['track_id']
+    info['fragments'] = len(moofs)
+
+    timescale = (video or {}).get('timescale') or info.get('movie_timescale')
+    if not timescale:
+        return info
+
+    info['timescale'] = timescale
+
+    if info['fragmented'] and video:
+        start = end = None
+        elapsed = 0
+        samples = 0
+        defaults = trex_defaults.get(video['track_id'], (0, 0))
+        for offset, payload in moofs:
+            run = _parse_moof(payload, video['track_id'], defaults)
+            base_time = elapsed if run['base_time'] is None else run['base_time']
+            start = base_time if start is None else min(start, base_time)
+            end = base_time + run['duration'] if end is None else max(end, base_time + run['duration'])
+            elapsed = base_time + run['duration']
+            if collect_fragments and run['samples']:
+                fragment_index.append({
+                    'time': round((base_time - start) / timescale, 3),
+                    'frame': samples,
+                    'offset': offset,
+                    'keyframe': bool(run['keyframe']),
+                })
+            samples += run['samples']
+        info['samples'] = samples
+        if start is not None:
+            info['duration_seconds'] = round((end - start) / timescale, 3)
+    elif video and video.get('duration'):
+        info['duration_seconds'] = round(video['duration'] / timescale, 3)
+    elif info.get('movie_duration'):
+        info['duration_seconds'] = round(info['movie_duration'] / info['movie_timescale'], 3)
+
+    if collect_fragments:
+        info['fragment_index'] = fragment_index
+    return info
+
+
+# ============================================================================
+# VALIDATION + QUARANTINE
+# ============================================================================
+
+def validate_segment(path, exit_code: Optional[int] = None) -> Dict:
+    """
+    Classify a segment from its container structure.
+
+    Returns:
+        dict with 'status' (ok/partial/empty/corrupt/missing), 'reason'
+        (None when ok) and the inspect_mp4() fields
+    """
+    path = Path(path)
+    if not path.exists():
+        return {'status': INTEGRITY_MISSING, 'reason': "file not found"}
+    size = path.stat().st_size
+    if size < MIN_VALID_SEGMENT_BYTES:
+        return {'status': INTEGRITY_EMPTY, 'reason': f"{size} bytes (container only)", 'size_bytes': size}
+
+    try:
+        info = inspect_mp4(path)
+    except (OSError, struct.error) as e:
+        return {'status': INTEGRITY_CORRUPT, 'reason': f"unreadable: {e}", 'size_bytes': size}
+
+    def result(status, reason=None):
+        info['status'] = status
+        info['reason'] = reason
+        return info
+
+    if not info['has_ftyp']:
+        return result(INTEGRITY_CORRUPT, "no ftyp box at start of file")
+    if not info['has_moov']:
+        return result(INTEGRITY_CORRUPT, "moov atom not found")
+    if info['video_track'] is None:
+        return result(INTEGRITY_CORRUPT, "no video track")
+
+    if info['fragmented']:
+        if info['fragments'] == 0:
+            return result(INTEGRITY_CORRUPT, "no complete fragment (moof+mdat)")
+    elif not info['has_mdat'] or info['truncated']:
+        return result(INTEGRITY_CORRUPT, f"non-fragmented file truncated in {info['truncated_box'] or 'mdat'}")
+
+    duration = info['duration_seconds']
+    if duration is not None and duration < MIN_SEGMENT_DURATION_SECONDS:
+        return result(INTEGRITY_CORRUPT, f"duration {duration:.2f}s below {MIN_SEGMENT_DURATION_SECONDS}s")
+
+    if info['truncated']:
+        return result(INTEGRITY_PARTIAL, f"truncated {info['truncated_box']} after {info['fragments']} complete fragment(s)")
+    if exit_code not in (0, None):
+        return result(INTEGRITY_PARTIAL, f"ffmpeg exit code {exit_code}")
+    return result(INTEGRITY_OK)
+
+
+def quarantine_dir_for(path) -> Path:
+    """videos/YYYYMMDD/camera_id/[analytics/]name -> videos/YYYYMMDD/camera_id/quarantine/"""
+    parent = Path(path).parent
+    camera_dir = parent.parent if parent.name == ANALYTICS_SUBDIR else parent
+    return camera_dir / QUARANTINE_SUBDIR
+
+
+def _move_into(path: Path, quarantine_dir: Path) -> Path:
+    """Move keeping the analytics/ level, so archive and analytics names never collide"""
+    target_dir = quarantine_dir / ANALYTICS_SUBDIR if path.parent.name == ANALYTICS_SUBDIR else quarantine_dir
+    target_dir.mkdir(parents=True, exist_ok=True)
+    target = target_dir / path.name
+    shutil.move(str(path), str(target))
+    return target
+
+
+def quarantine_segment(path, verdict: Dict, analytics_path=None) -> Optional[Path]:
+    """
+    Move a bad segment to its camera folder's quarantine/ and write
+    <name>.reason.json. Its companions (keyframe sidecar, analytics_path and that
+    file's sidecar) move along and are listed in the reason file.
+    Returns the new path (None if the file is gone).
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+
+    quarantine_dir = quarantine_dir_for(path)
+    companions = companion_files(path, analytics_path)
+    target = _move_into(path, quarantine_dir)
+    moved = {str(companion): str(_move_into(companion, quarantine_dir)) for companion in companions}
+    if analytics_path is not None and str(analytics_path) in moved:
+        verdict['analytics_path'] = Path(moved[str(analytics_path)])
+
+    reason = {
+        'original_path': str(path),
+        'companions': moved,
+        'quarantined_at': datetime.now().isoformat(timespec='seconds'),
+        'status': verdict.get('status'),
+        'reason': verdict.get('reason'),
+        'size_bytes': verdict.get('size_bytes'),
+        'boxes': verdict.get('boxes'),
+        'fragments': verdict.get('fragments'),
+        'duration_seconds': verdict.get('duration_seconds'),
+    }
+    with open(target.with_name(target.name + ".reason.json"), 'w') as f:
+        json.dump(reason, f, indent=2)
+    return target
+
+
+def check_segment(path, exit_code: Optional[int] = None, quarantine: bool = True, analytics_path=None) -> Dict:
+    """
+    validate_segment() + quarantine of unprocessable files.
+
+    analytics_path defaults to the same name under analytics/ (dual-stream
+    capture); it is quarantined with the archive segment.
+
+    Returns the verdict, with 'path' set to where the file is now and, after a
+    quarantine, 'analytics_path' set to where the analytics copy went.
+    """
+    path = Path(path)
+    if analytics_path is None and path.parent.name != ANALYTICS_SUBDIR:
+        analytics_path = path.parent / ANALYTICS_SUBDIR / path.name
+    verdict = validate_segment(path, exit_code)
+    verdict['path'] = path
+    if quarantine and verdict['status'] not in PROCESSABLE_STATUSES and verdict['status'] != INTEGRITY_MISSING:
+        moved = quarantine_segment(path, verdict, analytics_path)
+        if moved is not None:
+            verdict['path'] = moved
+            verdict['quarantined'] = True
+    return verdict
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Validate MP4 segments (box structure) and quarantine bad ones")
+    parser.add_argument("files", nargs='*', help="Segment files to check")
+    parser.add_argument("--scan", help="Check every *.mp4 below this folder (quarantine excluded)")
+    parser.add_argument("--quarantine", action="store_true", help="Move bad segments to <camera folder>/quarantine/")
+    parser.add_argument("--json", action="store_true", help="Print full verdicts as JSON")
+    args = parser.parse_args()
+
+    files: List[Path] = [Path(p) for p in args.files]
+    if args.scan:
+        files += sorted(p for p in Path(args.scan).rglob("*.mp4") if QUARANTINE_SUBDIR not in p.parts)
+    if not files:
+        parser.print_help()
+        return 1
+
+    counts: Dict[str, int] = {}
+    for file_path in files:
+        verdict = check_segment(file_path, quarantine=args.quarantine)
+        counts[verdict['status']] = counts.get(verdict['status'], 0) + 1
+        if args.json:
+            verdict['path'] = str(verdict['path'])
+            print(json.dumps(verdict, default=str))
+            continue
+        icon = "✅" if verdict['status'] == INTEGRITY_OK else ("⚠️ " if verdict['status'] in PROCESSABLE_STATUSES else "❌")
+        duration = verdict.get('duration_seconds')
+        detail = f"{duration:.1f}s, {verdict.get('fragments', 0)} fragment(s)" if duration is not None else ""
+        moved = " -> quarantined" if verdict.get('quarantined') else ""
+        print(f"{icon} {file_path.name}: {verdict['status']} {detail} {verdict.get('reason') or ''}{moved}")
+
+    if not args.json:
+        print(f"\n📊 {len(files)} segment(s): " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+    return 0 if all(k in PROCESSABLE_STATUSES for k in counts) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
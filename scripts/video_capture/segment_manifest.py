@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Segment Manifest - Capture-Time Index of Recorded Video Segments
+Version: 1.2.0
+Created: 2026-10-18
+Modified: 2026-10-18 - companion_size_bytes (analytics segment + keyframe sidecars) in disk accounting
+Modified: 2026-10-18 - registered_filenames() replaces registered_dates() (per-folder filesystem diff)
+Modified: 2026-10-18 - analytics_path column + analytics_segment_for() (dual-stream capture)
+Modified: 2026-10-18 - 'corrupt' status + integrity_reason column (segment_integrity.py verdicts)
+
+Purpose:
+- Capture registers every finished segment in the `videos` table
+  (db/database_schema.sql) the moment ffmpeg closes it
+- Orchestrator discovery, disk accounting (check_disk_space.py) and health
+  checks (comprehensive_health_check.py) read this index instead of walking
+  videos/ and stat-ing every file
+
+Columns used (videos table + columns added here):
+- camera_id, video_filename, video_date (YYYY-MM-DD), start_time, end_time,
+  duration_seconds, file_size_bytes, is_processed, storage_location
+- file_path:        absolute path of the segment
+- integrity_status: 'ok' | 'partial' (ffmpeg exited non-zero / truncated tail, file usable)
+                    | 'empty' (container only) | 'corrupt' (quarantined) | 'missing'
+- integrity_reason: why a segment is not 'ok' (segment_integrity.py)
+- ffmpeg_exit_code: exit code of the ffmpeg process that wrote it
+- analytics_path:   sub-stream copy of the same time span (dual-stream capture),
+                    videos/YYYYMMDD/camera_id/analytics/<same filename>
+- companion_size_bytes: analytics segment + keyframe index sidecars of both files;
+                    bytes_by_date_camera()/bytes_written_since() count it with file_size_bytes
+
+Usage:
+    from video_capture.segment_manifest import SegmentManifest
+
+    manifest = SegmentManifest()
+    manifest.register_segment("camera_35", path, start_time, 60.2, exit_code=0)
+    rows = manifest.unprocessed_segments(before_date="2025-12-10")
+    manifest.mark_processed("camera_35", "camera_35_20251209_180441.mp4")
+"""
+
+import sqlite3
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+DATABASE_PATH = SCRIPT_DIR.parent.parent / "db" / "detection_data.db"
+
+# Integrity statuses
+INTEGRITY_OK = "ok"
+INTEGRITY_PARTIAL = "partial"
+INTEGRITY_EMPTY = "empty"
+INTEGRITY_MISSING = "missing"
+INTEGRITY_CORRUPT = "corrupt"
+PROCESSABLE_STATUSES = (INTEGRITY_OK, INTEGRITY_PARTIAL)
+
+# ffmpeg writes a ~258 byte container even when no packet arrived
+MIN_VALID_SEGMENT_BYTES = 1024
+
+# Dual-stream capture: low-resolution sub-stream segments live next to the archive
+ANALYTICS_SUBDIR = "analytics"
+
+# Keyframe index sidecar next to each segment (keyframe_index.py imports it from here)
+KEYFRAME_SIDECAR_SUFFIX = ".kfidx.json"
+
+VIDEOS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS videos (
+    video_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    camera_id TEXT NOT NULL,
+    video_filename TEXT NOT NULL,
+    video_date TEXT NOT NULL,
+    start_time TIMESTAMP NOT NULL,
+    end_time TIMESTAMP,
+    duration_seconds INTEGER,
+    file_size_bytes INTEGER,
+    fps REAL,
+    resolution TEXT,
+    is_processed INTEGER DEFAULT 0,
+    storage_location TEXT DEFAULT 'local',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (camera_id) REFERENCES cameras(camera_id),
+    UNIQUE(camera_id, video_filename)
+);
+CREATE INDEX IF NOT EXISTS idx_videos_camera_date ON videos(camera_id, video_date);
+CREATE INDEX IF NOT EXISTS idx_videos_unprocessed ON videos(camera_id, is_processed) WHERE is_processed = 0;
+"""
+
+# Columns added on top of the v2.0.0 videos table
+MANIFEST_COLUMNS = {
+    "file_path": "TEXT",
+    "integrity_status": "TEXT DEFAULT 'ok'",
+    "ffmpeg_exit_code": "INTEGER",
+    "analytics_path": "TEXT",
+    "integrity_reason": "TEXT",
+    "companion_size_bytes": "INTEGER",
+}
+
+MANIFEST_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_videos_date_storage ON videos(video_date, storage_location)",
+    "CREATE INDEX IF NOT EXISTS idx_videos_end_time ON videos(end_time)",
+]
+
+
+def classify_segment(file_path: Path, exit_code: Optional[int]) -> str:
+    """Cheap integrity classification from exit code + size"""
+    if not file_path.exists():
+        return INTEGRITY_MISSING
+    if file_path.stat().st_size < MIN_VALID_SEGMENT_BYTES:
+        return INTEGRITY_EMPTY
+    if exit_code not in (0, None):
+        # Fragmented MP4 (+frag_keyframe+empty_moov) stays readable after a failure
+        return INTEGRITY_PARTIAL
+    return INTEGRITY_OK
+
+
+def companion_files(video_path, analytics_path=None) -> List[Path]:
+    """Files that belong to a segment: its analytics copy and the keyframe sidecars of both"""
+    video_path = Path(video_path)
+    files = [video_path.with_name(video_path.name + KEYFRAME_SIDECAR_SUFFIX)]
+    if analytics_path:
+        analytics_path = Path(analytics_path)
+        files += [analytics_path, analytics_path.with_name(analytics_path.name + KEYFRAME_SIDECAR_SUFFIX)]
+    return [f for f in files if f.exists()]
+
+
+def analytics_segment_for(video_path) -> Optional[Path]:
+    """Sub-stream segment recorded alongside an archive segment, if usable"""
+    video_path = Path(video_path)
+    candidate = video_path.parent / ANALYTICS_SUBDIR / video_path.name
+    try:
+        if candidate.stat().st_size >= MIN_VALID_SEGMENT_BYTES:
+            return candidate
+    except OSError:
+        pass
+    return None
+
+
+class SegmentManifest:
+    """
+    Thin accessor for the videos table
+    Version: 1.2.0
+
+    Every call uses its own short-lived connection: capture threads,
+    orchestrator workers and monitors can share one instance.
+    """
+
+    def __init__(self, db_path: Path = DATABASE_PATH):
+        self.db_path = Path(db_path)
+        self.ensure_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def ensure_schema(self):
+        """Create videos table if needed and add manifest columns to older databases"""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(VIDEOS_TABLE_SQL)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(videos)").fetchall()]
+            for column, column_type in MANIFEST_COLUMNS.items():
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE videos ADD COLUMN {column} {column_type}")
+            for statement in MANIFEST_INDEXES:
+                conn.execute(statement)
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Capture side
+    # ------------------------------------------------------------------
+
+    def register_segment(self, camera_id: str, file_path, start_time: datetime,
+                         duration_seconds: float, exit_code: Optional[int] = 0,
+                         integrity_status: Optional[str] = None,
+                         fps: Optional[float] = None, resolution: Optional[str] = None,
+                         analytics_path=None, integrity_reason: Optional[str] = None) -> str:
+        """
+        Record a finished segment (idempotent on camera_id + filename).
+
+        Returns:
+            The integrity status that was stored
+        """
+        file_path = Path(file_path)
+        if integrity_status is None:
+            integrity_status = classify_segment(file_path, exit_code)
+        size_bytes = file_path.stat().st_size if file_path.exists() else 0
+        companion_bytes = sum(f.stat().st_size for f in companion_files(file_path, analytics_path))
+        end_time = start_time + timedelta(seconds=duration_seconds)
+
+        conn = self._connect()
+        try:
+            conn.execute("""
+                INSERT INTO videos
+                    (camera_id, video_filename, video_date, start_time, end_time,
+                     duration_seconds, file_size_bytes, fps, resolution,
+                     file_path, integrity_status, ffmpeg_exit_code, analytics_path, integrity_reason,
+                     companion_size_bytes)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(camera_id, video_filename) DO UPDATE SET
+                    end_time = excluded.end_time,
+                    duration_seconds = excluded.duration_seconds,
+                    file_size_bytes = excluded.file_size_bytes,
+                    file_path = excluded.file_path,
+                    integrity_status = excluded.integrity_status,
+                    ffmpeg_exit_code = excluded.ffmpeg_exit_code,
+                    analytics_path = COALESCE(excluded.analytics_path, videos.analytics_path),
+                    integrity_reason = excluded.integrity_reason,
+                    companion_size_bytes = excluded.companion_size_bytes
+            """, (
+                camera_id, file_path.name, start_time.strftime("%Y-%m-%d"),
+                start_time.isoformat(timespec="seconds"), end_time.isoformat(timespec="seconds"),
+                int(round(duration_seconds)), size_bytes, fps, resolution,
+                str(file_path.resolve()), integrity_status, exit_code,
+                str(Path(analytics_path).resolve()) if analytics_path else None,
+                integrity_reason, companion_bytes
+            ))
+            conn.commit()
+        finally:
+            conn.close()
+        return integrity_status
+
+    # ------------------------------------------------------------------
+    # Processing side
+    # ------------------------------------------------------------------
+
+    def has_segments(self) -> bool:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT 1 FROM videos WHERE file_path IS NOT NULL LIMIT 1").fetchone() is not None
+        finally:
+            conn.close()
+
+    def unprocessed_segments(self, before_date: Optional[str] = None,
+                             ended_before: Optional[datetime] = None,
+                             camera_ids: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Processable segments not yet marked processed (uses idx_videos_unprocessed).
+
+        Args:
+            before_date: Only segments with video_date < this (YYYY-MM-DD)
+            ended_before: Only segments whose end_time is earlier (near-real-time lag)
+            camera_ids: Optional camera filter
+        """
+        clauses = ["is_processed = 0", "storage_location = 'local'", "file_path IS NOT NULL",
+                   f"integrity_status IN ({','.join('?' * len(PROCESSABLE_STATUSES))})"]
+        params: List = list(PROCESSABLE_STATUSES)
+        if before_date:
+            clauses.append("video_date < ?")
+            params.append(before_date)
+        if ended_before:
+            clauses.append("end_time <= ?")
+            params.append(ended_before.isoformat(timespec="seconds"))
+        if camera_ids:
+            clauses.append(f"camera_id IN ({','.join('?' * len(camera_ids))})")
+            params.extend(camera_ids)
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT * FROM videos WHERE {' AND '.join(clauses)} ORDER BY start_time",
+                params
+            ).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def registered_filenames(self, camera_id: str, video_date: str) -> Set[str]:
+        """Filenames registered for one camera folder (video_date YYYY-MM-DD, idx_videos_camera_date)"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT video_filename FROM videos WHERE camera_id = ? AND video_date = ? AND file_path IS NOT NULL",
+                (camera_id, video_date)
+            )
+            return {row[0] for row in rows}
+        finally:
+            conn.close()
+
+    def mark_processed(self, camera_id: str, video_filename: str):
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE videos SET is_processed = 1 WHERE camera_id = ? AND video_filename = ?",
+                (camera_id, video_filename)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Disk accounting / health side
+    # ------------------------------------------------------------------
+
+    def bytes_by_date_camera(self) -> Dict[str, Dict[str, int]]:
+        """{video_date(YYYYMMDD): {camera_id: bytes}} for segments still on local disk (with companions)"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("""
+                SELECT video_date, camera_id, SUM(COALESCE(file_size_bytes, 0) + COALESCE(companion_size_bytes, 0))
+                FROM videos
+                WHERE storage_location = 'local'
+                GROUP BY video_date, camera_id
+            """).fetchall()
+        finally:
+            conn.close()
+
+        usage: Dict[str, Dict[str, int]] = {}
+        for video_date, camera_id, total in rows:
+            usage.setdefault(video_date.replace("-", ""), {})[camera_id] = total or 0
+        return usage
+
+    def bytes_written_since(self, since: datetime) -> int:
+        """Bytes of segments that finished after `since` (recording rate without sleeping)"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT SUM(COALESCE(file_size_bytes, 0) + COALESCE(companion_size_bytes, 0)) "
+                "FROM videos WHERE end_time >= ?",
+                (since.isoformat(timespec="seconds"),)
+            ).fetchone()
+            return row[0] or 0
+        finally:
+            conn.close()
+
+    def segments_for_date(self, video_date: str, camera_id: Optional[str] = None) -> List[Dict]:
+        """All registered segments for a YYYYMMDD or YYYY-MM-DD date"""
+        if len(video_date) == 8:
+            video_date = f"{video_date[:4]}-{video_date[4:6]}-{video_date[6:]}"
+        params: List = [video_date]
+        camera_clause = ""
+        if camera_id:
+            camera_clause = "AND camera_id = ?"
+            params.append(camera_id)
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT * FROM videos WHERE video_date = ? {camera_clause} ORDER BY start_time",
+                params
+            ).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def mark_deleted(self, video_date: str, camera_ids: Optional[Iterable[str]] = None) -> int:
+        """Flag segments of a date (optionally per camera) as no longer on local disk"""
+        if len(video_date) == 8:
+            video_date = f"{video_date[:4]}-{video_date[4:6]}-{video_date[6:]}"
+        params: List = [video_date]
+        camera_clause = ""
+        camera_ids = list(camera_ids or [])
+        if camera_ids:
+            camera_clause = f"AND camera_id IN ({','.join('?' * len(camera_ids))})"
+            params.extend(camera_ids)
+
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                f"UPDATE videos SET storage_location = 'deleted' "
+                f"WHERE video_date = ? AND storage_location = 'local' {camera_clause}",
+                params
+            )
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
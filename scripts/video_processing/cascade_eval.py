@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Cascade Evaluation - Escalation Rate and State Agreement vs the Medium-Only Baseline
+Version: 1.0.0
+Created: 2026-10-18
+
+Purpose:
+- --cascade on the detection script runs yolov8n first and yolov8m only on
+  uncertain frames. This measures what that costs and saves on real segments:
+    escalation rate  fraction of frames handed to the full model, per reason
+                     (pending / uncertain / boundary / overlap) and per hour of day
+    speedup          detection-stage time per frame, baseline / cascade
+    agreement        table/division state timelines sampled every second, same
+                     comparison as the INT8 accuracy gate (state_timelines.py)
+- Each video is processed twice into throwaway databases: medium-only baseline
+  and --cascade, same backend
+- Report: logs/cascade_eval/cascade_eval_YYYYMMDD_HHMMSS.json
+
+Usage:
+    # 6 archived segments spread over cameras and days, 5 minutes each
+    python3 cascade_eval.py
+
+    # Explicit videos, wider uncertainty band
+    python3 cascade_eval.py --videos a.mp4 b.mp4 --margin 0.15 --duration 600
+
+Requires: the detection script's dependencies, the small model (models/yolov8n.pt,
+or its export for the onnx/openvino backends)
+"""
+
+import argparse
+import json
+import re
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+from video_processing.inference_backends import BACKENDS, DEFAULT_BACKEND, CASCADE_CONF_MARGIN, CASCADE_REASONS
+from video_processing.state_timelines import (
+    PROJECT_ROOT, recorded_segments, run_detection, load_timelines, timeline_agreement
+)
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+REPORT_DIR = PROJECT_ROOT / "logs" / "cascade_eval"
+DEFAULT_VIDEOS = 6
+DEFAULT_DURATION = 300               # Seconds of each video to process
+DEFAULT_MIN_AGREEMENT = 0.95         # Same bar as the INT8 gate
+SEGMENT_TIME_PATTERN = re.compile(r"_(\d{8})_(\d{2})\d{4}")   # camera_35_20251209_180441.mp4
+
+
+def pick_videos(count: int) -> List[Path]:
+    """Segments spread over the archive (different cameras, days and hours)"""
+    segments = recorded_segments()
+    if len(segments) <= count:
+        return segments
+    step = len(segments) / count
+    return [segments[int(i * step)] for i in range(count)]
+
+
+def segment_hour(video: Path) -> str:
+    match = SEGMENT_TIME_PATTERN.search(video.stem)
+    return f"{match.group(2)}:00" if match else "unknown"
+
+
+# ============================================================================
+# EVALUATION
+# ============================================================================
+
+def evaluate(videos: List[Path], backend: str, duration: int, margin: float,
+             cascade_model: str = None) -> Dict:
+    """Baseline vs cascade on each video"""
+    cascade_args = ["--cascade", "--cascade-margin", str(margin)]
+    if cascade_model:
+        cascade_args += ["--cascade-model", cascade_model]
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="cascade_eval_") as tmp:
+        work_dir = Path(tmp)
+        for video in videos:
+            print(f"\n🎬 {video.name}")
+            baseline = run_detection(video, backend, duration, work_dir, label="baseline")
+            cascade = run_detection(video, backend, duration, work_dir, extra_args=cascade_args, label="cascade")
+            agree, total = timeline_agreement(load_timelines(baseline["db"]), load_timelines(cascade["db"]), duration)
+
+            frames = cascade.get("cascade_frames", 0)
+            escalated = cascade.get("escalated", 0)
+            result = {
+                "video": str(video),
+                "hour": segment_hour(video),
+                "frames": frames,
+                "escalated": escalated,
+                "escalation_rate": round(escalated / frames, 4) if frames else 0.0,
+                "reasons": cascade.get("reasons", {}),
+                "agree": agree,
+                "samples": total,
+                "agreement": round(agree / total, 4) if total else 1.0,
+                "baseline_detect_ms": baseline["detect_ms"],
+                "cascade_detect_ms": cascade["detect_ms"],
+                "baseline_fps": baseline["fps"],
+                "cascade_fps": cascade["fps"],
+            }
+            speedup = baseline["detect_ms"] / cascade["detect_ms"] if cascade["detect_ms"] else 0.0
+            print(f"   Escalated {escalated}/{frames} ({result['escalation_rate']:.1%}) | "
+                  f"agreement {result['agreement']:.1%} | "
+                  f"detection {baseline['detect_ms']:.1f}ms -> {cascade['detect_ms']:.1f}ms ({speedup:.2f}x)")
+            results.append(result)
+    return summarize(results, backend, duration, margin)
+
+
+def summarize(results: List[Dict], backend: str, duration: int, margin: float) -> Dict:
+    frames = sum(r["frames"] for r in results)
+    escalated = sum(r["escalated"] for r in results)
+    agree = sum(r["agree"] for r in results)
+    samples = sum(r["samples"] for r in results)
+    baseline_ms = sum(r["baseline_detect_ms"] for r in results)
+    cascade_ms = sum(r["cascade_detect_ms"] for r in results)
+
+    reasons = {reason: sum(r["reasons"].get(reason, 0) for r in results) for reason in CASCADE_REASONS}
+    by_hour: Dict[str, Dict] = {}
+    for r in results:
+        hour = by_hour.setdefault(r["hour"], {"frames": 0, "escalated": 0})
+        hour["frames"] += r["frames"]
+        hour["escalated"] += r["escalated"]
+    for hour in by_hour.values():
+        hour["escalation_rate"] = round(hour["escalated"] / hour["frames"], 4) if hour["frames"] else 0.0
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "backend": backend,
+        "duration": duration,
+        "margin": margin,
+        "frames": frames,
+        "escalated": escalated,
+        "escalation_rate": round(escalated / frames, 4) if frames else 0.0,
+        "reasons": reasons,
+        "by_hour": dict(sorted(by_hour.items())),
+        "agreement": round(agree / samples, 4) if samples else 1.0,
+        "detection_speedup": round(baseline_ms / cascade_ms, 2) if cascade_ms else 0.0,
+        "videos": results,
+    }
+
+
+def print_report(report: Dict, min_agreement: float):
+    print(f"\n{'='*70}")
+    print("Cascade Evaluation")
+    print(f"{'='*70}")
+    print(f"   Backend: {report['backend']} | margin {report['margin']} | {len(report['videos'])} video(s)")
+    print(f"   Escalated: {report['escalated']}/{report['frames']} frames ({report['escalation_rate']:.1%})")
+    print("   Reasons: " + ", ".join(f"{k} {v}" for k, v in report["reasons"].items()))
+    for hour, stats in report["by_hour"].items():
+        print(f"      {hour}  {stats['escalation_rate']:.1%} of {stats['frames']} frames")
+    print(f"   Detection speedup: {report['detection_speedup']:.2f}x")
+    print(f"   State agreement with medium-only: {report['agreement']:.2%} (target {min_agreement:.0%})")
+    if report["agreement"] >= min_agreement:
+        print("   ✅ Cascade matches the baseline")
+    else:
+        print("   ⚠️  Cascade diverges from the baseline - widen --margin or keep it off for these cameras")
+    print(f"{'='*70}")
+
+
+# ============================================================================
+# MAIN ENTRY POINT
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the detector cascade with the medium-only baseline",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--videos", nargs="+", help="Videos to evaluate (default: picked from videos/)")
+    parser.add_argument("--count", type=int, default=DEFAULT_VIDEOS,
+                       help=f"Segments to pick automatically (default: {DEFAULT_VIDEOS})")
+    parser.add_argument("--duration", type=int, default=DEFAULT_DURATION,
+                       help=f"Seconds of each video to process (default: {DEFAULT_DURATION})")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKENDS,
+                       help=f"Backend for both runs (default: {DEFAULT_BACKEND})")
+    parser.add_argument("--margin", type=float, default=CASCADE_CONF_MARGIN,
+                       help=f"Cascade confidence margin (default: {CASCADE_CONF_MARGIN})")
+    parser.add_argument("--cascade-model", default=None, help="Small detector weights (default: detection script's)")
+    parser.add_argument("--min-agreement", type=float, default=DEFAULT_MIN_AGREEMENT,
+                       help=f"Agreement reported as matching (default: {DEFAULT_MIN_AGREEMENT})")
+    args = parser.parse_args()
+
+    videos = [Path(v) for v in args.videos] if args.videos else pick_videos(args.count)
+    if not videos:
+        print("❌ No videos to evaluate (none given, none archived under videos/)")
+        return 1
+
+    print(f"🔬 Cascade vs medium-only on {len(videos)} video(s), {args.duration}s each")
+    report = evaluate(videos, args.backend, args.duration, args.margin, args.cascade_model)
+    print_report(report, args.min_agreement)
+
+    REPORT_DIR.mkdir(parents=True, exist_ok=True)
+    report_file = REPORT_DIR / f"cascade_eval_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    report_file.write_text(json.dumps(report, indent=2))
+    print(f"💾 Report: {report_file}")
+    return 0 if report["agreement"] >= args.min_agreement else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
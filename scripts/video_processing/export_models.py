@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Model Export - ONNX / OpenVINO Graphs for the Detection Backends
+Version: 1.0.0
+Created: 2026-10-18
+
+Purpose:
+- Convert the person detector (yolov8m.pt) and the staff classifier
+  (waiter_customer_classifier.pt) to ONNX and optionally OpenVINO, next to
+  the .pt files where inference_backends.py looks for them
+- --verify: parity test of an exported backend against the pytorch path on
+  frames sampled from a real segment. The exported backends re-implement
+  letterbox, NMS, class filter and softmax top-1 in numpy, so this is the check
+  that the reproduction still matches ultralytics
+
+Parity criteria (per sampled frame, pytorch = reference):
+- Every reference person box has an exported box with IoU >= 0.9 and
+  |confidence delta| <= 0.05 (and no extra exported boxes), in >= 98% of boxes
+- Staff classifier top-1 agrees on >= 98% of the reference person crops,
+  |top-1 confidence delta| <= 0.05
+
+Usage:
+    # Export both models to ONNX, then check parity on 50 frames
+    python3 export_models.py --format onnx --verify --video ../../videos/20251209/camera_35/camera_35_20251209_180441.mp4
+
+    # OpenVINO too
+    python3 export_models.py --format all --verify --video VIDEO.mp4
+
+    # Re-check existing exports without exporting again
+    python3 export_models.py --format onnx --verify-only --video VIDEO.mp4
+
+Requires: ultralytics (export + reference), onnx/onnxruntime, openvino (optional)
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+from video_processing.inference_backends import (
+    load_inference_models, box_iou, onnx_path, openvino_path, DETECTOR_IMGSZ, CLASSIFIER_IMGSZ
+)
+from video_processing.table_and_region_state_detection import (
+    PERSON_DETECTOR_MODEL, STAFF_CLASSIFIER_MODEL, PERSON_CONF_THRESHOLD
+)
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+ONNX_OPSET = 12
+PARITY_IOU = 0.9                 # Matched boxes must overlap this much
+PARITY_CONF_DELTA = 0.05         # Max confidence difference (boxes and top-1)
+PARITY_MIN_AGREEMENT = 0.98      # Fraction of boxes / crops that must match
+DEFAULT_VERIFY_FRAMES = 50
+MIN_CROP_SIZE = 20               # classify_persons() skips smaller crops
+
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+
+def classifier_imgsz(weights: str) -> int:
+    """Training image size stored in the checkpoint (YOLO-cls default 224)"""
+    from ultralytics import YOLO
+    args = getattr(YOLO(weights).model, "args", {}) or {}
+    imgsz = args.get("imgsz", CLASSIFIER_IMGSZ)
+    return imgsz[0] if isinstance(imgsz, (list, tuple)) else int(imgsz)
+
+
+def export_model(weights: str, fmt: str, imgsz: int) -> Path:
+    """ultralytics export with a static batch-1 input (what the backends feed)"""
+    from ultralytics import YOLO
+    print(f"📦 Exporting {Path(weights).name} -> {fmt} (imgsz {imgsz})")
+    kwargs = {"format": fmt, "imgsz": imgsz, "dynamic": False}
+    if fmt == "onnx":
+        kwargs.update(opset=ONNX_OPSET, simplify=True)
+    YOLO(weights).export(**kwargs)
+    target = onnx_path(weights) if fmt == "onnx" else openvino_path(weights)
+    if not target.exists():
+        raise RuntimeError(f"Export finished but {target} is missing")
+    print(f"   ✅ {target}")
+    return target
+
+
+# ============================================================================
+# PARITY CHECK
+# ============================================================================
+
+def sample_frames(video: str, count: int) -> List[np.ndarray]:
+    """`count` frames evenly spread over the video"""
+    cap = cv2.VideoCapture(video)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or count
+    frames = []
+    for index in np.linspace(0, max(0, total - 1), count).astype(int):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+        ok, frame = cap.read()
+        if ok:
+            frames.append(frame)
+    cap.release()
+    return frames
+
+
+def match_detections(reference: List, candidate: List) -> Dict:
+    """Greedy IoU matching, highest-confidence reference box first"""
+    unmatched = list(candidate)
+    matched, ious, conf_deltas = 0, [], []
+    for ref in sorted(reference, key=lambda d: -d[4]):
+        best = max(unmatched, key=lambda c: box_iou(ref, c), default=None)
+        if best is None:
+            continue
+        iou = box_iou(ref, best)
+        if iou >= PARITY_IOU and abs(ref[4] - best[4]) <= PARITY_CONF_DELTA:
+            matched += 1
+            ious.append(iou)
+            conf_deltas.append(abs(ref[4] - best[4]))
+            unmatched.remove(best)
+    return {"reference": len(reference), "matched": matched, "extra": len(unmatched),
+            "ious": ious, "conf_deltas": conf_deltas}
+
+
+def verify(backend: str, video: str, frame_count: int = DEFAULT_VERIFY_FRAMES) -> bool:
+    """Compare an exported backend with the pytorch path on sampled frames"""
+    frames = sample_frames(video, frame_count)
+    if not frames:
+        print(f"❌ Could not read frames from {video}")
+        return False
+    print(f"\n🔍 Parity check: {backend} vs pytorch on {len(frames)} frames of {Path(video).name}")
+
+    ref_detector, ref_classifier = load_inference_models(PERSON_DETECTOR_MODEL, STAFF_CLASSIFIER_MODEL, "pytorch")
+    detector, classifier = load_inference_models(PERSON_DETECTOR_MODEL, STAFF_CLASSIFIER_MODEL, backend)
+
+    boxes_total = boxes_matched = boxes_extra = 0
+    ious, conf_deltas = [], []
+    crops_total = crops_agree = 0
+    prob_deltas = []
+    for frame in frames:
+        reference = ref_detector.detect(frame, PERSON_CONF_THRESHOLD, classes=[0])
+        candidate = detector.detect(frame, PERSON_CONF_THRESHOLD, classes=[0])
+        result = match_detections(reference, candidate)
+        boxes_total += result["reference"]
+        boxes_matched += result["matched"]
+        boxes_extra += result["extra"]
+        ious.extend(result["ious"])
+        conf_deltas.extend(result["conf_deltas"])
+
+        # Classifier on the reference crops, so both see identical pixels
+        for x1, y1, x2, y2, _ in reference:
+            crop = frame[int(y1):int(y2), int(x1):int(x2)]
+            if crop.shape[0] < MIN_CROP_SIZE or crop.shape[1] < MIN_CROP_SIZE:
+                continue
+            ref_top1 = ref_classifier.classify(crop)
+            top1 = classifier.classify(crop)
+            if ref_top1 is None or top1 is None:
+                continue
+            crops_total += 1
+            delta = abs(ref_top1[1] - top1[1])
+            prob_deltas.append(delta)
+            if ref_top1[0] == top1[0] and delta <= PARITY_CONF_DELTA:
+                crops_agree += 1
+
+    box_agreement = boxes_matched / (boxes_total + boxes_extra) if boxes_total + boxes_extra else 1.0
+    crop_agreement = crops_agree / crops_total if crops_total else 1.0
+    passed = box_agreement >= PARITY_MIN_AGREEMENT and crop_agreement >= PARITY_MIN_AGREEMENT
+
+    print(f"   Detector ({detector.backend}): {boxes_matched}/{boxes_total} reference boxes matched, "
+          f"{boxes_extra} extra -> {box_agreement:.1%}")
+    if ious:
+        print(f"      mean IoU {np.mean(ious):.3f}, max confidence delta {max(conf_deltas):.4f}")
+    print(f"   Classifier ({classifier.backend}): {crops_agree}/{crops_total} crops agree -> {crop_agreement:.1%}")
+    if prob_deltas:
+        print(f"      max top-1 confidence delta {max(prob_deltas):.4f}")
+    if boxes_total == 0:
+        print("   ⚠️  No persons in the sampled frames - pick a busier segment for a meaningful check")
+    print(f"   {'✅ PASS' if passed else '❌ FAIL'} (need >= {PARITY_MIN_AGREEMENT:.0%} agreement)")
+    return passed
+
+
+# ============================================================================
+# MAIN ENTRY POINT
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export detection models to ONNX/OpenVINO and check parity with PyTorch",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--format", default="onnx", choices=["onnx", "openvino", "all"],
+                       help="Export format (default: onnx)")
+    parser.add_argument("--imgsz", type=int, default=DETECTOR_IMGSZ,
+                       help=f"Detector input size (default: {DETECTOR_IMGSZ}); classifier uses its training size")
+    parser.add_argument("--verify", action="store_true",
+                       help="After export, compare each exported backend with the pytorch path")
+    parser.add_argument("--verify-only", action="store_true",
+                       help="Only run the parity check on existing exports")
+    parser.add_argument("--video", help="Segment to sample verification frames from")
+    parser.add_argument("--frames", type=int, default=DEFAULT_VERIFY_FRAMES,
+                       help=f"Frames to sample for verification (default: {DEFAULT_VERIFY_FRAMES})")
+    args = parser.parse_args()
+
+    formats = ["onnx", "openvino"] if args.format == "all" else [args.format]
+    if (args.verify or args.verify_only) and not args.video:
+        parser.error("--verify needs --video")
+
+    if not args.verify_only:
+        cls_imgsz = classifier_imgsz(STAFF_CLASSIFIER_MODEL)
+        for fmt in formats:
+            export_model(PERSON_DETECTOR_MODEL, fmt, args.imgsz)
+            export_model(STAFF_CLASSIFIER_MODEL, fmt, cls_imgsz)
+
+    if args.verify or args.verify_only:
+        results = [verify(fmt, args.video, args.frames) for fmt in formats]
+        return 0 if all(results) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
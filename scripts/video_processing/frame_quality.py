@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Frame Quality Gate - Skip Inference on Dark, Blurred and Frozen Frames
+Version: 1.0.1
+Created: 2026-10-18
+Modified: 2026-10-18 - Dark/blurred checked before repeat: black night frames hash the
+          same and were counted as repeats (and opened camera_frozen every night);
+          gate is opt-in per camera until the thresholds are tuned
+
+Purpose:
+- Before and after service hours and during camera glitches the detection loop
+  ran yolov8m on black frames, smeared/gray decoder output and exact repeats of a
+  frozen stream. One downscaled grayscale copy per frame (~1ms) answers all three:
+    dark     mean luminance below min_luma (0-255)
+    blurred  Laplacian variance below min_sharpness (flat gray, defocus, smear)
+    repeat   same hash as the previous usable frame (frozen stream); only frames
+             that pass the dark/blurred checks are compared
+- Skipped frames leave every state untouched: a repeat would give the same
+  detections, a dark/blurred frame would only give wrong ones
+- A repeat run longer than frozen_seconds of media time is a "camera_frozen"
+  event (opened when it crosses the limit, closed when the picture changes),
+  written to the camera_events table by the detection script
+
+Per camera: cameras_config.json "frame_quality"
+{"enabled", "min_luma", "min_sharpness", "frozen_seconds"}, overridable on the
+command line (--quality-gate / --no-quality-gate). Off unless enabled: the
+thresholds are not tuned per camera yet and skipped frames never reach detection.
+"""
+
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+ANALYSIS_WIDTH = 320                 # Downscaled width for all three measurements
+DEFAULT_MIN_LUMA = 16.0              # Mean gray level; lights-off dining room ~5, dim service ~40+
+DEFAULT_MIN_SHARPNESS = 8.0          # Laplacian variance at ANALYSIS_WIDTH; normal scenes are 100+
+DEFAULT_FROZEN_SECONDS = 10.0        # Identical frames for this long = camera_frozen event
+SKIP_REASONS = ["dark", "blurred", "repeat"]
+EVENT_CAMERA_FROZEN = "camera_frozen"
+
+
+def measure(frame: np.ndarray) -> Tuple[float, float, bytes]:
+    """(mean luminance, Laplacian variance, hash) of a downscaled grayscale copy"""
+    height, width = frame.shape[:2]
+    if width > ANALYSIS_WIDTH:
+        size = (ANALYSIS_WIDTH, max(1, int(height * ANALYSIS_WIDTH / width)))
+        frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    luma = float(gray.mean())
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+    digest = hashlib.blake2b(gray.tobytes(), digest_size=8).digest()
+    return luma, sharpness, digest
+
+
+class FrameQualityGate:
+    """Per-session gate: check() each sampled frame before detection"""
+
+    def __init__(self, min_luma: float = DEFAULT_MIN_LUMA, min_sharpness: float = DEFAULT_MIN_SHARPNESS,
+                 frozen_seconds: float = DEFAULT_FROZEN_SECONDS):
+        self.min_luma = min_luma
+        self.min_sharpness = min_sharpness
+        self.frozen_seconds = frozen_seconds
+        self.checked = 0
+        self.skipped = {reason: 0 for reason in SKIP_REASONS}
+        self.events: List[Dict] = []         # Every camera_frozen event of the session
+        self._changed: List[Dict] = []       # Opened/closed since the last pop_events()
+        self._last_hash: Optional[bytes] = None
+        self._run_start: Optional[Tuple[int, float]] = None   # (frame, media time) of the current picture
+        self._frozen: Optional[Dict] = None
+
+    @property
+    def skipped_total(self) -> int:
+        return sum(self.skipped.values())
+
+    def check(self, frame: np.ndarray, frame_idx: int, media_time: float) -> Optional[str]:
+        """Skip reason for this frame (dark / blurred / repeat), None to run detection"""
+        self.checked += 1
+        luma, sharpness, digest = measure(frame)
+
+        if luma < self.min_luma or sharpness < self.min_sharpness:
+            # Unusable picture: not compared for repeats (consecutive black frames
+            # hash the same), and it ends any frozen run
+            reason = "dark" if luma < self.min_luma else "blurred"
+            self._close_frozen(frame_idx, media_time)
+            self._last_hash = None
+            self._run_start = None
+        elif digest == self._last_hash:
+            reason = "repeat"
+            start_frame, start_time = self._run_start
+            if self._frozen is None and media_time - start_time >= self.frozen_seconds:
+                self._frozen = {"event_type": EVENT_CAMERA_FROZEN, "frame_number": start_frame,
+                                "media_seconds": start_time, "end_frame": None, "duration_seconds": None,
+                                "details": {"luma": round(luma, 1), "sharpness": round(sharpness, 1)}}
+                self.events.append(self._frozen)
+                self._changed.append(self._frozen)
+        else:
+            self._close_frozen(frame_idx, media_time)
+            self._last_hash = digest
+            self._run_start = (frame_idx, media_time)
+            reason = None
+
+        if reason is not None:
+            self.skipped[reason] += 1
+        return reason
+
+    def finish(self, frame_idx: Optional[int], media_time: float):
+        """End of session: a freeze still running is closed at the last frame"""
+        if self._frozen is not None:
+            self._frozen["details"]["until_end"] = True
+        self._close_frozen(frame_idx, media_time)
+
+    def pop_events(self) -> List[Dict]:
+        """Events opened or closed since the last call (same dict object when closed later)"""
+        changed, self._changed = self._changed, []
+        return changed
+
+    def _close_frozen(self, frame_idx: Optional[int], media_time: float):
+        if self._frozen is None:
+            return
+        self._frozen["end_frame"] = frame_idx
+        self._frozen["duration_seconds"] = round(media_time - self._frozen["media_seconds"], 2)
+        self._changed.append(self._frozen)
+        self._frozen = None
+
+    def summary(self) -> str:
+        reasons = ", ".join(f"{reason} {self.skipped[reason]}" for reason in SKIP_REASONS)
+        frozen = sum(event["duration_seconds"] or 0.0 for event in self.events)
+        return (f"skipped {self.skipped_total}/{self.checked} frames ({reasons}) | "
+                f"{len(self.events)} frozen event(s), {frozen:.0f}s")
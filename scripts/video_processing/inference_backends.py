@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+Inference Backends - Person Detector / Staff Classifier Runtimes
+Version: 1.2.1
+Created: 2026-10-18
+Modified: 2026-10-18 - INT8 gate matches the quantized files by SHA-256, not mtime
+Modified: 2026-10-18 - CascadeDetector: small detector first, the full detector only
+          on uncertain frames (--cascade on the detection script)
+Modified: 2026-10-18 - onnx-int8 backend (quantize_models.py), refused unless the
+          accuracy gate approved the quantized pair
+
+Purpose:
+- load_models() used to hard-code ultralytics YOLO(...) on .pt weights; on
+  CPU-only hosts PyTorch eager inference for yolov8m is several times slower
+  than an optimised runtime
+- Same two calls for every backend, so the detection loop does not care which
+  one runs:
+    detector.detect(frame, conf, classes) -> [(x1, y1, x2, y2, confidence), ...]
+    classifier.classify(crop)            -> (class_id, confidence)
+
+Backends:
+- pytorch   ultralytics YOLO on the .pt weights (reference, GPU when available)
+- onnx      ONNX Runtime on <weights>.onnx (export_models.py)
+- openvino  OpenVINO on <weights>_openvino_model/<weights>.xml (export_models.py)
+- onnx-int8 ONNX Runtime on <weights>.int8.onnx (quantize_models.py); only loads
+            when models/int8_gate.json records an approved state-timeline gate
+- auto      onnx when the exported file and onnxruntime are present, else pytorch
+
+The exported backends reproduce the ultralytics pipeline in numpy:
+- Detector: letterbox to imgsz (gray 114 padding), BGR->RGB, /255, NCHW;
+  output (1, 4 + classes, anchors) -> confidence filter, class filter,
+  class-aware NMS (IoU 0.7, max 300), boxes mapped back through the letterbox
+- Classifier: center square crop, resize to imgsz, BGR->RGB, /255, NCHW;
+  output probabilities (softmax applied if the graph returns logits), top-1
+The letterbox is static (square imgsz) where ultralytics pads to a stride
+multiple, so boxes can differ by a pixel - export_models.py --verify measures
+parity against the pytorch backend.
+
+Cascade (CascadeDetector):
+- The small model (yolov8n) runs on every frame at conf - margin; the full model
+  re-runs the frame only when the small result could change a state:
+    uncertain  a detection within +/- margin of the confidence threshold
+    boundary   a person center within CASCADE_BOUNDARY_PX of an ROI edge
+    overlap    two persons overlapping (IoU > CASCADE_OVERLAP_IOU)
+    pending    a debounce transition in progress (set by the caller per frame)
+- Empty frames and a few large, well-separated people stay on the small model
+
+Selection per deployment: --backend on the detection script, or the
+DETECTION_BACKEND environment variable (default: pytorch).
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Optional runtimes
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+try:
+    import openvino as ov
+    OPENVINO_AVAILABLE = True
+except ImportError:
+    try:
+        from openvino import runtime as ov  # openvino < 2023.1
+        OPENVINO_AVAILABLE = True
+    except ImportError:
+        OPENVINO_AVAILABLE = False
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+BACKENDS = ["auto", "pytorch", "onnx", "openvino", "onnx-int8"]
+DEFAULT_BACKEND = os.environ.get("DETECTION_BACKEND", "pytorch")
+
+DETECTOR_IMGSZ = 640
+CLASSIFIER_IMGSZ = 224
+NMS_IOU_THRESHOLD = 0.7              # ultralytics predict default
+NMS_MAX_DETECTIONS = 300
+NMS_MAX_WH = 7680                    # Class offset for batched NMS (ultralytics)
+LETTERBOX_COLOR = (114, 114, 114)
+CASCADE_CONF_MARGIN = 0.1            # Small-model confidences this close to the threshold escalate
+CASCADE_BOUNDARY_PX = 40             # Person centers this close to an ROI edge escalate
+CASCADE_OVERLAP_IOU = 0.3            # Overlapping persons escalate (small models merge/split them)
+CASCADE_REASONS = ["pending", "uncertain", "boundary", "overlap"]
+INT8_GATE_BYPASS_ENV = "DETECTION_INT8_GATE_RUN"   # Set by quantize_models.py for its own gate runs
+
+Detection = Tuple[float, float, float, float, float]
+
+
+def onnx_path(weights: str) -> Path:
+    """models/yolov8m.pt -> models/yolov8m.onnx (ultralytics export location)"""
+    return Path(weights).with_suffix(".onnx")
+
+
+def openvino_path(weights: str) -> Path:
+    """models/yolov8m.pt -> models/yolov8m_openvino_model/yolov8m.xml"""
+    weights = Path(weights)
+    return weights.parent / f"{weights.stem}_openvino_model" / f"{weights.stem}.xml"
+
+
+def int8_path(weights: str) -> Path:
+    """models/yolov8m.pt -> models/yolov8m.int8.onnx (quantize_models.py)"""
+    return Path(weights).with_suffix(".int8.onnx")
+
+
+def int8_gate_path(weights: str) -> Path:
+    """Accuracy gate verdict for the quantized models, next to the weights"""
+    return Path(weights).parent / "int8_gate.json"
+
+
+def file_sha256(path: Path) -> str:
+    """Content hash of a model file (the gate's identity for it: survives copies, touch and sync)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def check_int8_gate(detector_weights: str, classifier_weights: str):
+    """Raise RuntimeError unless the gate approved exactly these quantized files"""
+    if os.environ.get(INT8_GATE_BYPASS_ENV) == "1":
+        return  # quantize_models.py gate runs themselves
+    gate_file = int8_gate_path(detector_weights)
+    if not gate_file.exists():
+        raise RuntimeError(f"{gate_file.name} missing - run quantize_models.py (accuracy gate) first")
+    gate = json.loads(gate_file.read_text())
+    if not gate.get("approved"):
+        raise RuntimeError(f"INT8 models refused by the accuracy gate "
+                           f"(agreement {gate.get('agreement', 0):.1%} < {gate.get('min_agreement', 0):.1%})")
+    for weights in (detector_weights, classifier_weights):
+        path = int8_path(weights)
+        if not path.exists() or gate.get("files", {}).get(path.name) != file_sha256(path):
+            raise RuntimeError(f"{path.name} changed since the accuracy gate ran - re-run quantize_models.py")
+
+
+# ============================================================================
+# PRE/POST-PROCESSING (numpy reproduction of ultralytics)
+# ============================================================================
+
+def letterbox(image: np.ndarray, size: int = DETECTOR_IMGSZ) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """Resize keeping aspect ratio, pad to size x size. Returns (image, gain, (pad_left, pad_top))"""
+    height, width = image.shape[:2]
+    gain = min(size / height, size / width)
+    new_w, new_h = int(round(width * gain)), int(round(height * gain))
+    pad_w, pad_h = (size - new_w) / 2, (size - new_h) / 2
+
+    if (width, height) != (new_w, new_h):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_h - 0.1)), int(round(pad_h + 0.1))
+    left, right = int(round(pad_w - 0.1)), int(round(pad_w + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=LETTERBOX_COLOR)
+    return image, gain, (left, top)
+
+
+def to_tensor(image: np.ndarray) -> np.ndarray:
+    """HWC BGR uint8 -> 1x3xHxW RGB float32 in [0, 1]"""
+    tensor = image[:, :, ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(tensor, dtype=np.float32)[None] / 255.0
+
+
+def center_crop(image: np.ndarray, size: int = CLASSIFIER_IMGSZ) -> np.ndarray:
+    """Largest centered square, resized to size x size (ultralytics CenterCrop)"""
+    height, width = image.shape[:2]
+    side = min(height, width)
+    top, left = (height - side) // 2, (width - side) // 2
+    return cv2.resize(image[top:top + side, left:left + side], (size, size), interpolation=cv2.INTER_LINEAR)
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """Greedy NMS on xyxy boxes, indices of kept boxes by descending score"""
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        xx1 = np.maximum(x1[i], x1[order[1:]])
+        yy1 = np.maximum(y1[i], y1[order[1:]])
+        xx2 = np.minimum(x2[i], x2[order[1:]])
+        yy2 = np.minimum(y2[i], y2[order[1:]])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[order[1:]] - inter + 1e-9)
+        order = order[1:][iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def postprocess_detections(output: np.ndarray, conf: float, classes: Optional[List[int]],
+                           gain: float, pad: Tuple[float, float], image_shape: Tuple[int, int],
+                           iou_threshold: float = NMS_IOU_THRESHOLD,
+                           max_detections: int = NMS_MAX_DETECTIONS) -> List[Detection]:
+    """(1, 4 + nc, anchors) raw YOLOv8 output -> boxes in original image coordinates"""
+    predictions = output[0].T                      # anchors x (4 + nc)
+    class_scores = predictions[:, 4:]
+    class_ids = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(class_ids)), class_ids]
+
+    mask = scores > conf
+    if classes is not None:
+        mask &= np.isin(class_ids, classes)
+    if not mask.any():
+        return []
+    predictions, scores, class_ids = predictions[mask], scores[mask], class_ids[mask]
+
+    cx, cy, w, h = predictions[:, 0], predictions[:, 1], predictions[:, 2], predictions[:, 3]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+    # Class-aware NMS: offset boxes per class so different classes never suppress each other
+    keep = nms(boxes + class_ids[:, None] * NMS_MAX_WH, scores, iou_threshold)[:max_detections]
+    boxes, scores = boxes[keep], scores[keep]
+
+    # Undo the letterbox, clip to the frame
+    boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / gain
+    boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / gain
+    height, width = image_shape
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+    return [(float(b[0]), float(b[1]), float(b[2]), float(b[3]), float(s)) for b, s in zip(boxes, scores)]
+
+
+def box_iou(a, b) -> float:
+    """IoU of two (x1, y1, x2, y2, ...) boxes"""
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def top1(probabilities: np.ndarray) -> Tuple[int, float]:
+    """Top-1 class and confidence; softmax first if the graph returned logits"""
+    probabilities = probabilities.reshape(-1).astype(np.float64)
+    if probabilities.min() < 0 or abs(probabilities.sum() - 1.0) > 1e-3:
+        exp = np.exp(probabilities - probabilities.max())
+        probabilities = exp / exp.sum()
+    class_id = int(probabilities.argmax())
+    return class_id, float(probabilities[class_id])
+
+
+# ============================================================================
+# RUNTIME SESSIONS (exported graphs)
+# ============================================================================
+
+class OnnxRuntimeSession:
+    """ONNX Runtime, CUDA provider first when the build has it"""
+
+    def __init__(self, model_path: Path, threads: Optional[int] = None):
+        if not ONNXRUNTIME_AVAILABLE:
+            raise RuntimeError("onnxruntime not installed (pip3 install onnxruntime)")
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        available = ort.get_available_providers()
+        providers = [p for p in ("CUDAExecutionProvider", "CPUExecutionProvider") if p in available]
+        self.session = ort.InferenceSession(str(model_path), options, providers=providers)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.imgsz = model_input.shape[-1] if isinstance(model_input.shape[-1], int) else None
+        self.name = f"onnx ({self.session.get_providers()[0]})"
+
+    def run(self, tensor: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: tensor})[0]
+
+
+class OpenVinoSession:
+    """OpenVINO on CPU"""
+
+    def __init__(self, model_path: Path, threads: Optional[int] = None):
+        if not OPENVINO_AVAILABLE:
+            raise RuntimeError("openvino not installed (pip3 install openvino)")
+        config = {"INFERENCE_NUM_THREADS": threads} if threads else {}
+        self.model = ov.Core().compile_model(str(model_path), "CPU", config)
+        shape = self.model.inputs[0].get_partial_shape()
+        self.imgsz = shape[3].get_length() if shape[3].is_static else None
+        self.name = "openvino (CPU)"
+
+    def run(self, tensor: np.ndarray) -> np.ndarray:
+        return self.model(tensor)[0]
+
+
+# ============================================================================
+# MODEL WRAPPERS
+# ============================================================================
+
+class UltralyticsDetector:
+    """Reference path: ultralytics YOLO on .pt weights"""
+
+    def __init__(self, weights: str):
+        from ultralytics import YOLO
+        self.model = YOLO(weights)
+        self.backend = "pytorch"
+
+    def detect(self, frame: np.ndarray, conf: float, classes: Optional[List[int]] = None) -> List[Detection]:
+        results = self.model(frame, conf=conf, classes=classes, verbose=False)
+        detections = []
+        for result in results:
+            if result.boxes is None:
+                continue
+            for box in result.boxes:
+                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
+                detections.append((float(x1), float(y1), float(x2), float(y2), float(box.conf[0].cpu().numpy())))
+        return detections
+
+
+class UltralyticsClassifier:
+    """Reference path: ultralytics YOLO-cls on .pt weights"""
+
+    def __init__(self, weights: str):
+        from ultralytics import YOLO
+        self.model = YOLO(weights)
+        self.backend = "pytorch"
+
+    def classify(self, crop: np.ndarray) -> Optional[Tuple[int, float]]:
+        result = self.model(crop, verbose=False)[0]
+        if result.probs is None:
+            return None
+        return int(result.probs.top1), float(result.probs.top1conf)
+
+
+class ExportedDetector:
+    """YOLOv8 detector graph (ONNX/OpenVINO) with ultralytics pre/post-processing"""
+
+    def __init__(self, session, imgsz: int = DETECTOR_IMGSZ):
+        self.session = session
+        self.imgsz = session.imgsz or imgsz  # Static graph input size wins
+        self.backend = session.name
+
+    def detect(self, frame: np.ndarray, conf: float, classes: Optional[List[int]] = None) -> List[Detection]:
+        image, gain, pad = letterbox(frame, self.imgsz)
+        output = self.session.run(to_tensor(image))
+        return postprocess_detections(output, conf, classes, gain, pad, frame.shape[:2])
+
+
+class ExportedClassifier:
+    """YOLO-cls graph (ONNX/OpenVINO) with ultralytics pre-processing"""
+
+    def __init__(self, session, imgsz: int = CLASSIFIER_IMGSZ):
+        self.session = session
+        self.imgsz = session.imgsz or imgsz
+        self.backend = session.name
+
+    def classify(self, crop: np.ndarray) -> Optional[Tuple[int, float]]:
+        return top1(self.session.run(to_tensor(center_crop(crop, self.imgsz))))
+
+
+class CascadeDetector:
+    """
+    Small detector first, full detector only when the small result is uncertain
+
+    boundary_check: callable (x1, y1, x2, y2) -> bool, True when the box sits on
+    an ROI edge (set by the caller, which owns the ROI geometry)
+    force_escalation: set per frame by the caller, e.g. while a debounce
+    transition is pending
+    """
+
+    def __init__(self, small, large, conf_margin: float = CASCADE_CONF_MARGIN):
+        self.small = small
+        self.large = large
+        self.conf_margin = conf_margin
+        self.boundary_check = None
+        self.force_escalation = False
+        self.backend = f"cascade ({small.backend} small -> {large.backend})"
+        self.frames = 0
+        self.escalated = 0
+        self.reasons = {reason: 0 for reason in CASCADE_REASONS}
+
+    def escalation_reason(self, detections: List[Detection], conf: float) -> Optional[str]:
+        """First reason to hand this frame to the full model, None to keep the small result"""
+        if self.force_escalation:
+            return "pending"
+        if any(abs(d[4] - conf) < self.conf_margin for d in detections):
+            return "uncertain"
+        confident = [d for d in detections if d[4] >= conf]
+        if self.boundary_check is not None and any(self.boundary_check(d[:4]) for d in confident):
+            return "boundary"
+        for i, a in enumerate(confident):
+            if any(box_iou(a, b) > CASCADE_OVERLAP_IOU for b in confident[i + 1:]):
+                return "overlap"
+        return None
+
+    def detect(self, frame: np.ndarray, conf: float, classes: Optional[List[int]] = None) -> List[Detection]:
+        self.frames += 1
+        detections = self.small.detect(frame, max(0.01, conf - self.conf_margin), classes)
+        reason = self.escalation_reason(detections, conf)
+        if reason is None:
+            return [d for d in detections if d[4] >= conf]
+        self.escalated += 1
+        self.reasons[reason] += 1
+        return self.large.detect(frame, conf, classes)
+
+    @property
+    def escalation_rate(self) -> float:
+        return self.escalated / self.frames if self.frames else 0.0
+
+    def summary(self) -> str:
+        reasons = ", ".join(f"{reason} {self.reasons[reason]}" for reason in CASCADE_REASONS)
+        return (f"{self.escalated}/{self.frames} frames escalated ({self.escalation_rate:.1%}) | {reasons}")
+
+
+def _exported_session(backend: str, weights: str, threads: Optional[int]):
+    if backend == "onnx":
+        path = onnx_path(weights)
+        session_class = OnnxRuntimeSession
+    elif backend == "onnx-int8":
+        path = int8_path(weights)
+        session_class = OnnxRuntimeSession
+    else:
+        path = openvino_path(weights)
+        session_class = OpenVinoSession
+    if not path.exists():
+        tool = "quantize_models.py" if backend == "onnx-int8" else f"export_models.py --format {backend}"
+        raise FileNotFoundError(f"{path} not found - run {tool}")
+    return session_class(path, threads)
+
+
+def resolve_backend(backend: str, detector_weights: str, classifier_weights: str) -> str:
+    """'auto' -> onnx when both exports and onnxruntime are present, else pytorch"""
+    if backend != "auto":
+        return backend
+    if ONNXRUNTIME_AVAILABLE and onnx_path(detector_weights).exists() and onnx_path(classifier_weights).exists():
+        return "onnx"
+    return "pytorch"
+
+
+def load_inference_models(detector_weights: str, classifier_weights: str,
+                          backend: str = DEFAULT_BACKEND, threads: Optional[int] = None):
+    """
+    Build (detector, classifier) for a backend
+
+    threads: intra-op threads for ONNX Runtime/OpenVINO (the thread budget's
+    --torch-threads; the pytorch backend is sized by torch.set_num_threads)
+    """
+    backend = resolve_backend(backend, detector_weights, classifier_weights)
+    if backend == "pytorch":
+        return UltralyticsDetector(detector_weights), UltralyticsClassifier(classifier_weights)
+    if backend not in ("onnx", "openvino", "onnx-int8"):
+        raise ValueError(f"Unknown inference backend '{backend}' (choose from {', '.join(BACKENDS)})")
+    if backend == "onnx-int8":
+        check_int8_gate(detector_weights, classifier_weights)
+    detector = ExportedDetector(_exported_session(backend, detector_weights, threads))
+    classifier = ExportedClassifier(_exported_session(backend, classifier_weights, threads))
+    return detector, classifier
+
+
+def load_detector(weights: str, backend: str = DEFAULT_BACKEND, threads: Optional[int] = None):
+    """
+    Detector only (the cascade's small model)
+
+    onnx-int8 falls back to onnx: the INT8 accuracy gate covers the full
+    detector/classifier pair, not the small model
+    """
+    if backend == "auto":
+        backend = "onnx" if ONNXRUNTIME_AVAILABLE and onnx_path(weights).exists() else "pytorch"
+    if backend == "onnx-int8":
+        backend = "onnx"
+    if backend == "pytorch":
+        return UltralyticsDetector(weights)
+    if backend not in ("onnx", "openvino"):
+        raise ValueError(f"Unknown inference backend '{backend}' (choose from {', '.join(BACKENDS)})")
+    return ExportedDetector(_exported_session(backend, weights, threads))
@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+"""
+Live Stream Table and Region State Detection
+Version: 1.0.1
+Created: 2026-10-18
+Modified: 2026-10-18 - Camera's own ROI config (table_region_config_{camera_id}.json)
+          when it exists; ROI compiled once via roi_compiler.py
+
+Purpose:
+- Table/division state within seconds for selected cameras, instead of the next day
+- Decodes the camera's RTSP stream (or a low-res sub-stream) straight to memory at
+  target FPS - no write -> re-read -> re-decode cycle
+- Reuses the batch pipeline from table_and_region_state_detection.py unchanged:
+  detect_persons -> classify_persons -> assign_detections_to_rois -> debounced
+  Table/DivisionStateTracker updates -> division_states / table_states rows
+- State transitions are emitted immediately (stdout, database, optional JSONL file)
+- Optional --archive keeps recording the main stream through the existing
+  capture_rtsp_streams.py ffmpeg path (segments still land in videos/ + manifest)
+
+Frame path:
+    ffmpeg -i rtsp://... -vf fps=N,scale=W:H -f rawvideo -pix_fmt bgr24 pipe:1
+      -> reader thread -> latest-frame slot (older frames dropped if inference lags)
+      -> detection loop
+
+ROI configs drawn on the main stream are scaled to the decoded resolution
+(compile_roi), so a 640px sub-stream works with the existing config.
+
+Testing without a camera (file-backed stand-in):
+    --source some_video.mp4   Decoded with ffmpeg -re (native rate) like a live feed
+    --source rtsp://...       Any RTSP URL, e.g. a local RTSP server fed by
+                              ffmpeg -re -stream_loop -1 -i some_video.mp4 -c copy -f rtsp ...
+
+Author: ASEOfSmartICE Team
+"""
+
+import argparse
+import json
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+import table_and_region_state_detection as detection
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = SCRIPT_DIR.parent.parent
+CAMERAS_CONFIG = SCRIPT_DIR.parent / "config" / "cameras_config.json"
+CAPTURE_SCRIPT = SCRIPT_DIR.parent / "video_capture" / "capture_rtsp_streams.py"
+DB_PATH = PROJECT_ROOT / "db" / "detection_data.db"
+
+# Decoder settings
+DEFAULT_TARGET_FPS = 5.0
+DEFAULT_DECODE_WIDTH = 960      # Enough for person detection, ~7x fewer pixels than 2592x1944
+FFMPEG_SOCKET_TIMEOUT = 10000000  # Microseconds, same as capture (-stimeout)
+STALL_TIMEOUT_SECONDS = 15       # No frame for this long -> restart decoder
+RECONNECT_DELAY_SECONDS = 5
+ARCHIVE_DEFAULT_DURATION = 3600  # Same default as capture_rtsp_streams.py
+
+# Progress output interval (processed frames)
+STATUS_EVERY_FRAMES = 150
+
+
+def load_camera(camera_id):
+    """Load a single camera entry from cameras_config.json"""
+    if not CAMERAS_CONFIG.exists():
+        raise FileNotFoundError(f"❌ Camera configuration file not found: {CAMERAS_CONFIG}")
+    with open(CAMERAS_CONFIG) as f:
+        cameras = json.load(f)
+    if camera_id not in cameras:
+        raise KeyError(f"❌ Camera {camera_id} not in {CAMERAS_CONFIG.name}")
+    return cameras[camera_id]
+
+
+def build_rtsp_url(camera, stream_path=None):
+    """Build RTSP URL (same format as DirectFFmpegCapture), optionally for a sub-stream"""
+    path = stream_path or camera.get("substream_path") or camera["stream_path"]
+    return (f"rtsp://{camera['username']}:{camera['password']}"
+            f"@{camera['ip']}:{camera['port']}{path}")
+
+
+def redact(url):
+    """Hide credentials in log output"""
+    return re.sub(r'rtsp://[^:]+:([^@]+)@', r'rtsp://***:***@', url)
+
+
+class LiveFrameSource:
+    """
+    Decode a stream to BGR frames in memory at a fixed rate.
+
+    One ffmpeg process does demux + decode + fps drop + downscale; a reader thread
+    keeps only the newest frames so a slow detector never builds a backlog
+    (live state matters more than analysing every frame).
+    """
+
+    def __init__(self, url, target_fps=DEFAULT_TARGET_FPS, decode_width=DEFAULT_DECODE_WIDTH,
+                 rtsp_transport="tcp", loop=False):
+        self.url = url
+        self.is_rtsp = url.startswith("rtsp://")
+        self.target_fps = target_fps
+        self.decode_width = decode_width
+        self.rtsp_transport = rtsp_transport
+        self.loop = loop
+
+        self.width = None
+        self.height = None
+        self.frame_bytes = 0
+
+        self.process = None
+        self.reader_thread = None
+        self.frames = deque(maxlen=2)
+        self.frame_ready = threading.Condition()
+        self.running = False
+        self.ended = False
+
+        # Counters
+        self.frames_decoded = 0
+        self.frames_dropped = 0
+        self.restarts = 0
+        self.last_frame_time = None
+
+    def _input_args(self):
+        if self.is_rtsp:
+            return ['-rtsp_transport', self.rtsp_transport, '-stimeout', str(FFMPEG_SOCKET_TIMEOUT)]
+        # File-backed stand-in: read at native rate so it behaves like a live feed
+        args = ['-re']
+        if self.loop:
+            args += ['-stream_loop', '-1']
+        return args
+
+    def probe_size(self):
+        """Read source resolution with ffprobe and derive the decoded frame size"""
+        cmd = ['ffprobe', '-v', 'error']
+        if self.is_rtsp:
+            cmd += ['-rtsp_transport', self.rtsp_transport]
+        cmd += ['-select_streams', 'v:0', '-show_entries', 'stream=width,height',
+                '-of', 'csv=p=0', self.url]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        if result.returncode != 0 or not result.stdout.strip():
+            raise RuntimeError(f"ffprobe failed for {redact(self.url)}: {result.stderr.strip()[:200]}")
+
+        src_width, src_height = [int(v) for v in result.stdout.strip().split(',')[:2]]
+        if self.decode_width and self.decode_width < src_width:
+            self.width = self.decode_width - (self.decode_width % 2)
+            self.height = int(round(src_height * self.width / src_width / 2)) * 2
+        else:
+            self.width, self.height = src_width, src_height
+        self.frame_bytes = self.width * self.height * 3
+        return src_width, src_height
+
+    def _start_decoder(self):
+        cmd = (['ffmpeg', '-loglevel', 'error', '-nostdin'] + self._input_args() +
+               ['-i', self.url, '-an',
+                '-vf', f"fps={self.target_fps},scale={self.width}:{self.height}",
+                '-pix_fmt', 'bgr24', '-f', 'rawvideo', 'pipe:1'])
+        # stderr to DEVNULL: an unread PIPE fills up and stalls ffmpeg (see capture v5.3.0)
+        self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                        bufsize=self.frame_bytes * 2)
+        self.last_frame_time = time.time()
+
+    def _stop_decoder(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait(timeout=5)
+
+    def _read_loop(self):
+        while self.running:
+            if self.process is None or self.process.poll() is not None:
+                if not self.is_rtsp and not self.loop and self.process is not None:
+                    break  # File stand-in finished
+                if self.process is not None:
+                    self.restarts += 1
+                    print(f"⚠️  Decoder exited, reconnecting in {RECONNECT_DELAY_SECONDS}s "
+                          f"(restart #{self.restarts})", file=sys.stderr)
+                    time.sleep(RECONNECT_DELAY_SECONDS)
+                    if not self.running:
+                        break
+                self._start_decoder()
+
+            data = self.process.stdout.read(self.frame_bytes)
+            if len(data) < self.frame_bytes:
+                # EOF or short read: decoder died, loop restarts it (or ends for files)
+                self.process.wait()
+                continue
+
+            frame = np.frombuffer(data, dtype=np.uint8).reshape((self.height, self.width, 3))
+            now = time.time()
+            with self.frame_ready:
+                if len(self.frames) == self.frames.maxlen:
+                    self.frames_dropped += 1
+                self.frames.append((self.frames_decoded, now, frame))
+                self.frames_decoded += 1
+                self.last_frame_time = now
+                self.frame_ready.notify()
+
+        self.ended = True
+        with self.frame_ready:
+            self.frame_ready.notify_all()
+
+    def start(self):
+        if self.width is None:
+            self.probe_size()
+        self.running = True
+        self.reader_thread = threading.Thread(target=self._read_loop, daemon=True)
+        self.reader_thread.start()
+
+    def read(self, timeout=1.0):
+        """
+        Next frame as (decoded_index, wall_time, frame), or None on timeout/end.
+        Restarts a stalled decoder (stream alive but no frames).
+        """
+        with self.frame_ready:
+            if not self.frames and not self.ended:
+                self.frame_ready.wait(timeout)
+            if self.frames:
+                return self.frames.popleft()
+
+        if (self.running and self.last_frame_time and
+                time.time() - self.last_frame_time > STALL_TIMEOUT_SECONDS):
+            print(f"⚠️  No frames for {STALL_TIMEOUT_SECONDS}s, restarting decoder", file=sys.stderr)
+            self.last_frame_time = time.time()
+            self._stop_decoder()
+        return None
+
+    def stop(self):
+        self.running = False
+        self._stop_decoder()
+        if self.reader_thread:
+            self.reader_thread.join(timeout=5)
+
+
+class LiveStateEngine:
+    """
+    Runs the batch detection/assignment/debounce logic on in-memory frames
+    and emits state transitions as they happen.
+    """
+
+    def __init__(self, camera_id, config, frame_size, person_detector, staff_classifier,
+                 conn, session_id, screenshot_dir=None, events_file=None,
+                 config_name="table_region_config"):
+        self.camera_id = camera_id
+        self.person_detector = person_detector
+        self.staff_classifier = staff_classifier
+        self.conn = conn
+        self.session_id = session_id
+        self.screenshot_dir = screenshot_dir
+        self.events_file = events_file
+
+        self.roi = detection.compile_roi(config, frame_size[0], frame_size[1], config_name)
+        (self.division_polygon, self.tables,
+         self.sitting_areas, self.service_areas) = detection.reconstruct_objects_from_config(self.roi.config)
+        self.division_tracker = detection.DivisionStateTracker()
+        self.performance = detection.PerformanceTracker(window_size=30)
+        self.transitions_emitted = 0
+
+    def _run_pipeline(self, frame):
+        stage1_start = time.time()
+        person_detections = detection.detect_persons(self.person_detector, frame)
+        stage1_time = time.time() - stage1_start
+
+        stage2_start = time.time()
+        classified = detection.classify_persons(self.staff_classifier, frame, person_detections)
+        stage2_time = time.time() - stage2_start
+
+        walking_waiters, service_waiters = detection.assign_detections_to_rois(
+            self.division_polygon, self.tables, self.sitting_areas, self.service_areas, classified, self.roi
+        )
+        return classified, walking_waiters, service_waiters, stage1_time, stage2_time
+
+    def prime(self, first_frame, start_time, target_fps):
+        """Fill the debounce buffer from the first frame (same as batch v3.1.0)"""
+        frames_for_debounce = int(target_fps * detection.STATE_DEBOUNCE_SECONDS)
+        time_step = 1.0 / target_fps
+        for i in range(frames_for_debounce):
+            _, walking, service, _, _ = self._run_pipeline(first_frame)
+            simulated_time = start_time + i * time_step
+            for table in self.tables:
+                table.update_state(simulated_time)
+            self.division_tracker.update_state(walking, service, simulated_time)
+
+    def _emit(self, event):
+        self.transitions_emitted += 1
+        when = datetime.fromtimestamp(event['timestamp']).strftime('%H:%M:%S')
+        if event['kind'] == 'table':
+            print(f"   [{when}] {event['table_id']}: {event['from']} -> {event['to']} "
+                  f"(C:{event['customers']} W:{event['waiters']})", flush=True)
+        else:
+            print(f"   [{when}] DIVISION: {event['from']} -> {event['to']} "
+                  f"(Walking:{event['walking_waiters']} Service:{event['service_waiters']})", flush=True)
+        if self.events_file:
+            with open(self.events_file, 'a') as f:
+                f.write(json.dumps(event) + "\n")
+
+    def _screenshot(self, frame, classified, frame_number, prefix):
+        if self.screenshot_dir is None:
+            return None
+        annotated = detection.draw_frame_with_all_info(
+            frame, self.division_polygon, self.tables, self.sitting_areas, self.service_areas,
+            classified, self.division_tracker.current_state, self.performance, self.roi
+        )
+        return detection.save_screenshot(annotated, self.screenshot_dir, self.camera_id,
+                                         self.session_id, frame_number, prefix=prefix)
+
+    def process(self, frame, frame_number, current_time):
+        """Run one frame through the pipeline; log and emit any debounced transitions"""
+        frame_start = time.time()
+        classified, walking, service, stage1_time, stage2_time = self._run_pipeline(frame)
+        self.performance.increment_total_frames()
+
+        for table in self.tables:
+            previous = table.state.value
+            if table.update_state(current_time):
+                screenshot_path = self._screenshot(frame, classified, frame_number, f"{table.id}_")
+                detection.log_table_state_change(
+                    self.conn, self.session_id, self.camera_id, frame_number, current_time,
+                    table.id, table.state.value, table.customers_present, table.waiters_present,
+                    screenshot_path)
+                self._emit({
+                    'kind': 'table', 'camera_id': self.camera_id, 'session_id': self.session_id,
+                    'frame_number': frame_number, 'timestamp': current_time,
+                    'table_id': table.id, 'from': previous, 'to': table.state.value,
+                    'customers': table.customers_present, 'waiters': table.waiters_present
+                })
+
+        previous = self.division_tracker.current_state.upper()
+        if self.division_tracker.update_state(walking, service, current_time):
+            screenshot_path = self._screenshot(frame, classified, frame_number, "division_")
+            detection.log_division_state_change(
+                self.conn, self.session_id, self.camera_id, frame_number, current_time,
+                self.division_tracker.current_state.upper(), walking, service, screenshot_path)
+            self._emit({
+                'kind': 'division', 'camera_id': self.camera_id, 'session_id': self.session_id,
+                'frame_number': frame_number, 'timestamp': current_time,
+                'from': previous, 'to': self.division_tracker.current_state.upper(),
+                'walking_waiters': walking, 'service_waiters': service
+            })
+
+        self.performance.add_frame(time.time() - frame_start, stage1_time, stage2_time)
+
+    def status_line(self):
+        table_states = " | ".join(f"{t.id}:{t.state.value[:3]}" for t in self.tables)
+        return (f"FPS: {self.performance.get_current_fps():.2f} | "
+                f"DIV:{self.division_tracker.current_state.upper()[:3]} | {table_states}")
+
+
+def start_archive(camera_id, duration, rtsp_transport):
+    """Keep recording the main stream with the regular capture script"""
+    cmd = ["python3", str(CAPTURE_SCRIPT), "--cameras", camera_id,
+           "--duration", str(duration), "--rtsp-transport", rtsp_transport]
+    return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def run_live(args):
+    """Connect, prime, then process frames until duration/stop. Returns exit code."""
+    if args.source:
+        url = args.source
+        camera_id = args.camera or detection.extract_camera_id_from_filename(args.source)
+    else:
+        camera_id = args.camera
+        url = build_rtsp_url(load_camera(camera_id), args.stream_path)
+
+    config_file = detection.config_path_for_camera(camera_id)
+    config = detection.load_config_from_file(str(config_file))
+    if config is None:
+        print(f"❌ No ROI config found: {config_file}")
+        return 1
+
+    source = LiveFrameSource(url, args.fps, args.decode_width, args.rtsp_transport, args.loop)
+    print(f"📡 Source: {redact(url)}")
+    try:
+        src_width, src_height = source.probe_size()
+    except Exception as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"   Stream: {src_width}x{src_height} -> decode {source.width}x{source.height} @ {args.fps} FPS")
+
+    person_detector, staff_classifier = detection.load_models()
+    if person_detector is None or staff_classifier is None:
+        return 1
+
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = detection.init_database(str(DB_PATH))
+    started = datetime.now()
+    session_id = f"live_{started.strftime('%Y%m%d_%H%M%S')}_{camera_id}"
+    conn.execute('''
+        INSERT INTO sessions
+        (session_id, camera_id, video_file, start_time, fps, resolution, config_file)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (session_id, camera_id, f"live:{redact(url)}", started.isoformat(), args.fps,
+          f"{source.width}x{source.height}", str(config_file)))
+    conn.commit()
+
+    screenshot_dir = None
+    if args.screenshots:
+        screenshot_dir = PROJECT_ROOT / "db" / "screenshots"
+        screenshot_dir.mkdir(parents=True, exist_ok=True)
+
+    engine = LiveStateEngine(camera_id, config, (source.width, source.height),
+                             person_detector, staff_classifier, conn, session_id,
+                             screenshot_dir, args.events_file, config_file.stem)
+
+    archive_process = None
+    if args.archive and not args.source:
+        archive_process = start_archive(camera_id, args.duration or ARCHIVE_DEFAULT_DURATION,
+                                        args.rtsp_transport)
+        print(f"💾 Archiving main stream via capture_rtsp_streams.py (PID: {archive_process.pid})")
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+    source.start()
+    deadline = time.time() + args.duration if args.duration else None
+    frames_processed = 0
+    primed = False
+
+    print(f"\n🔴 Live detection running (session {session_id}) - Ctrl+C to stop\n")
+    try:
+        while not stop_event.is_set():
+            if deadline and time.time() >= deadline:
+                break
+            item = source.read(timeout=1.0)
+            if item is None:
+                if source.ended:
+                    break
+                continue
+
+            frame_number, frame_time, frame = item
+            if not primed:
+                engine.prime(frame, frame_time - detection.STATE_DEBOUNCE_SECONDS, args.fps)
+                primed = True
+
+            engine.process(frame, frame_number, frame_time)
+            frames_processed += 1
+
+            if frames_processed % STATUS_EVERY_FRAMES == 0:
+                print(f"   Live: {frames_processed} frames | dropped {source.frames_dropped} | "
+                      f"restarts {source.restarts} | {engine.status_line()}", flush=True)
+    finally:
+        source.stop()
+        if archive_process and archive_process.poll() is None:
+            archive_process.terminate()
+            try:
+                archive_process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                archive_process.kill()
+
+        conn.execute('UPDATE sessions SET end_time = ?, total_frames = ? WHERE session_id = ?',
+                     (datetime.now().isoformat(), frames_processed, session_id))
+        conn.commit()
+        conn.close()
+
+    print(f"\n{'='*70}")
+    print("Live Session Summary")
+    print(f"{'='*70}")
+    print(f"   Session: {session_id}")
+    print(f"   Frames processed: {frames_processed} (decoded {source.frames_decoded}, "
+          f"dropped {source.frames_dropped})")
+    print(f"   Decoder restarts: {source.restarts}")
+    print(f"   Transitions emitted: {engine.transitions_emitted}")
+    print(f"{'='*70}\n")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Live RTSP table and region state detection (no intermediate video files)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Live detection on camera_35 sub-stream at 5 FPS
+  python3 live_stream_detection.py --camera camera_35 --stream-path /media/video2
+
+  # Same, but keep archiving the main stream into videos/
+  python3 live_stream_detection.py --camera camera_35 --stream-path /media/video2 --archive
+
+  # File-backed stand-in (decoded at native rate like a live feed), 2 minutes
+  python3 live_stream_detection.py --source ../../videos/20251209/camera_35/camera_35_20251209_180441.mp4 --duration 120
+
+  # Write transitions to a JSONL file for other consumers
+  python3 live_stream_detection.py --camera camera_35 --events-file /tmp/camera_35_events.jsonl
+        """
+    )
+    parser.add_argument("--camera", help="Camera ID from cameras_config.json")
+    parser.add_argument("--source", help="Stream URL or video file instead of the camera config (testing)")
+    parser.add_argument("--stream-path", default=None,
+                        help="RTSP path override, e.g. /media/video2 for the sub-stream "
+                             "(default: camera 'substream_path', then 'stream_path')")
+    parser.add_argument("--fps", type=float, default=DEFAULT_TARGET_FPS,
+                        help=f"Target processing FPS (default: {DEFAULT_TARGET_FPS})")
+    parser.add_argument("--decode-width", type=int, default=DEFAULT_DECODE_WIDTH,
+                        help=f"Downscale decoded frames to this width, 0 = native (default: {DEFAULT_DECODE_WIDTH})")
+    parser.add_argument("--duration", type=int, default=None,
+                        help="Stop after N seconds (default: run until stopped)")
+    parser.add_argument("--rtsp-transport", default="tcp", choices=["tcp", "udp"],
+                        help="RTSP transport (default: tcp)")
+    parser.add_argument("--loop", action="store_true",
+                        help="Loop a file --source forever")
+    parser.add_argument("--archive", action="store_true",
+                        help="Also record the main stream via capture_rtsp_streams.py")
+    parser.add_argument("--screenshots", action="store_true",
+                        help="Save annotated screenshots on state changes")
+    parser.add_argument("--events-file", default=None,
+                        help="Append each transition as a JSON line to this file")
+    parser.add_argument("--person_conf", type=float, default=0.3,
+                        help="Person detection confidence (default: 0.3)")
+    parser.add_argument("--staff_conf", type=float, default=0.5,
+                        help="Staff classification confidence (default: 0.5)")
+
+    args = parser.parse_args()
+    if not args.camera and not args.source:
+        parser.error("one of --camera or --source is required")
+
+    detection.PERSON_CONF_THRESHOLD = args.person_conf
+    detection.STAFF_CONF_THRESHOLD = args.staff_conf
+
+    return run_live(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+INT8 Quantization - Calibrated Models with a State-Timeline Accuracy Gate
+Version: 1.0.2
+Created: 2026-10-18
+Modified: 2026-10-18 - Gate file records SHA-256 of the gated INT8 files (was mtime)
+Modified: 2026-10-18 - Detection runs and timeline comparison moved to state_timelines.py
+          (shared with cascade_eval.py)
+
+Purpose:
+- Quantized person detector + staff classifier for CPU fallback and for
+  packing more cameras per box (onnx-int8 backend in inference_backends.py)
+- Calibration uses frames sampled from our own recorded segments (fixed
+  cameras, restaurant lighting), not a generic dataset:
+    detector    letterboxed frames
+    classifier  person crops found by the FP32 detector on those frames
+- ONNX Runtime static quantization: QDQ, per-channel INT8 weights, UINT8
+  activations, calibrated from the FP32 ONNX exports (export_models.py)
+
+Accuracy gate:
+- What matters is the output of the pipeline, not raw logits: the detection
+  script is run on held-out videos (never used for calibration) once with the
+  FP32 reference backend and once with onnx-int8, each into a throwaway database
+- Table and division state timelines are sampled every second; agreement =
+  fraction of (second, table/division) samples in the same state
+- Agreement below --min-agreement (default 95%) refuses deployment:
+  models/int8_gate.json records approved=false and the onnx-int8 backend will
+  not load. Speedup (per-frame pipeline time, FP32 / INT8) is reported with it
+
+Usage:
+    # Export FP32 ONNX first (calibration and reference input)
+    python3 export_models.py --format onnx
+
+    # Calibrate on 6 segments, gate on 3 other segments (5 min each)
+    python3 quantize_models.py --calibration-videos 6 --holdout-videos 3 --gate-duration 300
+
+    # Explicit video lists
+    python3 quantize_models.py --calibrate-from a.mp4 b.mp4 --holdout c.mp4 d.mp4
+
+    # Re-run only the gate on existing INT8 files
+    python3 quantize_models.py --gate-only --holdout c.mp4 d.mp4
+
+Requires: onnxruntime (with onnxruntime.quantization), numpy, opencv
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+from video_processing.inference_backends import (
+    load_inference_models, onnx_path, int8_path, int8_gate_path, letterbox, center_crop, to_tensor,
+    file_sha256, INT8_GATE_BYPASS_ENV
+)
+from video_processing.state_timelines import (
+    recorded_segments, run_detection, load_timelines, timeline_agreement, VIDEOS_DIR
+)
+from video_processing.table_and_region_state_detection import (
+    PERSON_DETECTOR_MODEL, STAFF_CLASSIFIER_MODEL, PERSON_CONF_THRESHOLD, MIN_PERSON_SIZE
+)
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DEFAULT_CALIBRATION_VIDEOS = 6
+DEFAULT_HOLDOUT_VIDEOS = 3
+CALIBRATION_FRAMES_PER_VIDEO = 50    # 300 detector samples with the defaults
+MAX_CALIBRATION_CROPS = 500
+DEFAULT_GATE_DURATION = 300          # Seconds of each held-out video the gate processes
+DEFAULT_MIN_AGREEMENT = 0.95
+
+
+# ============================================================================
+# VIDEO SELECTION
+# ============================================================================
+
+def split_segments(segments: List[Path], calibration: int, holdout: int) -> Tuple[List[Path], List[Path]]:
+    """
+    Disjoint calibration / held-out sets spread across cameras and days:
+    round-robin over cameras, alternating the two sets
+    """
+    by_camera: Dict[str, List[Path]] = {}
+    for segment in segments:
+        by_camera.setdefault(segment.parent.name, []).append(segment)
+    # Spread each camera's picks over its whole history
+    queues = [items[::max(1, len(items) // (calibration + holdout))] for items in by_camera.values()]
+
+    calibration_set, holdout_set = [], []
+    while (len(calibration_set) < calibration or len(holdout_set) < holdout) and any(queues):
+        for queue in queues:
+            if not queue:
+                continue
+            segment = queue.pop(0)
+            if len(holdout_set) < holdout and len(holdout_set) < len(calibration_set):
+                holdout_set.append(segment)
+            elif len(calibration_set) < calibration:
+                calibration_set.append(segment)
+            elif len(holdout_set) < holdout:
+                holdout_set.append(segment)
+    return calibration_set, holdout_set
+
+
+def sample_frames(video: Path, count: int) -> List[np.ndarray]:
+    cap = cv2.VideoCapture(str(video))
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frames = []
+    if total > 0:
+        for index in np.linspace(0, total - 1, count).astype(int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            ok, frame = cap.read()
+            if ok:
+                frames.append(frame)
+    cap.release()
+    return frames
+
+
+# ============================================================================
+# CALIBRATION + QUANTIZATION
+# ============================================================================
+
+def calibration_tensors(videos: List[Path]) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+    """Detector inputs (letterboxed frames) and classifier inputs (FP32-detected person crops)"""
+    detector, classifier = load_inference_models(PERSON_DETECTOR_MODEL, STAFF_CLASSIFIER_MODEL, "onnx")
+    detector_inputs, classifier_inputs = [], []
+    for video in videos:
+        frames = sample_frames(video, CALIBRATION_FRAMES_PER_VIDEO)
+        print(f"   {video.parent.name}/{video.name}: {len(frames)} frames")
+        for frame in frames:
+            image, _, _ = letterbox(frame, detector.imgsz)
+            detector_inputs.append(to_tensor(image))
+            if len(classifier_inputs) >= MAX_CALIBRATION_CROPS:
+                continue
+            for x1, y1, x2, y2, _ in detector.detect(frame, PERSON_CONF_THRESHOLD, classes=[0]):
+                if x2 - x1 >= MIN_PERSON_SIZE and y2 - y1 >= MIN_PERSON_SIZE:
+                    crop = frame[int(y1):int(y2), int(x1):int(x2)]
+                    classifier_inputs.append(to_tensor(center_crop(crop, classifier.imgsz)))
+    return detector_inputs, classifier_inputs
+
+
+def quantize(fp32_model: Path, output: Path, inputs: List[np.ndarray]):
+    """Static QDQ quantization calibrated on `inputs`"""
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self, input_name: str, tensors: List[np.ndarray]):
+            self.batches = iter([{input_name: tensor} for tensor in tensors])
+
+        def get_next(self):
+            return next(self.batches, None)
+
+    import onnxruntime as ort
+    input_name = ort.InferenceSession(str(fp32_model), providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    with tempfile.TemporaryDirectory() as tmp:
+        prepared = Path(tmp) / "prepared.onnx"
+        try:
+            quant_pre_process(str(fp32_model), str(prepared))
+        except Exception as e:  # Optimisation pass only; quantize the raw graph if it fails
+            print(f"   ⚠️  Pre-processing skipped: {e}")
+            prepared = fp32_model
+        quantize_static(
+            str(prepared), str(output), FrameReader(input_name, inputs),
+            quant_format=QuantFormat.QDQ, per_channel=True,
+            weight_type=QuantType.QInt8, activation_type=QuantType.QUInt8,
+        )
+    print(f"   ✅ {output.name} ({output.stat().st_size / 1e6:.1f} MB, "
+          f"FP32 {fp32_model.stat().st_size / 1e6:.1f} MB, {len(inputs)} calibration samples)")
+
+
+# ============================================================================
+# ACCURACY GATE
+# ============================================================================
+
+def run_int8_detection(video: Path, backend: str, duration: int, work_dir: Path) -> Dict:
+    """Gate run; the gate is the one place allowed to load not-yet-approved INT8 files"""
+    env = dict(os.environ, **{INT8_GATE_BYPASS_ENV: "1"})
+    return run_detection(video, backend, duration, work_dir, env=env)
+
+
+def run_gate(holdout: List[Path], reference_backend: str, duration: int, min_agreement: float) -> Dict:
+    """FP32 vs INT8 state timelines on held-out videos; writes models/int8_gate.json"""
+    print(f"\n🚦 Accuracy gate: {reference_backend} vs onnx-int8 on {len(holdout)} held-out video(s), "
+          f"{duration}s each")
+    videos = []
+    agree_total = samples_total = 0
+    ref_ms = int8_ms = 0.0
+    with tempfile.TemporaryDirectory(prefix="int8_gate_") as tmp:
+        work_dir = Path(tmp)
+        # A previous verdict no longer applies to these files
+        write_gate_file({"approved": False, "agreement": 0.0, "min_agreement": min_agreement,
+                         "error": "gate in progress"})
+        try:
+            for video in holdout:
+                reference = run_int8_detection(video, reference_backend, duration, work_dir)
+                quantized = run_int8_detection(video, "onnx-int8", duration, work_dir)
+                agree, total = timeline_agreement(load_timelines(reference["db"]),
+                                                  load_timelines(quantized["db"]), duration)
+                agree_total += agree
+                samples_total += total
+                ref_ms += reference["frame_ms"]
+                int8_ms += quantized["frame_ms"]
+                agreement = agree / total if total else 1.0
+                speedup = reference["frame_ms"] / quantized["frame_ms"] if quantized["frame_ms"] else 0.0
+                print(f"   {video.name}: agreement {agreement:.1%} | "
+                      f"{reference['frame_ms']:.1f}ms -> {quantized['frame_ms']:.1f}ms per frame ({speedup:.2f}x)")
+                videos.append({"video": str(video), "agreement": round(agreement, 4),
+                               "reference_frame_ms": reference["frame_ms"], "int8_frame_ms": quantized["frame_ms"],
+                               "reference_fps": reference["fps"], "int8_fps": quantized["fps"]})
+        except Exception as e:
+            write_gate_file({"approved": False, "agreement": 0.0, "min_agreement": min_agreement,
+                             "error": f"gate run failed: {e}"})
+            raise
+
+    agreement = agree_total / samples_total if samples_total else 0.0
+    speedup = ref_ms / int8_ms if int8_ms else 0.0
+    gate = {
+        "approved": agreement >= min_agreement,
+        "agreement": round(agreement, 4),
+        "min_agreement": min_agreement,
+        "speedup": round(speedup, 2),
+        "reference_backend": reference_backend,
+        "gate_duration": duration,
+        "videos": videos,
+    }
+    write_gate_file(gate)
+
+    print("=" * 70)
+    print(f"   State agreement: {agreement:.2%} (threshold {min_agreement:.0%})")
+    print(f"   Speedup: {speedup:.2f}x per frame ({reference_backend} -> onnx-int8)")
+    if gate["approved"]:
+        print("   ✅ APPROVED - deploy with --backend onnx-int8 (or DETECTION_BACKEND=onnx-int8)")
+    else:
+        print("   ❌ REFUSED - onnx-int8 backend stays disabled")
+    print("=" * 70)
+    return gate
+
+
+def write_gate_file(gate: Dict):
+    """Verdict + SHA-256 of the gated files (re-quantizing invalidates it, copying to a node does not)"""
+    files = {}
+    for weights in (PERSON_DETECTOR_MODEL, STAFF_CLASSIFIER_MODEL):
+        path = int8_path(weights)
+        if path.exists():
+            files[path.name] = file_sha256(path)
+    gate = dict(gate, files=files, created=datetime.now().isoformat(timespec="seconds"))
+    int8_gate_path(PERSON_DETECTOR_MODEL).write_text(json.dumps(gate, indent=2))
+
+
+# ============================================================================
+# MAIN ENTRY POINT
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Calibrate INT8 models on recorded segments and gate them on state agreement",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--calibrate-from", nargs="+", help="Calibration videos (default: picked from videos/)")
+    parser.add_argument("--holdout", nargs="+", help="Held-out gate videos (default: picked from videos/)")
+    parser.add_argument("--calibration-videos", type=int, default=DEFAULT_CALIBRATION_VIDEOS,
+                       help=f"Segments to calibrate on when picking automatically (default: {DEFAULT_CALIBRATION_VIDEOS})")
+    parser.add_argument("--holdout-videos", type=int, default=DEFAULT_HOLDOUT_VIDEOS,
+                       help=f"Held-out segments for the gate (default: {DEFAULT_HOLDOUT_VIDEOS})")
+    parser.add_argument("--gate-duration", type=int, default=DEFAULT_GATE_DURATION,
+                       help=f"Seconds of each held-out video to process (default: {DEFAULT_GATE_DURATION})")
+    parser.add_argument("--min-agreement", type=float, default=DEFAULT_MIN_AGREEMENT,
+                       help=f"State timeline agreement required to deploy (default: {DEFAULT_MIN_AGREEMENT})")
+    parser.add_argument("--reference", default="onnx", choices=["onnx", "pytorch"],
+                       help="FP32 reference backend (default: onnx - same runtime, so speedup is INT8 only)")
+    parser.add_argument("--gate-only", action="store_true", help="Skip calibration, gate existing INT8 files")
+    args = parser.parse_args()
+
+    for weights in (PERSON_DETECTOR_MODEL, STAFF_CLASSIFIER_MODEL):
+        if not onnx_path(weights).exists():
+            print(f"❌ {onnx_path(weights)} missing - run export_models.py --format onnx first")
+            return 1
+
+    calibration = [Path(v) for v in args.calibrate_from] if args.calibrate_from else None
+    holdout = [Path(v) for v in args.holdout] if args.holdout else None
+    if calibration is None or holdout is None:
+        auto_calibration, auto_holdout = split_segments(recorded_segments(), args.calibration_videos,
+                                                        args.holdout_videos)
+        calibration = calibration or auto_calibration
+        holdout = holdout or [v for v in auto_holdout if v not in calibration]
+    overlap = set(calibration) & set(holdout)
+    if overlap:
+        print(f"❌ Held-out videos must not be used for calibration: {', '.join(p.name for p in overlap)}")
+        return 1
+    if not holdout or (not calibration and not args.gate_only):
+        print(f"❌ Not enough recorded segments in {VIDEOS_DIR} (need calibration and held-out videos)")
+        return 1
+
+    if not args.gate_only:
+        print(f"🎯 Calibration on {len(calibration)} segment(s):")
+        detector_inputs, classifier_inputs = calibration_tensors(calibration)
+        if not classifier_inputs:
+            print("❌ No persons found in the calibration frames - pick busier segments")
+            return 1
+        print(f"\n⚙️  Quantizing ({len(detector_inputs)} detector frames, {len(classifier_inputs)} person crops)")
+        quantize(onnx_path(PERSON_DETECTOR_MODEL), int8_path(PERSON_DETECTOR_MODEL), detector_inputs)
+        quantize(onnx_path(STAFF_CLASSIFIER_MODEL), int8_path(STAFF_CLASSIFIER_MODEL), classifier_inputs)
+
+    gate = run_gate(holdout, args.reference, args.gate_duration, args.min_agreement)
+    return 0 if gate["approved"] else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+ROI Compiler - Scaled, Rasterized ROI Configuration Cached per Config and Resolution
+Version: 1.0.0
+Created: 2026-10-18
+
+Purpose:
+- Every detection job re-read table_region_config.json, deep-copied and rescaled
+  it (auto_scale_config), rebuilt the ROI objects, ran ray casting over every
+  polygon for every person and converted every polygon to np.int32 again on
+  every drawn frame. compile_roi() does the resolution-dependent work once:
+    polygons         scaled int32 arrays (division, tables, sitting, service)
+    table_bboxes     per table, for the labels
+    sitting_to_table sitting area id -> table index
+    label_raster     uint16 H x W, one lookup per person center (see below)
+    division_mask    walking + service pixels (the division overlay)
+    division_center  centroid for the DIVISION label
+- Cached in memory (per process) and on disk under cache/roi/, keyed by the
+  config's content hash, the frame size and COMPILER_VERSION; a changed config
+  gets a new key and its stale files are pruned
+- config_path_for_camera(): config/table_region_config_{camera_id}.json when it
+  exists, else the shared table_region_config.json
+
+Label raster (same priority as the ray-casting assignment):
+    0            outside the division (ignored)
+    1            walking area (rest of the division)
+    2            service area
+    3 + i        table i, also painted over the sitting areas linked to it
+Tables win over sitting areas over service areas, and the first polygon in the
+config wins among overlapping ones of the same kind.
+"""
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = SCRIPT_DIR.parent.parent
+CONFIG_DIR = SCRIPT_DIR.parent / "config"
+DEFAULT_CONFIG_FILE = CONFIG_DIR / "table_region_config.json"
+CACHE_DIR = PROJECT_ROOT / "cache" / "roi"
+COMPILER_VERSION = 1                 # Bump when the compiled layout changes
+DEFAULT_FRAME_SIZE = [1920, 1080]    # Configs without frame_size were drawn at 1080p
+
+LABEL_OUTSIDE = 0
+LABEL_WALKING = 1
+LABEL_SERVICE = 2
+LABEL_TABLE = 3                      # + table index
+
+_memory_cache: Dict[str, "CompiledROI"] = {}
+
+
+def config_path_for_camera(camera_id: Optional[str], default_config: Path = DEFAULT_CONFIG_FILE) -> Path:
+    """Camera-specific config next to the default one, else the default"""
+    default_config = Path(default_config)
+    if camera_id:
+        camera_config = default_config.parent / f"table_region_config_{camera_id}.json"
+        if camera_config.exists():
+            return camera_config
+    return default_config
+
+
+def config_hash(config: Dict) -> str:
+    """Content hash of a config (key order and whitespace do not matter)"""
+    canonical = json.dumps(config, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def scale_config(config: Dict, width: int, height: int) -> Dict:
+    """Config with every polygon scaled to width x height (new dict, input untouched)"""
+    config_width, config_height = config.get("frame_size", DEFAULT_FRAME_SIZE)
+    scale_x = width / config_width
+    scale_y = height / config_height
+
+    def scale(polygon):
+        return [[int(x * scale_x), int(y * scale_y)] for x, y in polygon]
+
+    scaled = dict(config)
+    scaled["division"] = scale(config["division"])
+    for key in ("tables", "sitting_areas", "service_areas"):
+        scaled[key] = [dict(item, polygon=scale(item["polygon"])) for item in config.get(key, [])]
+    scaled["frame_size"] = [width, height]
+    return scaled
+
+
+# ============================================================================
+# COMPILED ROI
+# ============================================================================
+
+def _int32(polygon) -> np.ndarray:
+    return np.array(polygon, np.int32).reshape((-1, 1, 2))
+
+
+class CompiledROI:
+    """ROI configuration at one resolution, ready for lookup and drawing"""
+
+    def __init__(self, source_hash: str, config: Dict, label_raster: np.ndarray, division_mask: np.ndarray):
+        self.config_hash = source_hash       # Hash of the unscaled config (sessions.config_hash)
+        self.config = config                 # Scaled config (plain lists, for reconstruct_objects_from_config)
+        self.width, self.height = config["frame_size"]
+        self.key = cache_key(source_hash, self.width, self.height)
+        self.label_raster = label_raster
+        self.division_mask = division_mask
+
+        self.division = _int32(config["division"])
+        self.table_ids = [t["id"] for t in config.get("tables", [])]
+        self.table_polygons = [_int32(t["polygon"]) for t in config.get("tables", [])]
+        self.table_bboxes = [cv2.boundingRect(p) for p in self.table_polygons]   # (x, y, w, h)
+        self.sitting_polygons = [_int32(a["polygon"]) for a in config.get("sitting_areas", [])]
+        self.service_polygons = [_int32(a["polygon"]) for a in config.get("service_areas", [])]
+        self.sitting_to_table = _sitting_to_table(config)
+
+        moments = cv2.moments(self.division)
+        if moments["m00"] != 0:
+            self.division_center = (int(moments["m10"] / moments["m00"]), int(moments["m01"] / moments["m00"]))
+        else:
+            x, y, w, h = cv2.boundingRect(self.division)
+            self.division_center = (x + w // 2, y + h // 2)
+
+    @classmethod
+    def build(cls, source_hash: str, config: Dict) -> "CompiledROI":
+        """Rasterize a scaled config"""
+        width, height = config["frame_size"]
+        raster = np.zeros((height, width), np.uint16)
+        cv2.fillPoly(raster, [_int32(config["division"])], LABEL_WALKING)
+
+        # Reverse order of precedence, so higher-priority polygons paint last;
+        # each kind is painted back to front so the first one in the config wins
+        for area in reversed(config.get("service_areas", [])):
+            cv2.fillPoly(raster, [_int32(area["polygon"])], LABEL_SERVICE)
+        sitting_to_table = _sitting_to_table(config)
+        for area in reversed(config.get("sitting_areas", [])):
+            if area["id"] in sitting_to_table:
+                cv2.fillPoly(raster, [_int32(area["polygon"])], LABEL_TABLE + sitting_to_table[area["id"]])
+        for index in reversed(range(len(config.get("tables", [])))):
+            cv2.fillPoly(raster, [_int32(config["tables"][index]["polygon"])], LABEL_TABLE + index)
+
+        # Clip to the division (persons outside it are ignored)
+        division = np.zeros((height, width), np.uint8)
+        cv2.fillPoly(division, [_int32(config["division"])], 255)
+        raster[division == 0] = LABEL_OUTSIDE
+
+        # Division overlay: everything in the division but tables and sitting areas
+        mask = division.copy()
+        for table in config.get("tables", []):
+            cv2.fillPoly(mask, [_int32(table["polygon"])], 0)
+        for area in config.get("sitting_areas", []):
+            cv2.fillPoly(mask, [_int32(area["polygon"])], 0)
+        return cls(source_hash, config, raster, mask)
+
+    def lookup(self, point) -> int:
+        """Label of a pixel (LABEL_OUTSIDE off-frame)"""
+        x, y = int(point[0]), int(point[1])
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return int(self.label_raster[y, x])
+        return LABEL_OUTSIDE
+
+    def describe(self) -> str:
+        return (f"{self.width}x{self.height}, {len(self.table_ids)} tables, "
+                f"{len(self.sitting_polygons)} sitting, {len(self.service_polygons)} service")
+
+
+def _sitting_to_table(config: Dict) -> Dict[str, int]:
+    """Sitting area id -> index of its linked table (unlinked areas are left out)"""
+    table_index: Dict[str, int] = {}
+    for index, table in enumerate(config.get("tables", [])):
+        table_index.setdefault(table["id"], index)
+    return {area["id"]: table_index[area["table_id"]]
+            for area in config.get("sitting_areas", []) if area.get("table_id") in table_index}
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+def cache_key(source_hash: str, width: int, height: int) -> str:
+    return f"{source_hash}_{width}x{height}_v{COMPILER_VERSION}"
+
+
+def _load_cached(path: Path, source_hash: str) -> Optional[CompiledROI]:
+    try:
+        with np.load(path) as data:
+            config = json.loads(str(data["config"]))
+            return CompiledROI(source_hash, config, data["label_raster"], data["division_mask"])
+    except Exception as e:
+        print(f"⚠️  Ignoring unreadable ROI cache {path.name}: {e}")
+        return None
+
+
+def _save_cached(path: Path, roi: CompiledROI, config_name: str):
+    """Atomic write, then drop files of older versions of the same config"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, label_raster=roi.label_raster, division_mask=roi.division_mask,
+                            config=np.array(json.dumps(roi.config)))
+    os.replace(tmp, path)
+
+    # Same config file, other content or compiler version (table_region_config_camera_35_*
+    # files belong to another config and do not match the pattern)
+    pattern = re.compile(rf"{re.escape(config_name)}_([0-9a-f]{{16}})_\d+x\d+_v(\d+)\.npz")
+    for stale in path.parent.glob(f"{config_name}_*.npz"):
+        match = pattern.fullmatch(stale.name)
+        if match and (match.group(1) != roi.config_hash or int(match.group(2)) != COMPILER_VERSION):
+            stale.unlink(missing_ok=True)
+
+
+def compile_roi(config: Dict, width: int, height: int, config_name: str = "table_region_config",
+                cache_dir: Optional[Path] = CACHE_DIR) -> CompiledROI:
+    """Compiled ROI for this config at width x height (memory cache, disk cache, then build)
+
+    config_name groups the disk cache files of one config file (its stem), so an
+    edited config replaces its own stale entries; cache_dir=None disables the disk cache
+    """
+    source_hash = config_hash(config)
+    key = cache_key(source_hash, width, height)
+    roi = _memory_cache.get(key)
+    if roi is not None:
+        return roi
+
+    path = Path(cache_dir) / f"{config_name}_{key}.npz" if cache_dir is not None else None
+    if path is not None and path.exists():
+        roi = _load_cached(path, source_hash)
+    if roi is None:
+        config_width, config_height = config.get("frame_size", DEFAULT_FRAME_SIZE)
+        if (config_width, config_height) != (width, height):
+            print(f"⚠️  Resolution mismatch - scaling ROI configuration "
+                  f"{config_width}x{config_height} -> {width}x{height}")
+        roi = CompiledROI.build(source_hash, scale_config(config, width, height))
+        if path is not None:
+            try:
+                _save_cached(path, roi, config_name)
+            except OSError as e:
+                print(f"⚠️  Could not write ROI cache {path}: {e}")
+
+    _memory_cache[key] = roi
+    return roi
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Stage Profiler - Per-Stage Timing Percentiles for Detection Sessions
+Version: 1.0.0
+Created: 2026-10-18
+
+Purpose:
+- PerformanceTracker only keeps total / stage 1 / stage 2 averages over a 30-frame
+  window and prints them when the process exits. StageProfiler times every stage
+  of the frame loop and keeps the whole distribution:
+    decode      reading/grabbing up to the next sampled frame
+    skip        frame quality gate check (and its camera events)
+    detect      person detection (both models under --cascade)
+    classify    staff classification
+    assign      ROI assignment
+    state       table/division debounce updates
+    draw        annotated frame
+    encode      writing the annotated frame (and rotating video parts)
+    screenshot  state-change screenshots
+    db          state rows and checkpoints
+    finalize    joining the video parts + H.264 re-encode (once per session)
+    frame       whole loop iteration after decode
+- Per stage: a log-bucket histogram (10% wide buckets from 0.01ms), so p50/p95/p99
+  are within ~5%, memory stays constant on long videos and histograms of
+  several sessions merge exactly (profile_report.py)
+- The detection script stores the summary in the session_profiles table and
+  appends one JSON line per session to <db dir>/profiles/stage_profiles_YYYYMMDD.jsonl
+"""
+
+import json
+import math
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+STAGES = ["decode", "skip", "detect", "classify", "assign", "state",
+          "draw", "encode", "screenshot", "db", "finalize", "frame"]
+PERCENTILES = [50, 95, 99]
+BUCKET_BASE_MS = 0.01               # Upper edge of bucket 0
+BUCKET_GROWTH = 1.1                 # Each bucket 10% wider than the last
+PROFILE_DIR_NAME = "profiles"       # Next to the database, like screenshots/
+
+_LOG_GROWTH = math.log(BUCKET_GROWTH)
+
+
+def bucket_of(ms: float) -> int:
+    if ms <= BUCKET_BASE_MS:
+        return 0
+    return int(math.ceil(math.log(ms / BUCKET_BASE_MS) / _LOG_GROWTH))
+
+
+def bucket_upper_ms(index: float) -> float:
+    return BUCKET_BASE_MS * BUCKET_GROWTH ** index
+
+
+def code_version(version: str, repo_dir: Optional[Path] = None) -> str:
+    """Script version plus the git commit when running from a checkout ("3.14.0+3de1f44")"""
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=str(repo_dir or Path(__file__).parent),
+                                capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return version
+    commit = result.stdout.strip()
+    return f"{version}+{commit}" if result.returncode == 0 and commit else version
+
+
+# ============================================================================
+# HISTOGRAM
+# ============================================================================
+
+class StageHistogram:
+    """Timing distribution of one stage (milliseconds)"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets: Dict[int, int] = {}
+
+    def add(self, ms: float):
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        index = bucket_of(ms)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other: "StageHistogram"):
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Geometric middle of the bucket holding the q-th percentile (capped at the exact max)"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(bucket_upper_ms(index - 0.5), self.max_ms)
+        return self.max_ms
+
+    def to_dict(self) -> Dict:
+        summary = {"samples": self.count, "total_ms": round(self.total_ms, 3),
+                   "mean_ms": round(self.mean_ms, 3), "max_ms": round(self.max_ms, 3)}
+        for q in PERCENTILES:
+            summary[f"p{q}_ms"] = round(self.percentile(q), 3)
+        summary["histogram"] = {str(index): count for index, count in sorted(self.buckets.items())}
+        return summary
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "StageHistogram":
+        histogram = cls()
+        histogram.count = data.get("samples", 0)
+        histogram.total_ms = data.get("total_ms", 0.0)
+        histogram.max_ms = data.get("max_ms", 0.0)
+        histogram.buckets = {int(index): count for index, count in (data.get("histogram") or {}).items()}
+        return histogram
+
+
+# ============================================================================
+# PROFILER
+# ============================================================================
+
+class StageProfiler:
+    """Per-session stage timings: lap() between stages, timed() around the frame source
+
+    A stage gets a sample only on frames where it ran (draw only when drawing,
+    db only when something was written), so its percentiles are per occurrence
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, StageHistogram] = {}
+        self.started = time.time()
+        self._frame: Dict[str, float] = {}   # per_frame laps summed until end_frame()
+
+    @staticmethod
+    def now() -> float:
+        return time.perf_counter()
+
+    def add(self, stage: str, seconds: float):
+        self.stages.setdefault(stage, StageHistogram()).add(seconds * 1000)
+
+    def lap(self, stage: str, since: float, per_frame: bool = False) -> float:
+        """Record now - since for the stage; returns now (start of the next stage)
+
+        per_frame: stages that can run several times in one frame (screenshots,
+        database writes) are summed and recorded as one sample by end_frame()
+        """
+        now = time.perf_counter()
+        if per_frame:
+            self._frame[stage] = self._frame.get(stage, 0.0) + now - since
+        else:
+            self.add(stage, now - since)
+        return now
+
+    def end_frame(self):
+        for stage, seconds in self._frame.items():
+            self.add(stage, seconds)
+        self._frame.clear()
+
+    def timed(self, items: Iterable, stage: str = "decode") -> Iterator:
+        """Yield from items, timing each next() as the stage"""
+        iterator = iter(items)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.add(stage, time.perf_counter() - start)
+            yield item
+
+    def summary(self) -> Dict[str, Dict]:
+        """{stage: {samples, total_ms, mean_ms, max_ms, p50_ms, p95_ms, p99_ms, histogram}}, STAGES order"""
+        order = STAGES + sorted(set(self.stages) - set(STAGES))
+        return {stage: self.stages[stage].to_dict() for stage in order if stage in self.stages}
+
+    def record(self, **meta) -> Dict:
+        """One JSON line: session metadata plus the stage summary"""
+        return dict(meta, created=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    wall_seconds=round(time.time() - self.started, 2), stages=self.summary())
+
+    def write_jsonl(self, profile_dir: Path, **meta) -> Path:
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        path = profile_dir / f"stage_profiles_{time.strftime('%Y%m%d')}.jsonl"
+        with open(path, "a") as f:
+            f.write(json.dumps(self.record(**meta)) + "\n")
+        return path
+
+    def print_summary(self):
+        print("Stage Profile (ms):")
+        for line in stage_table(self.stages):
+            print(f"   {line}")
+
+
+def stage_table(stages: Dict[str, StageHistogram]) -> List[str]:
+    """Text table of stage histograms, STAGES order; share = fraction of the frame stage's time"""
+    frame = stages.get("frame")
+    frame_total = frame.total_ms if frame else 0.0
+    lines = [f"{'stage':<11}{'samples':>9}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'share':>8}"]
+    for stage in STAGES + sorted(set(stages) - set(STAGES)):
+        histogram = stages.get(stage)
+        if histogram is None:
+            continue
+        in_frame = frame_total and stage not in ("frame", "finalize", "decode")
+        share = f"{histogram.total_ms / frame_total:.0%}" if in_frame else ""
+        lines.append(f"{stage:<11}{histogram.count:>9}{histogram.mean_ms:>9.1f}{histogram.percentile(50):>9.1f}"
+                     f"{histogram.percentile(95):>9.1f}{histogram.percentile(99):>9.1f}{histogram.max_ms:>9.1f}{share:>8}")
+    return lines
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+State Timelines - Run the Detection Script and Compare Its State Output
+Version: 1.0.0
+Created: 2026-10-18
+
+Purpose:
+- Shared by the accuracy checks that judge a pipeline change by its output
+  (table/division state timelines) instead of raw model scores:
+    quantize_models.py  FP32 vs onnx-int8 accuracy gate
+    cascade_eval.py     medium-only baseline vs --cascade
+- run_detection(): the detection script on one video into a throwaway database,
+  with per-frame timings (and cascade escalation stats) parsed from its summary
+- timeline_agreement(): fraction of (second, table/division) samples in the
+  same state across two runs
+"""
+
+import re
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = SCRIPT_DIR.parent.parent
+VIDEOS_DIR = PROJECT_ROOT / "videos"
+DETECTION_SCRIPT = SCRIPT_DIR / "table_and_region_state_detection.py"
+
+TIMELINE_STEP_SECONDS = 1.0
+
+STAGE_PATTERN = re.compile(r"Stage (\d) \((?:detection|classification)\):\s+([\d.]+)ms")
+FPS_PATTERN = re.compile(r"Processing FPS:\s+([\d.]+)")
+CASCADE_PATTERN = re.compile(r"Cascade: (\d+)/(\d+) frames escalated \([\d.]+%\) \| (.*)")
+
+
+def recorded_segments() -> List[Path]:
+    """Archive segments from finished days (videos/YYYYMMDD/camera_id/*.mp4), oldest first"""
+    today = datetime.now().strftime("%Y%m%d")
+    segments = [p for p in VIDEOS_DIR.glob("[0-9]" * 8 + "/camera_*/camera_*.mp4") if p.parent.parent.name < today]
+    return sorted(segments)
+
+
+# ============================================================================
+# DETECTION RUNS
+# ============================================================================
+
+def run_detection(video: Path, backend: str, duration: int, work_dir: Path,
+                  extra_args: Optional[List[str]] = None, env: Optional[Dict[str, str]] = None,
+                  label: Optional[str] = None) -> Dict:
+    """Detection script on one video into its own database; timings parsed from its summary"""
+    label = label or backend
+    db_path = work_dir / f"{label}_{video.stem}.db"
+    cmd = [sys.executable, str(DETECTION_SCRIPT), "--video", str(video), "--backend", backend,
+           "--duration", str(duration), "--headless", "--output", str(work_dir), "--db", str(db_path)]
+    cmd += extra_args or []
+    result = subprocess.run(cmd, capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(f"{label} run on {video.name} exited {result.returncode}: "
+                           f"{result.stderr.strip()[-500:]}")
+    stages = {int(n): float(ms) for n, ms in STAGE_PATTERN.findall(result.stdout)}
+    fps = FPS_PATTERN.search(result.stdout)
+    run = {
+        "db": db_path,
+        "frame_ms": stages.get(1, 0.0) + stages.get(2, 0.0),
+        "detect_ms": stages.get(1, 0.0),
+        "fps": float(fps.group(1)) if fps else 0.0,
+    }
+    cascade = CASCADE_PATTERN.search(result.stdout)
+    if cascade:
+        reasons = {}
+        for item in cascade.group(3).split(","):
+            name, _, count = item.strip().rpartition(" ")
+            reasons[name] = int(count)
+        run.update(escalated=int(cascade.group(1)), cascade_frames=int(cascade.group(2)), reasons=reasons)
+    return run
+
+
+# ============================================================================
+# TIMELINES
+# ============================================================================
+
+def load_timelines(db_path: Path) -> Dict[str, List[Tuple[float, str]]]:
+    """
+    {"table:T1": [(media_seconds, state), ...], "division": [...]} from one run's database
+
+    Positions come from frame_number / sessions.fps: the timestamp column is wall
+    clock, so it differs between two runs of the same video
+    """
+    conn = sqlite3.connect(str(db_path))
+    try:
+        timelines: Dict[str, List[Tuple[float, str]]] = {}
+        for table_id, frame, fps, state in conn.execute(
+                "SELECT t.table_id, t.frame_number, s.fps, t.state FROM table_states t "
+                "JOIN sessions s ON s.session_id = t.session_id ORDER BY t.frame_number"):
+            timelines.setdefault(f"table:{table_id}", []).append((frame / (fps or 1.0), state))
+        for frame, fps, state in conn.execute(
+                "SELECT d.frame_number, s.fps, d.state FROM division_states d "
+                "JOIN sessions s ON s.session_id = d.session_id ORDER BY d.frame_number"):
+            timelines.setdefault("division", []).append((frame / (fps or 1.0), state))
+        return timelines
+    finally:
+        conn.close()
+
+
+def state_at(timeline: List[Tuple[float, str]], t: float) -> Optional[str]:
+    state = None
+    for timestamp, value in timeline:
+        if timestamp > t:
+            break
+        state = value
+    return state
+
+
+def timeline_agreement(reference: Dict, candidate: Dict, duration: float) -> Tuple[int, int]:
+    """(agreeing samples, total samples) over every table/division, one sample per second"""
+    agree = total = 0
+    end = duration
+    for timeline in list(reference.values()) + list(candidate.values()):
+        if timeline:
+            end = max(end, timeline[-1][0])
+    for key in set(reference) | set(candidate):
+        t = 0.0
+        while t <= end:
+            total += 1
+            if state_at(reference.get(key, []), t) == state_at(candidate.get(key, []), t):
+                agree += 1
+            t += TIMELINE_STEP_SECONDS
+    return agree, total
@@ -1,5 +1,128 @@
 #!/usr/bin/env python3
 """
+# Modified: 2026-10-18 - Stage-level profiling persisted per session
+# Issue: PerformanceTracker only kept stage 1/stage 2 averages over 30 frames and
+#        printed them at exit, so decode, drawing, encoding, screenshots and database
+#        writes were never measured and nothing survived the subprocess
+# Solution: StageProfiler (stage_profiler.py) times decode, skip, detect, classify,
+#           assign, state, draw, encode, screenshot, db and finalize per frame into
+#           mergeable histograms; the summary (p50/p95/p99) goes to the new
+#           session_profiles table and one JSON line per session to
+#           <db dir>/profiles/stage_profiles_YYYYMMDD.jsonl
+# Note: monitoring/profile_report.py compares sessions, cameras, code versions and
+#       backends; first-frame preprocessing is not profiled
+#
+# Modified: 2026-10-18 - Compiled, cached per-camera ROI configuration
+# Issue: Every job re-read and deep-copied the ROI config, rescaled and rebuilt it,
+#        ran ray casting over every polygon per person and converted every polygon
+#        to np.int32 again on every drawn frame. The per-camera
+#        table_region_config_{camera_id}.json was detected by the orchestrator but
+#        never passed, so every camera ran on the shared config
+# Solution: roi_compiler.py compiles the config once per (content hash, resolution):
+#           scaled int32 polygons, table bboxes, a label raster for ROI assignment and
+#           the division overlay mask, cached in memory and in cache/roi/. --config
+#           selects the file (default: the camera's own config when it exists)
+# Note: sessions.config_file is the file actually used, sessions.config_hash its
+#       content hash
+#
+# Modified: 2026-10-18 - Frame quality gate (stage 0)
+# Issue: Before/after service hours and during camera glitches full detection ran on
+#        black frames, smeared or gray decoder output and exact repeats of frozen streams
+# Solution: frame_quality.py checks a downscaled grayscale copy of every sampled frame
+#           (mean luminance, Laplacian variance, hash) before detect_persons(); dark,
+#           blurred and repeated frames skip inference and leave the states untouched.
+#           Identical frames for --frozen-seconds become a camera_frozen row in the new
+#           camera_events table; skip counts are stored per session
+# Note: Thresholds per camera in cameras_config.json "frame_quality"; opt-in per camera
+#       ("enabled": true) or with --quality-gate until the thresholds are tuned
+#
+# Modified: 2026-10-18 - Event-adaptive sampling (--adaptive-fps) and media-time debounce
+# Issue: --fps was fixed per run: 5 inferences per second while every table had been
+#        stable for 20 minutes, and no extra resolution while states were flipping.
+#        The debounce also ran on wall-clock time, so "1s stable" depended on how fast
+#        the host processed the frames
+# Solution: AdaptiveSampler drops to a base rate while no table/division has a
+#           pending state and the ROI counts are unchanged, and jumps to the max rate
+#           as soon as a debounce starts or a count changes (held 3s of media time,
+#           then halved per processed frame). Bounds per camera from cameras_config.json
+#           "adaptive_fps" {"min", "max"}, overridable with --min-fps/--max-fps.
+#           Debounce, preprocessing and checkpoints now use media time (frame / video fps)
+# Note: Effective fps distribution in the summary and in sessions.effective_fps /
+#       sessions.fps_profile; the timestamp column of table_states/division_states
+#       stays wall-clock
+#
+# Modified: 2026-10-18 - Detector cascade (--cascade)
+# Issue: yolov8m ran on every sampled frame, including empty quiet-hour frames and
+#        frames with a few large, well-separated people the nano model gets right
+# Solution: --cascade runs the small detector (yolov8n) first and re-runs the frame
+#           on yolov8m only when a small-model confidence is near the threshold, a
+#           person center is near an ROI edge, persons overlap or a debounce
+#           transition is pending (CascadeDetector in inference_backends.py)
+# Note: First-frame preprocessing always uses the full model. The escalation rate is
+#       stored in sessions.cascade_escalation_rate; cascade_eval.py compares the
+#       state timelines with a medium-only baseline
+#
+# Modified: 2026-10-18 - Pluggable inference backends
+# Issue: load_models() hard-coded ultralytics YOLO on .pt weights; PyTorch eager
+#        inference of yolov8m on CPU-only hosts is far slower than an optimised runtime
+# Solution: inference_backends.py wraps both models behind detect()/classify();
+#           --backend (or DETECTION_BACKEND) picks pytorch, onnx, openvino or auto.
+#           Exported graphs come from export_models.py, which also checks parity
+#           against the pytorch path (--verify)
+# Note: ultralytics is only imported by the pytorch backend, so an ONNX-only host
+#       does not need torch
+#
+# Modified: 2026-10-18 - Explicit thread budget per process
+# Issue: torch, OpenCV and OpenMP each sized their pools to every core, so N
+#        concurrent workers on a CPU host ran N x cores threads and thrashed
+# Solution: --torch-threads/--interop-threads/--cv-threads set the pools before the
+#           models load, --cpu-cores pins the process; the orchestrator's thread
+#           budget planner passes them (plus OMP/MKL env limits) per worker
+# Note: --db redirects the database (and screenshots) for benchmarks on throwaway
+#       databases
+#
+# Modified: 2026-10-18 - Structured progress channel for the orchestrator
+# Issue: The orchestrator only saw the output after exit, so it could not tell a
+#        slow video from a hung decoder
+# Solution: "@@PROGRESS {json}" lines on stdout every 5s (frame, progress, fps,
+#           stage timings) plus one per phase (models, preprocessing, encoding);
+#           the orchestrator's watchdog kills jobs whose progress stops
+#
+# Modified: 2026-10-18 - Checkpoint and resume for interrupted sessions
+# Issue: A worker dying mid-video left a session row behind; the next run saw the
+#        duplicate and exited 2, so the rest of the segment was silently never processed
+# Solution: sessions.processing_status (running/complete/failed) plus a checkpoint every
+#           15s: last frame whose results are in the database, debounce state, frame
+#           counter and the finished output video parts. A rerun of a running (stale)
+#           or failed session resumes after the checkpoint; only a complete session is
+#           skipped with exit 2
+# Note: Results logged after the checkpoint are deleted and recomputed on resume; the
+#       annotated video is written in parts (closed at every checkpoint) and joined
+#       before the H.264 re-encode
+#
+# Modified: 2026-10-18 - Headless mode (--headless)
+# Issue: Every run wrote a full-resolution annotated video and re-encoded it to H.264,
+#        even when only the database and screenshots were needed
+# Solution: --headless skips the VideoWriter and the re-encode; frames are only drawn
+#           when a state change needs a screenshot
+# Used by: deadline planning in the orchestrator to degrade low-priority cameras
+#
+# Modified: 2026-10-18 - Keyframe seeking (--start/--end) and --keyframes-only preview
+# Issue: Every run decoded the segment from frame 0, even for one minute of a long
+#        recording or a quick look at a camera
+# Solution: keyframe_index.py sidecars (written by capture) give keyframe times and
+#           frame numbers; --start seeks straight to the keyframe at or before it,
+#           --end stops there, --keyframes-only decodes one frame per keyframe
+# Note: Range runs are stored as video_file "<name>#t=START,END" with a matching
+#       session_id suffix, so keyframe-aligned chunks of one segment can run in
+#       parallel without tripping the duplicate check
+#
+# Modified: 2026-10-18 - Indexed duplicate check
+# Issue: SELECT ... WHERE camera_id = ? AND video_file = ? scanned the whole sessions table
+# Solution: idx_sessions_camera_video on sessions(camera_id, video_file)
+# Note: The orchestrator now dedups via the processing_jobs claim table; this check
+#       remains as a safety net for manual runs
+#
 # Modified: 2025-12-09 - Fixed video encoding and screenshot compression issues
 # Issue 1: Video output using MPEG4 (mp4v) resulting in 22x larger files than input
 #   - Changed from mp4v (MPEG-4 Part 2) to avc1 (H.264) codec
@@ -25,12 +148,93 @@
 # to fill debounce buffer and ensure initial states are logged to database
 #
 Table and Region State Detection System
-Version: 3.3.0
-Last Updated: 2025-12-03
+Version: 3.14.3
+Last Updated: 2026-10-18
 
 Purpose: Unified system monitoring both table states and regional staff coverage
 Combines table-level monitoring (IDLE/BUSY/CLEANING) with division-level monitoring (staffed/unstaffed)
 
+Changes in v3.14.3:
+- Resuming takes the session over with one conditional UPDATE (session_id and
+  the checkpoint_at read before); only the process whose UPDATE changed the row
+  continues, a concurrent resumer exits 3 before touching output parts or rows
+
+Changes in v3.14.2:
+- Progress lines keep coming every PROGRESS_INTERVAL_SECONDS while the finished
+  output is joined and re-encoded (each ffmpeg step may take up to 300s), so
+  the orchestrator's stall watchdog no longer kills completed sessions
+
+Changes in v3.14.1:
+- Frame quality gate is opt-in: cameras_config.json "frame_quality": {"enabled": true}
+  or --quality-gate (--no-quality-gate forces it off); dark/blurred are checked
+  before repeats, so black night frames no longer open camera_frozen events
+
+Changes in v3.14.0:
+- Stage profile per session (stage_profiler.py): timing percentiles of every
+  frame-loop stage in the session_profiles table, <db dir>/profiles/*.jsonl and
+  the summary; compare runs with monitoring/profile_report.py
+
+Changes in v3.13.0:
+- ROI configuration compiled and cached per config hash and resolution
+  (roi_compiler.py); person assignment is a label raster lookup and drawing
+  reuses the compiled polygons and division mask
+- roi_compiler.scale_config() is the only ROI scaler (the v3.2.0
+  scale_polygon/auto_scale_config helpers are removed)
+- Added --config; default is config/table_region_config_{camera_id}.json when it
+  exists, else the shared config; sessions.config_hash
+
+Changes in v3.12.0:
+- Frame quality gate before detection (frame_quality.py): dark, blurred and
+  repeated frames are skipped; --min-luma/--min-sharpness/--frozen-seconds
+  (per-camera defaults: cameras_config.json "frame_quality"), --no-quality-gate
+  (opt-in since v3.14.1)
+- camera_events table (camera_frozen events) and per-session skip counts
+  (frames_skipped_dark/blurred/repeat)
+
+Changes in v3.11.0:
+- Added --adaptive-fps with --min-fps/--max-fps (per-camera defaults from
+  cameras_config.json "adaptive_fps"): base rate while all states are stable,
+  max rate while a debounce is pending or ROI counts change
+- Debounce timing uses media time (frame number / video fps) instead of wall clock
+- Effective fps distribution in the summary, sessions.effective_fps and
+  sessions.fps_profile
+
+Changes in v3.10.0:
+- Added --cascade, --cascade-model and --cascade-margin: small detector first,
+  full detector only on uncertain frames; escalation rate in the progress lines,
+  the summary and sessions.cascade_escalation_rate
+
+Changes in v3.9.0:
+- Added --backend {auto,pytorch,onnx,openvino} (default: $DETECTION_BACKEND or
+  pytorch); detection/classification go through inference_backends.py
+
+Changes in v3.8.0:
+- Added --torch-threads, --interop-threads, --cv-threads and --cpu-cores (thread
+  budget from the orchestrator; defaults keep the library behaviour)
+- Added --db: alternative database path (screenshots go next to it)
+
+Changes in v3.7.0:
+- Machine-readable progress lines ("@@PROGRESS {json}", flushed) every 5s and at
+  each phase, read incrementally by the orchestrator's hung-job watchdog
+
+Changes in v3.6.0:
+- Sessions carry processing_status (running/complete/failed) and a checkpoint
+  (checkpoint_frame, checkpoint_state JSON, checkpoint_at) written every 15s
+- Rerunning an interrupted session resumes after its last checkpoint instead of
+  exiting 2; a session still checkpointing from another process exits 3
+- Annotated video written in parts rotated at each checkpoint, joined at the end
+
+Changes in v3.5.0:
+- Added --headless: no annotated output video and no H.264 re-encode
+  (database + screenshots only)
+
+Changes in v3.4.0:
+- Added --start/--end (seconds): seek to the keyframe at or before --start via the
+  segment's keyframe index sidecar and stop at --end
+- Added --keyframes-only: decode only keyframes (fast preview)
+- Frame numbers stay absolute (keyframe frame number), so chunked runs line up
+  with full-file runs in the database and screenshots
+
 Changes in v3.2.0:
 - Added automatic ROI configuration scaling for resolution mismatches
 - Auto-detects when config resolution differs from actual video resolution
@@ -98,7 +302,6 @@ Author: ASEOfSmartICE Team
 
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import os
 from pathlib import Path
 import argparse
@@ -110,12 +313,29 @@ from datetime import datetime
 import sqlite3
 import re
 import sys
+import threading
+from contextlib import contextmanager
 
 # Model paths (relative to script location)
 SCRIPT_DIR = Path(__file__).parent.resolve()
 PROJECT_ROOT = SCRIPT_DIR.parent.parent  # production/RTX_3060/ (scripts/video_processing/../.. )
+
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+from video_processing.inference_backends import (
+    load_inference_models, load_detector, CascadeDetector, BACKENDS, DEFAULT_BACKEND,
+    CASCADE_CONF_MARGIN, CASCADE_BOUNDARY_PX
+)
+from video_processing.frame_quality import (
+    FrameQualityGate, DEFAULT_MIN_LUMA, DEFAULT_MIN_SHARPNESS, DEFAULT_FROZEN_SECONDS
+)
+from video_processing.stage_profiler import StageProfiler, PROFILE_DIR_NAME, code_version
+from video_processing.roi_compiler import (
+    compile_roi, config_path_for_camera, LABEL_OUTSIDE, LABEL_SERVICE, LABEL_TABLE
+)
+from video_capture.keyframe_index import load_or_build_index, keyframe_at, keyframes_between
 PERSON_DETECTOR_MODEL = str(SCRIPT_DIR.parent / "models" / "yolov8m.pt")
 STAFF_CLASSIFIER_MODEL = str(SCRIPT_DIR.parent / "models" / "waiter_customer_classifier.pt")
+CASCADE_DETECTOR_MODEL = str(SCRIPT_DIR.parent / "models" / "yolov8n.pt")  # --cascade small model
 
 # Detection parameters
 PERSON_CONF_THRESHOLD = 0.3
@@ -124,10 +344,47 @@ MIN_PERSON_SIZE = 40
 
 # Configuration file (in scripts/config/)
 CONFIG_FILE = str(SCRIPT_DIR.parent / "config" / "table_region_config.json")
+CAMERAS_CONFIG_FILE = SCRIPT_DIR.parent / "config" / "cameras_config.json"
 
 # State transition parameters
 STATE_DEBOUNCE_SECONDS = 1.0  # All state changes require 1s stability
 
+# Checkpoint/resume (Modified: 2026-10-18)
+CHECKPOINT_INTERVAL_SECONDS = 15   # A crash costs at most ~15s of rework
+CHECKPOINT_STALE_SECONDS = 60      # 'running' session without a checkpoint this long = dead worker
+SESSION_RUNNING = "running"
+SESSION_COMPLETE = "complete"
+SESSION_FAILED = "failed"
+EXIT_IN_PROGRESS = 3               # Another live process is checkpointing this session
+
+# Event-adaptive sampling (Modified: 2026-10-18) - --adaptive-fps
+ADAPTIVE_MIN_FPS = 1.0             # Base rate while every state is stable (cameras_config.json "adaptive_fps")
+ADAPTIVE_HOLD_SECONDS = 3.0        # Media time at the max rate after the last event
+
+# Structured progress channel (Modified: 2026-10-18) - parsed by the orchestrator
+PROGRESS_PREFIX = "@@PROGRESS "
+PROGRESS_INTERVAL_SECONDS = 5
+
+# Stage profiling (Modified: 2026-10-18) - session_profiles table + profiles/*.jsonl
+SCRIPT_VERSION = "3.14.3"          # Keep in sync with the docstring; stored with the git commit when available
+
+# Columns added to sessions after v3.5.0 (ALTER TABLE on existing databases)
+# New columns also go into RESULT_TABLES in orchestration/work_queue.py (multi-node ingestion)
+SESSION_COLUMNS = {
+    "processing_status": "TEXT",    # running / complete / failed (NULL = legacy row)
+    "error_message": "TEXT",
+    "checkpoint_frame": "INTEGER",  # Last frame whose results are in the database
+    "checkpoint_state": "TEXT",     # JSON: debounce state, frame counter, finished output parts
+    "checkpoint_at": "TEXT",
+    "cascade_escalation_rate": "REAL",  # Fraction of frames the cascade sent to the full model (NULL = no cascade)
+    "effective_fps": "REAL",        # Processed frames per second of media
+    "fps_profile": "TEXT",          # JSON {fps: share of media time} under --adaptive-fps
+    "frames_skipped_dark": "INTEGER",     # Frame quality gate (NULL = gate off)
+    "frames_skipped_blurred": "INTEGER",
+    "frames_skipped_repeat": "INTEGER",
+    "config_hash": "TEXT",          # Content hash of the ROI config (roi_compiler.py cache key)
+}
+
 # Visual configuration
 COLORS = {
     'person': (255, 255, 0),        # Cyan for person detection
@@ -160,6 +417,73 @@ COLORS = {
 CLASS_NAMES = {0: 'customer', 1: 'waiter'}
 
 
+def apply_thread_budget(torch_threads=None, interop_threads=None, cv_threads=None, cpu_cores=None):
+    """
+    Size the torch/OpenCV thread pools and pin the process before models load
+
+    cpu_cores: taskset-style list ("0-3,8"). Threads created afterwards inherit
+    the affinity, so this must run before the first inference.
+    """
+    applied = []
+    if cpu_cores and hasattr(os, "sched_setaffinity"):
+        cores = set()
+        for part in cpu_cores.split(","):
+            start, sep, end = part.strip().partition("-")
+            cores.update(range(int(start), int(end) + 1) if sep else [int(start)])
+        os.sched_setaffinity(0, cores)
+        applied.append(f"cores {cpu_cores}")
+    try:
+        import torch  # Loaded by ultralytics anyway (pytorch backend)
+    except ImportError:
+        torch = None  # ONNX/OpenVINO-only host: the backend takes torch_threads itself
+    if torch is not None and (torch_threads or interop_threads):
+        if torch_threads:
+            torch.set_num_threads(torch_threads)
+            applied.append(f"torch {torch_threads}")
+        if interop_threads:
+            try:
+                torch.set_num_interop_threads(interop_threads)
+                applied.append(f"inter-op {interop_threads}")
+            except RuntimeError:
+                # Only allowed before the first parallel op
+                print("⚠️  Warning: inter-op thread count already fixed", file=sys.stderr)
+    if cv_threads:
+        cv2.setNumThreads(cv_threads)
+        applied.append(f"OpenCV {cv_threads}")
+    if applied:
+        print(f"🧵 Thread budget: {', '.join(applied)}")
+
+
+def emit_progress(phase, **fields):
+    """One machine-readable progress line: @@PROGRESS {"phase": ..., ...} (flushed)"""
+    print(f"{PROGRESS_PREFIX}{json.dumps(dict(phase=phase, **fields))}", flush=True)
+
+
+@contextmanager
+def progress_heartbeat(phase, interval=PROGRESS_INTERVAL_SECONDS, **fields):
+    """emit_progress(phase) now and every interval seconds until the block exits
+
+    For long blocking steps (ffmpeg join/re-encode) that print nothing: the
+    orchestrator kills jobs silent for JOB_STALL_SECONDS
+    """
+    stop = threading.Event()
+
+    def beat():
+        elapsed = 0
+        while not stop.wait(interval):
+            elapsed += interval
+            emit_progress(phase, elapsed=elapsed, **fields)
+
+    emit_progress(phase, **fields)
+    thread = threading.Thread(target=beat, name=f"progress-{phase}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
 def extract_camera_id_from_filename(video_path):
     """
     Extract camera_id from video filename
@@ -346,6 +670,71 @@ class DivisionStateTracker:
         return False
 
 
+class AdaptiveSampler:
+    """Event-adaptive sampling rate (--adaptive-fps)
+
+    Runs at max_fps while any debounce is pending or the ROI counts changed in the
+    last ADAPTIVE_HOLD_SECONDS of media time, then halves the rate per processed
+    frame down to min_fps. Rates are whole frame intervals of the video.
+    """
+
+    def __init__(self, video_fps, min_fps, max_fps):
+        self.video_fps = video_fps
+        self.fast_interval = max(1, int(round(video_fps / max_fps)))
+        self.slow_interval = max(self.fast_interval, int(round(video_fps / min_fps)))
+        self.interval = self.fast_interval   # Start fast while the initial states settle
+        self.next_frame = 0
+        self.last_event = None
+        self.last_counts = None
+        self.boosts = 0
+        self.media_seconds = {}              # effective fps -> media seconds sampled at that rate
+
+    @property
+    def current_fps(self):
+        return self.video_fps / self.interval
+
+    def update(self, frame_idx, media_time, counts, pending):
+        """After each processed frame: pick the interval to the next one"""
+        changed = self.last_counts is not None and counts != self.last_counts
+        self.last_counts = counts
+        if pending or changed:
+            if self.interval != self.fast_interval:
+                self.boosts += 1
+            self.interval = self.fast_interval
+            self.last_event = media_time
+        elif self.last_event is None or media_time - self.last_event >= ADAPTIVE_HOLD_SECONDS:
+            self.interval = min(self.slow_interval, self.interval * 2)
+        rate = round(self.current_fps, 2)
+        self.media_seconds[rate] = self.media_seconds.get(rate, 0.0) + self.interval / self.video_fps
+        self.next_frame = frame_idx + self.interval
+
+    def profile(self):
+        """{fps: share of media time}, fastest first"""
+        total = sum(self.media_seconds.values())
+        return {rate: round(seconds / total, 4) for rate, seconds in
+                sorted(self.media_seconds.items(), reverse=True)} if total else {}
+
+    def summary(self):
+        return " | ".join(f"{rate:g} fps {share:.1%}" for rate, share in self.profile().items())
+
+
+def load_camera_settings(camera_id, section, config_path=CAMERAS_CONFIG_FILE):
+    """One section of the camera's cameras_config.json entry ({} when unset)"""
+    try:
+        with open(config_path) as f:
+            camera = json.load(f).get(camera_id, {})
+    except (OSError, ValueError):
+        return {}
+    settings = camera.get(section, {}) if isinstance(camera, dict) else {}
+    return settings if isinstance(settings, dict) else {}
+
+
+def load_adaptive_fps_bounds(camera_id, config_path=CAMERAS_CONFIG_FILE):
+    """(min_fps, max_fps) from the camera's "adaptive_fps" entry, None where unset"""
+    bounds = load_camera_settings(camera_id, 'adaptive_fps', config_path)
+    return bounds.get('min'), bounds.get('max')
+
+
 class PerformanceTracker:
     """Track processing performance metrics"""
 
@@ -469,6 +858,39 @@ def point_in_polygon(point, polygon):
     return inside
 
 
+def distance_to_polygon_edge(point, polygon):
+    """Shortest distance from a point to any edge of the polygon"""
+    px, py = point
+    best = float('inf')
+    n = len(polygon)
+    for i in range(n):
+        x1, y1 = polygon[i]
+        x2, y2 = polygon[(i + 1) % n]
+        dx, dy = x2 - x1, y2 - y1
+        length_sq = dx * dx + dy * dy
+        t = 0.0 if length_sq == 0 else max(0.0, min(1.0, ((px - x1) * dx + (py - y1) * dy) / length_sq))
+        cx, cy = x1 + t * dx, y1 + t * dy
+        best = min(best, ((px - cx) ** 2 + (py - cy) ** 2) ** 0.5)
+    return best
+
+
+def roi_boundary_check(division_polygon, tables, sitting_areas, service_areas, margin=CASCADE_BOUNDARY_PX):
+    """Cascade escalation test: is a box center within `margin` px of any ROI edge?
+
+    Those are the people whose ROI assignment (assign_detections_to_rois uses the
+    center) flips with a few pixels of box jitter between the two models
+    """
+    polygons = [division_polygon] + [t.polygon for t in tables] + \
+               [a.polygon for a in sitting_areas] + [a.polygon for a in service_areas]
+
+    def near_edge(box):
+        center = ((box[0] + box[2]) / 2, (box[1] + box[3]) / 2)
+        return any(distance_to_polygon_edge(center, polygon) < margin for polygon in polygons)
+
+    return near_edge
+
+
+
 def draw_roi_on_frame(frame, points, color, thickness=2, fill_alpha=0.2):
     """Draw ROI polygon on frame"""
     if len(points) < 2:
@@ -848,97 +1270,16 @@ def setup_all_rois_from_video(video_path):
             return None
 
 
-def scale_polygon(polygon, scale_x, scale_y):
-    """
-    Scale polygon coordinates by given factors
-
-    Args:
-        polygon: List of [x, y] coordinates
-        scale_x: X-axis scaling factor
-        scale_y: Y-axis scaling factor
-
-    Returns:
-        Scaled polygon coordinates
-    """
-    return [[int(x * scale_x), int(y * scale_y)] for x, y in polygon]
-
-
-def auto_scale_config(config, actual_width, actual_height):
-    """
-    Automatically scale ROI configuration to match actual frame dimensions.
-
-    This function handles resolution mismatches between the configuration creation
-    environment (e.g., MacBook with 1920x1080 test video) and the production
-    environment (e.g., Linux RTX with 2592x1944 camera feed).
-
-    Args:
-        config: Original configuration dictionary
-        actual_width: Actual frame width from video
-        actual_height: Actual frame height from video
-
-    Returns:
-        Scaled configuration dictionary
-
-    Note:
-        Configuration created at 1920x1080 but production camera at 2592x1944?
-        This function automatically scales all ROI coordinates to match.
-    """
-    import copy
-    scaled_config = copy.deepcopy(config)
-
-    # Get configured frame size (default to 1920x1080 if not specified)
-    config_width, config_height = scaled_config.get('frame_size', [1920, 1080])
-
-    # Check if scaling is needed
-    if config_width == actual_width and config_height == actual_height:
-        return scaled_config
-
-    # Calculate scaling factors
-    scale_x = actual_width / config_width
-    scale_y = actual_height / config_height
-
-    print(f"⚠️  Resolution mismatch detected - Auto-scaling ROI configuration")
-    print(f"   Config resolution:  {config_width}x{config_height}")
-    print(f"   Actual resolution:  {actual_width}x{actual_height}")
-    print(f"   Scale factors:      {scale_x:.3f}x (width), {scale_y:.3f}x (height)")
-
-    # Scale division polygon
-    if 'division' in scaled_config:
-        scaled_config['division'] = scale_polygon(scaled_config['division'], scale_x, scale_y)
-
-    # Scale tables
-    if 'tables' in scaled_config:
-        for table in scaled_config['tables']:
-            table['polygon'] = scale_polygon(table['polygon'], scale_x, scale_y)
-
-    # Scale sitting areas
-    if 'sitting_areas' in scaled_config:
-        for area in scaled_config['sitting_areas']:
-            area['polygon'] = scale_polygon(area['polygon'], scale_x, scale_y)
-
-    # Scale service areas
-    if 'service_areas' in scaled_config:
-        for area in scaled_config['service_areas']:
-            area['polygon'] = scale_polygon(area['polygon'], scale_x, scale_y)
-
-    # Update frame size to actual
-    scaled_config['frame_size'] = [actual_width, actual_height]
-
-    print(f"✅ Configuration auto-scaled successfully")
-
-    return scaled_config
-
-
-def load_config_from_file():
-    """Load configuration from file"""
-    if not os.path.exists(CONFIG_FILE):
+def load_config_from_file(config_file=CONFIG_FILE):
+    """Load configuration from file (default: the shared config)"""
+    if not os.path.exists(config_file):
         return None
 
     try:
-        with open(CONFIG_FILE, 'r') as f:
+        with open(config_file, 'r') as f:
             config = json.load(f)
 
-        print(f"✅ Loaded configuration from: {os.path.basename(CONFIG_FILE)}")
+        print(f"✅ Loaded configuration from: {os.path.basename(config_file)}")
         print(f"   Division: ✓")
         print(f"   Tables: {len(config.get('tables', []))}")
         print(f"   Sitting Areas: {len(config.get('sitting_areas', []))}")
@@ -998,6 +1339,11 @@ def init_database(db_path):
             config_file TEXT
         )
     ''')
+    cursor.execute("PRAGMA table_info(sessions)")
+    session_columns = [row[1] for row in cursor.fetchall()]
+    for column, column_type in SESSION_COLUMNS.items():
+        if column not in session_columns:
+            cursor.execute(f"ALTER TABLE sessions ADD COLUMN {column} {column_type}")
 
     # Division states table
     cursor.execute('''
@@ -1032,12 +1378,56 @@ def init_database(db_path):
         )
     ''')
 
+    # Camera events (frame quality gate): frozen streams
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS camera_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            camera_id TEXT,
+            event_type TEXT NOT NULL,
+            frame_number INTEGER NOT NULL,
+            end_frame INTEGER,
+            media_seconds REAL,
+            duration_seconds REAL,
+            timestamp REAL NOT NULL,
+            details TEXT,
+            FOREIGN KEY (session_id) REFERENCES sessions(session_id)
+        )
+    ''')
+
+    # Stage profiles: one row per session and stage (stage_profiler.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS session_profiles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            camera_id TEXT,
+            code_version TEXT,
+            backend TEXT,
+            stage TEXT NOT NULL,
+            samples INTEGER NOT NULL,
+            total_ms REAL,
+            mean_ms REAL,
+            p50_ms REAL,
+            p95_ms REAL,
+            p99_ms REAL,
+            max_ms REAL,
+            histogram TEXT,
+            created_at TEXT,
+            FOREIGN KEY (session_id) REFERENCES sessions(session_id)
+        )
+    ''')
+
     # Create indexes for faster queries
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_session_profiles_session ON session_profiles(session_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_session_profiles_camera ON session_profiles(camera_id, stage)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_camera_events_camera ON camera_events(camera_id, event_type)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_division_session ON division_states(session_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_division_frame ON division_states(frame_number)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_table_session ON table_states(session_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_table_frame ON table_states(frame_number)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_table_id ON table_states(table_id)')
+    # Duplicate check lookup (camera_id, video_file) - keeps it O(log n) as history grows
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_camera_video ON sessions(camera_id, video_file)')
 
     conn.commit()
     return conn
@@ -1080,6 +1470,57 @@ def log_division_state_change(conn, session_id, camera_id, frame_number, timesta
     conn.commit()
 
 
+def record_camera_events(conn, session_id, camera_id, quality_gate):
+    """Insert events the gate opened, fill in end/duration of the ones it closed"""
+    for event in quality_gate.pop_events():
+        if 'row_id' not in event:
+            cursor = conn.execute('''
+                INSERT INTO camera_events
+                (session_id, camera_id, event_type, frame_number, media_seconds, timestamp, details)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (session_id, camera_id, event['event_type'], event['frame_number'],
+                  event['media_seconds'], time.time(), json.dumps(event['details'])))
+            event['row_id'] = cursor.lastrowid
+            print(f"   ⚠️  CAMERA FROZEN since frame {event['frame_number']} "
+                  f"({event['media_seconds']:.1f}s into the segment)")
+        if event['end_frame'] is not None:
+            conn.execute('''
+                UPDATE camera_events SET end_frame = ?, duration_seconds = ?, details = ? WHERE id = ?
+            ''', (event['end_frame'], event['duration_seconds'], json.dumps(event['details']), event['row_id']))
+        conn.commit()
+
+
+def record_session_profile(conn, session_id, camera_id, version, backend, profiler):
+    """Replace the session's stage profile rows (a resumed session keeps its last run's profile)"""
+    created_at = datetime.now().isoformat()
+    conn.execute('DELETE FROM session_profiles WHERE session_id = ?', (session_id,))
+    for stage, stats in profiler.summary().items():
+        conn.execute('''
+            INSERT INTO session_profiles
+            (session_id, camera_id, code_version, backend, stage, samples, total_ms, mean_ms,
+             p50_ms, p95_ms, p99_ms, max_ms, histogram, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (session_id, camera_id, version, backend, stage, stats['samples'], stats['total_ms'],
+              stats['mean_ms'], stats['p50_ms'], stats['p95_ms'], stats['p99_ms'], stats['max_ms'],
+              json.dumps(stats['histogram']), created_at))
+    conn.commit()
+
+
+def save_stage_profile(db_path, db_dir, profiler, session_id, camera_id, status, backend=None, **meta):
+    """Stage profile of a finished run: session_profiles rows and a line in <db dir>/profiles/"""
+    version = code_version(SCRIPT_VERSION, SCRIPT_DIR)
+    try:
+        conn = sqlite3.connect(str(db_path), timeout=30)
+        try:
+            record_session_profile(conn, session_id, camera_id, version, backend, profiler)
+        finally:
+            conn.close()
+        profiler.write_jsonl(db_dir / PROFILE_DIR_NAME, session_id=session_id, camera_id=camera_id,
+                             code_version=version, backend=backend, status=status, **meta)
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️  Could not save the stage profile: {e}", file=sys.stderr)
+
+
 def log_table_state_change(conn, session_id, camera_id, frame_number, timestamp, table_id,
                            state, customers, waiters, screenshot_path):
     """Log table state change to database"""
@@ -1094,46 +1535,52 @@ def log_table_state_change(conn, session_id, camera_id, frame_number, timestamp,
     conn.commit()
 
 
-def load_models():
-    """Load detection models"""
-    print("📦 Loading models...")
+def load_models(backend=DEFAULT_BACKEND, threads=None, cascade_model=None, cascade_margin=CASCADE_CONF_MARGIN):
+    """Load detection models
 
-    print(f"   Person detector: {os.path.basename(PERSON_DETECTOR_MODEL)}")
-    person_detector = YOLO(PERSON_DETECTOR_MODEL)
+    backend: pytorch | onnx | openvino | auto (see inference_backends.py)
+    threads: intra-op threads for the ONNX Runtime/OpenVINO backends
+    cascade_model: small detector weights for the cascade (None = full detector only)
+    """
+    print("📦 Loading models...")
 
-    if not os.path.exists(STAFF_CLASSIFIER_MODEL):
+    if backend in ("pytorch", "auto") and not os.path.exists(STAFF_CLASSIFIER_MODEL):
         print(f"❌ Staff classifier not found: {STAFF_CLASSIFIER_MODEL}")
         return None, None
 
-    print(f"   Staff classifier: {os.path.basename(STAFF_CLASSIFIER_MODEL)}")
-    staff_classifier = YOLO(STAFF_CLASSIFIER_MODEL)
+    try:
+        person_detector, staff_classifier = load_inference_models(
+            PERSON_DETECTOR_MODEL, STAFF_CLASSIFIER_MODEL, backend, threads
+        )
+        if cascade_model:
+            small_detector = load_detector(cascade_model, backend, threads)
+            print(f"   Cascade detector: {os.path.basename(cascade_model)} [{small_detector.backend}], "
+                  f"margin {cascade_margin}")
+            person_detector = CascadeDetector(small_detector, person_detector, cascade_margin)
+    except (FileNotFoundError, RuntimeError, ValueError) as e:
+        print(f"❌ Cannot load {backend} backend: {e}")
+        return None, None
 
+    print(f"   Person detector: {os.path.basename(PERSON_DETECTOR_MODEL)} [{person_detector.backend}]")
+    print(f"   Staff classifier: {os.path.basename(STAFF_CLASSIFIER_MODEL)} [{staff_classifier.backend}]")
     print("✅ Models loaded successfully!\n")
     return person_detector, staff_classifier
 
 
 def detect_persons(person_detector, frame):
     """Stage 1: Detect all persons"""
-    results = person_detector(frame, conf=PERSON_CONF_THRESHOLD, classes=[0], verbose=False)
-
     person_detections = []
-    for result in results:
-        boxes = result.boxes
-        if boxes is not None:
-            for box in boxes:
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                confidence = box.conf[0].cpu().numpy()
-
-                width = x2 - x1
-                height = y2 - y1
-                if width >= MIN_PERSON_SIZE and height >= MIN_PERSON_SIZE:
-                    center_x = int((x1 + x2) / 2)
-                    center_y = int((y1 + y2) / 2)
-                    person_detections.append({
-                        'bbox': (int(x1), int(y1), int(x2), int(y2)),
-                        'confidence': float(confidence),
-                        'center': (center_x, center_y)
-                    })
+    for x1, y1, x2, y2, confidence in person_detector.detect(frame, PERSON_CONF_THRESHOLD, classes=[0]):
+        width = x2 - x1
+        height = y2 - y1
+        if width >= MIN_PERSON_SIZE and height >= MIN_PERSON_SIZE:
+            center_x = int((x1 + x2) / 2)
+            center_y = int((y1 + y2) / 2)
+            person_detections.append({
+                'bbox': (int(x1), int(y1), int(x2), int(y2)),
+                'confidence': float(confidence),
+                'center': (center_x, center_y)
+            })
 
     return person_detections
 
@@ -1156,12 +1603,10 @@ def classify_persons(staff_classifier, frame, person_detections):
             })
             continue
 
-        classification_results = staff_classifier(person_crop, verbose=False)
-        result = classification_results[0]
+        top1 = staff_classifier.classify(person_crop)
 
-        if result.probs is not None:
-            class_id = result.probs.top1
-            confidence = float(result.probs.top1conf)
+        if top1 is not None:
+            class_id, confidence = top1
             class_name = CLASS_NAMES[class_id]
 
             if confidence >= STAFF_CONF_THRESHOLD:
@@ -1192,12 +1637,18 @@ def classify_persons(staff_classifier, frame, person_detections):
     return classified_detections
 
 
-def assign_detections_to_rois(division_polygon, tables, sitting_areas, service_areas, detections):
+def assign_detections_to_rois(division_polygon, tables, sitting_areas, service_areas, detections, roi=None):
     """Assign detections to ROIs and calculate area counts
 
+    With a compiled ROI (roi_compiler.py) each center is one label raster lookup
+    with the same priorities; without one, ray casting over the polygons.
+
     Returns:
         (walking_area_waiters, service_area_waiters)
     """
+    if roi is not None:
+        return assign_detections_with_raster(roi, tables, detections)
+
     # Filter to division only
     division_detections = [d for d in detections if point_in_polygon(d['center'], division_polygon)]
 
@@ -1261,11 +1712,53 @@ def assign_detections_to_rois(division_polygon, tables, sitting_areas, service_a
     return walking_area_waiters, service_area_waiters
 
 
+def assign_detections_with_raster(roi, tables, detections):
+    """assign_detections_to_rois() on the compiled label raster (tables in config order)"""
+    for table in tables:
+        table.update_counts(0, 0)
+
+    walking_area_waiters = 0
+    service_area_waiters = 0
+
+    for detection in detections:
+        label = roi.lookup(detection['center'])
+        if label == LABEL_OUTSIDE:
+            continue
+        if label >= LABEL_TABLE:
+            # Table or one of its sitting areas
+            table = tables[label - LABEL_TABLE]
+            if detection['class'] == 'customer':
+                table.customers_present += 1
+            elif detection['class'] == 'waiter':
+                table.waiters_present += 1
+        elif detection['class'] == 'waiter':
+            if label == LABEL_SERVICE:
+                service_area_waiters += 1
+            else:
+                walking_area_waiters += 1
+
+    return walking_area_waiters, service_area_waiters
+
+
 def draw_frame_with_all_info(frame, division_polygon, tables, sitting_areas, service_areas,
-                              detections, division_state, tracker):
-    """Draw complete annotated frame"""
+                              detections, division_state, tracker, roi=None):
+    """Draw complete annotated frame (roi: compiled polygons and division mask, see roi_compiler.py)"""
     annotated = frame.copy()
 
+    # ===== MODIFIED: 2026-10-18 - Polygons and mask from the compiled ROI =====
+    if roi is not None:
+        pts = roi.division
+        table_polygons = roi.table_polygons
+        sitting_polygons = roi.sitting_polygons
+        service_polygons = roi.service_polygons
+        table_bboxes = [[x, y, x + w, y + h] for x, y, w, h in roi.table_bboxes]
+    else:
+        pts = np.array(division_polygon, np.int32)
+        table_polygons = [np.array(table.polygon, np.int32) for table in tables]
+        sitting_polygons = [np.array(sitting.polygon, np.int32) for sitting in sitting_areas]
+        service_polygons = [np.array(service.polygon, np.int32) for service in service_areas]
+        table_bboxes = [table.get_bbox() for table in tables]
+
     # 1. Draw division state overlay (on Service Area + Walking Area)
     division_color = {
         'red': COLORS['division_red'],
@@ -1273,44 +1766,39 @@ def draw_frame_with_all_info(frame, division_polygon, tables, sitting_areas, ser
         'green': COLORS['division_green']
     }.get(division_state, COLORS['division_red'])
 
-    # Create mask for division
-    mask = np.zeros(annotated.shape[:2], dtype=np.uint8)
-    pts = np.array(division_polygon, np.int32)
-    cv2.fillPoly(mask, [pts], 255)
-
-    # Remove table + sitting areas from mask (they have their own colors)
-    for table in tables:
-        table_pts = np.array(table.polygon, np.int32)
-        cv2.fillPoly(mask, [table_pts], 0)
-
-    for sitting in sitting_areas:
-        sitting_pts = np.array(sitting.polygon, np.int32)
-        cv2.fillPoly(mask, [sitting_pts], 0)
+    # Mask for division minus table + sitting areas (they have their own colors)
+    if roi is not None:
+        mask = roi.division_mask
+    else:
+        mask = np.zeros(annotated.shape[:2], dtype=np.uint8)
+        cv2.fillPoly(mask, [pts], 255)
+        for table_pts in table_polygons:
+            cv2.fillPoly(mask, [table_pts], 0)
+        for sitting_pts in sitting_polygons:
+            cv2.fillPoly(mask, [sitting_pts], 0)
 
     # Apply division color to walking + service areas
+    division_pixels = mask == 255
     overlay = annotated.copy()
-    overlay[mask == 255] = division_color
-    annotated[mask == 255] = cv2.addWeighted(
-        overlay[mask == 255], 0.2,
-        annotated[mask == 255], 0.8, 0
+    overlay[division_pixels] = division_color
+    annotated[division_pixels] = cv2.addWeighted(
+        overlay[division_pixels], 0.2,
+        annotated[division_pixels], 0.8, 0
     )
 
     # 2. Draw division boundary
     cv2.polylines(annotated, [pts], True, COLORS['division'], 3)
 
     # 3. Draw service areas
-    for service in service_areas:
-        service_pts = np.array(service.polygon, np.int32)
+    for service_pts in service_polygons:
         cv2.polylines(annotated, [service_pts], True, COLORS['service_area'], 2)
 
     # 4. Draw sitting areas (gray)
-    for sitting in sitting_areas:
-        sitting_pts = np.array(sitting.polygon, np.int32)
+    for sitting_pts in sitting_polygons:
         cv2.polylines(annotated, [sitting_pts], True, COLORS['sitting_area'], 1)
 
     # 5. Draw tables with state colors
-    for table in tables:
-        table_pts = np.array(table.polygon, np.int32)
+    for table, table_pts, bbox in zip(tables, table_polygons, table_bboxes):
         table_color = table.get_state_color()
 
         # Fill
@@ -1322,7 +1810,6 @@ def draw_frame_with_all_info(frame, division_polygon, tables, sitting_areas, ser
         cv2.polylines(annotated, [table_pts], True, table_color, 3)
 
         # Label
-        bbox = table.get_bbox()
         center_x = int((bbox[0] + bbox[2]) / 2)
         center_y = int((bbox[1] + bbox[3]) / 2)
 
@@ -1341,17 +1828,19 @@ def draw_frame_with_all_info(frame, division_polygon, tables, sitting_areas, ser
     # 5.5. Draw Division state label in center
     if division_polygon and len(division_polygon) >= 3:
         # Calculate division center
-        division_pts = np.array(division_polygon, np.int32)
-        M = cv2.moments(division_pts)
-        if M['m00'] != 0:
-            div_center_x = int(M['m10'] / M['m00'])
-            div_center_y = int(M['m01'] / M['m00'])
+        if roi is not None:
+            div_center_x, div_center_y = roi.division_center
         else:
-            # Fallback to bbox center
-            xs = [p[0] for p in division_polygon]
-            ys = [p[1] for p in division_polygon]
-            div_center_x = int((min(xs) + max(xs)) / 2)
-            div_center_y = int((min(ys) + max(ys)) / 2)
+            M = cv2.moments(pts)
+            if M['m00'] != 0:
+                div_center_x = int(M['m10'] / M['m00'])
+                div_center_y = int(M['m01'] / M['m00'])
+            else:
+                # Fallback to bbox center
+                xs = [p[0] for p in division_polygon]
+                ys = [p[1] for p in division_polygon]
+                div_center_x = int((min(xs) + max(xs)) / 2)
+                div_center_y = int((min(ys) + max(ys)) / 2)
 
         # State names mapping
         state_names = {
@@ -1469,17 +1958,212 @@ def draw_frame_with_all_info(frame, division_polygon, tables, sitting_areas, ser
     return annotated
 
 
-def process_video(video_path, person_detector, staff_classifier, config, output_dir=None, duration_limit=None, target_fps=5):
+def reencode_h264(output_file):
+    """Re-encode the OpenCV mp4v output to H.264 in place (keeps the mp4v file on failure)"""
+    # ===== MODIFIED: 2025-12-09 - Re-encode video with H.264 for smaller file size =====
+    # OpenCV mp4v creates large files (~75MB/60s), H.264 reduces to ~15MB/60s
+    temp_output = output_file + ".temp.mp4"
+    os.rename(output_file, temp_output)
+
+    ffmpeg_cmd = [
+        'ffmpeg', '-y', '-i', temp_output,
+        '-c:v', 'libx264',      # H.264 codec
+        '-preset', 'fast',       # Fast encoding, good compression
+        '-crf', '23',            # Quality (18-28, lower=better, 23=default)
+        '-c:a', 'copy',          # Copy audio if present
+        '-movflags', '+faststart',  # Web-friendly
+        output_file
+    ]
+
+    try:
+        import subprocess
+        result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True, timeout=300)
+        if result.returncode == 0:
+            # Success - remove temp file
+            os.unlink(temp_output)
+            print(f"🎬 Video re-encoded to H.264 (smaller file size)")
+        else:
+            # Failed - keep original mp4v file
+            os.rename(temp_output, output_file)
+            print(f"⚠️ H.264 re-encoding failed, keeping MPEG4 output", file=sys.stderr)
+    except Exception as e:
+        # Error - keep original mp4v file
+        if os.path.exists(temp_output):
+            os.rename(temp_output, output_file)
+        print(f"⚠️ H.264 re-encoding error: {e}", file=sys.stderr)
+    # ==================================================================================
+
+
+def seek_to_seconds(cap, seconds):
+    """Position the capture at `seconds` (a keyframe time: demuxer seek, no decode of skipped frames)"""
+    cap.set(cv2.CAP_PROP_POS_MSEC, seconds * 1000.0)
+
+
+def iter_frames(cap, start_frame, end_frame, frame_interval, tracker, skip_before=None, sampler=None):
+    """Yield (frame_idx, frame) for every frame_interval-th frame in [start_frame, end_frame)
+
+    frame_idx is absolute within the segment, so the sampling grid is the same
+    whether the segment is processed whole or in keyframe-aligned chunks.
+    Frames before skip_before (resume: keyframe -> checkpoint) are decoded only.
+    With an AdaptiveSampler the next frame is sampler.next_frame instead, set by
+    the caller after each processed frame.
+    """
+    frame_idx = start_frame
+    while frame_idx < end_frame:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if skip_before is not None and frame_idx < skip_before:
+            frame_idx += 1
+            continue
+        tracker.increment_total_frames()
+        if frame_idx >= sampler.next_frame if sampler is not None else frame_idx % frame_interval == 0:
+            yield frame_idx, frame
+        frame_idx += 1
+
+
+def iter_keyframes(cap, keyframes, tracker):
+    """Yield (frame_idx, frame) for each keyframe: one seek + one decode per keyframe"""
+    for keyframe in keyframes:
+        seek_to_seconds(cap, keyframe['time'])
+        ret, frame = cap.read()
+        if not ret:
+            break
+        tracker.increment_total_frames()
+        yield keyframe['frame'], frame
+
+
+# ===== Checkpoint / resume helpers (Modified: 2026-10-18) =====
+
+def output_part_path(output_file, index):
+    """Annotated video part: <output>.part000.mp4, .part001.mp4, ..."""
+    return Path(output_file).with_suffix(f".part{index:03d}.mp4")
+
+
+def open_output_part(output_file, index, writer_fps, width, height):
+    """Start the next annotated video part (MPEG-4 Part 2, re-encoded at the end)"""
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    return cv2.VideoWriter(str(output_part_path(output_file, index)), fourcc, writer_fps, (width, height))
+
+
+def capture_checkpoint(tables, division_tracker, tracker, output_parts, now=None):
+    """Debounce state and counters needed to continue after the checkpoint frame
+
+    Pending debounce timers are stored as ages (now = media time of the
+    checkpoint frame), so they carry over to the resumed run unchanged.
+    """
+    now = time.time() if now is None else now
+
+    def pending_age(start):
+        return None if start is None else now - start
+
+    return {
+        'tables': {
+            table.id: {
+                'state': table.state.value,
+                'pending_state': table.pending_state.value if table.pending_state else None,
+                'pending_age': pending_age(table.pending_state_start),
+                'customers': table.customers_present,
+                'waiters': table.waiters_present,
+            } for table in tables
+        },
+        'division': {
+            'state': division_tracker.current_state,
+            'pending_state': division_tracker.pending_state,
+            'pending_age': pending_age(division_tracker.pending_state_start),
+        },
+        'total_frames': tracker.total_frames,
+        'output_parts': list(output_parts),
+    }
+
+
+def restore_checkpoint(state, tables, division_tracker, tracker, now=None):
+    """Inverse of capture_checkpoint(); tables missing from the checkpoint keep their defaults"""
+    now = time.time() if now is None else now
+
+    def pending_start(age):
+        return None if age is None else now - age
+
+    for table in tables:
+        saved = state['tables'].get(table.id)
+        if saved is None:
+            continue
+        table.state = TableState(saved['state'])
+        table.pending_state = TableState(saved['pending_state']) if saved['pending_state'] else None
+        table.pending_state_start = pending_start(saved['pending_age'])
+        table.customers_present = saved['customers']
+        table.waiters_present = saved['waiters']
+
+    division_tracker.current_state = state['division']['state']
+    division_tracker.pending_state = state['division']['pending_state']
+    division_tracker.pending_state_start = pending_start(state['division']['pending_age'])
+    tracker.total_frames = state['total_frames']
+
+
+def save_checkpoint(conn, session_id, frame_idx, state):
+    """Persist the checkpoint (results up to frame_idx are already committed)"""
+    conn.execute('''
+        UPDATE sessions SET checkpoint_frame = ?, checkpoint_state = ?, checkpoint_at = ?
+        WHERE session_id = ?
+    ''', (frame_idx, json.dumps(state), datetime.now().isoformat(), session_id))
+    conn.commit()
+
+
+def join_output_parts(output_file, parts):
+    """Join annotated video parts into output_file (stream copy); True on success"""
+    parts = [Path(part) for part in parts]
+    if len(parts) == 1:
+        os.replace(parts[0], output_file)
+        return True
+
+    list_file = Path(output_file).with_suffix(".parts.txt")
+    list_file.write_text("".join(f"file '{part.resolve()}'\n" for part in parts))
+    ffmpeg_cmd = ['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', str(list_file), '-c', 'copy', output_file]
+    try:
+        import subprocess
+        result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True, timeout=300)
+        joined = result.returncode == 0
+    except Exception as e:
+        print(f"⚠️ Joining video parts failed: {e}", file=sys.stderr)
+        joined = False
+    list_file.unlink(missing_ok=True)
+
+    if joined:
+        for part in parts:
+            part.unlink(missing_ok=True)
+    else:
+        print(f"⚠️ Could not join {len(parts)} video parts, kept as {parts[0].name} ...", file=sys.stderr)
+    return joined
+# ===============================================================
+
+
+def process_video(video_path, person_detector, staff_classifier, config, output_dir=None, duration_limit=None, target_fps=5,
+                  start_seconds=None, end_seconds=None, keyframes_only=False, headless=False,
+                  db_path=None, adaptive_fps=False, min_fps=None, max_fps=None,
+                  quality_gate=None, quality_thresholds=None, config_file=CONFIG_FILE):
     """Process video with table and division state detection
 
     Args:
         video_path: Path to input video
-        person_detector: YOLO person detection model
-        staff_classifier: YOLO staff classification model
+        person_detector: Person detector (inference_backends.py, any backend)
+        staff_classifier: Staff classifier (inference_backends.py, any backend)
         config: ROI configuration dictionary
         output_dir: Output directory for results
         duration_limit: Process only first N seconds (None = full video)
         target_fps: Target processing FPS (default: 5). Process at this rate instead of every frame.
+        start_seconds: Start at the keyframe at or before this time (None = from the beginning)
+        end_seconds: Stop at this time (None = end of video)
+        keyframes_only: Decode only keyframes (fast preview, ignores target_fps)
+        headless: No annotated output video (database + screenshots only)
+        db_path: Database file (None = PROJECT_ROOT/db/detection_data.db)
+        adaptive_fps: Event-adaptive sampling between min_fps and max_fps
+        min_fps: Base rate (None = cameras_config.json "adaptive_fps" min, else ADAPTIVE_MIN_FPS)
+        max_fps: Peak rate (None = cameras_config.json "adaptive_fps" max, else target_fps)
+        quality_gate: Skip dark/blurred/repeated frames before detection (frame_quality.py);
+            None = cameras_config.json "frame_quality" "enabled" (default off)
+        quality_thresholds: {"min_luma", "min_sharpness", "frozen_seconds"} overrides
+            (None values fall back to cameras_config.json "frame_quality", then the defaults)
+        config_file: File the config was loaded from (sessions.config_file, ROI cache name)
     """
     if output_dir is None:
         output_dir = str(SCRIPT_DIR.parent / "test-results")
@@ -1505,22 +2189,79 @@ def process_video(video_path, person_detector, staff_classifier, config, output_
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     duration = frame_count / fps if fps > 0 else 0
 
-    # Auto-scale configuration to match actual video resolution
-    config = auto_scale_config(config, width, height)
+    # ===== MODIFIED: 2026-10-18 - Compiled ROI (scaled + rasterized once per config and resolution) =====
+    roi = compile_roi(config, width, height, Path(config_file).stem)
 
     # Reconstruct objects with scaled configuration
-    division_polygon, tables, sitting_areas, service_areas = reconstruct_objects_from_config(config)
+    division_polygon, tables, sitting_areas, service_areas = reconstruct_objects_from_config(roi.config)
 
     print(f"ROIs: Division=1 Tables={len(tables)} Sitting={len(sitting_areas)} Service={len(service_areas)}\n")
 
-    max_frames = frame_count
+    # Cascade: people near an ROI edge go to the full model
+    cascade = person_detector if isinstance(person_detector, CascadeDetector) else None
+    if cascade is not None:
+        cascade.boundary_check = roi_boundary_check(division_polygon, tables, sitting_areas, service_areas)
+
+    # ===== MODIFIED: 2026-10-18 - Keyframe seeking via the segment's index sidecar =====
+    ranged = start_seconds is not None or end_seconds is not None
+    keyframe_index = None
+    if ranged or keyframes_only:
+        try:
+            keyframe_index = load_or_build_index(video_path)
+        except Exception as e:
+            print(f"⚠️  Keyframe index unavailable ({e}), decoding sequentially", file=sys.stderr)
+    has_keyframes = bool(keyframe_index and keyframe_index['keyframes'])
+
+    start_time_s, start_frame = 0.0, 0
+    if start_seconds:
+        if has_keyframes:
+            keyframe = keyframe_at(keyframe_index, start_seconds)
+            start_time_s, start_frame = keyframe['time'], keyframe['frame']
+        else:
+            start_time_s, start_frame = start_seconds, int(start_seconds * fps)
+
+    end_frame = frame_count
+    if end_seconds is not None:
+        end_frame = min(end_frame, int(end_seconds * fps))
     if duration_limit is not None:
-        max_frames = int(duration_limit * fps)
+        end_frame = min(end_frame, start_frame + int(duration_limit * fps))
+    max_frames = max(end_frame - start_frame, 0)
+
+    preview_keyframes = None
+    if keyframes_only:
+        if has_keyframes:
+            preview_keyframes = keyframes_between(keyframe_index, start_time_s, end_frame / fps if fps > 0 else None)
+        else:
+            print("⚠️  No keyframe index for this video, --keyframes-only falls back to --fps sampling", file=sys.stderr)
+    # ====================================================================================
 
     # ===== MODIFIED: Calculate frame skip interval =====
     # Example: Video is 20 FPS, target is 5 FPS -> process every 4th frame (interval=4)
     frame_interval = max(1, int(round(fps / target_fps))) if target_fps > 0 else 1
-    expected_processed = max_frames // frame_interval
+    media_fps = fps if fps > 0 else target_fps   # Debounce clock: frame number / media_fps
+
+    sampler = None
+    if adaptive_fps and preview_keyframes is None:
+        config_min, config_max = load_adaptive_fps_bounds(camera_id)
+        max_fps = max_fps or config_max or target_fps
+        min_fps = min(min_fps or config_min or ADAPTIVE_MIN_FPS, max_fps)
+        sampler = AdaptiveSampler(media_fps, min_fps, max_fps)
+        frame_interval = sampler.fast_interval
+
+    gate = None
+    settings = load_camera_settings(camera_id, 'frame_quality')
+    if quality_gate is None:
+        quality_gate = bool(settings.get('enabled', False))
+    if quality_gate:
+        overrides = {k: v for k, v in (quality_thresholds or {}).items() if v is not None}
+        settings = {**settings, **overrides}
+        gate = FrameQualityGate(settings.get('min_luma', DEFAULT_MIN_LUMA),
+                                settings.get('min_sharpness', DEFAULT_MIN_SHARPNESS),
+                                settings.get('frozen_seconds', DEFAULT_FROZEN_SECONDS))
+
+    expected_processed = max_frames // frame_interval   # Upper bound under --adaptive-fps
+    if preview_keyframes is not None:
+        expected_processed = len(preview_keyframes)
     # ===================================================
 
     print(f"Video Properties:")
@@ -1528,14 +2269,23 @@ def process_video(video_path, person_detector, staff_classifier, config, output_
     print(f"   FPS: {fps:.2f}")
     print(f"   Frames: {frame_count}")
     print(f"   Duration: {duration:.2f}s")
-    if duration_limit:
-        print(f"   Processing: {max_frames} frames ({duration_limit}s)")
+    if duration_limit or ranged:
+        print(f"   Processing: {max_frames} frames (frames {start_frame}-{end_frame}, from {start_time_s:.2f}s)")
     # ===== MODIFIED: Show processing configuration =====
     print(f"\nProcessing Configuration:")
-    print(f"   Target FPS: {target_fps}")
-    print(f"   Frame interval: {frame_interval} (process 1 in {frame_interval} frames)")
+    if preview_keyframes is not None:
+        print(f"   Keyframes only: {len(preview_keyframes)} keyframes (one decode each)")
+    elif sampler is not None:
+        print(f"   Adaptive FPS: {sampler.video_fps / sampler.slow_interval:g}-{sampler.video_fps / sampler.fast_interval:g} "
+              f"(interval {sampler.slow_interval}-{sampler.fast_interval} frames, hold {ADAPTIVE_HOLD_SECONDS:g}s)")
+    else:
+        print(f"   Target FPS: {target_fps}")
+        print(f"   Frame interval: {frame_interval} (process 1 in {frame_interval} frames)")
+        print(f"   Speedup: ~{frame_interval}x faster")
+    if gate is not None:
+        print(f"   Quality gate: luma >= {gate.min_luma:g}, sharpness >= {gate.min_sharpness:g}, "
+              f"frozen after {gate.frozen_seconds:g}s of repeats")
     print(f"   Expected processed: ~{expected_processed} frames")
-    print(f"   Speedup: ~{frame_interval}x faster")
     # ====================================================
     print()
 
@@ -1550,10 +2300,10 @@ def process_video(video_path, person_detector, staff_classifier, config, output_
     # This must happen BEFORE VideoWriter creation to prevent 258-byte empty files
     # db/ is at production/RTX_3060/db (same level as results/)
     # Calculate db path using PROJECT_ROOT constant (set at module level)
-    db_dir = PROJECT_ROOT / "db"
+    db_dir = Path(db_path).resolve().parent if db_path else PROJECT_ROOT / "db"
 
     # Validate the calculated path makes sense
-    if not db_dir.exists() or db_dir.name != "db":
+    if not db_path and (not db_dir.exists() or db_dir.name != "db"):
         # Fallback: Try one more level up if PROJECT_ROOT calculation failed
         db_dir = SCRIPT_DIR.parent.parent.parent.parent / "db"
 
@@ -1571,31 +2321,80 @@ def process_video(video_path, person_detector, staff_classifier, config, output_
         cap.release()
         return False
 
-    db_path = db_dir / "detection_data.db"
+    db_path = Path(db_path).resolve() if db_path else db_dir / "detection_data.db"
     conn = init_database(str(db_path))
 
     # Check if video already processed (BEFORE creating output file)
+    # Range and preview runs are their own sessions: "<name>#t=START,END" (media fragment)
     video_filename = os.path.basename(video_path)
+    run_suffix = ""
+    if ranged:
+        end_label = f",{end_seconds:g}" if end_seconds is not None else ""
+        video_filename += f"#t={start_time_s:g}{end_label}"
+        run_suffix += f"_t{start_time_s:g}-{end_seconds:g}" if end_seconds is not None else f"_t{start_time_s:g}-"
+    if preview_keyframes is not None:
+        video_filename += "#keyframes"
+        run_suffix += "_kf"
     cursor = conn.cursor()
     cursor.execute('''
-        SELECT session_id, start_time FROM sessions
+        SELECT session_id, start_time, end_time, processing_status,
+               checkpoint_frame, checkpoint_state, checkpoint_at
+        FROM sessions
         WHERE camera_id = ? AND video_file = ?
     ''', (camera_id, video_filename))
     existing = cursor.fetchone()
 
+    # ===== MODIFIED: 2026-10-18 - Resume interrupted sessions instead of skipping them =====
+    # complete (or legacy row with end_time)   -> skip, exit 2
+    # running with a recent checkpoint         -> another process has it, exit 3
+    # running but silent, or failed            -> resume after the last checkpoint
+    resume = None
     if existing:
-        # Use stderr for warnings so orchestrator can capture them
-        print(f"\n⚠️  WARNING: This video has already been processed!", file=sys.stderr)
-        print(f"   Video: {video_filename}", file=sys.stderr)
-        print(f"   Camera: {camera_id}", file=sys.stderr)
-        print(f"   Previous session: {existing[0]}", file=sys.stderr)
-        print(f"   Previous time: {existing[1]}", file=sys.stderr)
-        print(f"\n❌ Skipping to avoid duplicate data in database", file=sys.stderr)
-        print(f"   Delete the previous session first if you want to reprocess.\n", file=sys.stderr)
-        cap.release()
-        conn.close()
-        # Exit with code 2 to indicate "skipped" (not an error)
-        sys.exit(2)
+        prev_session, prev_start, prev_end, prev_status, ckpt_frame, ckpt_state, ckpt_at = existing
+        finished = prev_status == SESSION_COMPLETE or (
+            prev_status not in (SESSION_RUNNING, SESSION_FAILED) and prev_end is not None)
+
+        if finished:
+            # Use stderr for warnings so orchestrator can capture them
+            print(f"\n⚠️  WARNING: This video has already been processed!", file=sys.stderr)
+            print(f"   Video: {video_filename}", file=sys.stderr)
+            print(f"   Camera: {camera_id}", file=sys.stderr)
+            print(f"   Previous session: {prev_session}", file=sys.stderr)
+            print(f"   Previous time: {prev_start}", file=sys.stderr)
+            print(f"\n❌ Skipping to avoid duplicate data in database", file=sys.stderr)
+            print(f"   Delete the previous session first if you want to reprocess.\n", file=sys.stderr)
+            cap.release()
+            conn.close()
+            # Exit with code 2 to indicate "skipped" (not an error)
+            sys.exit(2)
+
+        if prev_status == SESSION_RUNNING and ckpt_at and \
+                (datetime.now() - datetime.fromisoformat(ckpt_at)).total_seconds() < CHECKPOINT_STALE_SECONDS:
+            print(f"\n⚠️  Session {prev_session} is being processed by another process "
+                  f"(last checkpoint {ckpt_at})", file=sys.stderr)
+            cap.release()
+            conn.close()
+            sys.exit(EXIT_IN_PROGRESS)
+
+        # Takeover is compare-and-set on the checkpoint read above: two processes that
+        # both judged the session stale race here, and only one UPDATE matches
+        cursor.execute('''
+            UPDATE sessions SET processing_status = ?, checkpoint_at = ?, end_time = NULL, error_message = NULL
+            WHERE session_id = ? AND checkpoint_at IS ?
+        ''', (SESSION_RUNNING, datetime.now().isoformat(), prev_session, ckpt_at))
+        if cursor.rowcount != 1:
+            conn.rollback()
+            print(f"\n⚠️  Session {prev_session} was taken over by another process", file=sys.stderr)
+            cap.release()
+            conn.close()
+            sys.exit(EXIT_IN_PROGRESS)
+        conn.commit()
+
+        resume = {
+            'session_id': prev_session,
+            'frame': ckpt_frame if ckpt_state else None,
+            'state': json.loads(ckpt_state) if ckpt_state else None,
+        }
     # =====================================================================
 
     # Setup output: results/YYYYMMDD/camera_id/ (symmetric to videos structure)
@@ -1603,25 +2402,42 @@ def process_video(video_path, person_detector, staff_classifier, config, output_
     output_path.mkdir(parents=True, exist_ok=True)
 
     script_name = Path(__file__).stem
-    output_filename = f"{script_name}_{Path(video_path).stem}.mp4"
+    output_filename = f"{script_name}_{Path(video_path).stem}{run_suffix}.mp4"
     output_file = str(output_path / output_filename)
 
     # Modified: 2025-11-19 - Fixed H.264 encoder unavailability
     # Changed from 'avc1' (H.264) to 'mp4v' (MPEG-4 Part 2)
     # Reason: OpenCV FFmpeg build missing H.264 encoder (codec_id=27)
     # MPEG-4 provides good compression (better than MJPEG) and universal compatibility
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # MPEG-4 Part 2 codec
-    out = cv2.VideoWriter(output_file, fourcc, fps, (width, height))
+    # Modified: 2026-10-18 - Written in parts (output_part_path) closed at every checkpoint;
+    # parts finished before the resumed checkpoint are kept, later ones are redone
+    resume_state = resume['state'] if resume else None
+    output_parts = [] if headless or resume_state is None else [
+        part for part in resume_state['output_parts'] if (output_path / part).exists()
+    ]
+    for stale_part in output_path.glob(f"{Path(output_file).stem}.part*.mp4"):
+        if stale_part.name not in output_parts:
+            stale_part.unlink()
+    part_frames = 0
+
+    out = None
+    # Keyframe previews are written at 1 fps (roughly one frame per GOP)
+    writer_fps = 1.0 if preview_keyframes is not None else fps
+    if headless:
+        print("🕶️  Headless: no annotated output video")
+    else:
+        out = open_output_part(output_file, len(output_parts), writer_fps, width, height)
 
-    if not out.isOpened():
-        print(f"❌ Could not create output: {output_file}", file=sys.stderr)
-        cap.release()
-        conn.close()
-        return False
+        if not out.isOpened():
+            print(f"❌ Could not create output: {output_file}", file=sys.stderr)
+            cap.release()
+            conn.close()
+            return False
 
     # Initialize trackers
     tracker = PerformanceTracker(window_size=30)
     division_tracker = DivisionStateTracker()
+    profiler = StageProfiler()
 
     # Modified 2025-12-10: Fix session_id concurrency conflict
     # Include video filename timestamp for uniqueness across parallel workers
@@ -1629,247 +2445,423 @@ def process_video(video_path, person_detector, staff_classifier, config, output_
     import re
     video_ts_match = re.search(r'(\d{8}_\d{6})', video_filename)
     video_ts = video_ts_match.group(1) if video_ts_match else datetime.now().strftime("%Y%m%d_%H%M%S")
-    session_id = f"{video_ts}_{camera_id}"  # e.g., 20251209_180441_camera_35
-
-    cursor.execute('''
-        INSERT INTO sessions
-        (session_id, camera_id, video_file, start_time, fps, resolution, config_file)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (session_id, camera_id, video_filename,
-          datetime.now().isoformat(), fps, f"{width}x{height}", CONFIG_FILE))
+    session_id = f"{video_ts}_{camera_id}{run_suffix}"  # e.g., 20251209_180441_camera_35
+
+    if resume:
+        # Results logged after the checkpoint are recomputed (all of them without one)
+        session_id = resume['session_id']
+        checkpoint_frame = resume['frame'] if resume['frame'] is not None else -1
+        for table_name in ('table_states', 'division_states', 'camera_events'):
+            cursor.execute(f'DELETE FROM {table_name} WHERE session_id = ? AND frame_number > ?',
+                           (session_id, checkpoint_frame))
+        cursor.execute('''
+            UPDATE sessions SET config_file = ?, config_hash = ? WHERE session_id = ?
+        ''', (str(config_file), roi.config_hash, session_id))
+        if resume_state is not None:
+            print(f"♻️  Resuming session {session_id} from frame {checkpoint_frame + 1}")
+        else:
+            print(f"♻️  Restarting session {session_id} (interrupted before its first checkpoint)")
+    else:
+        cursor.execute('''
+            INSERT INTO sessions
+            (session_id, camera_id, video_file, start_time, fps, resolution, config_file, config_hash,
+             processing_status, checkpoint_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (session_id, camera_id, video_filename,
+              datetime.now().isoformat(), fps, f"{width}x{height}", str(config_file), roi.config_hash,
+              SESSION_RUNNING, datetime.now().isoformat()))
     conn.commit()
 
     # Create screenshots directory (organized by camera)
     screenshot_dir = db_dir / "screenshots"
     screenshot_dir.mkdir(parents=True, exist_ok=True)
 
-    # ===== FIRST-FRAME DUPLICATION FOR DEBOUNCE BUFFER =====
-    # Process first frame multiple times to fill debounce buffer
-    print("\n" + "="*70)
-    print("First-Frame Preprocessing (v3.1.0)")
-    print("="*70)
-    print("📌 Processing first frame multiple times to fill debounce buffer...")
-
-    # Read first frame ONCE
-    ret, first_frame = cap.read()
-    if not ret:
-        print("❌ Could not read first frame")
-        cap.release()
-        out.release()
-        conn.close()
-        return False
-
-    # Reset to beginning for normal processing
-    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    emit_progress("preprocessing", session_id=session_id, resumed=resume_state is not None)
+
+    # ===== MODIFIED: 2026-10-18 - Resume restores the checkpoint instead of first-frame preprocessing =====
+    read_from, skip_before = start_frame, None
+    if resume_state is not None:
+        restore_checkpoint(resume_state, tables, division_tracker, tracker, now=checkpoint_frame / media_fps)
+        skip_before = checkpoint_frame + 1
+
+        # Seek to the keyframe at or before the first unprocessed frame, decode the rest
+        seek_time = start_time_s
+        if keyframe_index is None:
+            try:
+                keyframe_index = load_or_build_index(video_path)
+            except Exception as e:
+                print(f"⚠️  Keyframe index unavailable ({e}), decoding up to the checkpoint", file=sys.stderr)
+        if keyframe_index and keyframe_index['keyframes'] and fps > 0:
+            keyframe = keyframe_at(keyframe_index, skip_before / fps)
+            if keyframe['frame'] > start_frame:
+                read_from, seek_time = keyframe['frame'], keyframe['time']
+        if read_from:
+            seek_to_seconds(cap, seek_time)
+        if preview_keyframes is not None:
+            preview_keyframes = [kf for kf in preview_keyframes if kf['frame'] >= skip_before]
+
+        print(f"\n   Restored states at checkpoint frame {checkpoint_frame} (reading from frame {read_from}):")
+        for table in tables:
+            print(f"   {table.id}: {table.state.value} (C:{table.customers_present} W:{table.waiters_present})")
+        print(f"   DIVISION: {division_tracker.current_state.upper()}\n")
+    else:
+        # ===== FIRST-FRAME DUPLICATION FOR DEBOUNCE BUFFER =====
+        # Process first frame multiple times to fill debounce buffer
+        print("\n" + "="*70)
+        print("First-Frame Preprocessing (v3.1.0)")
+        print("="*70)
+        print("📌 Processing first frame multiple times to fill debounce buffer...")
+
+        # Read first frame ONCE (at the start keyframe for range runs)
+        if start_frame:
+            seek_to_seconds(cap, start_time_s)
+        ret, first_frame = cap.read()
+        if not ret:
+            print("❌ Could not read first frame")
+            cap.release()
+            if out is not None:
+                out.release()
+                output_part_path(output_file, len(output_parts)).unlink(missing_ok=True)
+            conn.execute('UPDATE sessions SET processing_status = ?, error_message = ? WHERE session_id = ?',
+                         (SESSION_FAILED, "could not read first frame", session_id))
+            conn.commit()
+            conn.close()
+            return False
+
+        # Reset to the start (beginning of video or start keyframe) for normal processing
+        if start_frame:
+            seek_to_seconds(cap, start_time_s)
+        else:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
 
-    # Calculate frames needed based on ACTUAL FPS (flexible!)
-    frames_for_debounce = int(target_fps * STATE_DEBOUNCE_SECONDS)
-    time_step = 1.0 / target_fps
+        # Calculate frames needed based on ACTUAL FPS (flexible!)
+        frames_for_debounce = int(target_fps * STATE_DEBOUNCE_SECONDS)
+        time_step = 1.0 / target_fps
 
-    print(f"   Target FPS: {target_fps}")
-    print(f"   Debounce period: {STATE_DEBOUNCE_SECONDS}s")
-    print(f"   Frames to process: {frames_for_debounce}")
-    print(f"   Time step: {time_step:.3f}s per frame")
+        print(f"   Target FPS: {target_fps}")
+        print(f"   Debounce period: {STATE_DEBOUNCE_SECONDS}s")
+        print(f"   Frames to process: {frames_for_debounce}")
+        print(f"   Time step: {time_step:.3f}s per frame")
 
-    # Process first frame multiple times
-    initial_time = time.time()
+        # Process first frame multiple times, in the media second before the first
+        # frame, so the first processed frame completes the debounce
+        initial_time = start_frame / media_fps - STATE_DEBOUNCE_SECONDS
 
-    for i in range(frames_for_debounce):
-        # Simulated time for this iteration
-        simulated_time = initial_time + (i * time_step)
+        for i in range(frames_for_debounce):
+            # Simulated (media) time for this iteration
+            simulated_time = initial_time + (i * time_step)
 
-        # Run full detection pipeline on SAME frame
-        person_detections = detect_persons(person_detector, first_frame)
-        classified_detections = classify_persons(staff_classifier, first_frame, person_detections)
+            # Run full detection pipeline on SAME frame (full model, also under --cascade)
+            person_detections = detect_persons(cascade.large if cascade else person_detector, first_frame)
+            classified_detections = classify_persons(staff_classifier, first_frame, person_detections)
 
-        # Assign to ROIs
-        walking_waiters, service_waiters = assign_detections_to_rois(
-            division_polygon, tables, sitting_areas, service_areas, classified_detections
-        )
+            # Assign to ROIs
+            walking_waiters, service_waiters = assign_detections_to_rois(
+                division_polygon, tables, sitting_areas, service_areas, classified_detections, roi
+            )
 
-        # Update states through debounce (NOT direct assignment!)
+            # Update states through debounce (NOT direct assignment!)
+            for table in tables:
+                table.update_state(simulated_time)
+
+            division_tracker.update_state(walking_waiters, service_waiters, simulated_time)
+
+            # Log first iteration only
+            if i == 0:
+                waiters = sum(1 for d in classified_detections if d['class'] == 'waiter')
+                customers = sum(1 for d in classified_detections if d['class'] == 'customer')
+                unknown = sum(1 for d in classified_detections if d['class'] == 'unknown')
+                print(f"\n   Initial detections (frame {start_frame}):")
+                print(f"   ✓ Persons: {len(person_detections)} (Waiters: {waiters}, Customers: {customers}, Unknown: {unknown})")
+                print(f"   ✓ Walking area waiters: {walking_waiters}")
+                print(f"   ✓ Service area waiters: {service_waiters}")
+
+        # After loop, states are established through proper debounce
+        print(f"\n   ✅ Processed first frame {frames_for_debounce} times")
+        print(f"   ✅ Debounce buffer filled ({STATE_DEBOUNCE_SECONDS}s @ {target_fps} FPS)")
+        print("\n   Final initial states:")
         for table in tables:
-            table.update_state(simulated_time)
-
-        division_tracker.update_state(walking_waiters, service_waiters, simulated_time)
-
-        # Log first iteration only
-        if i == 0:
-            waiters = sum(1 for d in classified_detections if d['class'] == 'waiter')
-            customers = sum(1 for d in classified_detections if d['class'] == 'customer')
-            unknown = sum(1 for d in classified_detections if d['class'] == 'unknown')
-            print(f"\n   Initial detections (frame 0):")
-            print(f"   ✓ Persons: {len(person_detections)} (Waiters: {waiters}, Customers: {customers}, Unknown: {unknown})")
-            print(f"   ✓ Walking area waiters: {walking_waiters}")
-            print(f"   ✓ Service area waiters: {service_waiters}")
-
-    # After loop, states are established through proper debounce
-    print(f"\n   ✅ Processed first frame {frames_for_debounce} times")
-    print(f"   ✅ Debounce buffer filled ({STATE_DEBOUNCE_SECONDS}s @ {target_fps} FPS)")
-    print("\n   Final initial states:")
-    for table in tables:
-        print(f"   {table.id}: {table.state.value} (C:{table.customers_present} W:{table.waiters_present})")
-    print(f"   DIVISION: {division_tracker.current_state.upper()} (Walking:{walking_waiters} Service:{service_waiters})")
-    print("="*70 + "\n")
-    # ======================================================
+            print(f"   {table.id}: {table.state.value} (C:{table.customers_present} W:{table.waiters_present})")
+        print(f"   DIVISION: {division_tracker.current_state.upper()} (Walking:{walking_waiters} Service:{service_waiters})")
+        print("="*70 + "\n")
+        # ======================================================
 
     # Process frames
-    frame_idx = 0
+    run_start_frames = tracker.total_frames   # Restored count on resume; rates cover this run only
+    last_classified = []                      # Drawn again on repeated frames (quality gate)
+    if preview_keyframes is not None:
+        frames = iter_keyframes(cap, preview_keyframes, tracker)
+    else:
+        frames = iter_frames(cap, read_from, end_frame, frame_interval, tracker, skip_before, sampler)
+    frames = profiler.timed(frames, "decode")
 
     print("🔄 Processing frames...")
     print(f"   Debounce: {STATE_DEBOUNCE_SECONDS}s for all state changes")
     print(f"   Table colors: GREEN=IDLE | YELLOW=BUSY | BLUE=CLEANING")
     print(f"   Division colors: RED=Understaffed | YELLOW=Busy | GREEN=Serving\n")
 
-    try:
-        while True:
-            ret, frame = cap.read()
-            if not ret or frame_idx >= max_frames:
-                break
-
-            # ===== MODIFIED: Increment total frames (including skipped) =====
-            tracker.increment_total_frames()
-            # ================================================================
-
-            # ===== MODIFIED: Smart frame skipping =====
-            # Skip frames if not at the interval (e.g., skip frames 1,2,3 but process frame 0,4,8,12...)
-            if frame_idx % frame_interval != 0:
-                frame_idx += 1
-                continue
-            # ==========================================
+    # Session outcome: stays failed unless the frame loop runs to the end
+    run_status = SESSION_FAILED
+    error_message = None
+    last_frame_idx = checkpoint_frame if resume_state is not None else None
+    last_checkpoint = time.time()
+    last_progress = 0.0
 
+    try:
+        # ===== MODIFIED: 2026-10-18 - Frame source generator =====
+        # iter_frames(): sequential decode from the start keyframe, counts every frame
+        # read (tracker.increment_total_frames) and yields every frame_interval-th
+        # (frames 0,4,8,12... for interval 4); iter_keyframes(): keyframes only
+        # ==========================================================
+        for frame_idx, frame in frames:
             frame_start = time.time()
-            current_time = time.time()
-
-            # Stage 1: Detect persons
-            stage1_start = time.time()
-            person_detections = detect_persons(person_detector, frame)
-            stage1_time = time.time() - stage1_start
-
-            # Stage 2: Classify persons
-            stage2_start = time.time()
-            classified_detections = classify_persons(staff_classifier, frame, person_detections)
-            stage2_time = time.time() - stage2_start
-
-            # Assign to ROIs
-            walking_waiters, service_waiters = assign_detections_to_rois(
-                division_polygon, tables, sitting_areas, service_areas, classified_detections
-            )
+            current_time = time.time()              # Wall clock, logged with state changes
+            media_time = frame_idx / media_fps      # Debounce clock
+            lap = frame_lap = profiler.now()        # Stage profile (stage_profiler.py)
+
+            # ===== MODIFIED: 2026-10-18 - Stage 0: frame quality gate =====
+            # Dark, blurred and repeated (frozen stream) frames skip inference and
+            # leave every state untouched; a repeat would give the same result anyway
+            skip_reason = None
+            if gate is not None:
+                skip_reason = gate.check(frame, frame_idx, media_time)
+                record_camera_events(conn, session_id, camera_id, gate)
+                lap = profiler.lap("skip", lap)
+            # ================================================================
 
             # Track state changes for screenshot/logging
             changed_tables = []
             division_changed = False
 
-            # Update table states
-            for table in tables:
-                if table.update_state(current_time):
-                    print(f"   {table.id}: {table.state.value} (C:{table.customers_present} W:{table.waiters_present})")
-                    changed_tables.append(table)
-
-            # Update division state
-            if division_tracker.update_state(walking_waiters, service_waiters, current_time):
-                print(f"   DIVISION: {division_tracker.current_state.upper()} (Walking:{walking_waiters} Service:{service_waiters})")
-                division_changed = True
-
-            # Track performance
-            frame_time = time.time() - frame_start
-            tracker.add_frame(frame_time, stage1_time, stage2_time)
-
-            # Draw annotated frame
-            annotated_frame = draw_frame_with_all_info(
-                frame, division_polygon, tables, sitting_areas, service_areas,
-                classified_detections, division_tracker.current_state, tracker
-            )
+            if skip_reason is None:
+                # Stage 1: Detect persons
+                stage1_start = time.time()
+                if cascade is not None:
+                    # A transition in its debounce window is decided by the next frames
+                    cascade.force_escalation = (division_tracker.pending_state is not None or
+                                                any(t.pending_state is not None for t in tables))
+                person_detections = detect_persons(person_detector, frame)
+                stage1_time = time.time() - stage1_start
+                lap = profiler.lap("detect", lap)
+
+                # Stage 2: Classify persons
+                stage2_start = time.time()
+                classified_detections = classify_persons(staff_classifier, frame, person_detections)
+                stage2_time = time.time() - stage2_start
+                lap = profiler.lap("classify", lap)
+
+                # Assign to ROIs
+                walking_waiters, service_waiters = assign_detections_to_rois(
+                    division_polygon, tables, sitting_areas, service_areas, classified_detections, roi
+                )
+                lap = profiler.lap("assign", lap)
+
+                # Update table states
+                for table in tables:
+                    if table.update_state(media_time):
+                        print(f"   {table.id}: {table.state.value} (C:{table.customers_present} W:{table.waiters_present})")
+                        changed_tables.append(table)
+
+                # Update division state
+                if division_tracker.update_state(walking_waiters, service_waiters, media_time):
+                    print(f"   DIVISION: {division_tracker.current_state.upper()} (Walking:{walking_waiters} Service:{service_waiters})")
+                    division_changed = True
+                last_classified = classified_detections
+                profiler.lap("state", lap)
+            else:
+                classified_detections = last_classified if skip_reason == "repeat" else []
+
+            # Schedule the next frame (--adaptive-fps)
+            if sampler is not None:
+                counts = sampler.last_counts if skip_reason else (
+                    tuple((t.customers_present, t.waiters_present) for t in tables), walking_waiters, service_waiters)
+                pending = division_tracker.pending_state is not None or any(t.pending_state is not None for t in tables)
+                sampler.update(frame_idx, media_time, counts, pending)
+
+            # Track performance (inference frames only)
+            if skip_reason is None:
+                frame_time = time.time() - frame_start
+                tracker.add_frame(frame_time, stage1_time, stage2_time)
+
+            # Draw annotated frame (headless: only when a screenshot needs it)
+            annotated_frame = None
+            if out is not None or changed_tables or division_changed:
+                lap = profiler.now()
+                annotated_frame = draw_frame_with_all_info(
+                    frame, division_polygon, tables, sitting_areas, service_areas,
+                    classified_detections, division_tracker.current_state, tracker, roi
+                )
+                profiler.lap("draw", lap)
 
             # ===== MODIFIED: Maintain original frame numbers in database/screenshots =====
             # Save screenshots and log state changes to database (use original frame_idx)
             for table in changed_tables:
+                lap = profiler.now()
                 screenshot_path = save_screenshot(
                     annotated_frame, screenshot_dir, camera_id, session_id,
                     frame_idx, prefix=f"{table.id}_")  # ← Uses original frame_idx
+                lap = profiler.lap("screenshot", lap, per_frame=True)
                 log_table_state_change(
                     conn, session_id, camera_id, frame_idx, current_time,  # ← Uses original frame_idx
                     table.id, table.state.value,
                     table.customers_present, table.waiters_present,
                     screenshot_path)
+                profiler.lap("db", lap, per_frame=True)
 
             if division_changed:
+                lap = profiler.now()
                 screenshot_path = save_screenshot(
                     annotated_frame, screenshot_dir, camera_id, session_id,
                     frame_idx, prefix="division_")  # ← Uses original frame_idx
+                lap = profiler.lap("screenshot", lap, per_frame=True)
                 log_division_state_change(
                     conn, session_id, camera_id, frame_idx, current_time,  # ← Uses original frame_idx
                     division_tracker.current_state.upper(),
                     walking_waiters, service_waiters,
                     screenshot_path)
+                profiler.lap("db", lap, per_frame=True)
             # ===========================================================================
 
-            out.write(annotated_frame)
-            frame_idx += 1
+            if out is not None:
+                lap = profiler.now()
+                out.write(annotated_frame)
+                part_frames += 1
+                profiler.lap("encode", lap, per_frame=True)
+            last_frame_idx = frame_idx
+
+            # ===== MODIFIED: 2026-10-18 - Periodic checkpoint =====
+            # Close the current video part first, so the checkpoint only ever
+            # references finished parts
+            if time.time() - last_checkpoint >= CHECKPOINT_INTERVAL_SECONDS:
+                lap = profiler.now()
+                if out is not None and part_frames:
+                    out.release()
+                    output_parts.append(output_part_path(output_file, len(output_parts)).name)
+                    out = open_output_part(output_file, len(output_parts), writer_fps, width, height)
+                    part_frames = 0
+                    lap = profiler.lap("encode", lap, per_frame=True)
+                save_checkpoint(conn, session_id, frame_idx,
+                                capture_checkpoint(tables, division_tracker, tracker, output_parts,
+                                                   now=frame_idx / media_fps))
+                profiler.lap("db", lap, per_frame=True)
+                last_checkpoint = time.time()
+            # ======================================================
+
+            # ===== MODIFIED: 2026-10-18 - Structured progress (watchdog heartbeat) =====
+            if time.time() - last_progress >= PROGRESS_INTERVAL_SECONDS:
+                stage1_ms, stage2_ms = tracker.get_avg_stage_times()
+                emit_progress(
+                    "frames", frame=frame_idx, end_frame=end_frame,
+                    processed=tracker.processed_frames, expected=expected_processed,
+                    progress=round(((frame_idx + 1 - start_frame) / max_frames) * 100 if max_frames else 100.0, 1),
+                    fps=round(tracker.get_current_fps(), 2),
+                    stage1_ms=round(stage1_ms, 1), stage2_ms=round(stage2_ms, 1),
+                    **({"escalation_rate": round(cascade.escalation_rate, 3)} if cascade else {}),
+                    **({"sample_fps": round(sampler.current_fps, 2)} if sampler else {}),
+                    **({"skipped": gate.skipped_total} if gate else {})
+                )
+                last_progress = time.time()
+            # ==========================================================================
 
             # ===== MODIFIED: Updated progress display =====
             # Progress - show processed vs total
-            if tracker.processed_frames % 30 == 0:
-                progress = (frame_idx / max_frames) * 100
+            if skip_reason is None and tracker.processed_frames % 30 == 0:
+                progress = ((frame_idx + 1 - start_frame) / max_frames) * 100 if max_frames else 100.0
                 table_states = " | ".join([f"{t.id}:{t.state.value[:3]}" for t in tables])
                 div_state = division_tracker.current_state.upper()[:3]
-                print(f"   Progress: {progress:.1f}% | Frame {frame_idx}/{max_frames} "
+                cascade_info = f" | ESC:{cascade.escalation_rate:.0%}" if cascade else ""
+                cascade_info += f" | SAMPLE:{sampler.current_fps:g}fps" if sampler else ""
+                cascade_info += f" | SKIP:{gate.skipped_total}" if gate else ""
+                print(f"   Progress: {progress:.1f}% | Frame {frame_idx + 1}/{end_frame} "
                       f"(Processed: {tracker.processed_frames}/{expected_processed}) | "
-                      f"FPS: {tracker.get_current_fps():.2f} | DIV:{div_state} | {table_states}")
+                      f"FPS: {tracker.get_current_fps():.2f}{cascade_info} | DIV:{div_state} | {table_states}")
             # ===============================================
 
+            profiler.lap("frame", frame_lap)
+            profiler.end_frame()
+
+        run_status = SESSION_COMPLETE
+
     except KeyboardInterrupt:
         print("\n⚠️  Interrupted by user")
+        error_message = "interrupted"
+
+    except Exception as e:
+        error_message = f"{type(e).__name__}: {e}"
+        raise
 
     finally:
-        # Update session end time and close database
-        cursor.execute('''
-            UPDATE sessions SET end_time = ?, total_frames = ?
-            WHERE session_id = ?
-        ''', (datetime.now().isoformat(), frame_idx, session_id))
+        # ===== MODIFIED: 2026-10-18 - Session status instead of an unconditional end_time =====
+        # complete: end_time set, checkpoint cleared, video parts joined
+        # failed:   the unfinished video part is dropped; the last checkpoint stays for resume
+        current_part = output_part_path(output_file, len(output_parts))
+        if out is not None:
+            out.release()
+            if run_status == SESSION_COMPLETE and part_frames:
+                output_parts.append(current_part.name)
+            else:
+                current_part.unlink(missing_ok=True)
+
+        if gate is not None:
+            gate.finish(last_frame_idx, (last_frame_idx or 0) / media_fps)
+            record_camera_events(conn, session_id, camera_id, gate)
+            cursor.execute('''
+                UPDATE sessions SET frames_skipped_dark = ?, frames_skipped_blurred = ?, frames_skipped_repeat = ?
+                WHERE session_id = ?
+            ''', (gate.skipped['dark'], gate.skipped['blurred'], gate.skipped['repeat'], session_id))
+
+        if run_status == SESSION_COMPLETE:
+            media_seconds = (tracker.total_frames - run_start_frames) / media_fps
+            cursor.execute('''
+                UPDATE sessions SET end_time = ?, total_frames = ?, processing_status = ?,
+                       checkpoint_frame = ?, checkpoint_state = NULL, checkpoint_at = ?,
+                       cascade_escalation_rate = ?, effective_fps = ?, fps_profile = ?
+                WHERE session_id = ?
+            ''', (datetime.now().isoformat(), tracker.total_frames, SESSION_COMPLETE,
+                  last_frame_idx, datetime.now().isoformat(),
+                  cascade.escalation_rate if cascade else None,
+                  tracker.processed_frames / media_seconds if media_seconds else None,
+                  json.dumps(sampler.profile()) if sampler else None, session_id))
+        else:
+            cursor.execute('''
+                UPDATE sessions SET processing_status = ?, error_message = ?
+                WHERE session_id = ?
+            ''', (SESSION_FAILED, error_message, session_id))
         conn.commit()
         conn.close()
 
         cap.release()
-        out.release()
-
-        # ===== MODIFIED: 2025-12-09 - Re-encode video with H.264 for smaller file size =====
-        # OpenCV mp4v creates large files (~75MB/60s), H.264 reduces to ~15MB/60s
-        temp_output = output_file + ".temp.mp4"
-        os.rename(output_file, temp_output)
-
-        ffmpeg_cmd = [
-            'ffmpeg', '-y', '-i', temp_output,
-            '-c:v', 'libx264',      # H.264 codec
-            '-preset', 'fast',       # Fast encoding, good compression
-            '-crf', '23',            # Quality (18-28, lower=better, 23=default)
-            '-c:a', 'copy',          # Copy audio if present
-            '-movflags', '+faststart',  # Web-friendly
-            output_file
-        ]
-
-        try:
-            import subprocess
-            result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True, timeout=300)
-            if result.returncode == 0:
-                # Success - remove temp file
-                os.unlink(temp_output)
-                print(f"🎬 Video re-encoded to H.264 (smaller file size)")
-            else:
-                # Failed - keep original mp4v file
-                os.rename(temp_output, output_file)
-                print(f"⚠️ H.264 re-encoding failed, keeping MPEG4 output", file=sys.stderr)
-        except Exception as e:
-            # Error - keep original mp4v file
-            if os.path.exists(temp_output):
-                os.rename(temp_output, output_file)
-            print(f"⚠️ H.264 re-encoding error: {e}", file=sys.stderr)
-        # ==================================================================================
+        if out is not None and run_status == SESSION_COMPLETE and output_parts:
+            lap = profiler.now()
+            with progress_heartbeat("encoding", parts=len(output_parts)):
+                if join_output_parts(output_file, [output_path / part for part in output_parts]):
+                    reencode_h264(output_file)
+            profiler.lap("finalize", lap)
+        # ==========================================================================================
+
+        # ===== MODIFIED: 2026-10-18 - Stage profile: session_profiles rows + JSON line =====
+        save_stage_profile(db_path, db_dir, profiler, session_id, camera_id, run_status,
+                           backend=getattr(person_detector, 'backend', None),
+                           video=video_filename, resolution=f"{width}x{height}",
+                           target_fps=target_fps, processed_frames=tracker.processed_frames,
+                           options={"cascade": cascade is not None, "adaptive_fps": sampler is not None,
+                                    "quality_gate": gate is not None, "headless": headless,
+                                    "keyframes_only": keyframes_only})
 
         # ===== MODIFIED: Pass target_fps to summary =====
         # Print summary
-        tracker.print_summary(duration if duration_limit is None else duration_limit, fps, target_fps)
+        tracker.print_summary(max_frames / fps if fps > 0 else duration, fps, None if sampler else target_fps)
         # =================================================
+        profiler.print_summary()
+        if cascade is not None:
+            print(f"Cascade: {cascade.summary()}")
+        if gate is not None:
+            print(f"Quality gate: {gate.summary()}")
+        if sampler is not None:
+            media_seconds = (tracker.total_frames - run_start_frames) / media_fps
+            peak_fps = sampler.video_fps / sampler.fast_interval
+            print(f"Adaptive FPS: {tracker.processed_frames} inferences (~{int(media_seconds * peak_fps)} at a fixed "
+                  f"{peak_fps:g} fps) | {sampler.boosts} boosts | {sampler.summary()}")
 
         # Division state summary
         print(f"\n{'='*70}")
@@ -1899,14 +2891,18 @@ def process_video(video_path, person_detector, staff_classifier, config, output_
                     print(f"      {trans['from']} -> {trans['to']}")
         print(f"{'='*70}\n")
 
-        print(f"💾 Video saved: {output_file}")
+        if out is not None and run_status == SESSION_COMPLETE:
+            print(f"💾 Video saved: {output_file}")
         print(f"💾 Database saved: {db_path}")
         print(f"📸 Screenshots: {screenshot_dir}/{camera_id}/{datetime.now().strftime('%Y%m%d')}/{session_id}/")
         print(f"   Camera ID: {camera_id}")
         print(f"   Session ID: {session_id}")
-        print(f"✅ Processing complete!\n")
+        if run_status == SESSION_COMPLETE:
+            print(f"✅ Processing complete!\n")
+        else:
+            print(f"⏸️  Session {SESSION_FAILED} - rerun the same command to resume from the last checkpoint\n")
 
-    return True
+    return run_status == SESSION_COMPLETE
 
 
 def main():
@@ -1930,6 +2926,15 @@ Examples:
 
   # Process full video
   python3 table_and_region_state_detection.py --video ../videos/camera_35.mp4
+
+  # Process 30s-45s only (seeks to the keyframe at or before 30s)
+  python3 table_and_region_state_detection.py --video ../videos/camera_35.mp4 --start 30 --end 45
+
+  # Quick preview: one decoded frame per keyframe
+  python3 table_and_region_state_detection.py --video ../videos/camera_35.mp4 --keyframes-only
+
+  # Event-adaptive sampling: 1 FPS while stable, up to 10 FPS around transitions
+  python3 table_and_region_state_detection.py --video ../videos/camera_35.mp4 --adaptive-fps --min-fps 1 --max-fps 10
         """
     )
     parser.add_argument("--video", required=True, help="Path to input video")
@@ -1937,16 +2942,69 @@ Examples:
                        help="Output directory (default: ../../results)")
     parser.add_argument("--interactive", action="store_true",
                        help="Interactive ROI setup mode")
+    parser.add_argument("--config", default=None,
+                       help="ROI config file (default: config/table_region_config_{camera_id}.json "
+                            "if it exists, else config/table_region_config.json)")
     parser.add_argument("--duration", type=int, default=None,
                        help="Process only first N seconds (default: full video)")
     # ===== MODIFIED: Added --fps parameter =====
     parser.add_argument("--fps", type=float, default=5.0,
                        help="Target processing FPS (default: 5.0). Process at this rate instead of every frame.")
     # ===========================================
+    parser.add_argument("--adaptive-fps", action="store_true",
+                       help="Event-adaptive sampling: base rate while all states are stable, "
+                            "max rate while a transition is pending or counts change")
+    parser.add_argument("--min-fps", type=float, default=None,
+                       help=f"--adaptive-fps base rate (default: cameras_config.json adaptive_fps.min, "
+                            f"else {ADAPTIVE_MIN_FPS:g})")
+    parser.add_argument("--max-fps", type=float, default=None,
+                       help="--adaptive-fps peak rate (default: cameras_config.json adaptive_fps.max, else --fps)")
+    quality_group = parser.add_mutually_exclusive_group()
+    quality_group.add_argument("--quality-gate", dest="quality_gate", action="store_true", default=None,
+                              help="Skip dark/blurred/repeated frames before detection "
+                                   "(default: cameras_config.json frame_quality.enabled, else off)")
+    quality_group.add_argument("--no-quality-gate", dest="quality_gate", action="store_false",
+                              help="Run detection on every sampled frame (no dark/blurred/repeat skipping)")
+    parser.add_argument("--min-luma", type=float, default=None,
+                       help=f"Quality gate: skip frames darker than this mean gray level "
+                            f"(default: cameras_config.json frame_quality, else {DEFAULT_MIN_LUMA:g})")
+    parser.add_argument("--min-sharpness", type=float, default=None,
+                       help=f"Quality gate: skip frames with a lower Laplacian variance (default: {DEFAULT_MIN_SHARPNESS:g})")
+    parser.add_argument("--frozen-seconds", type=float, default=None,
+                       help=f"Quality gate: identical frames for this long = camera_frozen event "
+                            f"(default: {DEFAULT_FROZEN_SECONDS:g})")
+    parser.add_argument("--start", type=float, default=None,
+                       help="Start at this many seconds (snapped back to the previous keyframe)")
+    parser.add_argument("--end", type=float, default=None,
+                       help="Stop at this many seconds (default: end of video)")
+    parser.add_argument("--keyframes-only", action="store_true",
+                       help="Process one frame per keyframe (fast preview)")
+    parser.add_argument("--headless", action="store_true",
+                       help="Do not write the annotated output video (database + screenshots only)")
     parser.add_argument("--person_conf", type=float, default=0.3,
                        help="Person detection confidence (default: 0.3)")
     parser.add_argument("--staff_conf", type=float, default=0.5,
                        help="Staff classification confidence (default: 0.5)")
+    parser.add_argument("--torch-threads", type=int, default=None,
+                       help="torch intra-op threads (default: library default, all cores)")
+    parser.add_argument("--interop-threads", type=int, default=None,
+                       help="torch inter-op threads (default: library default)")
+    parser.add_argument("--cv-threads", type=int, default=None,
+                       help="OpenCV threads (default: library default)")
+    parser.add_argument("--cpu-cores", default=None,
+                       help="Pin this process to these CPUs, taskset list format (e.g. 0-3,8)")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKENDS,
+                       help=f"Inference backend (default: {DEFAULT_BACKEND}, set DETECTION_BACKEND "
+                            f"per deployment; export with export_models.py)")
+    parser.add_argument("--db", default=None,
+                       help="Database file (default: ../../db/detection_data.db)")
+    parser.add_argument("--cascade", action="store_true",
+                       help="Small detector first, full detector only on uncertain frames")
+    parser.add_argument("--cascade-model", default=CASCADE_DETECTOR_MODEL,
+                       help=f"Small detector weights for --cascade (default: models/{os.path.basename(CASCADE_DETECTOR_MODEL)})")
+    parser.add_argument("--cascade-margin", type=float, default=CASCADE_CONF_MARGIN,
+                       help=f"Escalate when a small-model confidence is within this of --person_conf "
+                            f"(default: {CASCADE_CONF_MARGIN})")
 
     args = parser.parse_args()
 
@@ -1961,6 +3019,7 @@ Examples:
     print("="*70)
 
     config = None
+    config_file = CONFIG_FILE
 
     if args.interactive:
         config = setup_all_rois_from_video(args.video)
@@ -1968,9 +3027,10 @@ Examples:
             print("\n❌ Setup cancelled")
             return 1
     else:
-        config = load_config_from_file()
+        config_file = args.config or str(config_path_for_camera(extract_camera_id_from_filename(args.video)))
+        config = load_config_from_file(config_file)
         if config is None:
-            print(f"\n⚠️  No config found: {CONFIG_FILE}")
+            print(f"\n⚠️  No config found: {config_file}")
             print("   Use --interactive to create configuration")
             return 1
 
@@ -1978,7 +3038,11 @@ Examples:
     print("\n" + "="*70)
     print("Step 2: Loading Models")
     print("="*70)
-    person_detector, staff_classifier = load_models()
+    emit_progress("loading_models")
+    apply_thread_budget(args.torch_threads, args.interop_threads, args.cv_threads, args.cpu_cores)
+    person_detector, staff_classifier = load_models(args.backend, args.torch_threads,
+                                                    args.cascade_model if args.cascade else None,
+                                                    args.cascade_margin)
     if person_detector is None or staff_classifier is None:
         return 1
 
@@ -1988,7 +3052,15 @@ Examples:
     print("="*70)
     # ===== MODIFIED: Pass target_fps to process_video =====
     success = process_video(args.video, person_detector, staff_classifier, config,
-                           args.output, args.duration, target_fps=args.fps)
+                           args.output, args.duration, target_fps=args.fps,
+                           start_seconds=args.start, end_seconds=args.end,
+                           keyframes_only=args.keyframes_only, headless=args.headless,
+                           db_path=args.db, adaptive_fps=args.adaptive_fps,
+                           min_fps=args.min_fps, max_fps=args.max_fps,
+                           quality_gate=args.quality_gate,
+                           quality_thresholds={"min_luma": args.min_luma, "min_sharpness": args.min_sharpness,
+                                               "frozen_seconds": args.frozen_seconds},
+                           config_file=config_file)
     # =======================================================
 
     return 0 if success else 1